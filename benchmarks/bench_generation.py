@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Generation throughput and timeout behaviour against the OpenAI stub.
+
+Starts benchmarks/openai_stub.py in-process (or uses OPENAI_BASE_URL /
+--base-url when given) and drives common.openai_client from several
+threads, reporting success rate, latency percentiles and throughput for:
+
+    single   one post_chat_completion per draft (no retry)
+    retry    complete_with_retry (backoff + Retry-After, deadline-bounded)
+    hedge    complete_with_retry with OPENAI_HEDGE=1
+    stream   stream_chat_completion, time to first delta and to last
+    async    common.generation.AsyncTransport, all requests on one event
+             loop with at most --concurrency in flight
+
+Example:
+
+    python benchmarks/bench_generation.py --requests 300 --concurrency 8 \\
+        --latency lognormal:0.3,0.8 --error-rate 0.05 --budget 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "app")
+)
+
+from openai_stub import StubConfig, start_stub  # noqa: E402
+
+from common import openai_client  # noqa: E402
+from common.generation import AsyncTransport  # noqa: E402
+
+PAYLOAD = {
+    "model": "gpt-4o-mini",
+    "messages": [{"role": "user", "content": "bench"}],
+    "max_tokens": 200,
+}
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _run(
+    name: str,
+    call: Callable[[], Optional[float]],
+    requests: int,
+    concurrency: int,
+) -> None:
+    def timed(_: int) -> Tuple[bool, float, Optional[float]]:
+        started = time.perf_counter()
+        try:
+            first = call()
+            return True, time.perf_counter() - started, first
+        except Exception:
+            return False, time.perf_counter() - started, None
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(timed, range(requests)))
+    elapsed = time.perf_counter() - started
+
+    ok = [latency for success, latency, _ in results if success]
+    firsts = [first for _, _, first in results if first is not None]
+    line = f"{name:<7} ok={len(ok)}/{requests} rps={requests / elapsed:6.1f}"
+    if ok:
+        line += (
+            f" p50={_percentile(ok, 0.5) * 1000:7.1f}ms"
+            f" p95={_percentile(ok, 0.95) * 1000:7.1f}ms"
+            f" p99={_percentile(ok, 0.99) * 1000:7.1f}ms"
+            f" max={max(ok) * 1000:7.1f}ms"
+        )
+    if firsts:
+        line += f" ttft_p50={statistics.median(firsts) * 1000:6.1f}ms"
+    print(line)
+
+
+def _run_async(
+    budget: float, base_url: str, requests: int, concurrency: int
+) -> None:
+    async def drive() -> List[Tuple[bool, float]]:
+        transport = AsyncTransport("stub", base_url=base_url)
+        gate = asyncio.Semaphore(concurrency)
+
+        async def timed() -> Tuple[bool, float]:
+            async with gate:
+                started = time.perf_counter()
+                try:
+                    await transport.complete(PAYLOAD, budget)
+                    return True, time.perf_counter() - started
+                except Exception:
+                    return False, time.perf_counter() - started
+
+        try:
+            return await asyncio.gather(*(timed() for _ in range(requests)))
+        finally:
+            transport.close()
+
+    started = time.perf_counter()
+    results = asyncio.run(drive())
+    elapsed = time.perf_counter() - started
+    ok = [latency for success, latency in results if success]
+    line = f"{'async':<7} ok={len(ok)}/{requests} rps={requests / elapsed:6.1f}"
+    if ok:
+        line += (
+            f" p50={_percentile(ok, 0.5) * 1000:7.1f}ms"
+            f" p95={_percentile(ok, 0.95) * 1000:7.1f}ms"
+            f" p99={_percentile(ok, 0.99) * 1000:7.1f}ms"
+            f" max={max(ok) * 1000:7.1f}ms"
+        )
+    print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--budget", type=float, default=3.0)
+    parser.add_argument("--base-url", default=os.getenv("OPENAI_BASE_URL", ""))
+    parser.add_argument("--latency", default="lognormal:0.2,0.7")
+    parser.add_argument("--error-rate", type=float, default=0.05)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.02)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--stream-tokens-per-second", type=float, default=200)
+    parser.add_argument(
+        "--modes", default="single,retry,hedge,stream,async",
+        help="comma-separated subset of single,retry,hedge,stream,async",
+    )
+    args = parser.parse_args()
+
+    httpd = None
+    base_url = args.base_url
+    if not base_url:
+        httpd, _, base_url = start_stub(
+            StubConfig(
+                latency=args.latency,
+                error_rate=args.error_rate,
+                rate_limit_rate=args.rate_limit_rate,
+                retry_after=args.retry_after,
+                stream_tokens_per_second=args.stream_tokens_per_second,
+                seed=1,
+            )
+        )
+    os.environ["OPENAI_BASE_URL"] = base_url
+    print(f"target {base_url} budget={args.budget}s")
+
+    def single() -> None:
+        openai_client.post_chat_completion(PAYLOAD, "stub", timeout=args.budget)
+
+    def retry() -> None:
+        openai_client.complete_with_retry(PAYLOAD, "stub", args.budget)
+
+    def stream() -> Optional[float]:
+        started = time.perf_counter()
+        first = None
+        for _ in openai_client.stream_chat_completion(
+            PAYLOAD, "stub", timeout=args.budget
+        ):
+            if first is None:
+                first = time.perf_counter() - started
+        return first
+
+    try:
+        for mode in args.modes.split(","):
+            if mode == "single":
+                _run("single", single, args.requests, args.concurrency)
+            elif mode == "retry":
+                os.environ.pop("OPENAI_HEDGE", None)
+                _run("retry", retry, args.requests, args.concurrency)
+            elif mode == "hedge":
+                os.environ["OPENAI_HEDGE"] = "1"
+                _run("hedge", retry, args.requests, args.concurrency)
+                os.environ.pop("OPENAI_HEDGE", None)
+            elif mode == "stream":
+                _run("stream", stream, args.requests, args.concurrency)
+            elif mode == "async":
+                _run_async(
+                    args.budget, base_url, args.requests, args.concurrency
+                )
+    finally:
+        if httpd is not None:
+            httpd.shutdown()
+            httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
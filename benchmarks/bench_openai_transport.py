@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Per-call overhead of the OpenAI transport: fresh urllib connection per call
+versus the pooled keep-alive client, cold (first call) and warm.
+
+Runs against a local chat-completions stub, so no network or API key is
+needed:
+
+    python benchmarks/bench_openai_transport.py --requests 200
+
+The stub is plain HTTP on localhost, so the numbers cover connection setup
+and request overhead but not TLS; against api.openai.com the per-call
+saving of a warm pooled connection additionally includes the TLS handshake.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "app")
+)
+
+from common.http_pool import KeepAlivePool  # noqa: E402
+
+COMPLETION = json.dumps(
+    {"choices": [{"message": {"role": "assistant", "content": "ok"}}]}
+).encode("utf-8")
+PAYLOAD = json.dumps(
+    {
+        "model": "gpt-4o-mini",
+        "messages": [{"role": "user", "content": "bench"}],
+        "max_tokens": 16,
+    }
+).encode("utf-8")
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; avoid Nagle stalls
+    disable_nagle_algorithm = True
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server API
+        self.rfile.read(int(self.headers.get("Content-Length", "0")))
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(COMPLETION)))
+        self.end_headers()
+        self.wfile.write(COMPLETION)
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+def _time_calls(call: Callable[[], None], n: int) -> List[float]:
+    samples = []
+    for _ in range(n):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _report(name: str, samples: List[float]) -> None:
+    warm = samples[1:] or samples
+    print(
+        f"{name:<10} cold={samples[0]:7.3f}ms "
+        f"warm_p50={statistics.median(warm):7.3f}ms "
+        f"warm_mean={statistics.fmean(warm):7.3f}ms"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+    headers = {"Content-Type": "application/json"}
+
+    def urllib_call() -> None:
+        req = urllib.request.Request(
+            url=base_url + "/v1/chat/completions",
+            data=PAYLOAD,
+            headers=headers,
+            method="POST",
+        )
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            json.loads(resp.read())
+
+    pool = KeepAlivePool(base_url)
+
+    def pooled_call() -> None:
+        pool.request(
+            "POST", "/v1/chat/completions", body=PAYLOAD, headers=headers
+        ).json()
+
+    try:
+        _report("urllib", _time_calls(urllib_call, args.requests))
+        _report("pooled", _time_calls(pooled_call, args.requests))
+        print(f"pooled connections opened: {pool.connections_opened}")
+    finally:
+        pool.close()
+        httpd.shutdown()
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
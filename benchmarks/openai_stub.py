@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the OpenAI chat-completions API.
+
+Speaks enough of the protocol for common.openai_client and the Cloud Run
+worker: POST /v1/chat/completions, plain JSON or server-sent events when
+the payload has ``"stream": true``. Latency, failures and rate limits are
+configurable, so generation throughput and timeout behaviour can be
+measured without network access or an API key:
+
+    python benchmarks/openai_stub.py --port 8089 \\
+        --latency lognormal:0.4,0.6 --error-rate 0.02 \\
+        --rate-limit-rate 0.05 --tokens-per-minute 200000
+    OPENAI_BASE_URL=http://127.0.0.1:8089 python benchmarks/bench_generation.py
+
+Latency specs:
+    fixed:S              always S seconds
+    uniform:LO,HI        uniformly between LO and HI
+    exp:MEAN             exponential with the given mean
+    lognormal:MEDIAN,SIGMA
+
+GET /stats returns request, error and token counters as JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+
+REPLY_TEXT = (
+    "お問い合わせいただきありがとうございます。"
+    "ご質問の件について、担当者にて確認のうえ改めてご連絡いたします。"
+    "恐れ入りますが、今しばらくお待ちくださいませ。"
+)
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """Sampler for a latency spec such as ``uniform:0.1,0.5``."""
+    kind, _, args = spec.partition(":")
+    values = [float(v) for v in args.split(",") if v]
+    if kind == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "exp" and len(values) == 1:
+        return lambda rng: rng.expovariate(1.0 / values[0])
+    if kind == "lognormal" and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: rng.lognormvariate(mu, values[1])
+    raise ValueError(f"invalid latency spec: {spec}")
+
+
+@dataclass
+class StubConfig:
+    # Time to first byte (non-streaming: whole response)
+    latency: str = "fixed:0"
+    # Fraction of requests answered with 500 / 429
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    # Account-wide token budget; 0 disables the limit
+    tokens_per_minute: int = 0
+    # Streaming pace per response; 0 sends all chunks at once
+    stream_tokens_per_second: float = 0.0
+    # Reply length before max_tokens truncation, and characters per
+    # emitted token (Japanese is about one)
+    reply_tokens: int = 120
+    chars_per_token: int = 1
+    seed: Optional[int] = None
+
+
+@dataclass
+class StubStats:
+    requests: int = 0
+    streamed: int = 0
+    errors: int = 0
+    rate_limited: int = 0
+    tokens: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def as_dict(self) -> Dict[str, int]:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "streamed": self.streamed,
+                "errors": self.errors,
+                "rate_limited": self.rate_limited,
+                "tokens": self.tokens,
+            }
+
+
+class _TokenBucket:
+    """Tokens-per-minute limit shared by all requests."""
+
+    def __init__(self, per_minute: int) -> None:
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self, tokens: int) -> float:
+        """Consume ``tokens``; return 0 or the seconds until they exist."""
+        with self.lock:
+            now = time.monotonic()
+            self.level = min(
+                self.capacity, self.level + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.level >= tokens:
+                self.level -= tokens
+                return 0.0
+            return (tokens - self.level) / self.rate
+
+
+class OpenAIStub:
+    def __init__(self, config: StubConfig) -> None:
+        self.config = config
+        self.stats = StubStats()
+        self._sample_latency = parse_latency(config.latency)
+        self._rng = random.Random(config.seed)
+        self._rng_lock = threading.Lock()
+        self._bucket = (
+            _TokenBucket(config.tokens_per_minute)
+            if config.tokens_per_minute > 0
+            else None
+        )
+
+    def _draw(self) -> Tuple[float, float, float]:
+        with self._rng_lock:
+            return (
+                max(self._sample_latency(self._rng), 0.0),
+                self._rng.random(),
+                self._rng.random(),
+            )
+
+    def plan(self, payload: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Decide the outcome of one request: (status, details)."""
+        latency, error_roll, limit_roll = self._draw()
+        max_tokens = int(payload.get("max_tokens") or 300)
+        tokens = min(max_tokens, self.config.reply_tokens)
+        with self.stats.lock:
+            self.stats.requests += 1
+        if limit_roll < self.config.rate_limit_rate:
+            return 429, {"retry_after": self.config.retry_after}
+        if self._bucket is not None:
+            wait = self._bucket.take(tokens)
+            if wait > 0:
+                return 429, {"retry_after": wait}
+        if error_roll < self.config.error_rate:
+            return 500, {"latency": latency}
+        return 200, {"latency": latency, "tokens": tokens}
+
+    def server(
+        self, host: str = "127.0.0.1", port: int = 0
+    ) -> ThreadingHTTPServer:
+        handler = type("StubHandler", (_Handler,), {"stub": self})
+        return _StubServer((host, port), handler)
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # The default backlog of 5 drops SYNs when many clients connect at
+    # once, adding ~1s retransmit stalls that are not the client's doing
+    request_queue_size = 128
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately; avoid Nagle stalls
+    disable_nagle_algorithm = True
+    stub: OpenAIStub
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+    def _send_json(
+        self,
+        status: int,
+        body: Dict[str, Any],
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server API
+        if self.path == "/stats":
+            self._send_json(200, self.stub.stats.as_dict())
+            return
+        self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server API
+        length = int(self.headers.get("Content-Length", "0"))
+        raw = self.rfile.read(length)
+        if not self.path.endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": "not found"}})
+            return
+        try:
+            payload = json.loads(raw or b"{}")
+        except ValueError:
+            self._send_json(400, {"error": {"message": "invalid json"}})
+            return
+
+        stats = self.stub.stats
+        status, details = self.stub.plan(payload)
+        if status == 429:
+            with stats.lock:
+                stats.rate_limited += 1
+            wait = details["retry_after"]
+            self._send_json(
+                429,
+                {"error": {"type": "rate_limit_exceeded"}},
+                {
+                    "Retry-After": str(max(1, math.ceil(wait))),
+                    "retry-after-ms": str(int(wait * 1000)),
+                },
+            )
+            return
+        time.sleep(details["latency"])
+        if status == 500:
+            with stats.lock:
+                stats.errors += 1
+            self._send_json(500, {"error": {"type": "server_error"}})
+            return
+
+        tokens = details["tokens"]
+        chars = tokens * self.stub.config.chars_per_token
+        text = (REPLY_TEXT * (chars // len(REPLY_TEXT) + 1))[:chars]
+        with stats.lock:
+            stats.tokens += tokens
+        if payload.get("stream"):
+            with stats.lock:
+                stats.streamed += 1
+            self._stream(payload, text)
+            return
+        self._send_json(
+            200,
+            {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "model": payload.get("model", "stub"),
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": text},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": {"completion_tokens": tokens},
+            },
+        )
+
+    def _chunk(self, data: bytes) -> None:
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+
+    def _stream(self, payload: Dict[str, Any], text: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        per_token = self.stub.config.chars_per_token
+        tps = self.stub.config.stream_tokens_per_second
+        for i in range(0, len(text), per_token):
+            event = {
+                "object": "chat.completion.chunk",
+                "model": payload.get("model", "stub"),
+                "choices": [
+                    {"index": 0, "delta": {"content": text[i: i + per_token]}}
+                ],
+            }
+            self._chunk(
+                b"data: "
+                + json.dumps(event, ensure_ascii=False).encode("utf-8")
+                + b"\n\n"
+            )
+            if tps > 0:
+                time.sleep(1.0 / tps)
+        self._chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def start_stub(
+    config: Optional[StubConfig] = None,
+    host: str = "127.0.0.1",
+    port: int = 0,
+) -> Tuple[ThreadingHTTPServer, OpenAIStub, str]:
+    """Serve a stub in a background thread; returns (server, stub, base_url).
+
+    Stop it with ``server.shutdown(); server.server_close()``.
+    """
+    stub = OpenAIStub(config or StubConfig())
+    httpd = stub.server(host, port)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, stub, f"http://{host}:{httpd.server_address[1]}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", default="fixed:0")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--tokens-per-minute", type=int, default=0)
+    parser.add_argument("--stream-tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--reply-tokens", type=int, default=120)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        tokens_per_minute=args.tokens_per_minute,
+        stream_tokens_per_second=args.stream_tokens_per_second,
+        reply_tokens=args.reply_tokens,
+        seed=args.seed,
+    )
+    parse_latency(config.latency)
+    httpd = OpenAIStub(config).server(args.host, args.port)
+    print(f"OpenAI stub listening on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
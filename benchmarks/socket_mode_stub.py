@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for Slack Socket Mode.
+
+Serves ``POST /api/apps.connections.open``, which hands out a websocket
+URL on the same server, and the websocket itself: it sends ``hello``,
+then every envelope passed to ``deliver`` (or to ``POST /deliver``), and
+records each acknowledgement with its delay. The receiver in
+src/app/socket_mode.py can be run and measured against it without a
+Slack app:
+
+    python benchmarks/socket_mode_stub.py --port 8091
+    SLACK_API_URL=http://127.0.0.1:8091 SLACK_APP_TOKEN=xapp-local \\
+        python src/app/socket_mode.py
+    curl -d '{"type": "block_actions", "trigger_id": "t"}' \\
+        http://127.0.0.1:8091/deliver
+
+GET /stats returns connection, delivery and acknowledgement counters.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "app")
+)
+
+from common.websocket import (  # noqa: E402
+    OP_CLOSE,
+    OP_PING,
+    OP_TEXT,
+    accept_key,
+    read_frame,
+    write_frame,
+)
+
+
+@dataclass
+class SocketModeStats:
+    connections: int = 0
+    delivered: int = 0
+    acked: int = 0
+    # Seconds from sending an envelope to receiving its ack
+    ack_delays: List[float] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self.lock:
+            delays = sorted(self.ack_delays)
+            return {
+                "connections": self.connections,
+                "delivered": self.delivered,
+                "acked": self.acked,
+                "max_ack_ms": round(delays[-1] * 1000, 1) if delays else None,
+            }
+
+
+class SocketModeStub:
+    def __init__(self) -> None:
+        self.stats = SocketModeStats()
+        self._outbox: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+        self._sent: Dict[str, float] = {}
+        self._acks: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self.ws_url = ""
+
+    def deliver(
+        self,
+        payload: Dict[str, Any],
+        envelope_type: str = "interactive",
+        retry_attempt: int = 0,
+        retry_reason: str = "",
+        envelope_id: str = "",
+    ) -> str:
+        """Queue an envelope for the connected client; its envelope_id.
+
+        A redelivery passes the earlier ``envelope_id`` with a
+        ``retry_attempt`` above zero, as Slack does."""
+        envelope_id = envelope_id or uuid.uuid4().hex
+        with self._lock:
+            self._acks[envelope_id] = threading.Event()
+        self._outbox.put(
+            {
+                "envelope_id": envelope_id,
+                "type": envelope_type,
+                "accepts_response_payload": envelope_type == "interactive",
+                "retry_attempt": retry_attempt,
+                "retry_reason": retry_reason,
+                "payload": payload,
+            }
+        )
+        return envelope_id
+
+    def disconnect(self) -> None:
+        """Ask the client to reconnect, as Slack does every few hours."""
+        self._outbox.put({"type": "disconnect", "reason": "refresh_requested"})
+
+    def wait_ack(self, envelope_id: str, timeout: float = 5.0) -> bool:
+        with self._lock:
+            event = self._acks.get(envelope_id)
+        return event is not None and event.wait(timeout)
+
+    def _sent_at(self, envelope_id: str) -> None:
+        with self._lock:
+            self._sent[envelope_id] = time.monotonic()
+        with self.stats.lock:
+            self.stats.delivered += 1
+
+    def _acked(self, envelope_id: str) -> None:
+        with self._lock:
+            sent = self._sent.pop(envelope_id, None)
+            event = self._acks.get(envelope_id)
+        if sent is None or event is None:
+            return
+        with self.stats.lock:
+            self.stats.acked += 1
+            self.stats.ack_delays.append(time.monotonic() - sent)
+        event.set()
+
+    def server(
+        self, host: str = "127.0.0.1", port: int = 0
+    ) -> ThreadingHTTPServer:
+        handler = type("StubHandler", (_Handler,), {"stub": self})
+        httpd = _StubServer((host, port), handler)
+        self.ws_url = f"ws://{host}:{httpd.server_address[1]}/link"
+        return httpd
+
+
+class _StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    stub: SocketModeStub
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+    def _send_json(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self) -> None:  # noqa: N802 - http.server API
+        length = int(self.headers.get("Content-Length", "0"))
+        raw = self.rfile.read(length)
+        if self.path == "/api/apps.connections.open":
+            self._send_json(200, {"ok": True, "url": self.stub.ws_url})
+            return
+        if self.path == "/deliver":
+            try:
+                payload = json.loads(raw or b"{}")
+            except ValueError:
+                self._send_json(400, {"error": "invalid json"})
+                return
+            envelope_id = self.stub.deliver(payload)
+            self._send_json(200, {"envelope_id": envelope_id})
+            return
+        self._send_json(404, {"ok": False, "error": "unknown_method"})
+
+    def do_GET(self) -> None:  # noqa: N802 - http.server API
+        if self.path == "/stats":
+            self._send_json(200, self.stub.stats.as_dict())
+            return
+        key = self.headers.get("Sec-WebSocket-Key")
+        if self.path != "/link" or not key:
+            self._send_json(404, {"error": "not found"})
+            return
+        self.send_response(101)
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept_key(key))
+        self.end_headers()
+        self.wfile.flush()
+        with self.stub.stats.lock:
+            self.stub.stats.connections += 1
+        self._serve_socket()
+        self.close_connection = True
+
+    def _write(self, opcode: int, payload: bytes) -> None:
+        write_frame(self.connection, opcode, payload, masked=False)
+
+    def _serve_socket(self) -> None:
+        closed = threading.Event()
+        reader = threading.Thread(
+            target=self._read_acks, args=(closed,), daemon=True
+        )
+        reader.start()
+        self._write(OP_TEXT, json.dumps({"type": "hello"}).encode("utf-8"))
+        while not closed.is_set():
+            try:
+                message = self.stub._outbox.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+            if "envelope_id" in message:
+                self.stub._sent_at(message["envelope_id"])
+            try:
+                self._write(
+                    OP_TEXT,
+                    json.dumps(message, ensure_ascii=False).encode("utf-8"),
+                )
+            except OSError:
+                break
+            if message.get("type") == "disconnect":
+                # Slack waits for the client to go; so does the stub
+                closed.wait(5.0)
+                break
+        closed.set()
+
+    def _read_acks(self, closed: threading.Event) -> None:
+        try:
+            while not closed.is_set():
+                _, opcode, payload = read_frame(self.rfile)
+                if opcode == OP_CLOSE:
+                    try:
+                        self._write(OP_CLOSE, payload[:2])
+                    except OSError:
+                        pass
+                    break
+                if opcode == OP_PING:
+                    continue
+                try:
+                    ack = json.loads(payload.decode("utf-8"))
+                except ValueError:
+                    continue
+                if isinstance(ack, dict) and ack.get("envelope_id"):
+                    self.stub._acked(ack["envelope_id"])
+        except OSError:
+            pass
+        finally:
+            closed.set()
+
+
+def start_stub(
+    host: str = "127.0.0.1", port: int = 0
+) -> Tuple[ThreadingHTTPServer, SocketModeStub, str]:
+    """Serve a stub in a background thread; returns (server, stub,
+    api_url), where ``api_url`` is what ``SLACK_API_URL`` should be.
+
+    Stop it with ``server.shutdown(); server.server_close()``.
+    """
+    stub = SocketModeStub()
+    httpd = stub.server(host, port)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd, stub, f"http://{host}:{httpd.server_address[1]}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8091)
+    args = parser.parse_args()
+
+    httpd = SocketModeStub().server(args.host, args.port)
+    print(f"Socket Mode stub listening on http://{args.host}:{args.port}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -106,17 +106,15 @@ build_and_push_images() {
     
     # Build service image
     log_info "Building service image..."
-    cd cloudrun/service
-    docker build -t "${image_tag}/slack-events:latest" .
+    # Both images are built from the repository root: they bundle
+    # src/app/common (shared Slack client, generation engine)
+    docker build -f cloudrun/service/Dockerfile -t "${image_tag}/slack-events:latest" .
     docker push "${image_tag}/slack-events:latest"
-    cd ../..
     
     # Build job image
     log_info "Building job image..."
-    cd cloudrun/job_worker
-    docker build -t "${image_tag}/job-worker:latest" .
+    docker build -f cloudrun/job_worker/Dockerfile -t "${image_tag}/job-worker:latest" .
     docker push "${image_tag}/job-worker:latest"
-    cd ../..
 }
 
 # Deploy using Terraform
@@ -1,84 +1,223 @@
 """AWS authentication utilities for Cloud Run Job worker using Workload Identity."""  # noqa: E501
 
 import logging
-from typing import Optional, Dict
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
 
 try:
     from google.auth import default
+    from google.auth.transport.requests import Request as GoogleAuthRequest
     import requests  # type: ignore
     import xml.etree.ElementTree as ET
     import boto3  # type: ignore
+    import botocore.session  # type: ignore
+    from botocore.credentials import RefreshableCredentials  # type: ignore
 except ImportError:
     # These imports may not be available in all environments
     pass
 
-from .config import JobWorkerConfig
+try:
+    from .config import JobWorkerConfig
+except ImportError:
+    # Loaded as a top-level module next to worker.py (Cloud Run image)
+    from config import JobWorkerConfig  # type: ignore[no-redef]
 
 logger = logging.getLogger(__name__)
 
+_STS_NS = "{https://sts.amazonaws.com/doc/2011-06-15/}"
 
-def get_aws_credentials(config: JobWorkerConfig) -> Optional[Dict[str, str]]:
-    """
-    Get AWS credentials using Workload Identity.
+# A refresh botocore asks for this close to Expiration fetches a new set...
+REFRESH_MARGIN_SECONDS = 15 * 60
+# ...and callers get a fresh set once this close. Both match botocore's
+# advisory and mandatory windows for RefreshableCredentials, so a refresh
+# it asks for always yields credentials outside them.
+MANDATORY_REFRESH_SECONDS = 10 * 60
 
-    Returns:
-        Dict with AWS credentials or None if failed
+
+def _parse_expiration(value: str) -> float:
+    # STS returns ISO 8601 in UTC, e.g. 2024-01-01T00:00:00Z
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class WorkloadIdentityCredentialProvider:
+    """Caches STS AssumeRoleWithWebIdentity credentials until near Expiration.
+
+    Within ``mandatory_margin`` of expiry the caller refreshes; botocore's
+    own refresh fetches a new set within ``refresh_margin``. STS calls
+    reuse one pooled ``requests.Session``.
+
+    The cache lives in the process. A Cloud Run Job drafts one inquiry and
+    exits, so every job still makes one STS call; the cache only saves the
+    repeated calls within a job.
     """
-    try:
-        # Get GCP credentials
-        credentials, project_id = default()
 
-        # Create OIDC token
-        oidc_token = credentials.token
+    def __init__(
+        self,
+        config: JobWorkerConfig,
+        refresh_margin: float = REFRESH_MARGIN_SECONDS,
+        mandatory_margin: float = MANDATORY_REFRESH_SECONDS,
+        session: Any = None,
+    ) -> None:
+        self._config = config
+        self._refresh_margin = refresh_margin
+        self._mandatory_margin = mandatory_margin
+        self._session = session
+        self._lock = threading.Lock()
+        self._credentials: Optional[Dict[str, str]] = None
+        self._expires_at = 0.0
+
+    def _http(self) -> Any:
+        if self._session is None:
+            self._session = requests.Session()
+        return self._session
 
-        # Prepare the request to AWS STS
-        sts_url = f"https://sts.{config.aws_region}.amazonaws.com/"
+    def _web_identity_token(self) -> str:
+        credentials, _ = default()
+        if not getattr(credentials, "token", None):
+            credentials.refresh(GoogleAuthRequest())
+        return str(credentials.token)
 
-        # Create the AssumeRoleWithWebIdentity request
+    def _assume_role(self) -> Tuple[Dict[str, str], float]:
+        sts_url = f"https://sts.{self._config.aws_region}.amazonaws.com/"
         assume_role_data = {
             "Action": "AssumeRoleWithWebIdentity",
             "Version": "2011-06-15",
-            "RoleArn": config.aws_role_arn,
+            "RoleArn": self._config.aws_role_arn,
             "RoleSessionName": "cloudrun-job-worker",
-            "WebIdentityToken": oidc_token,
+            "WebIdentityToken": self._web_identity_token(),
         }
-
-        # Make the request
-        response = requests.post(sts_url, data=assume_role_data)
+        response = self._http().post(sts_url, data=assume_role_data, timeout=10)
         response.raise_for_status()
 
         # Parse the XML response (AWS STS returns XML)
         root = ET.fromstring(response.text)
-
-        # Extract credentials from XML response
-        credentials_elem = root.find(
-            ".//{https://sts.amazonaws.com/doc/2011-06-15/}Credentials"
-        )
+        credentials_elem = root.find(f".//{_STS_NS}Credentials")
         if credentials_elem is None:
-            logger.error("No credentials found in STS response")
-            return None
-
-        access_key = credentials_elem.find(
-            "{https://sts.amazonaws.com/doc/2011-06-15/}AccessKeyId"
-        )
-        secret_key = credentials_elem.find(
-            "{https://sts.amazonaws.com/doc/2011-06-15/}SecretAccessKey"
-        )
-        session_token = credentials_elem.find(
-            "{https://sts.amazonaws.com/doc/2011-06-15/}SessionToken"
-        )
+            raise ValueError("No credentials found in STS response")
 
+        access_key = credentials_elem.find(f"{_STS_NS}AccessKeyId")
+        secret_key = credentials_elem.find(f"{_STS_NS}SecretAccessKey")
+        session_token = credentials_elem.find(f"{_STS_NS}SessionToken")
+        expiration = credentials_elem.find(f"{_STS_NS}Expiration")
         if access_key is None or secret_key is None or session_token is None:
-            logger.error("Incomplete credentials in STS response")
-            return None
+            raise ValueError("Incomplete credentials in STS response")
 
-        return {
+        if expiration is not None and expiration.text:
+            expires_at = _parse_expiration(expiration.text)
+        else:
+            # STS default session duration
+            expires_at = time.time() + 3600
+        creds = {
             "aws_access_key_id": access_key.text or "",
             "aws_secret_access_key": secret_key.text or "",
             "aws_session_token": session_token.text or "",
-            "region": config.aws_region,
+            "region": self._config.aws_region,
         }
+        return creds, expires_at
+
+    def _refresh(self) -> Tuple[Dict[str, str], float]:
+        creds, expires_at = self._assume_role()
+        with self._lock:
+            self._credentials = creds
+            self._expires_at = expires_at
+        logger.info("Refreshed AWS credentials via Workload Identity")
+        return creds, expires_at
+
+    def refresh(self) -> Dict[str, str]:
+        """Fetch a new set of credentials from STS and cache it."""
+        return self._refresh()[0]
+
+    def _current(self) -> Tuple[Dict[str, str], float]:
+        with self._lock:
+            creds = self._credentials
+            expires_at = self._expires_at
+        remaining = expires_at - time.time()
+        if creds is None or remaining <= self._mandatory_margin:
+            return self._refresh()
+        return creds, expires_at
+
+    def get_credentials(self) -> Dict[str, str]:
+        return self._current()[0]
+
+    @property
+    def expires_at(self) -> float:
+        return self._expires_at
+
+    def botocore_metadata(self) -> Dict[str, str]:
+        """Credentials in the shape ``RefreshableCredentials`` expects."""
+        return self._metadata(*self._current())
+
+    def botocore_refresh(self) -> Dict[str, str]:
+        """``refresh_using`` callback: botocore only calls it inside its
+        refresh windows, so fetch a new set rather than return the cached
+        one it would ask for again on every request."""
+        with self._lock:
+            remaining = self._expires_at - time.time()
+        if remaining <= self._refresh_margin:
+            return self._metadata(*self._refresh())
+        return self.botocore_metadata()
 
+    @staticmethod
+    def _metadata(creds: Dict[str, str], expires_at: float) -> Dict[str, str]:
+        expiry = datetime.fromtimestamp(expires_at, tz=timezone.utc)
+        return {
+            "access_key": creds["aws_access_key_id"],
+            "secret_key": creds["aws_secret_access_key"],
+            "token": creds["aws_session_token"],
+            "expiry_time": expiry.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+
+
+class BotocoreCredentialSource:
+    """Credential provider for a botocore session's resolver, serving
+    refreshable credentials from a ``WorkloadIdentityCredentialProvider``.
+    """
+
+    METHOD = "assume-role-with-web-identity"
+    CANONICAL_NAME = "custom-workload-identity"
+
+    def __init__(self, provider: WorkloadIdentityCredentialProvider) -> None:
+        self._provider = provider
+
+    def load(self) -> Any:
+        return RefreshableCredentials.create_from_metadata(
+            metadata=self._provider.botocore_metadata(),
+            refresh_using=self._provider.botocore_refresh,
+            method=self.METHOD,
+        )
+
+
+_providers: Dict[Tuple[str, str], WorkloadIdentityCredentialProvider] = {}
+_dynamodb_resources: Dict[Tuple[str, str], Any] = {}
+_cache_lock = threading.Lock()
+
+
+def get_credential_provider(
+    config: JobWorkerConfig,
+) -> WorkloadIdentityCredentialProvider:
+    """Return the process-wide provider for ``config``'s role and region."""
+    key = (config.aws_region, config.aws_role_arn)
+    with _cache_lock:
+        provider = _providers.get(key)
+        if provider is None:
+            provider = WorkloadIdentityCredentialProvider(config)
+            _providers[key] = provider
+        return provider
+
+
+def get_aws_credentials(config: JobWorkerConfig) -> Optional[Dict[str, str]]:
+    """
+    Get AWS credentials using Workload Identity.
+
+    Credentials are cached until shortly before their STS Expiration.
+
+    Returns:
+        Dict with AWS credentials or None if failed
+    """
+    try:
+        return get_credential_provider(config).get_credentials()
     except Exception as exc:
         logger.error(
             f"Failed to get AWS credentials via Workload Identity: {exc}"
@@ -90,30 +229,44 @@ def create_dynamodb_client(config: JobWorkerConfig):
     """
     Create a DynamoDB client using Workload Identity credentials.
 
+    The resource is built once per role and region and reused; botocore
+    asks the cached provider for new credentials as they near expiry.
+
     Returns:
         boto3 DynamoDB resource or None if failed
     """
+    key = (config.aws_region, config.aws_role_arn)
+    with _cache_lock:
+        cached = _dynamodb_resources.get(key)
+    if cached is not None:
+        return cached
     try:
-        # Get AWS credentials
-        aws_creds = get_aws_credentials(config)
-        if not aws_creds:
-            logger.error("Failed to get AWS credentials")
-            return None
-
-        # Create DynamoDB client with temporary credentials
-        dynamodb = boto3.resource(
-            'dynamodb',
-            region_name=aws_creds['region'],
-            aws_access_key_id=aws_creds['aws_access_key_id'],
-            aws_secret_access_key=aws_creds['aws_secret_access_key'],
-            aws_session_token=aws_creds['aws_session_token']
+        provider = get_credential_provider(config)
+        botocore_session = botocore.session.get_session()
+        # Ahead of the environment and config file providers
+        botocore_session.get_component("credential_provider").insert_before(
+            "env", BotocoreCredentialSource(provider)
         )
+        session = boto3.Session(
+            botocore_session=botocore_session,
+            region_name=config.aws_region,
+        )
+        dynamodb = session.resource("dynamodb")
 
         logger.info(
             "Successfully created DynamoDB client with Workload Identity"
         )
+        with _cache_lock:
+            _dynamodb_resources[key] = dynamodb
         return dynamodb
 
     except Exception as exc:
         logger.error(f"Failed to create DynamoDB client: {exc}")
         return None
+
+
+def clear_aws_client_cache() -> None:
+    """Forget cached providers and DynamoDB resources."""
+    with _cache_lock:
+        _providers.clear()
+        _dynamodb_resources.clear()
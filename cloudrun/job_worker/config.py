@@ -25,7 +25,15 @@ class JobWorkerConfig:
     
     # Optional environment variables
     openai_timeout: int = 30
+    # OpenAI-compatible origin, e.g. a local stub; empty uses api.openai.com
+    openai_base_url: str = ""
+    # Push partial drafts into the modal while the completion streams
+    openai_streaming: bool = False
+    stream_update_interval: float = 1.0
     log_level: str = "INFO"
+
+    # Context store backend shared with the Lambda (dynamodb/sqlite/memory)
+    context_store_backend: str = "dynamodb"
     
     @classmethod
     def from_env(cls) -> "JobWorkerConfig":
@@ -60,7 +68,16 @@ class JobWorkerConfig:
             gcp_service_account_email=os.getenv("GCP_SERVICE_ACCOUNT_EMAIL", ""),
             workload_identity_provider=os.getenv("WORKLOAD_IDENTITY_PROVIDER", ""),
             openai_timeout=int(os.getenv("OPENAI_TIMEOUT", "30")),
+            openai_base_url=os.getenv("OPENAI_BASE_URL", ""),
+            openai_streaming=os.getenv("OPENAI_STREAMING", "").lower()
+            in ("1", "true", "yes"),
+            stream_update_interval=float(
+                os.getenv("STREAM_UPDATE_INTERVAL", "1.0")
+            ),
             log_level=os.getenv("LOG_LEVEL", "INFO"),
+            context_store_backend=os.getenv(
+                "CONTEXT_STORE_BACKEND", "dynamodb"
+            ),
         )
     
     @staticmethod
@@ -0,0 +1,174 @@
+"""Unit tests for Workload Identity credential caching."""
+
+import time
+from datetime import datetime, timezone
+from unittest.mock import MagicMock, patch
+
+import aws_auth
+from aws_auth import (
+    WorkloadIdentityCredentialProvider,
+    clear_aws_client_cache,
+    create_dynamodb_client,
+)
+from config import JobWorkerConfig
+
+
+def _sts_response(expires_in: float, key: str = "AKIA1") -> MagicMock:
+    expiry = datetime.fromtimestamp(time.time() + expires_in, tz=timezone.utc)
+    body = (
+        '<AssumeRoleWithWebIdentityResponse '
+        'xmlns="https://sts.amazonaws.com/doc/2011-06-15/">'
+        "<AssumeRoleWithWebIdentityResult><Credentials>"
+        f"<AccessKeyId>{key}</AccessKeyId>"
+        "<SecretAccessKey>secret</SecretAccessKey>"
+        "<SessionToken>token</SessionToken>"
+        f"<Expiration>{expiry.strftime('%Y-%m-%dT%H:%M:%SZ')}</Expiration>"
+        "</Credentials></AssumeRoleWithWebIdentityResult>"
+        "</AssumeRoleWithWebIdentityResponse>"
+    )
+    response = MagicMock()
+    response.text = body
+    return response
+
+
+def _config() -> JobWorkerConfig:
+    return JobWorkerConfig(
+        openai_api_key="test-key",
+        slack_bot_token="test-token",
+        ddb_table_name="test-table",
+        aws_role_arn="arn:aws:iam::123456789012:role/test",
+    )
+
+
+class TestCredentialProvider:
+    """Test STS credential caching."""
+
+    def _provider(self, session):
+        provider = WorkloadIdentityCredentialProvider(
+            _config(), session=session
+        )
+        provider._web_identity_token = lambda: "oidc-token"
+        return provider
+
+    def test_credentials_are_cached_until_expiry(self):
+        """Test STS is called once while credentials are fresh."""
+        session = MagicMock()
+        session.post.return_value = _sts_response(3600)
+        provider = self._provider(session)
+
+        first = provider.get_credentials()
+        second = provider.get_credentials()
+
+        assert first == second
+        assert first["aws_access_key_id"] == "AKIA1"
+        session.post.assert_called_once()
+
+    def test_mandatory_refresh_near_expiry(self):
+        """Test credentials about to expire are refreshed synchronously."""
+        session = MagicMock()
+        session.post.side_effect = [
+            _sts_response(60, key="OLD"),
+            _sts_response(3600, key="NEW"),
+        ]
+        provider = self._provider(session)
+
+        provider.get_credentials()
+        creds = provider.get_credentials()
+
+        assert creds["aws_access_key_id"] == "NEW"
+        assert session.post.call_count == 2
+
+    def test_cached_outside_mandatory_margin(self):
+        """Test credentials short of the mandatory margin are reused."""
+        session = MagicMock()
+        session.post.side_effect = [
+            _sts_response(12 * 60, key="OLD"),
+            _sts_response(3600, key="NEW"),
+        ]
+        provider = self._provider(session)
+        provider.get_credentials()
+
+        creds = provider.get_credentials()
+
+        assert creds["aws_access_key_id"] == "OLD"
+        session.post.assert_called_once()
+
+    def test_botocore_metadata_shape(self):
+        """Test metadata matches RefreshableCredentials expectations."""
+        session = MagicMock()
+        session.post.return_value = _sts_response(3600)
+        provider = self._provider(session)
+
+        metadata = provider.botocore_metadata()
+
+        assert set(metadata) == {
+            "access_key", "secret_key", "token", "expiry_time"
+        }
+        assert metadata["expiry_time"].endswith("Z")
+
+    def test_botocore_refresh_fetches_new_set(self):
+        """Test botocore's refresh yields credentials outside its window."""
+        session = MagicMock()
+        session.post.side_effect = [
+            _sts_response(12 * 60, key="OLD"),
+            _sts_response(3600, key="NEW"),
+        ]
+        provider = self._provider(session)
+        provider.get_credentials()
+
+        metadata = provider.botocore_refresh()
+
+        assert metadata["access_key"] == "NEW"
+        assert session.post.call_count == 2
+
+
+class TestCreateDynamoDBClient:
+    """Test the reused DynamoDB resource."""
+
+    def teardown_method(self):
+        clear_aws_client_cache()
+
+    def test_resource_is_reused(self):
+        """Test one resource is built per role and region."""
+        clear_aws_client_cache()
+        provider = MagicMock()
+        provider.botocore_metadata.return_value = {
+            "access_key": "AKIA1",
+            "secret_key": "secret",
+            "token": "token",
+            "expiry_time": "2099-01-01T00:00:00Z",
+        }
+        with (
+            patch.object(
+                aws_auth, "get_credential_provider", return_value=provider
+            ),
+            patch.object(aws_auth.boto3, "Session") as mock_session,
+        ):
+            first = create_dynamodb_client(_config())
+            second = create_dynamodb_client(_config())
+
+        assert first is second
+        mock_session.assert_called_once()
+
+    def test_session_resolves_workload_identity(self):
+        """Test the botocore session loads credentials from the provider."""
+        clear_aws_client_cache()
+        provider = MagicMock()
+        provider.botocore_metadata.return_value = {
+            "access_key": "AKIA1",
+            "secret_key": "secret",
+            "token": "token",
+            "expiry_time": "2099-01-01T00:00:00Z",
+        }
+        with (
+            patch.object(
+                aws_auth, "get_credential_provider", return_value=provider
+            ),
+            patch.object(aws_auth.boto3, "Session") as mock_session,
+        ):
+            create_dynamodb_client(_config())
+
+        botocore_session = mock_session.call_args[1]["botocore_session"]
+        credentials = botocore_session.get_credentials()
+        assert credentials.method == "assume-role-with-web-identity"
+        assert credentials.get_frozen_credentials().access_key == "AKIA1"
@@ -1,17 +1,21 @@
 """Unit tests for Cloud Run Job worker."""
 
+import asyncio
 import json
 import os
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import AsyncMock, patch, MagicMock
 from worker import (
     _call_openai,
     _reidentify_pii,
     _get_dynamodb_context,
     _update_slack_modal,
+    _save_draft,
+    _stream_openai,
     main,
 )
 from config import JobWorkerConfig
+import worker as worker_module
 
 
 class TestCallOpenAI:
@@ -37,19 +41,16 @@ class TestCallOpenAI:
         result = _call_openai("test body", config)
         assert result == ""
 
-    @patch('urllib.request.urlopen')
-    def test_successful_generation(self, mock_urlopen):
+    @patch('common.openai_client.post_chat_completion')
+    def test_successful_generation(self, mock_post):
         """Test successful OpenAI generation."""
-        # Mock response
-        mock_response = MagicMock()
-        mock_response.read.return_value = json.dumps({
+        mock_post.return_value = {
             "choices": [{
                 "message": {
                     "content": "Generated reply text"
                 }
             }]
-        }).encode('utf-8')
-        mock_urlopen.return_value.__enter__.return_value = mock_response
+        }
 
         config = JobWorkerConfig(
             openai_api_key="test-key",
@@ -59,11 +60,71 @@ class TestCallOpenAI:
 
         result = _call_openai("test body", config)
         assert result == "Generated reply text"
+        payload = mock_post.call_args[0][0]
+        assert "test body" in payload["messages"][0]["content"]
+        assert mock_post.call_args[0][1] == "test-key"
+        # A short inquiry takes the fast route, whose 10s timeout caps the
+        # 30s job budget
+        assert payload["model"] == "gpt-4o-mini"
+        assert 9 < mock_post.call_args[1]["timeout"] <= 10
+
+    @patch('common.openai_client.post_chat_completion')
+    def test_complex_inquiry_uses_strong_route(self, mock_post):
+        """Test complaints go to the strong model with its own limits."""
+        mock_post.return_value = {
+            "choices": [{"message": {"content": "Careful reply"}}]
+        }
+        config = JobWorkerConfig(
+            openai_api_key="test-key",
+            slack_bot_token="test-token",
+            ddb_table_name="test-table"
+        )
+
+        assert _call_openai("度重なる不具合について苦情です", config) == "Careful reply"
+        payload = mock_post.call_args[0][0]
+        assert payload["model"] == "gpt-4o"
+        assert 24 < mock_post.call_args[1]["timeout"] <= 25
+
+    @patch('common.retry.time.sleep')
+    @patch('common.openai_client.post_chat_completion')
+    def test_retries_rate_limit(self, mock_post, mock_sleep):
+        """Test a 429 is retried after its Retry-After."""
+        from common.openai_client import OpenAIHTTPError
+
+        mock_post.side_effect = [
+            OpenAIHTTPError(429, b"{}", {"retry-after": "2"}),
+            {"choices": [{"message": {"content": "Retried reply"}}]},
+        ]
+        config = JobWorkerConfig(
+            openai_api_key="test-key",
+            slack_bot_token="test-token",
+            ddb_table_name="test-table"
+        )
+
+        assert _call_openai("test body", config) == "Retried reply"
+        assert mock_post.call_count == 2
+        assert mock_sleep.call_args[0][0] >= 2
 
-    @patch('urllib.request.urlopen')
-    def test_api_error(self, mock_urlopen):
+    @patch('common.openai_client.post_chat_completion')
+    def test_base_url_override(self, mock_post):
+        """Test OPENAI_BASE_URL (e.g. a local stub) reaches the transport."""
+        mock_post.return_value = {
+            "choices": [{"message": {"content": "Stub reply"}}]
+        }
+        config = JobWorkerConfig(
+            openai_api_key="test-key",
+            slack_bot_token="test-token",
+            ddb_table_name="test-table",
+            openai_base_url="http://127.0.0.1:8089",
+        )
+
+        assert _call_openai("test body", config) == "Stub reply"
+        assert mock_post.call_args[1]["base_url"] == "http://127.0.0.1:8089"
+
+    @patch('common.openai_client.post_chat_completion')
+    def test_api_error(self, mock_post):
         """Test OpenAI API error."""
-        mock_urlopen.side_effect = Exception("API Error")
+        mock_post.side_effect = Exception("API Error")
 
         config = JobWorkerConfig(
             openai_api_key="test-key",
@@ -75,6 +136,54 @@ class TestCallOpenAI:
         assert result == ""
 
 
+class TestStreamOpenAI:
+    """Test streamed drafts pushed into the modal."""
+
+    @patch('worker._update_slack_modal')
+    @patch('common.openai_client.stream_chat_completion')
+    def test_pushes_partial_and_final_text(self, mock_stream, mock_update):
+        """Test the first delta is pushed at once and the full text last."""
+        mock_stream.return_value = iter(["Hello ", "[PERSON_1]", "!"])
+        mock_update.return_value = True
+        config = JobWorkerConfig(
+            openai_api_key="test-key",
+            slack_bot_token="test-token",
+            ddb_table_name="test-table",
+            openai_streaming=True,
+            stream_update_interval=60.0,
+        )
+
+        draft, ok = _stream_openai(
+            "test body", {"[PERSON_1]": "John"}, "ext", "ctx", config
+        )
+
+        assert draft == "Hello [PERSON_1]!"
+        assert ok is True
+        texts = [call[0][2] for call in mock_update.call_args_list]
+        assert texts == ["Hello ", "Hello John!"]
+
+    @patch('worker._update_slack_modal')
+    @patch('common.openai_client.stream_chat_completion')
+    def test_stream_error_keeps_partial_draft(self, mock_stream, mock_update):
+        """Test a broken stream still returns what arrived."""
+        def deltas(*args, **kwargs):
+            yield "Partial"
+            raise ConnectionError("reset")
+
+        mock_stream.side_effect = deltas
+        mock_update.return_value = True
+        config = JobWorkerConfig(
+            openai_api_key="test-key",
+            slack_bot_token="test-token",
+            ddb_table_name="test-table",
+        )
+
+        draft, ok = _stream_openai("test body", {}, "ext", "ctx", config)
+
+        assert draft == "Partial"
+        assert ok is True
+
+
 class TestReidentifyPII:
     """Test PII reidentification."""
 
@@ -100,6 +209,10 @@ class TestReidentifyPII:
 class TestGetDynamoDBContext:
     """Test DynamoDB context retrieval."""
 
+    def setup_method(self):
+        """Drop stores cached by earlier tests."""
+        worker_module._stores.clear()
+
     def test_no_context_id(self):
         """Test with no context ID."""
         config = JobWorkerConfig(
@@ -150,10 +263,58 @@ class TestGetDynamoDBContext:
         result = _get_dynamodb_context("test-id", config)
         assert result == {}
 
+    @patch('worker.get_context_store')
+    def test_shared_store_backend(self, mock_get_store):
+        """Test non-DynamoDB backends use the shared context store."""
+        from common.context_store import InMemoryContextStore
+
+        store = InMemoryContextStore()
+        store.put({'context_id': 'test-id', 'body_redacted': 'test body'})
+        mock_get_store.return_value = store
+
+        config = JobWorkerConfig(
+            openai_api_key="test-key",
+            slack_bot_token="test-token",
+            ddb_table_name="",
+            context_store_backend="memory",
+        )
+
+        result = _get_dynamodb_context("test-id", config)
+        assert result['body_redacted'] == 'test body'
+
+
+class TestSaveDraft:
+    """Test partial draft updates."""
+
+    @patch('worker._get_context_store')
+    def test_writes_only_draft_fields(self, mock_get_store):
+        """Test the draft is stored without rewriting the item."""
+        from common.context_store import InMemoryContextStore
+
+        store = InMemoryContextStore()
+        store.put({'context_id': 'ctx', 'body_raw': 'large body'})
+        mock_get_store.return_value = store
+
+        config = JobWorkerConfig(
+            openai_api_key="test-key",
+            slack_bot_token="test-token",
+            ddb_table_name="test-table"
+        )
+        _save_draft('ctx', 'draft [EMAIL_1]', config)
+
+        item = store.get('ctx')
+        assert item['body_raw'] == 'large body'
+        assert item['draft_redacted'] == 'draft [EMAIL_1]'
+        assert 'drafted_at' in item
+
 
 class TestUpdateSlackModal:
     """Test Slack modal updates."""
 
+    def setup_method(self):
+        # Updates are deduplicated process-wide
+        worker_module.get_modal_updater.cache_clear()
+
     def test_no_bot_token(self):
         """Test with no bot token."""
         config = JobWorkerConfig(
@@ -176,11 +337,11 @@ class TestUpdateSlackModal:
         result = _update_slack_modal("", "context-id", "test text", config)
         assert result is False
 
-    @patch('slack_sdk.WebClient')
-    def test_successful_update(self, mock_webclient):
+    @patch('worker.get_slack_web_client')
+    def test_successful_update(self, mock_get_client):
         """Test successful Slack modal update."""
         mock_client = MagicMock()
-        mock_webclient.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         config = JobWorkerConfig(
             openai_api_key="test-key",
@@ -192,15 +353,18 @@ class TestUpdateSlackModal:
             "test-id", "context-id", "test text", config
         )
         assert result is True
+        mock_get_client.assert_called_once_with("test-token")
         mock_client.views_update.assert_called_once()
 
-    @patch('slack_sdk.WebClient')
-    def test_slack_api_error(self, mock_webclient):
+    @patch('worker.get_slack_web_client')
+    def test_slack_api_error(self, mock_get_client):
         """Test Slack API error."""
-        from slack_sdk.errors import SlackApiError
+        from common.slack_api import SlackAPIError
         mock_client = MagicMock()
-        mock_client.views_update.side_effect = SlackApiError("API Error", {})
-        mock_webclient.return_value = mock_client
+        mock_client.views_update.side_effect = SlackAPIError(
+            "views.update", "not_found"
+        )
+        mock_get_client.return_value = mock_client
 
         config = JobWorkerConfig(
             openai_api_key="test-key",
@@ -213,6 +377,76 @@ class TestUpdateSlackModal:
         )
         assert result is False
 
+    @patch('worker.get_slack_web_client')
+    def test_unchanged_text_is_not_resent(self, mock_get_client):
+        """Repeated pushes of the same text make one call."""
+        mock_client = MagicMock()
+        mock_client.views_update.return_value = {
+            "ok": True, "view": {"hash": "h1"}
+        }
+        mock_get_client.return_value = mock_client
+        config = JobWorkerConfig(
+            openai_api_key="test-key",
+            slack_bot_token="test-token",
+            ddb_table_name="test-table"
+        )
+
+        for text in ("draft", "draft", "draft v2"):
+            assert _update_slack_modal("test-id", "ctx", text, config)
+
+        assert mock_client.views_update.call_count == 2
+        # The second update is made against the view the first returned
+        assert mock_client.views_update.call_args[1]["hash"] == "h1"
+
+    @patch('worker.get_async_slack_web_client')
+    def test_async_update(self, mock_client_cls):
+        """The asyncio variant sends the same view."""
+        mock_client_cls.return_value.views_update = AsyncMock()
+        config = JobWorkerConfig(
+            openai_api_key="test-key",
+            slack_bot_token="test-token",
+            ddb_table_name="test-table"
+        )
+
+        result = asyncio.run(worker_module._aupdate_slack_modal(
+            "test-id", "context-id", "test text", config
+        ))
+
+        assert result is True
+        mock_client_cls.assert_called_once_with("test-token")
+        kwargs = mock_client_cls.return_value.views_update.call_args[1]
+        assert kwargs["external_id"] == "test-id"
+        element = kwargs["view"]["blocks"][1]["element"]
+        assert element["initial_value"] == "test text"
+
+    @patch('worker._save_draft')
+    @patch('worker._aupdate_slack_modal')
+    def test_publish_overlaps_update_and_save(self, mock_update, mock_save):
+        """The draft write runs while the modal update is in flight."""
+        order = []
+
+        async def update(*args):
+            order.append("update started")
+            await asyncio.sleep(0.05)
+            order.append("update done")
+            return True
+
+        mock_update.side_effect = update
+        mock_save.side_effect = lambda *args: order.append("saved")
+        config = JobWorkerConfig(
+            openai_api_key="test-key",
+            slack_bot_token="test-token",
+            ddb_table_name="test-table"
+        )
+
+        ok = asyncio.run(worker_module._publish_draft(
+            "ext", "ctx", "final", "draft", config, {}
+        ))
+
+        assert ok is True
+        assert order == ["update started", "saved", "update done"]
+        mock_save.assert_called_once_with("ctx", "draft", config, {})
+
 
 class TestMain:
     """Test main function."""
@@ -229,8 +463,9 @@ class TestMain:
         })
     })
     @patch('worker._call_openai')
-    @patch('worker._update_slack_modal')
-    def test_successful_execution(self, mock_update, mock_call):
+    @patch('worker._aupdate_slack_modal', new_callable=AsyncMock)
+    @patch('worker._save_draft')
+    def test_successful_execution(self, mock_save, mock_update, mock_call):
         """Test successful main execution."""
         mock_call.return_value = "Generated text"
         mock_update.return_value = True
@@ -238,6 +473,37 @@ class TestMain:
         with pytest.raises(SystemExit) as exc_info:
             main()
         assert exc_info.value.code == 0
+        mock_save.assert_called_once()
+        assert mock_save.call_args[0][:2] == ('test-context', 'Generated text')
+        # The chosen route is recorded alongside the draft
+        assert mock_save.call_args[0][3]["model_route"] == "fast"
+
+    @patch.dict(os.environ, {
+        'OPENAI_API_KEY': 'test-key',
+        'SLACK_BOT_TOKEN': 'test-token',
+        'DDB_TABLE_NAME': 'test-table',
+        'JOB_PAYLOAD': json.dumps({'redacted_body': 'test body'}),
+        'CONTEXT_ID': 'env-context',
+        'EXTERNAL_ID': 'env-external',
+        'VIEW_HASH': 'h1',
+    })
+    @patch('worker._call_openai', return_value="Generated text")
+    @patch('worker._aupdate_slack_modal', new_callable=AsyncMock)
+    @patch('worker._save_draft')
+    def test_view_hash_from_service_is_adopted(
+        self, mock_save, mock_update, mock_call
+    ):
+        """Test the job updates the modal from the hash views.open gave."""
+        worker_module.get_modal_updater.cache_clear()
+        mock_update.return_value = True
+
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+
+        assert exc_info.value.code == 0
+        assert mock_save.call_args[0][0] == 'env-context'
+        updater = worker_module.get_modal_updater()
+        assert updater.current_hash('env-external') == 'h1'
 
     @patch.dict(os.environ, {
         'OPENAI_API_KEY': '',
@@ -264,3 +530,34 @@ class TestMain:
         with pytest.raises(SystemExit) as exc_info:
             main()
         assert exc_info.value.code == 1
+
+    @patch.dict(os.environ, {
+        'OPENAI_API_KEY': 'test-key',
+        'SLACK_BOT_TOKEN': 'test-token',
+        'DDB_TABLE_NAME': 'test-table',
+        'JOB_PAYLOAD': json.dumps({
+            'context_id': 'test-context',
+            'external_id': 'test-external',
+        })
+    })
+    @patch('worker._get_dynamodb_context')
+    @patch('worker._call_openai')
+    @patch('worker._aupdate_slack_modal', new_callable=AsyncMock)
+    @patch('worker._save_draft')
+    def test_fetches_context_record_when_body_absent(
+        self, mock_save, mock_update, mock_call, mock_get
+    ):
+        """Test the stored body and PII map are used via ContextRecord."""
+        mock_get.return_value = {
+            'context_id': 'test-context',
+            'body_redacted': 'stored body',
+            'pii_map': '{"[PERSON_1]": "John"}',
+        }
+        mock_call.return_value = "Hello [PERSON_1]"
+        mock_update.return_value = True
+
+        with pytest.raises(SystemExit) as exc_info:
+            main()
+        assert exc_info.value.code == 0
+        assert mock_call.call_args[0][0] == 'stored body'
+        assert mock_update.call_args[0][2] == "Hello John"
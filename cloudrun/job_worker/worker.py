@@ -2,36 +2,12 @@
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
 import sys
-from typing import Any, Dict
-
-import urllib.request
-
-# Test-friendly shims for optional deps (so pytest can patch by name)
-try:  # pragma: no cover - prefer real libs if present
-    from slack_sdk import WebClient  # type: ignore
-    from slack_sdk.errors import SlackApiError  # type: ignore
-except Exception:  # pragma: no cover - create a shim for patching
-    import types as _types
-
-    class _DummyWebClient:  # minimal to satisfy type usage
-        def __init__(self, *args: Any, **kwargs: Any) -> None:
-            pass
-
-        def views_update(self, *args: Any, **kwargs: Any) -> None:
-            pass
-
-    _errors = _types.SimpleNamespace(SlackApiError=Exception)
-    # Construct a minimal module-like object for slack_sdk
-    _slack_mod = _types.ModuleType("slack_sdk")
-    _slack_mod.WebClient = _DummyWebClient  # type: ignore[attr-defined]
-    _slack_mod.errors = _errors  # type: ignore[attr-defined]
-    # allow patch('slack_sdk.WebClient') to work in tests
-    sys.modules.setdefault("slack_sdk", _slack_mod)
-    WebClient = _DummyWebClient  # type: ignore
-    SlackApiError = Exception  # type: ignore
+import time
+from typing import Any, Dict, Optional, Tuple
 
 try:  # pragma: no cover
     import boto3  # type: ignore
@@ -48,55 +24,90 @@ except Exception:  # pragma: no cover
     import boto3  # type: ignore  # noqa: E402  (now points to shim)
 
 from config import JobWorkerConfig
+from aws_auth import create_dynamodb_client
+from common.context_record import ContextRecord
+from common.draft_stream import stream_draft
+from common.model_routing import Route, choose_route
+from common.generation import DraftCache, GenerationEngine, SyncTransport
+from common.modal_updates import get_modal_updater
+from common.slack_api import (
+    get_async_slack_web_client,
+    get_slack_web_client,
+)
+from common.context_store import (
+    ContextStore,
+    build_context_store,
+    get_context_store,
+)
+
+
+def _openai_timeout(config: JobWorkerConfig) -> float:
+    # The engine further caps this with the route's timeout
+    return max(1, int(getattr(config, "openai_timeout", 30)))
 
 
-def _call_openai(redacted_body: str, config: JobWorkerConfig) -> str:
+def _engine(config: JobWorkerConfig) -> GenerationEngine:
+    """The Lambda's generation engine, on this job's key and endpoint.
+
+    A job drafts a single inquiry, so a draft cache would never hit.
+    """
+    return GenerationEngine(
+        SyncTransport(
+            config.openai_api_key, base_url=config.openai_base_url or None
+        ),
+        cache=DraftCache(),
+    )
+
+
+def _call_openai(
+    redacted_body: str,
+    config: JobWorkerConfig,
+    route: Optional[Route] = None,
+) -> str:
     """Call OpenAI to generate a draft reply.
 
     Returns empty string on failure to keep the worker idempotent.
     """
     if not redacted_body or not config.openai_api_key:
         return ""
+    # Same prompt, routing, retries and parsing as the Lambda's inline
+    # generation; 429/5xx and connection errors are retried within the
+    # job's OpenAI timeout.
+    result = _engine(config).generate(
+        redacted_body, budget=_openai_timeout(config), route=route
+    )
+    return result.text
 
-    payload = {
-        "model": "gpt-4o-mini",
-        "messages": [
-            {
-                "role": "user",
-                "content": (
-                    "あなたは日本語のCS担当者です。以下の問い合わせに対して、丁寧で簡潔な返信文案を作成してください。\n\n"
-                    + redacted_body
-                ),
-            }
-        ],
-        "max_tokens": 400,
-    }
-    headers = {
-        "Authorization": f"Bearer {config.openai_api_key}",
-        "Content-Type": "application/json",
-    }
-    try:
-        req = urllib.request.Request(
-            url="https://api.openai.com/v1/chat/completions",
-            data=json.dumps(payload).encode("utf-8"),
-            headers=headers,
-            method="POST",
-        )
-        timeout = max(1, int(getattr(config, "openai_timeout", 30)))
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            raw = resp.read().decode(
-                "utf-8",
-                errors="ignore",
-            )
-        data = json.loads(raw)
-        choices = data.get("choices") or []
-        if not choices:
-            return ""
-        message = choices[0].get("message", {})
-        content = (message or {}).get("content", "")
-        return str(content or "").strip()
-    except Exception:
-        return ""
+
+def _stream_openai(
+    redacted_body: str,
+    pii_map: Dict[str, str],
+    external_id: str,
+    context_id: str,
+    config: JobWorkerConfig,
+    route: Optional[Route] = None,
+) -> Tuple[str, bool]:
+    """Stream a draft, pushing partial text into the modal as it arrives.
+
+    Returns the redacted draft and whether the last modal update succeeded.
+    """
+    if not redacted_body or not config.openai_api_key:
+        return "", False
+    pushed = {"ok": False}
+
+    def push(text: str) -> None:
+        pushed["ok"] = _update_slack_modal(external_id, context_id, text, config)
+
+    deltas = _engine(config).stream(
+        redacted_body, budget=_openai_timeout(config), route=route
+    )
+    draft = stream_draft(
+        deltas,
+        pii_map,
+        push,
+        min_interval=getattr(config, "stream_update_interval", 1.0),
+    )
+    return draft, pushed["ok"]
 
 
 def _reidentify_pii(text: str, pii_map: Dict[str, str]) -> str:
@@ -108,63 +119,148 @@ def _reidentify_pii(text: str, pii_map: Dict[str, str]) -> str:
     return out
 
 
+_stores: Dict[Tuple[str, str, str], ContextStore] = {}
+
+
+def _get_context_store(config: JobWorkerConfig) -> ContextStore:
+    backend = config.context_store_backend
+    if backend != "dynamodb":
+        return get_context_store()
+    # Reuse one store (and its boto3 resource) per table and role so that
+    # Workload Identity credentials are fetched once per STS session.
+    key = (config.ddb_table_name, config.aws_region, config.aws_role_arn)
+    store = _stores.get(key)
+    if store is None:
+        resource = None
+        if config.aws_role_arn:
+            resource = create_dynamodb_client(config)
+            if resource is None:
+                raise RuntimeError("Workload Identity DynamoDB unavailable")
+        # The table name comes from the job config rather than the process env
+        store = build_context_store(
+            backend, table_name=config.ddb_table_name, resource=resource
+        )
+        _stores[key] = store
+    return store
+
+
 def _get_dynamodb_context(
     context_id: str, config: JobWorkerConfig
 ) -> Dict[str, Any]:
     if not context_id:
         return {}
     try:
-        table = boto3.resource("dynamodb").Table(  # type: ignore
-            config.ddb_table_name
-        )
-        resp = table.get_item(Key={"context_id": context_id})
-        return resp.get("Item") or {}
+        return _get_context_store(config).get(context_id) or {}
     except Exception:
         return {}
 
 
+def _get_context_record(
+    context_id: str, config: JobWorkerConfig
+) -> Optional[ContextRecord]:
+    return ContextRecord.from_item(_get_dynamodb_context(context_id, config))
+
+
+def _save_draft(
+    context_id: str,
+    draft: str,
+    config: JobWorkerConfig,
+    extra: Optional[Dict[str, Any]] = None,
+) -> None:
+    """Record the (still redacted) draft on the context with a partial update."""
+    fields: Dict[str, Any] = dict(extra or {})
+    fields.update(draft_redacted=draft, drafted_at=int(time.time()))
+    try:
+        _get_context_store(config).update_fields(context_id, fields)
+    except Exception:  # best effort; the modal already has the text
+        pass
+
+
+def _modal_view(context_id: str, text: str) -> Dict[str, Any]:
+    return {
+        "type": "modal",
+        "private_metadata": json.dumps({"context_id": context_id}),
+        "title": {"type": "plain_text", "text": "AI返信アシスタント"},
+        "submit": {"type": "plain_text", "text": "この内容でメールを送信"},
+        "close": {"type": "plain_text", "text": "閉じる"},
+        "blocks": [
+            {
+                "type": "header",
+                "text": {"type": "plain_text", "text": "返信文案の確認・編集"},
+            },
+            {
+                "type": "input",
+                "block_id": "editable_reply_block",
+                "label": {
+                    "type": "plain_text",
+                    "text": "以下の返信文案を編集し、送信してください。",
+                },
+                "element": {
+                    "type": "plain_text_input",
+                    "action_id": "editable_reply_input",
+                    "multiline": True,
+                    "initial_value": text,
+                },
+            },
+        ],
+    }
+
+
 def _update_slack_modal(
     external_id: str, context_id: str, text: str, config: JobWorkerConfig
 ) -> bool:
     if not getattr(config, "slack_bot_token", "") or not external_id:
         return False
     try:
-        # Late import so tests can patch slack_sdk.WebClient reliably
-        from slack_sdk import WebClient as _WebClient  # type: ignore
-        client = _WebClient(token=config.slack_bot_token)
-        view = {
-            "type": "modal",
-            "private_metadata": json.dumps({"context_id": context_id}),
-            "title": {"type": "plain_text", "text": "AI返信アシスタント"},
-            "submit": {"type": "plain_text", "text": "この内容でメールを送信"},
-            "close": {"type": "plain_text", "text": "閉じる"},
-            "blocks": [
-                {
-                    "type": "header",
-                    "text": {"type": "plain_text", "text": "返信文案の確認・編集"},
-                },
-                {
-                    "type": "input",
-                    "block_id": "editable_reply_block",
-                    "label": {
-                        "type": "plain_text",
-                        "text": "以下の返信文案を編集し、送信してください。",
-                    },
-                    "element": {
-                        "type": "plain_text_input",
-                        "action_id": "editable_reply_input",
-                        "multiline": True,
-                        "initial_value": text,
-                    },
-                },
-            ],
-        }
-        client.views_update(external_id=external_id, view=view)
-        return True
+        # Pooled and cached per token: progressive updates reuse one
+        # connection instead of a TLS handshake per views.update.
+        # Unchanged text is not resent, and an update never overwrites a
+        # newer version of the modal.
+        client = get_slack_web_client(config.slack_bot_token)
+        return get_modal_updater().update(
+            client, external_id, _modal_view(context_id, text)
+        )
     except Exception:  # be permissive in worker context
         return False
 
 
+async def _aupdate_slack_modal(
+    external_id: str, context_id: str, text: str, config: JobWorkerConfig
+) -> bool:
+    """``_update_slack_modal`` on the event loop."""
+    if not getattr(config, "slack_bot_token", "") or not external_id:
+        return False
+    try:
+        # Cached per token on this event loop, as on the sync path
+        return await get_modal_updater().aupdate(
+            get_async_slack_web_client(config.slack_bot_token),
+            external_id,
+            _modal_view(context_id, text),
+        )
+    except Exception:  # be permissive in worker context
+        return False
+
+
+async def _publish_draft(
+    external_id: str,
+    context_id: str,
+    final_text: str,
+    draft: str,
+    config: JobWorkerConfig,
+    fields: Dict[str, Any],
+) -> bool:
+    """Show the draft in the modal while it is written to the store.
+
+    Both are network round trips and neither needs the other, so the
+    user sees the draft one DynamoDB write sooner.
+    """
+    ok, _ = await asyncio.gather(
+        _aupdate_slack_modal(external_id, context_id, final_text, config),
+        asyncio.to_thread(_save_draft, context_id, draft, config, fields),
+    )
+    return bool(ok)
+
+
 def main() -> None:
     # Load config: allow direct env fallbacks for tests/local
     cfg: JobWorkerConfig
@@ -179,6 +275,12 @@ def main() -> None:
                 slack_bot_token=direct_slack,
                 ddb_table_name=ddb,
                 openai_timeout=int(os.getenv("OPENAI_TIMEOUT", "30")),
+                openai_base_url=os.getenv("OPENAI_BASE_URL", ""),
+                openai_streaming=os.getenv("OPENAI_STREAMING", "").lower()
+                in ("1", "true", "yes"),
+                context_store_backend=os.getenv(
+                    "CONTEXT_STORE_BACKEND", "dynamodb"
+                ),
             )
         else:
             cfg = JobWorkerConfig.from_env()
@@ -192,32 +294,54 @@ def main() -> None:
     except Exception:
         payload = {}
 
-    context_id = str(payload.get("context_id", ""))
-    external_id = str(payload.get("external_id", ""))
+    # The HTTP service starts the job with plain env vars instead
+    context_id = str(payload.get("context_id") or os.getenv("CONTEXT_ID", ""))
+    external_id = str(
+        payload.get("external_id") or os.getenv("EXTERNAL_ID", "")
+    )
     redacted_body = str(payload.get("redacted_body", ""))
     pii_map = payload.get("pii_map") or {}
 
     if not context_id:
         sys.exit(1)
 
+    # This process did not open the modal: start from the hash views.open
+    # returned, so the first update cannot overwrite a newer view
+    get_modal_updater().adopt(
+        external_id,
+        str(payload.get("view_hash") or os.getenv("VIEW_HASH", "")),
+    )
+
     # Fetch context if body absent
     if not redacted_body:
-        item = _get_dynamodb_context(context_id, cfg)
-        redacted_body = str(item.get("body_redacted", ""))
-        raw_map = item.get("pii_map") or "{}"
-        try:
-            pii_map = json.loads(str(raw_map))
-        except Exception:
-            pii_map = {}
-
-    draft = _call_openai(redacted_body, cfg)
-    if not draft:
-        sys.exit(0)
-
-    final_text = _reidentify_pii(draft, pii_map)
-    ok = _update_slack_modal(external_id, context_id, final_text, cfg)
-    sys.exit(0 if ok else 1)
+        record = _get_context_record(context_id, cfg)
+        if record is not None:
+            redacted_body = record.body_redacted
+            pii_map = record.pii_map
 
+    decision = choose_route(redacted_body)
+    # The route is recorded in the same write as the draft
+    fields = decision.context_fields()
+    if getattr(cfg, "openai_streaming", False):
+        draft, ok = _stream_openai(
+            redacted_body, pii_map, external_id, context_id, cfg,
+            route=decision.route,
+        )
+        if not draft:
+            sys.exit(0)
+        _save_draft(context_id, draft, cfg, fields)
+    else:
+        draft = _call_openai(redacted_body, cfg, route=decision.route)
+        if not draft:
+            sys.exit(0)
+
+        final_text = _reidentify_pii(draft, pii_map)
+        ok = asyncio.run(
+            _publish_draft(
+                external_id, context_id, final_text, draft, cfg, fields
+            )
+        )
+    sys.exit(0 if ok else 1)
 
 if __name__ == "__main__":
     main()
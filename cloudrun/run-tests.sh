@@ -42,7 +42,7 @@ test_job_worker() {
     pip install -r requirements-test.txt
     
     # Run tests
-    pytest test_worker.py -v --cov=. --cov-report=term-missing
+    pytest test_worker.py test_aws_auth.py -v --cov=. --cov-report=term-missing
     
     cd ..
 }
@@ -35,6 +35,7 @@ def async_generate() -> Any:
     external_id = str(payload.get("external_id", ""))
     redacted_body = str(payload.get("redacted_body", ""))
     pii_map = payload.get("pii_map") or {}
+    view_hash = str(payload.get("view_hash", ""))
 
     # Trigger Cloud Run Job instead of in-process generation
     try:
@@ -59,6 +60,7 @@ def async_generate() -> Any:
                                             "external_id": external_id,
                                             "redacted_body": redacted_body,
                                             "pii_map": pii_map,
+                                            "view_hash": view_hash,
                                         }
                                     ),
                                 },
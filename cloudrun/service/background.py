@@ -0,0 +1,146 @@
+"""
+Bounded background executor for work done after Slack has been answered.
+
+Slack needs an HTTP response within 3 seconds; anything the response does
+not depend on (such as starting the generation job) is handed to this
+executor so the request can return as soon as the modal is open. The
+queue is bounded: when it is full ``submit`` refuses the task and the
+caller decides what to do instead. Each task is retried on transient
+errors within its own budget, and every outcome is logged as a
+structured line for Cloud Logging metrics.
+
+Background threads only get CPU after the response when the service runs
+with CPU always allocated (``cpu_idle = false``).
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from common.logging import log_error, log_info
+from common.retry import (
+    RETRYABLE_STATUSES,
+    RetryPolicy,
+    backoff_delay,
+    is_retryable,
+)
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_PENDING = 32
+TASK_BUDGET_SECONDS = 30.0
+TASK_RETRY_POLICY = RetryPolicy(max_attempts=4, base_delay=0.5, max_delay=8.0)
+
+
+def is_transient(exc: BaseException) -> bool:
+    """``is_retryable``, plus Google API errors (which carry ``code``)."""
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_STATUSES:
+        return True
+    return is_retryable(exc)
+
+
+class BackgroundTasks:
+    """At most ``workers`` tasks running and ``max_pending`` waiting."""
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        policy: RetryPolicy = TASK_RETRY_POLICY,
+        budget: float = TASK_BUDGET_SECONDS,
+        retryable: Callable[[BaseException], bool] = is_transient,
+        sleep: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        self.policy = policy
+        self.budget = budget
+        self.retryable = retryable
+        self._sleep = sleep
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="background"
+        )
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = dict.fromkeys(
+            ("submitted", "rejected", "succeeded", "failed", "retries"), 0
+        )
+
+    def _count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counts[name] += n
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def submit(self, name: str, fn: Callable[[], Any], **fields: Any) -> bool:
+        """Queue ``fn``; ``False`` (nothing queued) when the queue is full.
+
+        ``fields`` are added to the task's log lines.
+        """
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            log_error("background queue full", task=name, **fields)
+            return False
+        try:
+            self._executor.submit(
+                self._run, name, fn, time.monotonic(), fields
+            )
+        except RuntimeError:
+            # Shut down
+            self._slots.release()
+            self._count("rejected")
+            return False
+        self._count("submitted")
+        return True
+
+    def _run(
+        self,
+        name: str,
+        fn: Callable[[], Any],
+        enqueued: float,
+        fields: Dict[str, Any],
+    ) -> None:
+        started = time.monotonic()
+        deadline = started + self.budget
+        attempts = 0
+        try:
+            while True:
+                attempts += 1
+                try:
+                    fn()
+                    break
+                except Exception as exc:
+                    delay = backoff_delay(attempts - 1, self.policy, exc)
+                    if (
+                        attempts >= self.policy.max_attempts
+                        or not self.retryable(exc)
+                        or time.monotonic() + delay >= deadline
+                    ):
+                        self._count("failed")
+                        log_error(
+                            "background task failed",
+                            task=name,
+                            attempts=attempts,
+                            error=str(exc) or type(exc).__name__,
+                            **fields,
+                        )
+                        return
+                    (self._sleep or time.sleep)(delay)
+            self._count("succeeded")
+            log_info(
+                "background task succeeded",
+                task=name,
+                attempts=attempts,
+                queued_ms=round((started - enqueued) * 1000),
+                elapsed_ms=round((time.monotonic() - started) * 1000),
+                **fields,
+            )
+        finally:
+            self._count("retries", attempts - 1)
+            self._slots.release()
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
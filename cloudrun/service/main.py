@@ -5,10 +5,25 @@ Receives Slack events and triggers Cloud Run Jobs for async processing
 import json
 import os
 import logging
+from typing import Optional
 from flask import Flask, request, jsonify
 import google.cloud.run_v2 as run_v2
 from google.cloud import secretmanager
 
+from common.idempotency import (
+    get_interaction_ledger,
+    interaction_key,
+    slack_retry,
+)
+from common.secrets import CachedSecret
+from common.slack_api import (
+    SlackAPIError,
+    get_slack_pool,
+    get_slack_web_client,
+)
+from common.slack_verify import SlackRequestVerifier
+from background import BackgroundTasks
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -26,6 +41,16 @@ SLACK_SIGNING_SECRET_NAME = os.getenv(
 SLACK_BOT_TOKEN_SECRET_NAME = os.getenv(
     "SLACK_BOT_TOKEN_SECRET_NAME", "slack-bot-token-staging"
 )
+# Answer Slack as soon as the modal is open and start the generation job
+# in the background. Needs CPU allocated outside requests (cpu_idle=false).
+SLACK_ACK_FIRST = os.getenv("SLACK_ACK_FIRST", "").lower() in (
+    "1", "true", "yes"
+)
+
+background = BackgroundTasks(
+    workers=int(os.getenv("BACKGROUND_WORKERS", "4")),
+    max_pending=int(os.getenv("BACKGROUND_MAX_PENDING", "32")),
+)
 
 
 def get_secret(secret_name: str) -> str:
@@ -40,27 +65,38 @@ def get_secret(secret_name: str) -> str:
         raise
 
 
+# Secret Manager is read at most once per TTL, not on every request
+_bot_token = CachedSecret(lambda: get_secret(SLACK_BOT_TOKEN_SECRET_NAME))
+_verifier = SlackRequestVerifier(
+    lambda: get_secret(SLACK_SIGNING_SECRET_NAME)
+)
+
+
 def get_slack_bot_token() -> str:
     """Get Slack bot token from Secret Manager"""
     try:
-        return get_secret(SLACK_BOT_TOKEN_SECRET_NAME)
+        return _bot_token.get()
     except Exception as e:
         logger.error(f"Failed to get Slack bot token: {e}")
         return ""
 
 
-def open_slack_modal(trigger_id: str, context_id: str) -> bool:
-    """Open Slack modal for reply generation"""
-    try:
-        from slack_sdk import WebClient
-        from slack_sdk.errors import SlackApiError
+def open_slack_modal(trigger_id: str, context_id: str) -> Optional[str]:
+    """Open Slack modal for reply generation.
 
+    Returns the view ``hash`` from ``views.open`` ("" if Slack sent none),
+    or None when the modal could not be opened. The job passes the hash
+    on its first update so it never overwrites a newer view.
+    """
+    try:
         bot_token = get_slack_bot_token()
         if not bot_token:
             logger.error("Slack bot token not available")
-            return False
+            return None
 
-        client = WebClient(token=bot_token)
+        # Cached per token over a keep-alive pool shared with the rest of
+        # the process; a rotated token just gets a new client
+        client = get_slack_web_client(bot_token)
 
         # Create modal view
         view = {
@@ -93,16 +129,16 @@ def open_slack_modal(trigger_id: str, context_id: str) -> bool:
             ],
         }
 
-        client.views_open(trigger_id=trigger_id, view=view)
+        response = client.views_open(trigger_id=trigger_id, view=view)
         logger.info(f"Opened Slack modal for context_id: {context_id}")
-        return True
+        return str((response.get("view") or {}).get("hash") or "")
 
-    except SlackApiError as e:
+    except SlackAPIError as e:
         logger.error(f"Slack API error: {e}")
-        return False
+        return None
     except Exception as e:
         logger.error(f"Failed to open Slack modal: {e}")
-        return False
+        return None
 
 
 def verify_slack_signature(
@@ -110,63 +146,46 @@ def verify_slack_signature(
 ) -> bool:
     """Verify Slack request signature"""
     try:
-        import hmac
-        import hashlib
-        import time
-
-        signing_secret = get_secret(SLACK_SIGNING_SECRET_NAME)
-
-        # Check timestamp (within 5 minutes)
-        if abs(time.time() - int(timestamp)) > 300:
-            logger.warning("Request timestamp too old")
-            return False
-
-        # Create signature
-        sig_basestring = f"v0:{timestamp}:{body.decode('utf-8')}"
-        expected_signature = 'v0=' + hmac.new(
-            signing_secret.encode(),
-            sig_basestring.encode(),
-            hashlib.sha256
-        ).hexdigest()
-
-        return hmac.compare_digest(signature, expected_signature)
+        # Cached signing secret, HMAC over the raw body, replay check
+        reason = _verifier.check(timestamp, signature, body)
+        if reason:
+            logger.warning(f"Slack request rejected: {reason}")
+        return not reason
     except Exception as e:
         logger.error(f"Signature verification failed: {e}")
         return False
 
 
+def run_cloud_run_job(
+    context_id: str, external_id: str, stage: str, view_hash: str = ""
+) -> None:
+    """Start a job execution; raises on failure."""
+    client = run_v2.JobsClient()
+    job_name = f"projects/{PROJECT_ID}/locations/{REGION}/jobs/{JOB_NAME}"
+    env = [
+        run_v2.EnvVar(name="CONTEXT_ID", value=context_id),
+        run_v2.EnvVar(name="EXTERNAL_ID", value=external_id),
+        run_v2.EnvVar(name="STAGE", value=stage),
+    ]
+    if view_hash:
+        env.append(run_v2.EnvVar(name="VIEW_HASH", value=view_hash))
+    request = run_v2.RunJobRequest(
+        name=job_name,
+        overrides=run_v2.RunJobRequest.Overrides(
+            container_overrides=[
+                run_v2.RunJobRequest.Overrides.ContainerOverride(env=env)
+            ]
+        ),
+    )
+    client.run_job(request=request)
+
+
 def trigger_cloud_run_job(
-    context_id: str, external_id: str, stage: str
+    context_id: str, external_id: str, stage: str, view_hash: str = ""
 ) -> bool:
     """Trigger Cloud Run Job for async processing"""
     try:
-        client = run_v2.JobsClient()
-        job_name = (
-            f"projects/{PROJECT_ID}/locations/{REGION}/jobs/{JOB_NAME}"
-        )
-
-        # Prepare job execution request
-        request = run_v2.RunJobRequest(
-            name=job_name,
-            overrides=run_v2.RunJobRequest.Overrides(
-                container_overrides=[
-                    run_v2.RunJobRequest.Overrides.ContainerOverride(
-                        env=[
-                            run_v2.EnvVar(
-                                name="CONTEXT_ID", value=context_id
-                            ),
-                            run_v2.EnvVar(
-                                name="EXTERNAL_ID", value=external_id
-                            ),
-                            run_v2.EnvVar(name="STAGE", value=stage),
-                        ]
-                    )
-                ]
-            )
-        )
-
-        # Execute job
-        client.run_job(request=request)
+        run_cloud_run_job(context_id, external_id, stage, view_hash)
         logger.info(f"Triggered Cloud Run Job for context_id: {context_id}")
         return True
 
@@ -178,7 +197,9 @@ def trigger_cloud_run_job(
 @app.route("/health", methods=["GET"])
 def health_check():
     """Health check endpoint"""
-    return jsonify({"status": "healthy"}), 200
+    return jsonify(
+        {"status": "healthy", "background": background.stats()}
+    ), 200
 
 
 @app.route("/async/generate", methods=["POST"])
@@ -193,12 +214,15 @@ def async_generate():
         context_id = data.get("context_id")
         external_id = data.get("external_id")
         stage = data.get("stage")
+        view_hash = str(data.get("view_hash") or "")
 
         if not all([context_id, external_id, stage]):
             return jsonify({"error": "Missing required fields"}), 400
 
         # Trigger Cloud Run Job
-        success = trigger_cloud_run_job(context_id, external_id, stage)
+        success = trigger_cloud_run_job(
+            context_id, external_id, stage, view_hash
+        )
 
         if success:
             return jsonify({"status": "job_triggered"}), 200
@@ -210,6 +234,77 @@ def async_generate():
         return jsonify({"error": "Internal server error"}), 500
 
 
+def handle_interaction_payload(payload):
+    """Open the modal and start the job for a verified interaction;
+    returns the Flask response."""
+    # Handle interactive components (button clicks)
+    if payload.get("type") == "block_actions":
+        actions = payload.get("actions", [])
+        if actions:
+            action = actions[0]
+            if action.get("action_id") == "generate_reply_action":
+                # Extract context_id from button value
+                try:
+                    value_data = json.loads(action.get("value", "{}"))
+                    context_id = value_data.get("context_id", "")
+                    trigger_id = payload.get("trigger_id", "")
+                    external_id = (
+                        f"ai-reply-{context_id}" if context_id else ""
+                    )
+                    stage = os.getenv("STAGE", "staging")
+
+                    if context_id and trigger_id:
+                        # Connect to Slack while the bot token is
+                        # fetched from Secret Manager
+                        get_slack_pool().prewarm()
+                        # Open modal immediately
+                        view_hash = open_slack_modal(
+                            trigger_id, context_id
+                        )
+                        if view_hash is None:
+                            logger.error("Failed to open Slack modal")
+                            return jsonify({
+                                "error": "Failed to open modal"
+                            }), 500
+
+                        # Ack first: the job starts after the response.
+                        # A full queue falls back to starting it inline.
+                        if SLACK_ACK_FIRST and background.submit(
+                            "run_job",
+                            lambda: run_cloud_run_job(
+                                context_id, external_id, stage, view_hash
+                            ),
+                            context_id=context_id,
+                        ):
+                            return jsonify({
+                                "status": "modal_opened_and_job_queued"
+                            }), 200
+
+                        # Trigger Cloud Run Job for async generation
+                        job_success = trigger_cloud_run_job(
+                            context_id, external_id, stage, view_hash
+                        )
+                        if job_success:
+                            return jsonify({
+                                "status": "modal_opened_and_job_triggered"
+                            }), 200
+                        else:
+                            logger.warning(
+                                "Modal opened but job trigger failed"
+                            )
+                            return jsonify({"status": "modal_opened"}), 200
+                    else:
+                        return jsonify({
+                            "error": "Missing context_id or trigger_id"
+                        }), 400
+                except Exception as e:
+                    logger.error(f"Error processing block_actions: {e}")
+                    return jsonify({"error": "Processing failed"}), 500
+
+    # Default response
+    return jsonify({"status": "ok"}), 200
+
+
 @app.route("/slack/events", methods=["POST"])
 def slack_events():
     """Handle Slack events (URL verification and interactions)"""
@@ -248,56 +343,30 @@ def slack_events():
             if challenge:
                 return challenge, 200
 
-        # Handle interactive components (button clicks)
-        if payload.get("type") == "block_actions":
-            actions = payload.get("actions", [])
-            if actions:
-                action = actions[0]
-                if action.get("action_id") == "generate_reply_action":
-                    # Extract context_id from button value
-                    try:
-                        value_data = json.loads(action.get("value", "{}"))
-                        context_id = value_data.get("context_id", "")
-                        trigger_id = payload.get("trigger_id", "")
-                        external_id = (
-                            f"ai-reply-{context_id}" if context_id else ""
-                        )
-                        stage = os.getenv("STAGE", "staging")
-
-                        if context_id and trigger_id:
-                            # Open modal immediately
-                            modal_success = open_slack_modal(
-                                trigger_id, context_id
-                            )
-                            if not modal_success:
-                                logger.error("Failed to open Slack modal")
-                                return jsonify({
-                                    "error": "Failed to open modal"
-                                }), 500
-
-                            # Trigger Cloud Run Job for async generation
-                            job_success = trigger_cloud_run_job(
-                                context_id, external_id, stage
-                            )
-                            if job_success:
-                                return jsonify({
-                                    "status": "modal_opened_and_job_triggered"
-                                }), 200
-                            else:
-                                logger.warning(
-                                    "Modal opened but job trigger failed"
-                                )
-                                return jsonify({"status": "modal_opened"}), 200
-                        else:
-                            return jsonify({
-                                "error": "Missing context_id or trigger_id"
-                            }), 400
-                    except Exception as e:
-                        logger.error(f"Error processing block_actions: {e}")
-                        return jsonify({"error": "Processing failed"}), 500
-
-        # Default response
-        return jsonify({"status": "ok"}), 200
+        # Slack retries requests it thinks timed out; a second delivery of
+        # an interaction being or already handled must not start a second
+        # job
+        retry_num, retry_reason = slack_retry(request.headers)
+        key = interaction_key(payload)
+        ledger = get_interaction_ledger()
+        if ledger.is_duplicate(key):
+            logger.info(
+                f"Acknowledged duplicate of {key} "
+                f"(retry {retry_num}, {retry_reason})"
+            )
+            return jsonify({"status": "duplicate_ignored"}), 200
+
+        try:
+            response = handle_interaction_payload(payload)
+        except Exception:
+            ledger.release(key)
+            raise
+        # A failed attempt leaves the interaction to Slack's next retry
+        if response[1] >= 500:
+            ledger.release(key)
+        else:
+            ledger.done(key)
+        return response
 
     except Exception as e:
         logger.error(f"Error in slack_events: {e}")
@@ -3,12 +3,14 @@
 import json
 import pytest
 from unittest.mock import patch, MagicMock
-from main import app
+from main import app, get_interaction_ledger
 
 
 @pytest.fixture
 def client():
     """Create test client."""
+    # Payloads are reused across tests; start with an empty ledger
+    get_interaction_ledger.cache_clear()
     app.config['TESTING'] = True
     with app.test_client() as client:
         yield client
@@ -147,6 +149,17 @@ class TestTriggerCloudRunJob:
         assert result is True
         mock_client.run_job.assert_called_once()
 
+    @patch('main.run_v2.JobsClient')
+    def test_view_hash_passed_to_job(self, mock_client_class):
+        """Test the job gets the hash of the modal it will update."""
+        from main import run_cloud_run_job
+        run_cloud_run_job('test-context', 'test-external', 'staging', 'h1')
+
+        request = mock_client_class.return_value.run_job.call_args[1][
+            'request']
+        env = request.overrides.container_overrides[0].env
+        assert {e.name: e.value for e in env}['VIEW_HASH'] == 'h1'
+
     @patch('main.run_v2.JobsClient')
     def test_failed_trigger(self, mock_client_class):
         """Test failed job trigger."""
@@ -216,3 +229,184 @@ class TestVerifySlackSignature:
         result = verify_slack_signature('500', 'v0=test', b'test-body')
         
         assert result is False
+
+
+class _Unavailable(Exception):
+    """Stand-in for a Google API 503."""
+
+    code = 503
+
+
+class TestBackgroundTasks:
+    """Test the bounded background executor."""
+
+    def test_retries_transient_errors(self):
+        """A transient failure is retried and then succeeds."""
+        from background import BackgroundTasks
+
+        tasks = BackgroundTasks(workers=1, sleep=lambda _: None)
+        fn = MagicMock(side_effect=[_Unavailable(), None])
+
+        assert tasks.submit('job', fn)
+        tasks.shutdown()
+
+        assert fn.call_count == 2
+        stats = tasks.stats()
+        assert stats['succeeded'] == 1
+        assert stats['retries'] == 1
+
+    def test_permanent_error_not_retried(self):
+        """A non-transient failure is recorded after one attempt."""
+        from background import BackgroundTasks
+
+        tasks = BackgroundTasks(workers=1, sleep=lambda _: None)
+        fn = MagicMock(side_effect=ValueError('bad request'))
+
+        assert tasks.submit('job', fn)
+        tasks.shutdown()
+
+        assert fn.call_count == 1
+        assert tasks.stats()['failed'] == 1
+
+    def test_full_queue_rejects(self):
+        """Submissions beyond the bound are refused, not queued."""
+        import threading
+        from background import BackgroundTasks
+
+        release = threading.Event()
+        tasks = BackgroundTasks(workers=1, max_pending=1)
+
+        assert tasks.submit('a', release.wait)
+        assert tasks.submit('b', release.wait)
+        assert not tasks.submit('c', release.wait)
+        release.set()
+        tasks.shutdown()
+
+        stats = tasks.stats()
+        assert stats['rejected'] == 1
+        assert stats['succeeded'] == 2
+
+
+class TestAckFirst:
+    """Test answering Slack before the job is started."""
+
+    payload = {
+        'type': 'block_actions',
+        'trigger_id': 'trigger-1',
+        'actions': [{
+            'action_id': 'generate_reply_action',
+            'value': json.dumps({'context_id': 'test-context'})
+        }]
+    }
+
+    def _post(self, client):
+        return client.post('/slack/events',
+                           data={'payload': json.dumps(self.payload)},
+                           content_type='application/x-www-form-urlencoded')
+
+    @patch('main.SLACK_ACK_FIRST', True)
+    @patch('main.verify_slack_signature', return_value=True)
+    @patch('main.open_slack_modal', return_value='hash-1')
+    @patch('main.trigger_cloud_run_job')
+    @patch('main.background')
+    def test_job_queued_after_modal(self, mock_background, mock_trigger,
+                                    mock_modal, mock_verify, client):
+        """The response does not wait for the job to start."""
+        mock_background.submit.return_value = True
+
+        response = self._post(client)
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['status'] == 'modal_opened_and_job_queued'
+        mock_trigger.assert_not_called()
+        name, task = mock_background.submit.call_args[0]
+        assert name == 'run_job'
+        with patch('main.run_cloud_run_job') as mock_run:
+            task()
+        mock_run.assert_called_once_with(
+            'test-context', 'ai-reply-test-context', 'staging', 'hash-1'
+        )
+
+    @patch('main.SLACK_ACK_FIRST', True)
+    @patch('main.verify_slack_signature', return_value=True)
+    @patch('main.open_slack_modal', return_value='hash-1')
+    @patch('main.trigger_cloud_run_job', return_value=True)
+    @patch('main.background')
+    def test_full_queue_starts_job_inline(self, mock_background,
+                                          mock_trigger, mock_modal,
+                                          mock_verify, client):
+        """A full queue falls back to starting the job in the request."""
+        mock_background.submit.return_value = False
+
+        response = self._post(client)
+
+        assert response.status_code == 200
+        mock_trigger.assert_called_once()
+
+
+class TestSlackRetries:
+    """Test that Slack retries do not start a second job."""
+
+    payload = {
+        'type': 'block_actions',
+        'trigger_id': 'trigger-retry',
+        'actions': [{
+            'action_id': 'generate_reply_action',
+            'value': json.dumps({'context_id': 'retry-context'})
+        }]
+    }
+
+    def _post(self, client, headers=None):
+        return client.post('/slack/events',
+                           data={'payload': json.dumps(self.payload)},
+                           content_type='application/x-www-form-urlencoded',
+                           headers=headers or {})
+
+    def setup_method(self):
+        from common.idempotency import get_interaction_ledger
+        get_interaction_ledger.cache_clear()
+
+    @patch('main.verify_slack_signature', return_value=True)
+    @patch('main.open_slack_modal', return_value='hash-1')
+    @patch('main.trigger_cloud_run_job', return_value=True)
+    def test_retry_acknowledged_without_side_effects(
+            self, mock_trigger, mock_modal, mock_verify, client):
+        """A retry of a handled interaction is acknowledged at once."""
+        assert self._post(client).status_code == 200
+
+        response = self._post(client, {
+            'X-Slack-Retry-Num': '1',
+            'X-Slack-Retry-Reason': 'http_timeout',
+        })
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data['status'] == 'duplicate_ignored'
+        assert mock_modal.call_count == 1
+        assert mock_trigger.call_count == 1
+
+    @patch('main.verify_slack_signature', return_value=True)
+    @patch('main.open_slack_modal', side_effect=[None, 'hash-1'])
+    @patch('main.trigger_cloud_run_job', return_value=True)
+    def test_retry_after_failed_attempt_processed(
+            self, mock_trigger, mock_modal, mock_verify, client):
+        """A retry of an attempt that failed runs the interaction."""
+        assert self._post(client).status_code == 500
+
+        response = self._post(client, {'X-Slack-Retry-Num': '1'})
+
+        assert response.status_code == 200
+        assert mock_modal.call_count == 2
+        mock_trigger.assert_called_once()
+
+    @patch('main.verify_slack_signature', return_value=True)
+    @patch('main.open_slack_modal', return_value='hash-1')
+    @patch('main.trigger_cloud_run_job', return_value=True)
+    def test_retry_of_unseen_interaction_processed(
+            self, mock_trigger, mock_modal, mock_verify, client):
+        """A retry whose original never arrived here is handled."""
+        response = self._post(client, {'X-Slack-Retry-Num': '1'})
+
+        assert response.status_code == 200
+        mock_trigger.assert_called_once()
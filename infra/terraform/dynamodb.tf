@@ -8,6 +8,33 @@ resource "aws_dynamodb_table" "context" {
     type = "S"
   }
 
+  attribute {
+    name = "pending_flag"
+    type = "S"
+  }
+
+  attribute {
+    name = "received_at"
+    type = "N"
+  }
+
+  # Sparse index: only unanswered contexts carry pending_flag, so backlog
+  # queries by age cost O(results) instead of a table scan.
+  global_secondary_index {
+    name               = "pending_by_age"
+    hash_key           = "pending_flag"
+    range_key          = "received_at"
+    projection_type    = "INCLUDE"
+    # batch_id / drafted_at let batch generation pick work from the index
+    non_key_attributes = [
+      "status",
+      "subject",
+      "sender_email",
+      "batch_id",
+      "drafted_at",
+    ]
+  }
+
   ttl {
     attribute_name = local.effective_ddb_ttl_attr
     enabled        = true
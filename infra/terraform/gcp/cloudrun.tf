@@ -59,11 +59,19 @@ resource "google_cloud_run_v2_service" "slack_events" {
         value = var.auth_token
       }
       
+      # Respond to Slack once the modal is open; start jobs afterwards
+      env {
+        name  = "SLACK_ACK_FIRST"
+        value = "1"
+      }
+      
       resources {
         limits = {
           cpu    = "1"
           memory = "512Mi"
         }
+        # Background job dispatch keeps running after the response
+        cpu_idle = false
       }
       
       startup_probe {
@@ -47,7 +47,8 @@ data "aws_iam_policy_document" "lambda_app_policy" {
       "dynamodb:Scan"
     ]
     resources = [
-      aws_dynamodb_table.context.arn
+      aws_dynamodb_table.context.arn,
+      "${aws_dynamodb_table.context.arn}/index/*"
     ]
   }
 
@@ -85,6 +86,21 @@ data "aws_iam_policy_document" "lambda_app_policy" {
     ]
   }
 
+  statement {
+    sid = "SlackOutbox"
+    actions = [
+      "sqs:SendMessage",
+      "sqs:ReceiveMessage",
+      "sqs:DeleteMessage",
+      "sqs:GetQueueAttributes"
+    ]
+    resources = [
+      aws_sqs_queue.slack_outbox.arn,
+      aws_sqs_queue.slack_digest.arn,
+      aws_sqs_queue.reply_send.arn
+    ]
+  }
+
   statement {
     sid = "S3InboundRead"
     actions = [
@@ -20,6 +20,8 @@ resource "aws_lambda_function" "app" {
     variables = {
       STAGE                        = terraform.workspace
       DDB_TABLE_NAME               = local.effective_ddb_table_name
+      DDB_TTL_ATTRIBUTE            = local.effective_ddb_ttl_attr
+      CONTEXT_TTL_DAYS             = var.context_ttl_days
       OPENAI_API_KEY_SECRET_ARN    = aws_secretsmanager_secret.openai_api_key.arn
       SLACK_APP_SECRET_ARN         = aws_secretsmanager_secret.slack_app.arn
       SLACK_SIGNING_SECRET_ARN     = aws_secretsmanager_secret.slack_signing.arn
@@ -30,6 +32,13 @@ resource "aws_lambda_function" "app" {
       SES_INBOUND_PREFIX           = "inbound/"
       ASYNC_GENERATION_ENDPOINT    = var.async_generation_endpoint
       ASYNC_GENERATION_AUTH_HEADER = var.async_generation_auth_header
+      OPENAI_STREAMING             = var.openai_streaming ? "1" : ""
+      FAQ_MATCH_THRESHOLD          = var.faq_match_threshold
+      FAQ_BACKGROUND_GENERATION    = var.faq_background_generation ? "1" : ""
+      SLACK_OUTBOX_QUEUE_URL       = aws_sqs_queue.slack_outbox.url
+      SLACK_DIGEST_QUEUE_URL       = local.slack_digest_queue_url
+      SLACK_INTERACTION_RECORDS    = "1"
+      REPLY_SEND_QUEUE_URL         = aws_sqs_queue.reply_send.url
     }
   }
 
@@ -59,12 +68,16 @@ resource "aws_lambda_function" "gmail_poller" {
     variables = {
       STAGE                        = terraform.workspace
       DDB_TABLE_NAME               = local.effective_ddb_table_name
+      DDB_TTL_ATTRIBUTE            = local.effective_ddb_ttl_attr
+      CONTEXT_TTL_DAYS             = var.context_ttl_days
       OPENAI_API_KEY_SECRET_ARN    = aws_secretsmanager_secret.openai_api_key.arn
       SLACK_APP_SECRET_ARN         = aws_secretsmanager_secret.slack_app.arn
       SLACK_SIGNING_SECRET_ARN     = aws_secretsmanager_secret.slack_signing.arn
       SENDER_EMAIL_ADDRESS         = var.sender_email_address
       SLACK_CHANNEL_ID             = var.slack_channel_id
       GMAIL_OAUTH_SECRET_ARN       = aws_secretsmanager_secret.gmail_oauth.arn
+      SLACK_OUTBOX_QUEUE_URL       = aws_sqs_queue.slack_outbox.url
+      SLACK_DIGEST_QUEUE_URL       = local.slack_digest_queue_url
     }
   }
 
@@ -73,6 +86,95 @@ resource "aws_lambda_function" "gmail_poller" {
   ]
 }
 
+# Drains Slack calls deferred by the rate-limited dispatcher
+resource "aws_lambda_function" "slack_outbox" {
+  function_name = "reply-bot-slack-outbox-${terraform.workspace}"
+  role          = aws_iam_role.lambda_exec.arn
+  runtime       = "python3.11"
+  handler       = "slack_outbox.handler"
+
+  filename         = data.archive_file.lambda_package.output_path
+  source_code_hash = data.archive_file.lambda_package.output_base64sha256
+
+  timeout     = 30
+  memory_size = 128
+
+  environment {
+    variables = {
+      STAGE                    = terraform.workspace
+      SLACK_APP_SECRET_ARN     = aws_secretsmanager_secret.slack_app.arn
+      SLACK_SIGNING_SECRET_ARN = aws_secretsmanager_secret.slack_signing.arn
+      SLACK_OUTBOX_QUEUE_URL   = aws_sqs_queue.slack_outbox.url
+      SLACK_DIGEST_MAX_ITEMS   = var.slack_digest_max_items
+    }
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "slack_outbox" {
+  event_source_arn = aws_sqs_queue.slack_outbox.arn
+  function_name    = aws_lambda_function.slack_outbox.arn
+  batch_size       = 10
+
+  # Few concurrent drains, so their rate limits do not add up
+  scaling_config {
+    maximum_concurrency = 2
+  }
+}
+
+locals {
+  # Notifiers queue new emails here instead of posting when digest mode is on
+  slack_digest_queue_url = (
+    var.slack_digest_enabled ? aws_sqs_queue.slack_digest.url : ""
+  )
+}
+
+# Digest mode: up to slack_digest_max_items notifications, or whatever
+# arrived within the window, reach the drain Lambda as one batch
+resource "aws_lambda_event_source_mapping" "slack_digest" {
+  event_source_arn                   = aws_sqs_queue.slack_digest.arn
+  function_name                      = aws_lambda_function.slack_outbox.arn
+  batch_size                         = var.slack_digest_max_items
+  maximum_batching_window_in_seconds = var.slack_digest_window_seconds
+
+  scaling_config {
+    maximum_concurrency = 2
+  }
+}
+
+# Sends replies queued by view_submission (SES plus Slack confirmation)
+resource "aws_lambda_function" "reply_sender" {
+  function_name = "reply-bot-reply-sender-${terraform.workspace}"
+  role          = aws_iam_role.lambda_exec.arn
+  runtime       = "python3.11"
+  handler       = "reply_sender.handler"
+
+  filename         = data.archive_file.lambda_package.output_path
+  source_code_hash = data.archive_file.lambda_package.output_base64sha256
+
+  timeout     = 30
+  memory_size = 128
+
+  environment {
+    variables = {
+      STAGE                    = terraform.workspace
+      DDB_TABLE_NAME           = local.effective_ddb_table_name
+      DDB_TTL_ATTRIBUTE        = local.effective_ddb_ttl_attr
+      SLACK_APP_SECRET_ARN     = aws_secretsmanager_secret.slack_app.arn
+      SLACK_SIGNING_SECRET_ARN = aws_secretsmanager_secret.slack_signing.arn
+      SENDER_EMAIL_ADDRESS     = var.sender_email_address
+      SLACK_CHANNEL_ID         = var.slack_channel_id
+      SLACK_OUTBOX_QUEUE_URL   = aws_sqs_queue.slack_outbox.url
+    }
+  }
+}
+
+resource "aws_lambda_event_source_mapping" "reply_send" {
+  event_source_arn        = aws_sqs_queue.reply_send.arn
+  function_name           = aws_lambda_function.reply_sender.arn
+  batch_size              = 5
+  function_response_types = ["ReportBatchItemFailures"]
+}
+
 resource "aws_cloudwatch_event_rule" "gmail_poll_schedule" {
   name                = "reply-bot-gmail-poll-${terraform.workspace}"
   schedule_expression = "rate(24 hours)"
@@ -91,3 +193,49 @@ resource "aws_lambda_permission" "allow_events_invoke_gmail_poller" {
   principal     = "events.amazonaws.com"
   source_arn    = aws_cloudwatch_event_rule.gmail_poll_schedule.arn
 }
+
+# Off-peak batch draft generation (shares the same source package)
+resource "aws_lambda_function" "batch_generator" {
+  function_name = "reply-bot-batch-generator-${terraform.workspace}"
+  role          = aws_iam_role.lambda_exec.arn
+  runtime       = "python3.11"
+  handler       = "batch_generator.handler"
+
+  filename         = data.archive_file.lambda_package.output_path
+  source_code_hash = data.archive_file.lambda_package.output_base64sha256
+
+  # Uploading a large backlog can take a while; no waiting on the batch
+  timeout     = 300
+  memory_size = 256
+
+  environment {
+    variables = {
+      STAGE                     = terraform.workspace
+      DDB_TABLE_NAME            = local.effective_ddb_table_name
+      DDB_TTL_ATTRIBUTE         = local.effective_ddb_ttl_attr
+      CONTEXT_TTL_DAYS          = var.context_ttl_days
+      OPENAI_API_KEY_SECRET_ARN = aws_secretsmanager_secret.openai_api_key.arn
+      BATCH_BACKEND             = "openai"
+      BATCH_MAX_CONTEXTS        = var.batch_max_contexts
+    }
+  }
+}
+
+resource "aws_cloudwatch_event_rule" "batch_generation_schedule" {
+  name                = "reply-bot-batch-generation-${terraform.workspace}"
+  schedule_expression = var.batch_generation_schedule
+}
+
+resource "aws_cloudwatch_event_target" "batch_generation_target" {
+  rule      = aws_cloudwatch_event_rule.batch_generation_schedule.name
+  target_id = "batch-generator"
+  arn       = aws_lambda_function.batch_generator.arn
+}
+
+resource "aws_lambda_permission" "allow_events_invoke_batch_generator" {
+  statement_id  = "AllowExecutionFromEventBridge"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.batch_generator.function_name
+  principal     = "events.amazonaws.com"
+  source_arn    = aws_cloudwatch_event_rule.batch_generation_schedule.arn
+}
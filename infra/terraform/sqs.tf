@@ -15,4 +15,44 @@ resource "aws_sqs_queue" "main" {
   })
 }
 
+# Slack calls that could not be sent within an invocation's deadline
+# (rate limited or backed up); drained by the slack_outbox Lambda
+resource "aws_sqs_queue" "slack_outbox" {
+  name                       = "reply-bot-slack-outbox-${terraform.workspace}"
+  message_retention_seconds  = 86400 # 1 day
+  visibility_timeout_seconds = 60    # at least the drain Lambda's timeout
+  sqs_managed_sse_enabled    = true
 
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.dlq.arn
+    maxReceiveCount     = 5
+  })
+}
+
+# New-email notifications held for digest mode; the slack_outbox Lambda's
+# trigger batches them by size and window and posts one message per batch
+resource "aws_sqs_queue" "slack_digest" {
+  name                       = "reply-bot-slack-digest-${terraform.workspace}"
+  message_retention_seconds  = 86400 # 1 day
+  visibility_timeout_seconds = 360   # batching window plus the Lambda timeout
+  sqs_managed_sse_enabled    = true
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.dlq.arn
+    maxReceiveCount     = 5
+  })
+}
+
+# Replies submitted from the modal; view_submission persists the send
+# intent and returns at once, the reply_sender Lambda sends the email
+resource "aws_sqs_queue" "reply_send" {
+  name                       = "reply-bot-reply-send-${terraform.workspace}"
+  message_retention_seconds  = 86400 # 1 day
+  visibility_timeout_seconds = 60    # at least the sender Lambda's timeout
+  sqs_managed_sse_enabled    = true
+
+  redrive_policy = jsonencode({
+    deadLetterTargetArn = aws_sqs_queue.dlq.arn
+    maxReceiveCount     = 5
+  })
+}
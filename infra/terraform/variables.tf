@@ -32,6 +32,43 @@ variable "ddb_ttl_attribute" {
   default     = ""
 }
 
+variable "context_ttl_days" {
+  type        = number
+  description = "Days after receipt before a context item expires via TTL"
+  default     = 30
+}
+
+variable "openai_streaming" {
+  type        = bool
+  description = "Stream inline drafts into the open Slack modal"
+  default     = false
+}
+
+variable "faq_match_threshold" {
+  type        = number
+  description = "Minimum similarity for pre-filling the modal with an approved FAQ template"
+  default     = 0.3
+}
+
+variable "faq_background_generation" {
+  type        = bool
+  description = "Still request an AI draft from the async worker when a FAQ template matched"
+  default     = false
+}
+
+variable "batch_generation_schedule" {
+  type        = string
+  description = "EventBridge schedule for batch draft generation (UTC)"
+  # Hourly during 18:00-06:00 JST collects finished batches and submits new work
+  default     = "cron(0 9-21 * * ? *)"
+}
+
+variable "batch_max_contexts" {
+  type        = number
+  description = "Maximum contexts submitted per batch run"
+  default     = 500
+}
+
 variable "sender_email_address" {
   type        = string
   description = "SES sender email address used for replies"
@@ -43,6 +80,34 @@ variable "slack_channel_id" {
   default     = ""
 }
 
+variable "slack_digest_enabled" {
+  type        = bool
+  description = "Batch new-email notifications into one Slack message per window"
+  default     = false
+}
+
+variable "slack_digest_window_seconds" {
+  type        = number
+  description = "Longest a notification waits for others to share its digest"
+  default     = 60
+
+  validation {
+    condition     = var.slack_digest_window_seconds <= 300
+    error_message = "SQS batching windows are at most 300 seconds."
+  }
+}
+
+variable "slack_digest_max_items" {
+  type        = number
+  description = "Emails per digest message (at most 24 to fit Slack's block limit)"
+  default     = 10
+
+  validation {
+    condition     = var.slack_digest_max_items >= 1 && var.slack_digest_max_items <= 24
+    error_message = "slack_digest_max_items must be between 1 and 24."
+  }
+}
+
 
 variable "async_generation_endpoint" {
   type        = string
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import json
+import os
+
+from common.batch_generation import build_batch_backend, run_batch
+from common.logging import log_error, log_info
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Scheduled off-peak run: collect finished batches, submit the backlog.
+
+    The event may override ``limit``, ``older_than_seconds`` and
+    ``backend``; otherwise BATCH_MAX_CONTEXTS / BATCH_MIN_AGE_SECONDS /
+    BATCH_BACKEND apply. Batches stay in flight between runs, so the
+    function never waits on the provider's completion window.
+    """
+    event = event or {}
+    try:
+        backend = build_batch_backend(event.get("backend"))
+        limit = int(
+            event.get("limit") or os.getenv("BATCH_MAX_CONTEXTS", "") or 500
+        )
+        older_than = int(
+            event.get("older_than_seconds")
+            or os.getenv("BATCH_MIN_AGE_SECONDS", "")
+            or 0
+        )
+        report = run_batch(
+            backend, limit=limit, older_than_seconds=older_than
+        )
+    except Exception as exc:
+        log_error("batch generation failed", error=str(exc))
+        return {
+            "statusCode": 500,
+            "body": json.dumps({"error": "batch generation failed"}),
+        }
+    log_info("batch generation run", **report.as_dict())
+    return {"statusCode": 200, "body": json.dumps(report.as_dict())}
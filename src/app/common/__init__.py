@@ -1,7 +1,16 @@
 from .config import load_config
 from .logging import log_error, log_info
 from .secrets import resolve_slack_credentials
-from .dynamodb_repo import get_context_item, put_context_item
+from .dynamodb_repo import (
+    get_context_item,
+    get_context_record,
+    put_context_item,
+    update_context_fields,
+    mark_context_status,
+    list_pending_contexts,
+)
+from .context_store import ContextStore, get_context_store
+from .context_record import ContextRecord
 from .ses_email import send_email
 from .pii import redact_and_map, reidentify
 
@@ -11,7 +20,14 @@ __all__ = [
     "log_info",
     "resolve_slack_credentials",
     "get_context_item",
+    "get_context_record",
+    "ContextRecord",
     "put_context_item",
+    "update_context_fields",
+    "mark_context_status",
+    "list_pending_contexts",
+    "ContextStore",
+    "get_context_store",
     "send_email",
     "redact_and_map",
     "reidentify",
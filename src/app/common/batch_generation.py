@@ -0,0 +1,505 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.context_store import ConditionFailedError
+    from common.dynamodb_repo import (
+        get_context_item,
+        list_pending_contexts,
+        update_context_fields,
+    )
+    from common.logging import log_error, log_info
+    from common.model_routing import choose_route
+    from common.openai_client import (
+        CHAT_COMPLETIONS_PATH,
+        OpenAIHTTPError,
+        _get_api_key,
+        build_route_payload,
+        extract_message_content,
+        get_openai_pool,
+    )
+except ImportError:
+    # テスト環境用の相対インポート
+    from .context_store import ConditionFailedError
+    from .dynamodb_repo import (
+        get_context_item,
+        list_pending_contexts,
+        update_context_fields,
+    )
+    from .logging import log_error, log_info
+    from .model_routing import choose_route
+    from .openai_client import (
+        CHAT_COMPLETIONS_PATH,
+        OpenAIHTTPError,
+        _get_api_key,
+        build_route_payload,
+        extract_message_content,
+        get_openai_pool,
+    )
+
+# Provider batch states (OpenAI Batch API vocabulary)
+BATCH_COMPLETED = "completed"
+BATCH_TERMINAL_STATES = frozenset(
+    {BATCH_COMPLETED, "failed", "expired", "cancelled"}
+)
+
+# Context attribute holding the batch a context belongs to. While a run is
+# submitting it holds a "claim:<epoch>:<nonce>" marker so concurrent runs
+# skip the context; markers older than STALE_CLAIM_SECONDS (a run that died
+# between claim and submit) are released by the next collect.
+BATCH_ID_ATTR = "batch_id"
+_CLAIM_PREFIX = "claim:"
+STALE_CLAIM_SECONDS = 3600
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    custom_id: str
+    content: str = ""
+    error: str = ""
+
+
+@dataclass
+class BatchReport:
+    submitted: List[str] = field(default_factory=list)
+    completed: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    batch_ids: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "submitted": len(self.submitted),
+            "completed": len(self.completed),
+            "failed": len(self.failed),
+            "batch_ids": list(self.batch_ids),
+        }
+
+
+class BatchBackend:
+    """Provider of asynchronous bulk chat completions.
+
+    ``submit`` takes Batch API request lines (``custom_id``, ``method``,
+    ``url``, ``body``) and returns a batch id; ``status`` returns one of the
+    provider states; ``results`` is only valid once the batch is completed.
+    """
+
+    name = "base"
+
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        raise NotImplementedError
+
+    def status(self, batch_id: str) -> str:
+        raise NotImplementedError
+
+    def results(self, batch_id: str) -> List[BatchResult]:
+        raise NotImplementedError
+
+
+def _parse_output_line(line: Dict[str, Any]) -> BatchResult:
+    custom_id = str(line.get("custom_id", ""))
+    error = line.get("error")
+    response = line.get("response") or {}
+    if error or int(response.get("status_code", 0)) >= 300:
+        detail = json.dumps(error or response, ensure_ascii=False)
+        return BatchResult(custom_id, error=detail[:500])
+    content = extract_message_content(response.get("body") or {})
+    if not content:
+        return BatchResult(custom_id, error="empty completion")
+    return BatchResult(custom_id, content=content)
+
+
+def _read_jsonl(data: bytes) -> Iterable[Dict[str, Any]]:
+    for raw in data.splitlines():
+        if raw.strip():
+            yield json.loads(raw)
+
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API: upload a JSONL file, create a batch, poll it."""
+
+    name = "openai"
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        completion_window: str = "24h",
+    ) -> None:
+        self._api_key = api_key
+        self._pool = get_openai_pool(base_url)
+        self.completion_window = completion_window
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        content_type: str = "application/json",
+    ) -> bytes:
+        headers = {"Authorization": f"Bearer {self._api_key}"}
+        if body is not None:
+            headers["Content-Type"] = content_type
+        resp = self._pool.request(method, path, body=body, headers=headers)
+        if resp.status >= 300:
+            raise OpenAIHTTPError(resp.status, resp.body, resp.headers)
+        return resp.body
+
+    def _upload(self, data: bytes) -> str:
+        boundary = uuid.uuid4().hex
+        body = b"".join(
+            [
+                f"--{boundary}\r\n".encode(),
+                b'Content-Disposition: form-data; name="purpose"\r\n\r\n',
+                b"batch\r\n",
+                f"--{boundary}\r\n".encode(),
+                b"Content-Disposition: form-data; name=\"file\"; "
+                b"filename=\"drafts.jsonl\"\r\n",
+                b"Content-Type: application/jsonl\r\n\r\n",
+                data,
+                f"\r\n--{boundary}--\r\n".encode(),
+            ]
+        )
+        out = self._request(
+            "POST",
+            "/v1/files",
+            body,
+            content_type=f"multipart/form-data; boundary={boundary}",
+        )
+        return str(json.loads(out)["id"])
+
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        data = b"\n".join(
+            json.dumps(r, ensure_ascii=False).encode("utf-8") for r in requests
+        )
+        file_id = self._upload(data)
+        out = self._request(
+            "POST",
+            "/v1/batches",
+            json.dumps(
+                {
+                    "input_file_id": file_id,
+                    "endpoint": CHAT_COMPLETIONS_PATH,
+                    "completion_window": self.completion_window,
+                }
+            ).encode("utf-8"),
+        )
+        return str(json.loads(out)["id"])
+
+    def _batch(self, batch_id: str) -> Dict[str, Any]:
+        return json.loads(self._request("GET", f"/v1/batches/{batch_id}"))
+
+    def status(self, batch_id: str) -> str:
+        return str(self._batch(batch_id).get("status", ""))
+
+    def results(self, batch_id: str) -> List[BatchResult]:
+        batch = self._batch(batch_id)
+        results: List[BatchResult] = []
+        for key in ("output_file_id", "error_file_id"):
+            file_id = batch.get(key)
+            if not file_id:
+                continue
+            data = self._request("GET", f"/v1/files/{file_id}/content")
+            results.extend(
+                _parse_output_line(line) for line in _read_jsonl(data)
+            )
+        return results
+
+
+def _canned_reply(body: Dict[str, Any]) -> str:
+    return (
+        "お問い合わせいただきありがとうございます。"
+        "内容を確認のうえ、担当者より改めてご連絡いたします。"
+    )
+
+
+class LocalFileBatchBackend(BatchBackend):
+    """File-based stand-in for a batch provider.
+
+    Each batch is a directory under ``root`` holding ``input.jsonl``; the
+    first ``status`` call at least ``complete_after`` seconds after submit
+    runs every request through ``responder`` and writes ``output.jsonl`` in
+    the provider's format. Useful offline and with benchmarks/openai_stub.py
+    as the responder.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        root: str,
+        responder: Optional[Callable[[Dict[str, Any]], str]] = None,
+        complete_after: float = 0.0,
+    ) -> None:
+        self.root = root
+        self.responder = responder or _canned_reply
+        self.complete_after = complete_after
+
+    def _dir(self, batch_id: str) -> str:
+        return os.path.join(self.root, batch_id)
+
+    def submit(self, requests: List[Dict[str, Any]]) -> str:
+        batch_id = f"batch_local_{uuid.uuid4().hex[:16]}"
+        os.makedirs(self._dir(batch_id))
+        with open(os.path.join(self._dir(batch_id), "input.jsonl"), "w") as f:
+            for r in requests:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+        return batch_id
+
+    def _process(self, batch_id: str) -> None:
+        with open(os.path.join(self._dir(batch_id), "input.jsonl")) as f:
+            lines = [json.loads(raw) for raw in f if raw.strip()]
+        tmp = os.path.join(self._dir(batch_id), "output.jsonl.tmp")
+        with open(tmp, "w") as out:
+            for line in lines:
+                try:
+                    content = self.responder(line["body"])
+                    record = {
+                        "custom_id": line["custom_id"],
+                        "response": {
+                            "status_code": 200,
+                            "body": {
+                                "choices": [
+                                    {"message": {"content": content}}
+                                ]
+                            },
+                        },
+                        "error": None,
+                    }
+                except Exception as exc:
+                    record = {
+                        "custom_id": line["custom_id"],
+                        "response": None,
+                        "error": {"message": str(exc)},
+                    }
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        # Atomic publish so a concurrent poll never reads a partial file
+        os.replace(tmp, os.path.join(self._dir(batch_id), "output.jsonl"))
+
+    def status(self, batch_id: str) -> str:
+        directory = self._dir(batch_id)
+        if not os.path.isdir(directory):
+            return "failed"
+        if os.path.exists(os.path.join(directory, "output.jsonl")):
+            return BATCH_COMPLETED
+        submitted = os.path.getmtime(os.path.join(directory, "input.jsonl"))
+        if time.time() - submitted < self.complete_after:
+            return "in_progress"
+        self._process(batch_id)
+        return BATCH_COMPLETED
+
+    def results(self, batch_id: str) -> List[BatchResult]:
+        path = os.path.join(self._dir(batch_id), "output.jsonl")
+        with open(path, "rb") as f:
+            return [_parse_output_line(line) for line in _read_jsonl(f.read())]
+
+
+def build_batch_backend(backend: Optional[str] = None) -> BatchBackend:
+    """``BATCH_BACKEND``: ``openai`` (default) or ``local`` (files under
+    ``BATCH_LOCAL_DIR``)."""
+    backend = (backend or os.getenv("BATCH_BACKEND", "") or "openai").lower()
+    if backend == "local":
+        root = os.getenv("BATCH_LOCAL_DIR", "") or "/tmp/reply-bot-batches"
+        return LocalFileBatchBackend(root)
+    if backend == "openai":
+        return OpenAIBatchBackend(_get_api_key())
+    raise ValueError(f"unknown batch backend: {backend}")
+
+
+def submit_pending(
+    backend: BatchBackend,
+    limit: int = 500,
+    older_than_seconds: int = 0,
+    report: Optional[BatchReport] = None,
+) -> BatchReport:
+    """Claim undrafted pending contexts and submit them as one batch.
+
+    Drafted contexts stay pending until the reply is sent, so they are
+    filtered out in the index query, not after it; otherwise ``limit`` of
+    them would hide every newer context.
+    """
+    report = report or BatchReport()
+    candidates = list_pending_contexts(
+        limit=limit,
+        older_than_seconds=older_than_seconds,
+        absent=("drafted_at", BATCH_ID_ATTR),
+    )
+    if not candidates:
+        return report
+
+    claim = f"{_CLAIM_PREFIX}{int(time.time())}:{uuid.uuid4().hex}"
+    claimed: List[Dict[str, Any]] = []
+    for candidate in candidates:
+        context_id = candidate["context_id"]
+        try:
+            update_context_fields(
+                context_id,
+                condition={BATCH_ID_ATTR: None, "drafted_at": None},
+                **{BATCH_ID_ATTR: claim},
+            )
+        except ConditionFailedError:
+            continue  # another run took it, or a draft appeared
+        item = get_context_item(context_id) or {}
+        if not item.get("body_redacted"):
+            _release([candidate], claim)
+            continue
+        claimed.append(item)
+
+    requests = []
+    route_fields = {}
+    for item in claimed:
+        body = str(item["body_redacted"])
+        decision = choose_route(body)
+        route_fields[item["context_id"]] = decision.context_fields()
+        requests.append(
+            {
+                "custom_id": item["context_id"],
+                "method": "POST",
+                "url": CHAT_COMPLETIONS_PATH,
+                "body": build_route_payload(body, decision.route),
+            }
+        )
+    if not requests:
+        return report
+
+    try:
+        batch_id = backend.submit(requests)
+    except Exception:
+        _release(claimed, claim)
+        raise
+    for item in claimed:
+        context_id = item["context_id"]
+        update_context_fields(
+            context_id,
+            condition={BATCH_ID_ATTR: claim},
+            batch_submitted_at=int(time.time()),
+            **{BATCH_ID_ATTR: batch_id},
+            **route_fields[context_id],
+        )
+        report.submitted.append(context_id)
+    report.batch_ids.append(batch_id)
+    log_info(
+        "draft batch submitted",
+        backend=backend.name,
+        batch_id=batch_id,
+        contexts=len(requests),
+    )
+    return report
+
+
+def _is_stale_claim(batch_id: str, now: float) -> bool:
+    try:
+        claimed_at = int(batch_id.split(":")[1])
+    except (IndexError, ValueError):
+        return True
+    return now - claimed_at > STALE_CLAIM_SECONDS
+
+
+def _release(items: List[Dict[str, Any]], batch_id: str) -> None:
+    for item in items:
+        try:
+            update_context_fields(
+                item["context_id"],
+                condition={BATCH_ID_ATTR: batch_id},
+                **{BATCH_ID_ATTR: None},
+            )
+        except Exception as exc:
+            log_error(
+                "failed to release batch claim",
+                context_id=item.get("context_id", ""),
+                error=str(exc),
+            )
+
+
+def collect_finished(
+    backend: BatchBackend,
+    limit: int = 1000,
+    report: Optional[BatchReport] = None,
+) -> BatchReport:
+    """Write drafts from finished batches back onto their contexts.
+
+    Contexts whose request failed (or whose batch failed or expired) are
+    released so the next run can resubmit them.
+    """
+    report = report or BatchReport()
+    in_flight: Dict[str, List[Dict[str, Any]]] = {}
+    now = time.time()
+    for item in list_pending_contexts(limit=limit, present=(BATCH_ID_ATTR,)):
+        batch_id = str(item.get(BATCH_ID_ATTR) or "")
+        if batch_id.startswith(_CLAIM_PREFIX):
+            if _is_stale_claim(batch_id, now):
+                _release([item], batch_id)
+            continue
+        in_flight.setdefault(batch_id, []).append(item)
+
+    for batch_id, items in in_flight.items():
+        state = backend.status(batch_id)
+        if state not in BATCH_TERMINAL_STATES:
+            continue
+        results = {}
+        if state == BATCH_COMPLETED:
+            results = {r.custom_id: r for r in backend.results(batch_id)}
+        drafted_at = int(time.time())
+        for item in items:
+            context_id = item["context_id"]
+            result = results.get(context_id)
+            fields: Dict[str, Any] = {BATCH_ID_ATTR: None}
+            if result is not None and result.content:
+                fields.update(
+                    draft_redacted=result.content, drafted_at=drafted_at
+                )
+                report.completed.append(context_id)
+            else:
+                fields["batch_error"] = (
+                    result.error if result is not None else state
+                )
+                report.failed.append(context_id)
+            try:
+                update_context_fields(
+                    context_id, condition={BATCH_ID_ATTR: batch_id}, **fields
+                )
+            except ConditionFailedError:
+                continue
+        log_info(
+            "draft batch collected",
+            backend=backend.name,
+            batch_id=batch_id,
+            state=state,
+            contexts=len(items),
+        )
+    return report
+
+
+def run_batch(
+    backend: BatchBackend,
+    limit: int = 500,
+    older_than_seconds: int = 0,
+    wait: bool = False,
+    poll_interval: float = 30.0,
+    timeout: float = 3600.0,
+    sleep: Callable[[float], None] = time.sleep,
+) -> BatchReport:
+    """Collect finished batches, then submit the current backlog.
+
+    A scheduled run leaves new batches in flight for the next run to
+    collect; ``wait=True`` (backfills, local runs) polls until they finish
+    or ``timeout`` passes.
+    """
+    report = collect_finished(backend)
+    submit_pending(backend, limit, older_than_seconds, report)
+    deadline = time.monotonic() + timeout
+    pending_ids = list(report.batch_ids)
+    while wait and pending_ids and time.monotonic() < deadline:
+        if all(
+            backend.status(b) in BATCH_TERMINAL_STATES for b in pending_ids
+        ):
+            collect_finished(backend, report=report)
+            break
+        sleep(poll_interval)
+    return report
@@ -17,6 +17,10 @@ class AppConfig:
     # Async generation (Cloud Run, etc.)
     async_generation_endpoint: str
     async_generation_auth_header: str
+    # Stream inline drafts into the open modal (OPENAI_STREAMING=1)
+    openai_streaming: bool = False
+    # Still run the async worker when a FAQ template pre-filled the modal
+    faq_background_generation: bool = False
 
 
 def load_config() -> AppConfig:
@@ -35,4 +39,10 @@ def load_config() -> AppConfig:
         async_generation_auth_header=os.getenv(
             "ASYNC_GENERATION_AUTH_HEADER", ""
         ),
+        openai_streaming=os.getenv("OPENAI_STREAMING", "").lower()
+        in ("1", "true", "yes"),
+        faq_background_generation=os.getenv(
+            "FAQ_BACKGROUND_GENERATION", ""
+        ).lower()
+        in ("1", "true", "yes"),
     )
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Optional
+
+_UNSET: Any = object()
+
+
+def _as_text(value: Any) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value
+    # boto3 Binary wraps bytes in ``.value``
+    raw = getattr(value, "value", value)
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+        return bytes(raw).decode("utf-8", errors="ignore")
+    return str(value)
+
+
+class ContextRecord:
+    """Typed, read-only view of a context item.
+
+    Small header attributes are copied eagerly; ``pii_map`` and the bodies
+    are decoded from the raw item on first access and cached, so a request
+    that only needs the redacted body never parses the PII map and vice
+    versa.
+    """
+
+    __slots__ = (
+        "context_id",
+        "sender_email",
+        "subject",
+        "status",
+        "_item",
+        "_pii_map",
+        "_body_raw",
+        "_body_redacted",
+        "_draft_redacted",
+    )
+
+    def __init__(self, item: Dict[str, Any]) -> None:
+        self._item = item
+        self.context_id = _as_text(item.get("context_id"))
+        self.sender_email = _as_text(item.get("sender_email"))
+        self.subject = _as_text(item.get("subject"))
+        self.status = _as_text(item.get("status"))
+        self._pii_map: Any = _UNSET
+        self._body_raw: Any = _UNSET
+        self._body_redacted: Any = _UNSET
+        self._draft_redacted: Any = _UNSET
+
+    @classmethod
+    def from_item(
+        cls, item: Optional[Dict[str, Any]]
+    ) -> Optional["ContextRecord"]:
+        return cls(item) if item else None
+
+    @property
+    def recipient(self) -> str:
+        return self.sender_email or _as_text(self._item.get("to"))
+
+    @property
+    def body_raw(self) -> str:
+        if self._body_raw is _UNSET:
+            self._body_raw = _as_text(self._item.get("body_raw"))
+        return self._body_raw  # type: ignore[no-any-return]
+
+    @property
+    def body_redacted(self) -> str:
+        if self._body_redacted is _UNSET:
+            self._body_redacted = _as_text(self._item.get("body_redacted"))
+        return self._body_redacted  # type: ignore[no-any-return]
+
+    @property
+    def draft_redacted(self) -> str:
+        """Draft stored ahead of the click (batch run or async worker)."""
+        if self._draft_redacted is _UNSET:
+            self._draft_redacted = _as_text(self._item.get("draft_redacted"))
+        return self._draft_redacted  # type: ignore[no-any-return]
+
+    @property
+    def pii_map(self) -> Dict[str, str]:
+        if self._pii_map is _UNSET:
+            self._pii_map = _decode_pii_map(self._item.get("pii_map"))
+        return self._pii_map  # type: ignore[no-any-return]
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Raw attribute access for fields without a typed accessor."""
+        return self._item.get(key, default)
+
+    def to_item(self) -> Dict[str, Any]:
+        return self._item
+
+
+def _decode_pii_map(raw: Any) -> Dict[str, str]:
+    if not raw:
+        return {}
+    if isinstance(raw, dict):
+        return {str(k): str(v) for k, v in raw.items()}
+    try:
+        decoded = json.loads(_as_text(raw))
+    except Exception:
+        return {}
+    return decoded if isinstance(decoded, dict) else {}
@@ -0,0 +1,504 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+from decimal import Decimal
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.deadline import boto_config, timeout_bucket
+except ImportError:
+    # テスト環境用の相対インポート
+    from .deadline import boto_config, timeout_bucket
+
+
+STATUS_PENDING = "pending"
+STATUS_SENT = "sent"
+
+# Sparse GSI: only unanswered contexts carry PENDING_FLAG_ATTR, so the index
+# holds the backlog alone and is queried oldest-first by received_at.
+PENDING_INDEX_NAME = "pending_by_age"
+PENDING_FLAG_ATTR = "pending_flag"
+
+
+class ConditionFailedError(Exception):
+    """Raised when a conditional update does not match the stored item."""
+
+
+def _check_condition(
+    item: Optional[Dict[str, Any]], condition: Optional[Dict[str, Any]]
+) -> None:
+    if item is None:
+        raise ConditionFailedError("context not found")
+    for name, expected in (condition or {}).items():
+        if expected is None:
+            if name in item:
+                raise ConditionFailedError(f"{name} already set")
+        elif item.get(name) != expected:
+            raise ConditionFailedError(f"{name} does not match")
+
+
+def _matches(
+    item: Dict[str, Any], present: Sequence[str], absent: Sequence[str]
+) -> bool:
+    return all(name in item for name in present) and not any(
+        name in item for name in absent
+    )
+
+
+def _apply_fields(item: Dict[str, Any], fields: Dict[str, Any]) -> None:
+    for name, value in fields.items():
+        if value is None:
+            item.pop(name, None)
+        else:
+            item[name] = value
+
+
+def _update_parts(
+    fields: Dict[str, Any]
+) -> Tuple[Dict[str, str], Dict[str, Any], List[str], List[str]]:
+    names: Dict[str, str] = {}
+    values: Dict[str, Any] = {}
+    sets: List[str] = []
+    removes: List[str] = []
+    for i, (name, value) in enumerate(fields.items()):
+        names[f"#f{i}"] = name
+        if value is None:
+            removes.append(f"#f{i}")
+        else:
+            values[f":f{i}"] = value
+            sets.append(f"#f{i} = :f{i}")
+    return names, values, sets, removes
+
+
+class ContextStore:
+    """Storage for email contexts keyed by ``context_id``.
+
+    Implementations must be safe to share across threads and across warm
+    invocations; callers obtain one via ``get_context_store()``.
+    """
+
+    backend = ""
+
+    def get(self, context_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def put(self, item: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def put_new(self, item: Dict[str, Any]) -> bool:
+        """Write ``item`` only if no item has its ``context_id``; ``False``
+        (and nothing written) when one exists."""
+        raise NotImplementedError
+
+    def update_fields(
+        self,
+        context_id: str,
+        fields: Dict[str, Any],
+        condition: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """Set (or, for ``None`` values, remove) attributes of an existing item.
+
+        ``condition`` maps attribute names to the value they must currently
+        hold; ``None`` means the attribute must be absent. A missing item or
+        a mismatch raises ``ConditionFailedError`` and writes nothing.
+        """
+        raise NotImplementedError
+
+    def query_pending(
+        self,
+        limit: int = 50,
+        received_before: Optional[int] = None,
+        present: Sequence[str] = (),
+        absent: Sequence[str] = (),
+    ) -> List[Dict[str, Any]]:
+        """Return unanswered contexts, oldest first, from the pending index.
+
+        Only contexts holding every attribute in ``present`` and none in
+        ``absent`` are returned, and ``limit`` counts those: the index is
+        read past any number of older contexts that do not match.
+        """
+        raise NotImplementedError
+
+    def bounded(self, timeout: float) -> "ContextStore":
+        """A view of this store whose calls give up after ``timeout``
+        seconds; local backends never block that long and return self."""
+        return self
+
+
+@lru_cache(maxsize=16)
+def _bounded_dynamodb_resource(timeout: float) -> Any:
+    import boto3
+
+    return boto3.resource("dynamodb", config=boto_config(timeout))
+
+
+class DynamoDBContextStore(ContextStore):
+    backend = "dynamodb"
+
+    def __init__(self, table_name: str, resource: Any = None) -> None:
+        if not table_name:
+            raise ValueError("DDB_TABLE_NAME not set")
+        self.table_name = table_name
+        self._resource = resource
+        self._table: Any = None
+
+    @property
+    def table(self) -> Any:
+        # Build the boto3 resource lazily and keep it for warm invocations
+        if self._table is None:
+            resource = self._resource
+            if resource is None:
+                import boto3
+
+                resource = boto3.resource("dynamodb")
+            self._table = resource.Table(self.table_name)
+        return self._table
+
+    def bounded(self, timeout: float) -> "ContextStore":
+        if self._resource is not None:
+            # Injected resources (tests, local endpoints) keep their config
+            return self
+        # One resource per timeout bucket, reused across warm invocations
+        return DynamoDBContextStore(
+            self.table_name,
+            resource=_bounded_dynamodb_resource(timeout_bucket(timeout)),
+        )
+
+    def get(self, context_id: str) -> Optional[Dict[str, Any]]:
+        resp = self.table.get_item(Key={"context_id": context_id})
+        return resp.get("Item")  # type: ignore[no-any-return]
+
+    def put(self, item: Dict[str, Any]) -> None:
+        self.table.put_item(Item=item)
+
+    def put_new(self, item: Dict[str, Any]) -> bool:
+        try:
+            self.table.put_item(
+                Item=item,
+                ConditionExpression="attribute_not_exists(context_id)",
+            )
+        except Exception as exc:
+            code = (
+                (getattr(exc, "response", None) or {})
+                .get("Error", {})
+                .get("Code", "")
+            )
+            if code == "ConditionalCheckFailedException":
+                return False
+            raise
+        return True
+
+    def update_fields(
+        self,
+        context_id: str,
+        fields: Dict[str, Any],
+        condition: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        if not fields:
+            return
+        names, values, sets, removes = _update_parts(fields)
+        conditions = ["attribute_exists(context_id)"]
+        for i, (name, expected) in enumerate((condition or {}).items()):
+            names[f"#c{i}"] = name
+            if expected is None:
+                conditions.append(f"attribute_not_exists(#c{i})")
+            else:
+                values[f":c{i}"] = expected
+                conditions.append(f"#c{i} = :c{i}")
+        expression = []
+        if sets:
+            expression.append("SET " + ", ".join(sets))
+        if removes:
+            expression.append("REMOVE " + ", ".join(removes))
+        kwargs: Dict[str, Any] = {
+            "Key": {"context_id": context_id},
+            "UpdateExpression": " ".join(expression),
+            "ConditionExpression": " AND ".join(conditions),
+            "ExpressionAttributeNames": names,
+            "ReturnValues": "NONE",
+        }
+        if values:
+            kwargs["ExpressionAttributeValues"] = values
+        try:
+            self.table.update_item(**kwargs)
+        except Exception as exc:
+            code = (
+                (getattr(exc, "response", None) or {})
+                .get("Error", {})
+                .get("Code", "")
+            )
+            if code == "ConditionalCheckFailedException":
+                raise ConditionFailedError(str(exc)) from exc
+            raise
+
+    def query_pending(
+        self,
+        limit: int = 50,
+        received_before: Optional[int] = None,
+        present: Sequence[str] = (),
+        absent: Sequence[str] = (),
+    ) -> List[Dict[str, Any]]:
+        from boto3.dynamodb.conditions import Attr, Key
+
+        condition = Key(PENDING_FLAG_ATTR).eq(STATUS_PENDING)
+        if received_before is not None:
+            condition = condition & Key("received_at").lt(received_before)
+        kwargs: Dict[str, Any] = {
+            "IndexName": PENDING_INDEX_NAME,
+            "KeyConditionExpression": condition,
+            "ScanIndexForward": True,
+            "Limit": limit,
+        }
+        filters = [Attr(name).exists() for name in present] + [
+            Attr(name).not_exists() for name in absent
+        ]
+        if filters:
+            expression = filters[0]
+            for extra in filters[1:]:
+                expression = expression & extra
+            kwargs["FilterExpression"] = expression
+        # Limit caps the items read, before the filter; page until enough
+        # match or the index is exhausted
+        items: List[Dict[str, Any]] = []
+        while len(items) < limit:
+            resp = self.table.query(**kwargs)
+            items.extend(resp.get("Items") or [])
+            last_key = resp.get("LastEvaluatedKey")
+            if not last_key:
+                break
+            kwargs["ExclusiveStartKey"] = last_key
+        return items[:limit]
+
+
+class InMemoryContextStore(ContextStore):
+    """Process-local store for tests and offline benchmarks."""
+
+    backend = "memory"
+
+    def __init__(self) -> None:
+        self._items: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, context_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(context_id)
+            return dict(item) if item is not None else None
+
+    def put(self, item: Dict[str, Any]) -> None:
+        context_id = str(item.get("context_id", ""))
+        if not context_id:
+            raise ValueError("context_id is required")
+        with self._lock:
+            self._items[context_id] = dict(item)
+
+    def put_new(self, item: Dict[str, Any]) -> bool:
+        context_id = str(item.get("context_id", ""))
+        if not context_id:
+            raise ValueError("context_id is required")
+        with self._lock:
+            if context_id in self._items:
+                return False
+            self._items[context_id] = dict(item)
+            return True
+
+    def update_fields(
+        self,
+        context_id: str,
+        fields: Dict[str, Any],
+        condition: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        with self._lock:
+            item = self._items.get(context_id)
+            _check_condition(item, condition)
+            _apply_fields(item, fields)  # type: ignore[arg-type]
+
+    def query_pending(
+        self,
+        limit: int = 50,
+        received_before: Optional[int] = None,
+        present: Sequence[str] = (),
+        absent: Sequence[str] = (),
+    ) -> List[Dict[str, Any]]:
+        with self._lock:
+            pending = [
+                dict(item)
+                for item in self._items.values()
+                if PENDING_FLAG_ATTR in item
+                and _matches(item, present, absent)
+                and (
+                    received_before is None
+                    or int(item.get("received_at", 0)) < received_before
+                )
+            ]
+        pending.sort(key=lambda item: int(item.get("received_at", 0)))
+        return pending[:limit]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+def _json_default(value: Any) -> Any:
+    # DynamoDB hands numbers back as Decimal; keep them round-trippable
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    if isinstance(value, (bytes, bytearray)):
+        return bytes(value).decode("utf-8", errors="ignore")
+    raise TypeError(f"unsupported type: {type(value).__name__}")
+
+
+class SQLiteContextStore(ContextStore):
+    """File-backed (or ``:memory:``) store with DynamoDB-like item semantics.
+
+    Items are stored as JSON documents so that the schema can follow the
+    DynamoDB table without migrations.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = ":memory:") -> None:
+        self.path = path or ":memory:"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS contexts ("
+                " context_id TEXT PRIMARY KEY,"
+                " item TEXT NOT NULL"
+                ")"
+            )
+            # Partial expression index mirrors the sparse DynamoDB GSI
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {PENDING_INDEX_NAME}"
+                " ON contexts (json_extract(item, '$.received_at'))"
+                f" WHERE json_extract(item, '$.{PENDING_FLAG_ATTR}')"
+                " IS NOT NULL"
+            )
+
+    def get(self, context_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT item FROM contexts WHERE context_id = ?",
+                (context_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])  # type: ignore[no-any-return]
+
+    def put(self, item: Dict[str, Any]) -> None:
+        context_id = str(item.get("context_id", ""))
+        if not context_id:
+            raise ValueError("context_id is required")
+        doc = json.dumps(item, ensure_ascii=False, default=_json_default)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO contexts (context_id, item)"
+                " VALUES (?, ?)",
+                (context_id, doc),
+            )
+
+    def put_new(self, item: Dict[str, Any]) -> bool:
+        context_id = str(item.get("context_id", ""))
+        if not context_id:
+            raise ValueError("context_id is required")
+        doc = json.dumps(item, ensure_ascii=False, default=_json_default)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO contexts (context_id, item)"
+                " VALUES (?, ?)",
+                (context_id, doc),
+            )
+        return cursor.rowcount == 1
+
+    def update_fields(
+        self,
+        context_id: str,
+        fields: Dict[str, Any],
+        condition: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        # Read-modify-write under the connection lock and one transaction
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT item FROM contexts WHERE context_id = ?",
+                (context_id,),
+            ).fetchone()
+            item = json.loads(row[0]) if row is not None else None
+            _check_condition(item, condition)
+            _apply_fields(item, fields)  # type: ignore[arg-type]
+            self._conn.execute(
+                "UPDATE contexts SET item = ? WHERE context_id = ?",
+                (
+                    json.dumps(item, ensure_ascii=False, default=_json_default),
+                    context_id,
+                ),
+            )
+
+    def query_pending(
+        self,
+        limit: int = 50,
+        received_before: Optional[int] = None,
+        present: Sequence[str] = (),
+        absent: Sequence[str] = (),
+    ) -> List[Dict[str, Any]]:
+        sql = (
+            "SELECT item FROM contexts"
+            f" WHERE json_extract(item, '$.{PENDING_FLAG_ATTR}') IS NOT NULL"
+        )
+        params: List[Any] = []
+        for name, test in [(n, "IS NOT NULL") for n in present] + [
+            (n, "IS NULL") for n in absent
+        ]:
+            sql += f" AND json_extract(item, ?) {test}"
+            params.append(f"$.{name}")
+        if received_before is not None:
+            sql += " AND json_extract(item, '$.received_at') < ?"
+            params.append(received_before)
+        sql += " ORDER BY json_extract(item, '$.received_at') LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def build_context_store(
+    backend: str,
+    table_name: str = "",
+    sqlite_path: str = "",
+    resource: Any = None,
+) -> ContextStore:
+    name = (backend or "dynamodb").strip().lower()
+    if name == "dynamodb":
+        return DynamoDBContextStore(table_name, resource=resource)
+    if name == "memory":
+        return InMemoryContextStore()
+    if name == "sqlite":
+        return SQLiteContextStore(sqlite_path)
+    raise ValueError(f"unknown context store backend: {backend}")
+
+
+@lru_cache(maxsize=1)
+def get_context_store() -> ContextStore:
+    """Return the process-wide store selected by ``CONTEXT_STORE_BACKEND``.
+
+    ``dynamodb`` (default) uses ``DDB_TABLE_NAME``; ``sqlite`` uses
+    ``CONTEXT_STORE_SQLITE_PATH`` (``:memory:`` when empty); ``memory``
+    keeps items in this process only.
+    """
+    return build_context_store(
+        os.getenv("CONTEXT_STORE_BACKEND", "dynamodb"),
+        table_name=os.getenv("DDB_TABLE_NAME", ""),
+        sqlite_path=os.getenv("CONTEXT_STORE_SQLITE_PATH", ""),
+    )
+
+
+def reset_context_store() -> None:
+    """Drop the cached store so the next call re-reads the environment."""
+    get_context_store.cache_clear()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import math
+import time
+from typing import Any, Callable, Optional
+
+# Slack drops interactions not acknowledged within 3 seconds; keep a margin
+# for API Gateway and the response itself
+SLACK_ACK_BUDGET_SECONDS = 2.5
+# Stop this long before the Lambda timeout so logs and the response flush
+LAMBDA_SAFETY_MARGIN_SECONDS = 0.3
+# Optional work (bookkeeping writes, progressive updates) needs at least this
+OPTIONAL_WORK_SECONDS = 0.5
+# Below this no outbound call is worth starting
+MIN_CALL_SECONDS = 0.05
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class Deadline:
+    """Point in time by which the current invocation must be done.
+
+    Created once at entry and passed down to every outbound call, which
+    caps its own timeout with ``cap`` and skips optional work when
+    ``allows`` says the budget is nearly spent.
+    """
+
+    def __init__(
+        self,
+        expires_at: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.expires_at = expires_at
+        self.clock = clock
+
+    @classmethod
+    def after(
+        cls, seconds: float, clock: Callable[[], float] = time.monotonic
+    ) -> "Deadline":
+        return cls(clock() + seconds, clock)
+
+    @classmethod
+    def never(cls) -> "Deadline":
+        return cls(math.inf)
+
+    @classmethod
+    def from_lambda_context(
+        cls,
+        context: Any,
+        budget: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> "Deadline":
+        """Deadline from ``get_remaining_time_in_millis`` minus a safety
+        margin, tightened to ``budget`` seconds when given.
+
+        Without a Lambda context (tests, local runs) only ``budget``
+        applies.
+        """
+        seconds = math.inf
+        remaining_ms = getattr(context, "get_remaining_time_in_millis", None)
+        if callable(remaining_ms):
+            try:
+                seconds = (
+                    float(remaining_ms()) / 1000.0
+                    - LAMBDA_SAFETY_MARGIN_SECONDS
+                )
+            except (TypeError, ValueError):
+                seconds = math.inf
+        if budget is not None:
+            seconds = min(seconds, budget)
+        return cls(clock() + max(seconds, 0.0), clock)
+
+    def child(self, seconds: float) -> "Deadline":
+        """A tighter deadline: ``seconds`` from now, at most this one."""
+        expires_at = min(self.expires_at, self.clock() + seconds)
+        return Deadline(expires_at, self.clock)
+
+    def remaining(self) -> float:
+        return max(self.expires_at - self.clock(), 0.0)
+
+    def expired(self) -> bool:
+        return self.remaining() <= MIN_CALL_SECONDS
+
+    def allows(self, seconds: float = OPTIONAL_WORK_SECONDS) -> bool:
+        """Whether ``seconds`` of (optional) work still fit."""
+        return self.remaining() >= seconds
+
+    def cap(self, timeout: float) -> float:
+        """``timeout`` limited to the time left; raises once it is gone."""
+        remaining = self.remaining()
+        if remaining <= MIN_CALL_SECONDS:
+            raise DeadlineExceeded("deadline exceeded")
+        return min(timeout, remaining)
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.3f}s)"
+
+
+def cap_timeout(deadline: Optional[Deadline], timeout: float) -> float:
+    return timeout if deadline is None else deadline.cap(timeout)
+
+
+def boto_config(timeout: float) -> Any:
+    """botocore ``Config`` whose connect/read timeouts and retries fit
+    ``timeout`` seconds, instead of botocore's 60s reads and 3 retries."""
+    from botocore.config import Config
+
+    return Config(
+        connect_timeout=max(min(timeout, 1.0), MIN_CALL_SECONDS),
+        read_timeout=max(timeout, MIN_CALL_SECONDS),
+        retries={
+            "total_max_attempts": 1 if timeout < 2 else 2,
+            "mode": "standard",
+        },
+    )
+
+
+# Clients are cached per bucket, not per exact timeout; a bucket never
+# exceeds the timeout asked for
+TIMEOUT_BUCKETS = (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0)
+
+
+def timeout_bucket(timeout: float) -> float:
+    fitting = [b for b in TIMEOUT_BUCKETS if b <= timeout]
+    if fitting:
+        return fitting[-1]
+    # Below the smallest bucket, steps of MIN_CALL_SECONDS keep the
+    # number of distinct clients small
+    steps = max(math.floor(timeout / MIN_CALL_SECONDS), 1)
+    return round(steps * MIN_CALL_SECONDS, 3)
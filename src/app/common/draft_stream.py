@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.pii import reidentify, reidentify_partial
+except ImportError:
+    # テスト環境用の相対インポート
+    from .pii import reidentify, reidentify_partial
+
+
+def stream_draft(
+    deltas: Iterable[str],
+    pii_map: Dict[str, str],
+    push: Callable[[str], Any],
+    min_interval: float = 1.0,
+    deadline: Optional[float] = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> str:
+    """Accumulate streamed deltas and push re-identified text as it grows.
+
+    The first delta is pushed immediately so the operator sees text at the
+    model's first-token latency; later pushes are throttled to one per
+    ``min_interval`` seconds, and a final push carries the complete text.
+    Consumption stops once ``clock()`` passes ``deadline``.
+
+    Returns the accumulated draft, still redacted.
+    """
+    parts = []
+    last_push: Optional[float] = None
+    last_text = ""
+    for delta in deltas:
+        parts.append(delta)
+        now = clock()
+        if last_push is None or now - last_push >= min_interval:
+            text = reidentify_partial("".join(parts), pii_map)
+            if text.strip() and text != last_text:
+                push(text)
+                last_text = text
+                last_push = now
+        if deadline is not None and now >= deadline:
+            break
+    draft = "".join(parts).strip()
+    final_text = reidentify(draft, pii_map)
+    if final_text and final_text != last_text:
+        push(final_text)
+    return draft
@@ -1,9 +1,41 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, Optional
+import time
+from typing import Any, Dict, List, Optional, Sequence
 
-import boto3
+try:
+    # Lambda環境用の絶対インポート
+    from common.context_record import ContextRecord
+    from common.context_store import (
+        PENDING_FLAG_ATTR,
+        STATUS_PENDING,
+        STATUS_SENT,
+        ConditionFailedError,
+        ContextStore,
+        get_context_store,
+    )
+    from common.deadline import Deadline
+except ImportError:
+    # テスト環境用の相対インポート
+    from .context_record import ContextRecord
+    from .context_store import (
+        PENDING_FLAG_ATTR,
+        STATUS_PENDING,
+        STATUS_SENT,
+        ConditionFailedError,
+        ContextStore,
+        get_context_store,
+    )
+    from .deadline import Deadline
+
+# Upper bound for one repository call when no tighter deadline applies
+DEFAULT_TIMEOUT_SECONDS = 5.0
+# Interaction records share the table; the prefix keeps them apart from
+# contexts (whose ids are Message-IDs or S3 keys)
+INTERACTION_KEY_PREFIX = "interaction#"
+# Until this epoch the interaction is being handled; absent once it was
+INTERACTION_LEASE_ATTR = "lease_until"
 
 
 def get_table_name() -> str:
@@ -13,12 +45,167 @@ def get_table_name() -> str:
     return name
 
 
-def get_context_item(context_id: str) -> Optional[Dict[str, Any]]:
-    table = boto3.resource("dynamodb").Table(get_table_name())
-    resp = table.get_item(Key={"context_id": context_id})
-    return resp.get("Item")
+def get_ttl_attribute() -> str:
+    # Must match the TTL attribute enabled on the table (dynamodb.tf)
+    return os.getenv("DDB_TTL_ATTRIBUTE", "") or "ttl_epoch"
+
+
+def get_ttl_seconds() -> int:
+    return int(os.getenv("CONTEXT_TTL_DAYS", "30") or "30") * 24 * 60 * 60
+
+
+def stamp_lifecycle(
+    item: Dict[str, Any], now: Optional[int] = None
+) -> Dict[str, Any]:
+    """Return a copy of ``item`` with received_at, status and TTL filled in.
+
+    Values already present on the item win, so re-puts keep the original
+    arrival time and expiry.
+    """
+    now = int(time.time()) if now is None else now
+    stamped = dict(item)
+    received_at = int(stamped.setdefault("received_at", now))
+    stamped.setdefault("status", STATUS_PENDING)
+    stamped.setdefault(get_ttl_attribute(), received_at + get_ttl_seconds())
+    if stamped["status"] == STATUS_SENT:
+        stamped.pop(PENDING_FLAG_ATTR, None)
+    else:
+        stamped[PENDING_FLAG_ATTR] = STATUS_PENDING
+    return stamped
+
+
+def _store(deadline: Optional[Deadline]) -> ContextStore:
+    store = get_context_store()
+    if deadline is None:
+        return store
+    return store.bounded(deadline.cap(DEFAULT_TIMEOUT_SECONDS))
+
+
+def get_context_item(
+    context_id: str, deadline: Optional[Deadline] = None
+) -> Optional[Dict[str, Any]]:
+    return _store(deadline).get(context_id)
+
+
+def get_context_record(
+    context_id: str, deadline: Optional[Deadline] = None
+) -> Optional[ContextRecord]:
+    return ContextRecord.from_item(get_context_item(context_id, deadline))
+
+
+def put_context_item(
+    item: Dict[str, Any], deadline: Optional[Deadline] = None
+) -> None:
+    _store(deadline).put(stamp_lifecycle(item))
+
+
+def claim_interaction(
+    key: str,
+    lease_until: int,
+    expires_at: int,
+    now: int,
+    deadline: Optional[Deadline] = None,
+) -> bool:
+    """Take on a Slack interaction recorded next to the contexts.
+
+    ``False`` when it was handled already or another attempt holds an
+    unexpired lease; a lapsed lease (an attempt that crashed or timed
+    out) is taken over. The item carries no pending flag, so it stays
+    out of the pending index, and expires through the table's TTL.
+    """
+    store = _store(deadline)
+    item_id = f"{INTERACTION_KEY_PREFIX}{key}"
+    fields = {
+        get_ttl_attribute(): expires_at,
+        INTERACTION_LEASE_ATTR: lease_until,
+    }
+    if store.put_new(dict(fields, context_id=item_id)):
+        return True
+    item = store.get(item_id)
+    if item is None:
+        # Expired between the two calls
+        return store.put_new(dict(fields, context_id=item_id))
+    lease = item.get(INTERACTION_LEASE_ATTR)
+    if lease is None or int(lease) > now:
+        return False
+    try:
+        store.update_fields(
+            item_id, fields, condition={INTERACTION_LEASE_ATTR: lease}
+        )
+    except ConditionFailedError:
+        return False  # another retry took it over first
+    return True
+
+
+def complete_interaction(
+    key: str, expires_at: int, deadline: Optional[Deadline] = None
+) -> None:
+    """Mark a claimed interaction as handled: retries are duplicates."""
+    _store(deadline).update_fields(
+        f"{INTERACTION_KEY_PREFIX}{key}",
+        {get_ttl_attribute(): expires_at, INTERACTION_LEASE_ATTR: None},
+    )
+
+
+def release_interaction(
+    key: str, deadline: Optional[Deadline] = None
+) -> None:
+    """Give up a claim so the next retry runs the interaction again."""
+    _store(deadline).update_fields(
+        f"{INTERACTION_KEY_PREFIX}{key}", {INTERACTION_LEASE_ATTR: 0}
+    )
+
+
+def update_context_fields(
+    context_id: str,
+    condition: Optional[Dict[str, Any]] = None,
+    deadline: Optional[Deadline] = None,
+    **fields: Any,
+) -> None:
+    """Write only ``fields`` of an existing context (``None`` removes).
+
+    Pass ``condition`` for optimistic concurrency, e.g.
+    ``condition={"sent_at": None}`` to refuse a second send. With a
+    ``deadline`` the call gives up (``DeadlineExceeded`` or a botocore
+    timeout) instead of outliving the invocation.
+    """
+    _store(deadline).update_fields(context_id, fields, condition)
+
+
+def mark_context_status(
+    context_id: str,
+    status: str,
+    condition: Optional[Dict[str, Any]] = None,
+    deadline: Optional[Deadline] = None,
+    **fields: Any,
+) -> None:
+    """Move a context to ``status``; leaving pending drops it from the index."""
+    fields["status"] = status
+    fields[PENDING_FLAG_ATTR] = (
+        None if status == STATUS_SENT else STATUS_PENDING
+    )
+    update_context_fields(
+        context_id, condition=condition, deadline=deadline, **fields
+    )
+
 
+def list_pending_contexts(
+    limit: int = 50,
+    older_than_seconds: int = 0,
+    present: Sequence[str] = (),
+    absent: Sequence[str] = (),
+) -> List[Dict[str, Any]]:
+    """Unanswered contexts, oldest first, via the sparse pending index.
 
-def put_context_item(item: Dict[str, Any]) -> None:
-    table = boto3.resource("dynamodb").Table(get_table_name())
-    table.put_item(Item=item)
+    ``present``/``absent`` keep only contexts that hold (or lack) those
+    attributes; ``limit`` counts the contexts kept.
+    """
+    received_before = None
+    if older_than_seconds > 0:
+        received_before = int(time.time()) - older_than_seconds
+    return get_context_store().query_pending(
+        limit=limit,
+        received_before=received_before,
+        present=present,
+        absent=absent,
+    )
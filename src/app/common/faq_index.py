@@ -0,0 +1,393 @@
+"""
+Retrieval index over approved FAQ reply templates.
+
+Inquiries are matched with TF-IDF over character n-grams (2- and
+3-grams), which needs no tokenizer for Japanese and tolerates inflection
+and mixed scripts. The index is built offline from a JSON file of
+templates and memory-mapped at startup, so a cold Lambda pays only an
+``mmap`` and page faults for the postings a query touches:
+
+    cd src/app && python -m common.faq_index faq/templates.json \\
+        faq/faq_index.bin          # or: make faq-index
+
+File layout (little-endian, every section 8-byte aligned)::
+
+    header        magic, version, n-gram range, doc/feature/posting counts
+    features      uint64[F]   n-gram hashes, sorted
+    idf           float32[F]
+    post_offsets  uint32[F+1] postings of feature i: [off[i], off[i+1])
+    post_docs     uint32[P]
+    post_weights  float32[P]  L2-normalised tf-idf weight in the document
+    doc_offsets   uint32[D+1]
+    docs          UTF-8 JSON per template (id, title, answer)
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.logging import log_error
+    from common.prompt_builder import estimate_tokens
+except ImportError:
+    # テスト環境用の相対インポート
+    from .logging import log_error
+    from .prompt_builder import estimate_tokens
+
+MAGIC = b"FAQIDX\x00\x00"
+VERSION = 1
+NGRAM_RANGE = (2, 3)
+_HEADER = struct.Struct("<8sIHHIII4x")
+
+DEFAULT_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "faq",
+    "faq_index.bin",
+)
+
+# Redaction placeholders such as [PERSON_1] carry no meaning for matching
+_PLACEHOLDER = re.compile(r"\[[A-Z_]+_\d+\]")
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+@dataclass(frozen=True)
+class FaqTemplate:
+    template_id: str
+    title: str
+    answer: str
+    # Example inquiries phrased the way customers ask
+    questions: Tuple[str, ...] = field(default_factory=tuple)
+
+    def document(self) -> str:
+        return "\n".join((self.title,) + tuple(self.questions))
+
+
+@dataclass(frozen=True)
+class FaqMatch:
+    template_id: str
+    title: str
+    answer: str
+    score: float
+
+
+def normalize(text: str) -> str:
+    text = _PLACEHOLDER.sub(" ", text)
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _NON_WORD.sub(" ", text).strip()
+
+
+def char_ngrams(
+    text: str, ngram_range: Tuple[int, int] = NGRAM_RANGE
+) -> List[str]:
+    """Character n-grams within each run of word characters."""
+    grams: List[str] = []
+    low, high = ngram_range
+    for run in normalize(text).split():
+        for n in range(low, high + 1):
+            grams.extend(run[i: i + n] for i in range(len(run) - n + 1))
+        if len(run) < low:
+            grams.append(run)
+    return grams
+
+
+def feature_hash(gram: str) -> int:
+    """Stable across processes, unlike ``hash()``."""
+    digest = hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _tf(count: int) -> float:
+    return 1.0 + math.log(count)
+
+
+def load_templates(path: str) -> List[FaqTemplate]:
+    with open(path, encoding="utf-8") as f:
+        raw = json.load(f)
+    templates = [
+        FaqTemplate(
+            template_id=str(item["id"]),
+            title=str(item["title"]),
+            answer=str(item["answer"]),
+            questions=tuple(str(q) for q in item.get("questions") or ()),
+        )
+        for item in raw
+    ]
+    ids = [t.template_id for t in templates]
+    if len(set(ids)) != len(ids):
+        raise ValueError("duplicate template ids")
+    return templates
+
+
+def _pad(buf: bytearray) -> None:
+    buf.extend(b"\x00" * (-len(buf) % 8))
+
+
+def _le(values: array) -> bytes:
+    if sys.byteorder != "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def build_index(templates: Sequence[FaqTemplate]) -> bytes:
+    """Serialise an index; the output depends only on ``templates``."""
+    doc_counts = [
+        Counter(feature_hash(g) for g in char_ngrams(t.document()))
+        for t in templates
+    ]
+    df: Counter = Counter()
+    for counts in doc_counts:
+        df.update(counts.keys())
+    n_docs = len(templates)
+    features = sorted(df)
+    idf = {h: math.log((1 + n_docs) / (1 + df[h])) + 1.0 for h in features}
+
+    postings: Dict[int, List[Tuple[int, float]]] = defaultdict(list)
+    for doc, counts in enumerate(doc_counts):
+        weights = {h: _tf(c) * idf[h] for h, c in counts.items()}
+        norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+        for h in sorted(weights):
+            postings[h].append((doc, weights[h] / norm))
+
+    post_offsets = array("I", [0])
+    post_docs = array("I")
+    post_weights = array("f")
+    for h in features:
+        for doc, weight in postings[h]:
+            post_docs.append(doc)
+            post_weights.append(weight)
+        post_offsets.append(len(post_docs))
+
+    blobs = [
+        json.dumps(
+            {"id": t.template_id, "title": t.title, "answer": t.answer},
+            ensure_ascii=False,
+            sort_keys=True,
+        ).encode("utf-8")
+        for t in templates
+    ]
+    doc_offsets = array("I", [0])
+    for blob in blobs:
+        doc_offsets.append(doc_offsets[-1] + len(blob))
+
+    buf = bytearray(
+        _HEADER.pack(
+            MAGIC,
+            VERSION,
+            NGRAM_RANGE[0],
+            NGRAM_RANGE[1],
+            n_docs,
+            len(features),
+            len(post_docs),
+        )
+    )
+    for section in (
+        array("Q", features),
+        array("f", [idf[h] for h in features]),
+        post_offsets,
+        post_docs,
+        post_weights,
+        doc_offsets,
+    ):
+        buf.extend(_le(section))
+        _pad(buf)
+    buf.extend(b"".join(blobs))
+    return bytes(buf)
+
+
+def write_index(templates: Sequence[FaqTemplate], path: str) -> None:
+    data = build_index(templates)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class FaqIndex:
+    """Read-only view over a built index (``bytes`` or a mapped file)."""
+
+    def __init__(self, data: Any) -> None:
+        if sys.byteorder != "little":
+            raise ValueError("faq index requires a little-endian host")
+        view = memoryview(data)
+        (
+            magic,
+            version,
+            low,
+            high,
+            self.n_docs,
+            n_features,
+            n_postings,
+        ) = _HEADER.unpack_from(view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a faq index (or an incompatible version)")
+        self.ngram_range = (low, high)
+        pos = _HEADER.size
+
+        def section(fmt: str, count: int) -> memoryview:
+            nonlocal pos
+            size = struct.calcsize(fmt) * count
+            out = view[pos: pos + size].cast(fmt)
+            pos += size + (-size % 8)
+            return out
+
+        self._features = section("Q", n_features)
+        self._idf = section("f", n_features)
+        self._post_offsets = section("I", n_features + 1)
+        self._post_docs = section("I", n_postings)
+        self._post_weights = section("f", n_postings)
+        self._doc_offsets = section("I", self.n_docs + 1)
+        self._docs = view[pos:]
+        # Keeps the mapping (and its file) alive with the views
+        self._data = data
+
+    @classmethod
+    def open(cls, path: str) -> "FaqIndex":
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped)
+
+    def _find(self, h: int) -> int:
+        i = bisect_left(self._features, h)  # type: ignore[arg-type]
+        if i < len(self._features) and self._features[i] == h:
+            return i
+        return -1
+
+    def _doc(self, doc: int) -> Dict[str, str]:
+        start, end = self._doc_offsets[doc], self._doc_offsets[doc + 1]
+        return json.loads(bytes(self._docs[start:end]).decode("utf-8"))
+
+    def search(self, text: str, limit: int = 3) -> List[FaqMatch]:
+        """Best templates by cosine similarity, highest first.
+
+        Only n-grams present in the index count towards the query's norm,
+        so greetings and signatures that no template uses do not dilute
+        the score of an otherwise matching inquiry.
+        """
+        counts = Counter(
+            feature_hash(g) for g in char_ngrams(text, self.ngram_range)
+        )
+        scores: Dict[int, float] = defaultdict(float)
+        query_norm = 0.0
+        for h, count in counts.items():
+            i = self._find(h)
+            if i < 0:
+                continue
+            weight = _tf(count) * self._idf[i]
+            query_norm += weight * weight
+            for p in range(self._post_offsets[i], self._post_offsets[i + 1]):
+                scores[self._post_docs[p]] += weight * self._post_weights[p]
+        if not scores:
+            return []
+        query_norm = math.sqrt(query_norm)
+        ranked = sorted(scores.items(), key=lambda item: -item[1])[:limit]
+        matches = []
+        for doc, score in ranked:
+            meta = self._doc(doc)
+            matches.append(
+                FaqMatch(
+                    template_id=meta["id"],
+                    title=meta["title"],
+                    answer=meta["answer"],
+                    score=min(score / query_norm, 1.0),
+                )
+            )
+        return matches
+
+
+@lru_cache(maxsize=4)
+def get_faq_index(path: str = "") -> Optional[FaqIndex]:
+    """Index at ``path`` / ``FAQ_INDEX_PATH``, mapped once per process.
+
+    A missing or unreadable file disables template matching.
+    """
+    path = path or os.getenv("FAQ_INDEX_PATH", "") or DEFAULT_INDEX_PATH
+    try:
+        return FaqIndex.open(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as exc:
+        log_error("faq index unavailable", path=path, error=str(exc))
+        return None
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def find_faq_template(
+    redacted_body: str,
+    threshold: Optional[float] = None,
+    margin: Optional[float] = None,
+    index: Optional[FaqIndex] = None,
+) -> Optional[FaqMatch]:
+    """Template good enough to send as the draft, or ``None``.
+
+    The best match must reach ``FAQ_MATCH_THRESHOLD`` (default 0.3) and
+    beat the runner-up by ``FAQ_MATCH_MARGIN`` times (default 1.5); an
+    inquiry close to two templates is ambiguous and left to the model.
+    Inquiries estimated above ``FAQ_MAX_BODY_TOKENS`` (default 400) are
+    never answered from a template, since long mails rarely ask just one
+    stock question.
+    """
+    if not redacted_body:
+        return None
+    if estimate_tokens(redacted_body) > _env_float("FAQ_MAX_BODY_TOKENS", 400):
+        return None
+    index = index or get_faq_index()
+    if index is None:
+        return None
+    if threshold is None:
+        threshold = _env_float("FAQ_MATCH_THRESHOLD", 0.3)
+    if margin is None:
+        margin = _env_float("FAQ_MATCH_MARGIN", 1.5)
+    matches = index.search(redacted_body, limit=2)
+    if not matches or matches[0].score < threshold:
+        return None
+    if len(matches) > 1 and matches[0].score < margin * matches[1].score:
+        return None
+    return matches[0]
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Build the FAQ template index from a JSON file"
+    )
+    parser.add_argument("templates", help="JSON list of templates")
+    parser.add_argument("output", help="index file to write")
+    parser.add_argument(
+        "--query", action="append", default=[],
+        help="print the best matches for a sample inquiry after building",
+    )
+    args = parser.parse_args(list(argv) if argv is not None else None)
+
+    templates = load_templates(args.templates)
+    write_index(templates, args.output)
+    print(f"wrote {args.output}: {len(templates)} templates")
+    index = FaqIndex.open(args.output)
+    for query in args.query:
+        for match in index.search(query):
+            print(f"{match.score:.3f} {match.template_id} {query}")
+
+
+if __name__ == "__main__":
+    main()
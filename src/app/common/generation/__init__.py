@@ -0,0 +1,30 @@
+from .aio import AsyncKeepAlivePool, AsyncTransport
+from .cache import DraftCache, MemoryCache, cache_key
+from .engine import (
+    GenerationEngine,
+    GenerationResult,
+    build_cache,
+    generate_reply_draft,
+    get_engine,
+    stream_reply_draft,
+)
+from .metrics import GenerationMetrics, LogMetrics, MultiMetrics
+from .transport import SyncTransport
+
+__all__ = [
+    "AsyncKeepAlivePool",
+    "AsyncTransport",
+    "DraftCache",
+    "MemoryCache",
+    "cache_key",
+    "GenerationEngine",
+    "GenerationResult",
+    "build_cache",
+    "generate_reply_draft",
+    "get_engine",
+    "stream_reply_draft",
+    "GenerationMetrics",
+    "LogMetrics",
+    "MultiMetrics",
+    "SyncTransport",
+]
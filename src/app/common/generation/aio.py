@@ -0,0 +1,391 @@
+from __future__ import annotations
+
+import asyncio
+import http.client
+import json
+import socket
+import ssl
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.http_pool import HTTPResponse, can_resend
+    from common.openai_client import (
+        CHAT_COMPLETIONS_PATH,
+        OpenAIHTTPError,
+        get_base_url,
+        get_retry_policy,
+        parse_sse_line,
+    )
+    from common.retry import RetryPolicy, async_call_with_retry
+    from common.generation.transport import ApiKey, resolve_key
+except ImportError:
+    # テスト環境用の相対インポート
+    from ..http_pool import HTTPResponse, can_resend
+    from ..openai_client import (
+        CHAT_COMPLETIONS_PATH,
+        OpenAIHTTPError,
+        get_base_url,
+        get_retry_policy,
+        parse_sse_line,
+    )
+    from ..retry import RetryPolicy, async_call_with_retry
+    from .transport import ApiKey, resolve_key
+
+_Conn = Tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+_EMPTY = object()
+
+
+class AsyncStreamingResponse:
+    """Body read incrementally; each read waits at most ``read_timeout``.
+
+    As with the blocking pool, the connection is reused only when the body
+    has been read to the end.
+    """
+
+    def __init__(
+        self,
+        pool: "AsyncKeepAlivePool",
+        conn: _Conn,
+        status: int,
+        headers: Dict[str, str],
+        read_timeout: float,
+    ) -> None:
+        self._pool = pool
+        self._conn: Optional[_Conn] = conn
+        self.status = status
+        self.headers = headers
+        self.read_timeout = read_timeout
+
+    async def _pieces(self) -> AsyncIterator[bytes]:
+        reader = self._conn[0] if self._conn is not None else None
+        if reader is None:
+            return
+        if self.headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size_line = await reader.readline()
+                size = int(size_line.split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    # Trailers end with a blank line
+                    while (await reader.readline()).strip():
+                        pass
+                    return
+                data = await reader.readexactly(size)
+                await reader.readexactly(2)
+                yield data
+        elif "content-length" in self.headers:
+            left = int(self.headers["content-length"])
+            while left > 0:
+                data = await reader.read(min(left, 65536))
+                if not data:
+                    raise asyncio.IncompleteReadError(b"", left)
+                left -= len(data)
+                yield data
+        else:
+            self.headers["connection"] = "close"
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    return
+                yield data
+
+    async def _timed_pieces(self) -> AsyncIterator[bytes]:
+        pieces = self._pieces()
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(
+                        pieces.__anext__(), self.read_timeout
+                    )
+                except StopAsyncIteration:
+                    break
+                yield data
+        except (Exception, asyncio.CancelledError):
+            self.close()
+            raise
+        self._finish()
+
+    async def iter_lines(self) -> AsyncIterator[bytes]:
+        buffer = b""
+        async for data in self._timed_pieces():
+            buffer += data
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                yield line.rstrip(b"\r")
+        if buffer:
+            yield buffer.rstrip(b"\r")
+
+    async def read(self) -> bytes:
+        chunks: List[bytes] = []
+        async for data in self._timed_pieces():
+            chunks.append(data)
+        return b"".join(chunks)
+
+    def _finish(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if self.headers.get("connection", "").lower() == "close":
+            conn[1].close()
+        else:
+            self._pool._release(conn)
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn[1].close()
+
+
+class AsyncKeepAlivePool:
+    """asyncio counterpart of ``common.http_pool.KeepAlivePool``.
+
+    Connections belong to the event loop that opened them, so create one
+    pool per loop (``AsyncTransport`` does) and ``close`` it with the loop.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_idle: int = 8,
+        connect_timeout: float = 2.0,
+    ) -> None:
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"unsupported base url: {base_url}")
+        self.base_url = base_url.rstrip("/")
+        self._https = parts.scheme == "https"
+        self._host = parts.hostname
+        self._port = parts.port or (443 if self._https else 80)
+        self._prefix = parts.path.rstrip("/")
+        self.max_idle = max_idle
+        self.connect_timeout = connect_timeout
+        self._idle: List[_Conn] = []
+        # Counters for benchmarks and logs
+        self.connections_opened = 0
+
+    async def _new_connection(self, timeout: Optional[float] = None) -> _Conn:
+        # A tighter per-call timeout also bounds connection setup
+        connect_timeout = self.connect_timeout
+        if timeout is not None:
+            connect_timeout = min(connect_timeout, timeout)
+        conn = await asyncio.wait_for(
+            asyncio.open_connection(
+                self._host,
+                self._port,
+                ssl=ssl.create_default_context() if self._https else None,
+            ),
+            connect_timeout,
+        )
+        sock = conn[1].get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections_opened += 1
+        return conn
+
+    async def _acquire(
+        self, timeout: Optional[float] = None
+    ) -> Tuple[_Conn, bool]:
+        while self._idle:
+            conn = self._idle.pop()
+            if not conn[0].at_eof() and not conn[1].is_closing():
+                return conn, True
+            conn[1].close()
+        return await self._new_connection(timeout), False
+
+    def _release(self, conn: _Conn) -> None:
+        if len(self._idle) < self.max_idle and not conn[1].is_closing():
+            self._idle.append(conn)
+            return
+        conn[1].close()
+
+    def _head(
+        self, method: str, path: str, body: bytes, headers: Dict[str, str]
+    ) -> bytes:
+        host = self._host
+        if self._port not in (80, 443):
+            host = f"{host}:{self._port}"
+        lines = [
+            f"{method} {self._prefix}{path} HTTP/1.1",
+            f"Host: {host}",
+            f"Content-Length: {len(body)}",
+        ]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def stream(
+        self,
+        method: str,
+        path: str,
+        body: bytes = b"",
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 30.0,
+    ) -> AsyncStreamingResponse:
+        """Send a request and return once the status line has arrived."""
+        head = self._head(method, path, body, headers or {})
+        for attempt in range(2):
+            conn, reused = await self._acquire(timeout)
+            reader, writer = conn
+            written = False
+            try:
+                writer.write(head + body)
+                await writer.drain()
+                written = True
+                status_line = await asyncio.wait_for(
+                    reader.readline(), timeout
+                )
+                if not status_line:
+                    raise http.client.RemoteDisconnected(
+                        "connection closed by peer"
+                    )
+                status = int(status_line.split()[1])
+                response_headers: Dict[str, str] = {}
+                while True:
+                    line = await asyncio.wait_for(reader.readline(), timeout)
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    response_headers[name.strip().lower()] = value.strip()
+            except (OSError, asyncio.IncompleteReadError) as exc:
+                writer.close()
+                # An idle keep-alive socket may have been closed by the peer;
+                # retry once on a fresh connection when nothing was processed
+                if (
+                    reused
+                    and attempt == 0
+                    and can_resend(method, exc, written)
+                ):
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            return AsyncStreamingResponse(
+                self, conn, status, response_headers, timeout
+            )
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    async def request(
+        self,
+        method: str,
+        path: str,
+        body: bytes = b"",
+        headers: Optional[Dict[str, str]] = None,
+        timeout: float = 30.0,
+    ) -> HTTPResponse:
+        resp = await self.stream(method, path, body, headers, timeout)
+        data = await resp.read()
+        return HTTPResponse(resp.status, resp.headers, data)
+
+    def close(self) -> None:
+        idle, self._idle = self._idle, []
+        for _, writer in idle:
+            writer.close()
+
+
+class AsyncTransport:
+    """Chat completions on an asyncio event loop.
+
+    Same wire protocol, retry policy and Retry-After handling as
+    ``SyncTransport``, without a thread per request; many drafts can be in
+    flight on one loop. Hedging is left to the caller (``asyncio.wait``
+    on two ``complete`` tasks) since the loop is already concurrent.
+    """
+
+    def __init__(
+        self,
+        api_key: ApiKey,
+        base_url: Optional[str] = None,
+        policy: Optional[RetryPolicy] = None,
+        pool: Optional[AsyncKeepAlivePool] = None,
+    ) -> None:
+        self.api_key = api_key
+        self.policy = policy
+        self.pool = pool or AsyncKeepAlivePool(base_url or get_base_url())
+
+    def _headers(self, streaming: bool) -> Dict[str, str]:
+        headers = {
+            "Authorization": f"Bearer {resolve_key(self.api_key)}",
+            "Content-Type": "application/json",
+        }
+        if streaming:
+            headers["Accept"] = "text/event-stream"
+        return headers
+
+    async def _post(
+        self, payload: Dict[str, Any], timeout: float
+    ) -> Dict[str, Any]:
+        resp = await self.pool.request(
+            "POST",
+            CHAT_COMPLETIONS_PATH,
+            body=json.dumps(payload).encode("utf-8"),
+            headers=self._headers(False),
+            timeout=timeout,
+        )
+        if resp.status >= 300:
+            raise OpenAIHTTPError(resp.status, resp.body, resp.headers)
+        return resp.json()  # type: ignore[no-any-return]
+
+    async def complete(
+        self, payload: Dict[str, Any], budget: float
+    ) -> Dict[str, Any]:
+        return await async_call_with_retry(
+            lambda timeout: self._post(payload, timeout),
+            time.monotonic() + budget,
+            self.policy or get_retry_policy(),
+        )
+
+    async def _deltas(
+        self, payload: Dict[str, Any], timeout: float
+    ) -> AsyncIterator[str]:
+        resp = await self.pool.stream(
+            "POST",
+            CHAT_COMPLETIONS_PATH,
+            body=json.dumps(dict(payload, stream=True)).encode("utf-8"),
+            headers=self._headers(True),
+            timeout=timeout,
+        )
+        try:
+            if resp.status >= 300:
+                raise OpenAIHTTPError(
+                    resp.status, await resp.read(), resp.headers
+                )
+            async for line in resp.iter_lines():
+                deltas = parse_sse_line(line)
+                if deltas is None:
+                    # Drain the terminating chunk so the connection is reused
+                    await resp.read()
+                    return
+                for delta in deltas:
+                    yield delta
+        finally:
+            resp.close()
+
+    async def stream(
+        self, payload: Dict[str, Any], budget: float
+    ) -> AsyncIterator[str]:
+        """Yield deltas; only opening the stream (up to the first delta)
+        is retried, as a retry after output would duplicate it."""
+
+        async def first(timeout: float) -> Tuple[Any, AsyncIterator[str]]:
+            deltas = self._deltas(payload, timeout)
+            try:
+                return await deltas.__anext__(), deltas
+            except StopAsyncIteration:
+                return _EMPTY, deltas
+
+        head, deltas = await async_call_with_retry(
+            first,
+            time.monotonic() + budget,
+            self.policy or get_retry_policy(),
+        )
+        if head is _EMPTY:
+            return
+        yield head
+        async for delta in deltas:
+            yield delta
+
+    def close(self) -> None:
+        self.pool.close()
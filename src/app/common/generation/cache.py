@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+def cache_key(payload: Dict[str, Any]) -> str:
+    """Stable key for a chat payload: model, prompt and limits."""
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class DraftCache:
+    """Interface for draft caches; the base class caches nothing.
+
+    Keys come from ``cache_key``, so only redacted text is ever hashed and
+    stored. Implementations must be thread-safe.
+    """
+
+    def get(self, key: str) -> Optional[str]:
+        return None
+
+    def set(self, key: str, text: str) -> None:
+        pass
+
+
+class MemoryCache(DraftCache):
+    """Process-local LRU with a time-to-live.
+
+    Lives as long as the warm Lambda container, which is exactly the window
+    in which an operator re-opens the same inquiry or Slack retries the
+    interaction.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 128,
+        ttl: float = 900.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._items: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires, text = item
+            if expires <= self._clock():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return text
+
+    def set(self, key: str, text: str) -> None:
+        with self._lock:
+            self._items[key] = (self._clock() + self.ttl, text)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
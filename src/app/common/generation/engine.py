@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import os
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Tuple
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.model_routing import Route, RoutingPolicy, choose_route
+    from common.openai_client import (
+        _get_api_key,
+        build_route_payload,
+        extract_message_content,
+    )
+    from common.generation.aio import AsyncTransport
+    from common.generation.cache import DraftCache, MemoryCache, cache_key
+    from common.generation.metrics import GenerationMetrics, LogMetrics
+    from common.generation.transport import SyncTransport
+except ImportError:
+    # テスト環境用の相対インポート
+    from ..model_routing import Route, RoutingPolicy, choose_route
+    from ..openai_client import (
+        _get_api_key,
+        build_route_payload,
+        extract_message_content,
+    )
+    from .aio import AsyncTransport
+    from .cache import DraftCache, MemoryCache, cache_key
+    from .metrics import GenerationMetrics, LogMetrics
+    from .transport import SyncTransport
+
+
+@dataclass(frozen=True)
+class GenerationResult:
+    text: str
+    route: Route
+    cached: bool = False
+    # Seconds spent, cache lookups included
+    elapsed: float = 0.0
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return bool(self.text)
+
+
+class GenerationEngine:
+    """Reply-draft generation shared by the Lambda and the Cloud Run worker.
+
+    One place decides the route, builds the budgeted prompt, calls the
+    model through a transport, parses the reply and reports to the metrics
+    hooks, so a latency change here applies to every deployment.
+    ``budget`` always bounds the whole call (retries and backoff included)
+    and is further capped by the route's timeout. Failures are logged via
+    the metrics hooks and yield an empty draft, never an exception.
+    """
+
+    def __init__(
+        self,
+        transport: Optional[SyncTransport] = None,
+        async_transport: Optional[AsyncTransport] = None,
+        cache: Optional[DraftCache] = None,
+        metrics: Optional[GenerationMetrics] = None,
+        routing: Optional[RoutingPolicy] = None,
+    ) -> None:
+        self.transport = transport
+        self.async_transport = async_transport
+        self.cache = cache if cache is not None else DraftCache()
+        self.metrics = metrics if metrics is not None else LogMetrics()
+        self.routing = routing
+
+    def prepare(
+        self,
+        redacted_body: str,
+        tone: Optional[str] = None,
+        route: Optional[Route] = None,
+    ) -> Tuple[Route, Dict[str, Any]]:
+        """Route and chat payload for a draft."""
+        route = route or choose_route(redacted_body, self.routing).route
+        return route, build_route_payload(redacted_body, route, tone)
+
+    def _lookup(self, payload: Dict[str, Any]) -> Tuple[str, Optional[str]]:
+        key = cache_key(payload)
+        return key, self.cache.get(key)
+
+    def _store(self, key: str, text: str) -> None:
+        if text:
+            self.cache.set(key, text)
+
+    def generate(
+        self,
+        redacted_body: str,
+        tone: Optional[str] = None,
+        budget: float = 3,
+        route: Optional[Route] = None,
+    ) -> GenerationResult:
+        started = time.monotonic()
+        route, payload = self.prepare(redacted_body, tone, route)
+        key, hit = self._lookup(payload)
+        if hit is not None:
+            return self._succeeded(route, "complete", started, hit, True)
+        if self.transport is None:
+            raise RuntimeError("engine has no sync transport")
+        try:
+            data = self.transport.complete(payload, min(budget, route.timeout))
+            text = extract_message_content(data)
+        except Exception as exc:
+            return self._failed(route, "complete", started, exc)
+        self._store(key, text)
+        return self._succeeded(route, "complete", started, text, False)
+
+    def stream(
+        self,
+        redacted_body: str,
+        tone: Optional[str] = None,
+        budget: float = 3,
+        route: Optional[Route] = None,
+    ) -> Iterator[str]:
+        """Yield text deltas; errors end the stream early, keeping what
+        arrived. A cached draft comes back as a single delta."""
+        started = time.monotonic()
+        route, payload = self.prepare(redacted_body, tone, route)
+        key, hit = self._lookup(payload)
+        if hit is not None:
+            yield hit
+            self._succeeded(route, "stream", started, hit, True)
+            return
+        if self.transport is None:
+            raise RuntimeError("engine has no sync transport")
+        parts = []
+        try:
+            for delta in self.transport.stream(
+                payload, min(budget, route.timeout)
+            ):
+                if not parts:
+                    self.metrics.on_first_delta(
+                        route, time.monotonic() - started
+                    )
+                parts.append(delta)
+                yield delta
+        except Exception as exc:
+            self._failed(route, "stream", started, exc)
+            return
+        text = "".join(parts).strip()
+        self._store(key, text)
+        self._succeeded(route, "stream", started, text, False)
+
+    async def agenerate(
+        self,
+        redacted_body: str,
+        tone: Optional[str] = None,
+        budget: float = 3,
+        route: Optional[Route] = None,
+    ) -> GenerationResult:
+        """``generate`` on the asyncio transport."""
+        started = time.monotonic()
+        route, payload = self.prepare(redacted_body, tone, route)
+        key, hit = self._lookup(payload)
+        if hit is not None:
+            return self._succeeded(route, "complete", started, hit, True)
+        if self.async_transport is None:
+            raise RuntimeError("engine has no async transport")
+        try:
+            data = await self.async_transport.complete(
+                payload, min(budget, route.timeout)
+            )
+            text = extract_message_content(data)
+        except Exception as exc:
+            return self._failed(route, "complete", started, exc)
+        self._store(key, text)
+        return self._succeeded(route, "complete", started, text, False)
+
+    async def astream(
+        self,
+        redacted_body: str,
+        tone: Optional[str] = None,
+        budget: float = 3,
+        route: Optional[Route] = None,
+    ) -> AsyncIterator[str]:
+        """``stream`` on the asyncio transport."""
+        started = time.monotonic()
+        route, payload = self.prepare(redacted_body, tone, route)
+        key, hit = self._lookup(payload)
+        if hit is not None:
+            yield hit
+            self._succeeded(route, "stream", started, hit, True)
+            return
+        if self.async_transport is None:
+            raise RuntimeError("engine has no async transport")
+        parts = []
+        try:
+            async for delta in self.async_transport.stream(
+                payload, min(budget, route.timeout)
+            ):
+                if not parts:
+                    self.metrics.on_first_delta(
+                        route, time.monotonic() - started
+                    )
+                parts.append(delta)
+                yield delta
+        except Exception as exc:
+            self._failed(route, "stream", started, exc)
+            return
+        text = "".join(parts).strip()
+        self._store(key, text)
+        self._succeeded(route, "stream", started, text, False)
+
+    def _succeeded(
+        self, route: Route, mode: str, started: float, text: str, cached: bool
+    ) -> GenerationResult:
+        elapsed = time.monotonic() - started
+        self.metrics.on_success(route, mode, elapsed, len(text), cached)
+        return GenerationResult(text, route, cached=cached, elapsed=elapsed)
+
+    def _failed(
+        self, route: Route, mode: str, started: float, exc: BaseException
+    ) -> GenerationResult:
+        elapsed = time.monotonic() - started
+        self.metrics.on_error(route, mode, elapsed, exc)
+        return GenerationResult(
+            "", route, elapsed=elapsed, error=str(exc) or type(exc).__name__
+        )
+
+
+def build_cache() -> DraftCache:
+    """``GENERATION_CACHE_SIZE`` drafts (default 128, 0 disables) kept for
+    ``GENERATION_CACHE_TTL`` seconds (default 900)."""
+    size = int(os.getenv("GENERATION_CACHE_SIZE", "") or 128)
+    if size <= 0:
+        return DraftCache()
+    ttl = float(os.getenv("GENERATION_CACHE_TTL", "") or 900)
+    return MemoryCache(maxsize=size, ttl=ttl)
+
+
+@lru_cache(maxsize=1)
+def get_engine() -> GenerationEngine:
+    """Process-wide engine for the Lambda, reused across warm invocations.
+
+    The API key is resolved from Secrets Manager on the first call that
+    reaches the network, not at import.
+    """
+    return GenerationEngine(SyncTransport(_get_api_key), cache=build_cache())
+
+
+def generate_reply_draft(
+    redacted_body: str,
+    tone: Optional[str] = None,
+    budget: float = 3,
+    route: Optional[Route] = None,
+) -> str:
+    """
+    Generate a Japanese reply draft from redacted text.
+    Do not include PII; input is already redacted.
+
+    ``route`` defaults to the routing policy's choice; its timeout further
+    caps ``budget``.
+    """
+    if not redacted_body:
+        return ""
+    return get_engine().generate(redacted_body, tone, budget, route).text
+
+
+def stream_reply_draft(
+    redacted_body: str,
+    tone: Optional[str] = None,
+    timeout: float = 3,
+    route: Optional[Route] = None,
+) -> Iterator[str]:
+    """Streaming variant of ``generate_reply_draft`` yielding text deltas.
+
+    Opening the stream is retried within ``timeout`` seconds; errors after
+    the first delta end the stream early and whatever arrived so far is
+    kept by the caller.
+    """
+    if not redacted_body:
+        return iter(())
+    return get_engine().stream(redacted_body, tone, timeout, route)
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from typing import List
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.logging import log_error, log_info
+    from common.model_routing import Route
+except ImportError:
+    # テスト環境用の相対インポート
+    from ..logging import log_error, log_info
+    from ..model_routing import Route
+
+
+class GenerationMetrics:
+    """Hooks called by the engine; the base class records nothing.
+
+    ``mode`` is ``"complete"`` or ``"stream"``; times are in seconds.
+    """
+
+    def on_first_delta(self, route: Route, elapsed: float) -> None:
+        pass
+
+    def on_success(
+        self, route: Route, mode: str, elapsed: float, chars: int, cached: bool
+    ) -> None:
+        pass
+
+    def on_error(
+        self, route: Route, mode: str, elapsed: float, error: BaseException
+    ) -> None:
+        pass
+
+
+class LogMetrics(GenerationMetrics):
+    """Structured log lines, picked up by the CloudWatch / Cloud Logging
+    metric filters."""
+
+    def on_first_delta(self, route: Route, elapsed: float) -> None:
+        log_info(
+            "generation first delta",
+            route=route.name,
+            model=route.model,
+            ttft_ms=round(elapsed * 1000),
+        )
+
+    def on_success(
+        self, route: Route, mode: str, elapsed: float, chars: int, cached: bool
+    ) -> None:
+        log_info(
+            "generation completed",
+            route=route.name,
+            model=route.model,
+            mode=mode,
+            elapsed_ms=round(elapsed * 1000),
+            chars=chars,
+            cached=cached,
+        )
+
+    def on_error(
+        self, route: Route, mode: str, elapsed: float, error: BaseException
+    ) -> None:
+        log_error(
+            "openai generation failed",
+            route=route.name,
+            model=route.model,
+            mode=mode,
+            elapsed_ms=round(elapsed * 1000),
+            error=str(error) or type(error).__name__,
+        )
+
+
+class MultiMetrics(GenerationMetrics):
+    """Fan each hook out to several recorders."""
+
+    def __init__(self, *recorders: GenerationMetrics) -> None:
+        self.recorders: List[GenerationMetrics] = list(recorders)
+
+    def on_first_delta(self, route: Route, elapsed: float) -> None:
+        for recorder in self.recorders:
+            recorder.on_first_delta(route, elapsed)
+
+    def on_success(
+        self, route: Route, mode: str, elapsed: float, chars: int, cached: bool
+    ) -> None:
+        for recorder in self.recorders:
+            recorder.on_success(route, mode, elapsed, chars, cached)
+
+    def on_error(
+        self, route: Route, mode: str, elapsed: float, error: BaseException
+    ) -> None:
+        for recorder in self.recorders:
+            recorder.on_error(route, mode, elapsed, error)
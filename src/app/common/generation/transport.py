@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Iterator, Optional, Union
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.openai_client import (
+        complete_with_retry,
+        stream_completion_with_retry,
+    )
+    from common.retry import RetryPolicy
+except ImportError:
+    # テスト環境用の相対インポート
+    from ..openai_client import (
+        complete_with_retry,
+        stream_completion_with_retry,
+    )
+    from ..retry import RetryPolicy
+
+ApiKey = Union[str, Callable[[], str]]
+
+
+def resolve_key(api_key: ApiKey) -> str:
+    """Keys may be given lazily so Secrets Manager is read on first use."""
+    return api_key() if callable(api_key) else api_key
+
+
+class SyncTransport:
+    """Blocking chat completions over the process-wide keep-alive pool.
+
+    Retries, Retry-After handling and hedging are those of
+    ``common.openai_client``; ``budget`` bounds each call end to end.
+    """
+
+    def __init__(
+        self,
+        api_key: ApiKey,
+        base_url: Optional[str] = None,
+        policy: Optional[RetryPolicy] = None,
+        hedge: Optional[bool] = None,
+    ) -> None:
+        self.api_key = api_key
+        self.base_url = base_url or None
+        self.policy = policy
+        self.hedge = hedge
+
+    def complete(
+        self, payload: Dict[str, Any], budget: float
+    ) -> Dict[str, Any]:
+        return complete_with_retry(
+            payload,
+            resolve_key(self.api_key),
+            budget,
+            base_url=self.base_url,
+            policy=self.policy,
+            hedge=self.hedge,
+        )
+
+    def stream(self, payload: Dict[str, Any], budget: float) -> Iterator[str]:
+        return stream_completion_with_retry(
+            payload,
+            resolve_key(self.api_key),
+            budget,
+            base_url=self.base_url,
+            policy=self.policy,
+        )
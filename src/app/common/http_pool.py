@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import http.client
+import json
+import socket
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlsplit
+
+# Safe to send twice: the peer may already have acted on the first one
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+
+def can_resend(method: str, exc: BaseException, written: bool) -> bool:
+    """Whether a request that failed on a reused connection may be sent
+    again on a fresh one.
+
+    Failing to write the request, or the peer closing the connection
+    before any response bytes (a keep-alive socket it had already
+    dropped), means nothing was processed. Any other failure may come
+    after the peer acted on the request, so only idempotent methods are
+    re-sent; a POST to chat.postMessage or chat completions is not.
+    Timeouts are never re-sent.
+    """
+    if isinstance(exc, TimeoutError):
+        return False
+    if not written or isinstance(exc, http.client.RemoteDisconnected):
+        return True
+    return method.upper() in IDEMPOTENT_METHODS
+
+
+class HTTPResponse:
+    __slots__ = ("status", "headers", "body")
+
+    def __init__(self, status: int, headers: Dict[str, str], body: bytes):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Any:
+        return json.loads(self.body.decode("utf-8", errors="ignore"))
+
+
+class StreamingResponse:
+    """Response whose body is consumed incrementally.
+
+    The connection goes back to the pool only once the body has been read
+    to the end; closing early discards it.
+    """
+
+    def __init__(
+        self,
+        pool: "KeepAlivePool",
+        conn: http.client.HTTPConnection,
+        resp: http.client.HTTPResponse,
+    ) -> None:
+        self._pool = pool
+        self._conn: Optional[http.client.HTTPConnection] = conn
+        self._resp = resp
+        self.status = resp.status
+        self.headers = {k.lower(): v for k, v in resp.getheaders()}
+
+    def iter_lines(self) -> Iterator[bytes]:
+        try:
+            while True:
+                line = self._resp.readline()
+                if not line:
+                    break
+                yield line.rstrip(b"\r\n")
+        except Exception:
+            self.close()
+            raise
+        self._finish()
+
+    def read(self) -> bytes:
+        try:
+            data = self._resp.read()
+        except Exception:
+            self.close()
+            raise
+        self._finish()
+        return data
+
+    def _finish(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is None:
+            return
+        if self._resp.will_close:
+            conn.close()
+        else:
+            self._pool._release(conn)
+
+    def close(self) -> None:
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    def __enter__(self) -> "StreamingResponse":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class KeepAlivePool:
+    """Small pool of persistent HTTP/1.1 connections to one origin.
+
+    Connections are kept open between calls (and across warm Lambda
+    invocations when the pool is module-level), so only the first request
+    pays DNS, TCP and TLS setup. ``connect_timeout`` bounds connection
+    setup; ``read_timeout`` (or the per-call ``timeout``) bounds each
+    socket read, and a shorter per-call ``timeout`` caps setup as well.
+    With ``max_idle_age`` set, connections idle for longer are closed
+    instead of reused, since the peer has likely dropped them and a
+    failed write costs more than a fresh connection.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        max_idle: int = 4,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 30.0,
+        max_idle_age: Optional[float] = None,
+    ) -> None:
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"unsupported base url: {base_url}")
+        self.base_url = base_url.rstrip("/")
+        self._https = parts.scheme == "https"
+        self._host = parts.hostname
+        self._port = parts.port
+        self._prefix = parts.path.rstrip("/")
+        self.max_idle = max_idle
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_idle_age = max_idle_age
+        self._idle: List[http.client.HTTPConnection] = []
+        self._idle_since: Dict[http.client.HTTPConnection, float] = {}
+        self._warming = False
+        self._lock = threading.Lock()
+        # Counters for benchmarks and logs
+        self.connections_opened = 0
+
+    def _new_connection(
+        self, timeout: Optional[float] = None
+    ) -> http.client.HTTPConnection:
+        cls = (
+            http.client.HTTPSConnection
+            if self._https
+            else http.client.HTTPConnection
+        )
+        # A tighter per-call timeout also bounds connection setup
+        connect_timeout = self.connect_timeout
+        if timeout is not None:
+            connect_timeout = min(connect_timeout, timeout)
+        conn = cls(self._host, self._port, timeout=connect_timeout)
+        conn.connect()
+        # http.client writes headers and body separately; without NODELAY a
+        # reused connection stalls on Nagle + delayed ACK (~40ms per call).
+        conn.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections_opened += 1
+        return conn
+
+    def _acquire(
+        self, timeout: Optional[float] = None
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        stale: List[http.client.HTTPConnection] = []
+        found: Optional[http.client.HTTPConnection] = None
+        with self._lock:
+            while self._idle:
+                conn = self._idle.pop()
+                since = self._idle_since.pop(conn, None)
+                if (
+                    self.max_idle_age is not None
+                    and since is not None
+                    and time.monotonic() - since > self.max_idle_age
+                ):
+                    stale.append(conn)
+                    continue
+                found = conn
+                break
+        for conn in stale:
+            conn.close()
+        if found is not None:
+            return found, True
+        return self._new_connection(timeout), False
+
+    def _release(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                self._idle_since[conn] = time.monotonic()
+                return
+        conn.close()
+
+    def prewarm(self) -> Optional[threading.Thread]:
+        """Open a connection in the background unless one is idle.
+
+        Lets a latency-critical request skip DNS, TCP and TLS setup when
+        the caller has other work (secret or database lookups) to overlap
+        with the handshake. Returns the thread, or ``None`` if nothing
+        needed doing.
+        """
+        with self._lock:
+            if self._warming:
+                return None
+            fresh = [
+                conn
+                for conn in self._idle
+                if self.max_idle_age is None
+                or time.monotonic() - self._idle_since.get(conn, 0.0)
+                <= self.max_idle_age
+            ]
+            if fresh:
+                return None
+            self._warming = True
+
+        def run() -> None:
+            try:
+                self._release(self._new_connection())
+            except OSError:
+                pass
+            finally:
+                self._warming = False
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+    def _send(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes],
+        headers: Optional[Dict[str, str]],
+        timeout: Optional[float],
+    ) -> tuple[http.client.HTTPConnection, http.client.HTTPResponse]:
+        read_timeout = self.read_timeout if timeout is None else timeout
+        for attempt in range(2):
+            conn, reused = self._acquire(timeout)
+            written = False
+            try:
+                if conn.sock is not None:
+                    conn.sock.settimeout(read_timeout)
+                conn.request(
+                    method,
+                    self._prefix + path,
+                    body=body,
+                    headers=headers or {},
+                )
+                written = True
+                return conn, conn.getresponse()
+            except (http.client.HTTPException, OSError) as exc:
+                conn.close()
+                # An idle keep-alive socket may have been closed by the peer;
+                # retry once on a fresh connection when nothing was processed
+                if (
+                    reused
+                    and attempt == 0
+                    and can_resend(method, exc, written)
+                ):
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> HTTPResponse:
+        stream = self.stream(method, path, body, headers, timeout)
+        data = stream.read()
+        return HTTPResponse(stream.status, stream.headers, data)
+
+    def stream(
+        self,
+        method: str,
+        path: str,
+        body: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+    ) -> StreamingResponse:
+        """Send a request and return once the status line has arrived."""
+        conn, resp = self._send(method, path, body, headers, timeout)
+        return StreamingResponse(self, conn, resp)
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._idle_since.clear()
+        for conn in idle:
+            conn.close()
+
+
+@lru_cache(maxsize=8)
+def get_pool(
+    base_url: str,
+    connect_timeout: float = 2.0,
+    read_timeout: float = 30.0,
+    max_idle_age: Optional[float] = None,
+) -> KeepAlivePool:
+    """Process-wide pool per origin, reused across warm invocations."""
+    return KeepAlivePool(
+        base_url,
+        connect_timeout=connect_timeout,
+        read_timeout=read_timeout,
+        max_idle_age=max_idle_age,
+    )
@@ -0,0 +1,197 @@
+"""
+Idempotent handling of Slack interaction retries.
+
+Slack resends an interaction it believes timed out, marking the request
+with ``X-Slack-Retry-Num`` and ``X-Slack-Retry-Reason``. Running it again
+would start a second generation job or send the reply twice, and the
+extra work slows the original down further. Every interaction is claimed
+under a key derived from the payload, first with a short lease and then,
+once handled, for the full TTL. A retry is acknowledged at once without
+side effects while the original holds its lease or after it finished;
+a retry that finds the lease lapsed (the original crashed or timed out)
+takes the interaction over. The key names one user interaction, so a
+second delivery of it is a duplicate whether or not Slack marked it as a
+retry.
+
+The ledger is per process. A Lambda container serves one request at a
+time, so its retries land elsewhere; ``InteractionRecords`` lets the
+caller add shared records (conditional writes) that other processes
+consult.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.logging import log_error
+except ImportError:
+    # テスト環境用の相対インポート
+    from .logging import log_error
+
+# Slack gives up after three retries within a few minutes
+INTERACTION_TTL_SECONDS = 15 * 60
+# Longer than any attempt runs, shorter than Slack's one-minute retry
+INTERACTION_LEASE_SECONDS = 30
+MAX_TRACKED_INTERACTIONS = 4096
+
+
+class InteractionRecords:
+    """Interaction claims shared between processes."""
+
+    def claim(
+        self, key: str, lease_until: int, expires_at: int, now: int
+    ) -> bool:
+        """Claim ``key`` until ``lease_until``; ``False`` when it was
+        handled or another unexpired claim holds it."""
+        raise NotImplementedError
+
+    def complete(self, key: str, expires_at: int) -> None:
+        raise NotImplementedError
+
+    def release(self, key: str) -> None:
+        raise NotImplementedError
+
+
+def interaction_key(payload: Dict[str, Any]) -> str:
+    """Stable key of one user interaction; "" when there is none."""
+    kind = payload.get("type")
+    if kind == "block_actions":
+        trigger_id = payload.get("trigger_id") or ""
+        actions = payload.get("actions") or [{}]
+        action_id = (actions[0] or {}).get("action_id") or ""
+        return f"block_actions:{trigger_id}:{action_id}" if trigger_id else ""
+    if kind == "view_submission":
+        view_id = (payload.get("view") or {}).get("id") or ""
+        return f"view_submission:{view_id}" if view_id else ""
+    return ""
+
+
+def slack_retry(headers: Mapping[str, str]) -> Tuple[int, str]:
+    """(retry number, reason) from the request headers; 0 for a first
+    attempt. ``headers`` must be lower-cased or case-insensitive."""
+    raw = headers.get("x-slack-retry-num") or ""
+    try:
+        number = max(int(raw), 0)
+    except ValueError:
+        number = 0
+    return number, headers.get("x-slack-retry-reason") or ""
+
+
+class InteractionLedger:
+    """Interactions taken on recently, oldest first. Thread-safe."""
+
+    def __init__(
+        self,
+        ttl: float = INTERACTION_TTL_SECONDS,
+        lease: float = INTERACTION_LEASE_SECONDS,
+        max_entries: int = MAX_TRACKED_INTERACTIONS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.ttl = ttl
+        self.lease = lease
+        self.max_entries = max_entries
+        self._clock = clock
+        # key -> (expires_at, lease_until); lease_until is 0 once handled
+        self._entries: "OrderedDict[str, Tuple[float, float]]" = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def claim(self, key: str) -> bool:
+        """Claim ``key`` here; ``False`` when it was handled or an
+        unexpired claim holds it."""
+        now = self._clock()
+        with self._lock:
+            while self._entries and (
+                len(self._entries) >= self.max_entries
+                or next(iter(self._entries.values()))[0] <= now
+            ):
+                self._entries.popitem(last=False)
+            entry = self._entries.get(key)
+            if entry is not None and (entry[1] == 0 or entry[1] > now):
+                return False
+            self._entries[key] = (now + self.ttl, now + self.lease)
+            return True
+
+    def is_duplicate(
+        self, key: str, records: Optional[InteractionRecords] = None
+    ) -> bool:
+        """Claim the interaction; ``True`` when it is being or was handled
+        here or, through ``records``, elsewhere.
+
+        With ``records`` the shared claim decides: when another process
+        holds it, the local claim is dropped and the request is a
+        duplicate. A failing ``records`` is logged and the request runs
+        as new without either claim.
+        """
+        if not key:
+            return False
+        if not self.claim(key):
+            return True
+        if records is None:
+            return False
+        now = int(self._clock())
+        try:
+            claimed = records.claim(
+                key,
+                lease_until=now + int(self.lease),
+                expires_at=now + int(self.ttl),
+                now=now,
+            )
+        except Exception as exc:
+            log_error("interaction record failed", key=key, error=str(exc))
+            self._forget(key)
+            return False
+        if not claimed:
+            self._forget(key)
+            return True
+        return False
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def done(
+        self, key: str, records: Optional[InteractionRecords] = None
+    ) -> None:
+        """The interaction was handled: retries are now duplicates."""
+        if not key:
+            return
+        expires_at = self._clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (expires_at, 0)
+        if records is None:
+            return
+        try:
+            records.complete(key, int(expires_at))
+        except Exception as exc:
+            log_error("interaction record failed", key=key, error=str(exc))
+
+    def release(
+        self, key: str, records: Optional[InteractionRecords] = None
+    ) -> None:
+        """Handling failed: let the next retry run it again."""
+        if not key:
+            return
+        self._forget(key)
+        if records is None:
+            return
+        try:
+            records.release(key)
+        except Exception as exc:
+            log_error("interaction record failed", key=key, error=str(exc))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+@lru_cache(maxsize=1)
+def get_interaction_ledger() -> InteractionLedger:
+    """Process-wide ledger, kept across warm invocations."""
+    return InteractionLedger()
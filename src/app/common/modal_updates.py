@@ -0,0 +1,205 @@
+"""
+Deduplicated, conflict-checked ``views.update`` calls.
+
+Streaming and retries push the same modal many times, often with text
+that has not changed since the last push. ``ModalUpdater`` remembers what
+it last sent to each ``external_id`` and skips identical updates. It also
+passes the ``hash`` Slack returned for the view, so an update based on a
+stale copy fails with ``hash_conflict`` instead of overwriting newer
+content. After a conflict it stops updating that modal.
+
+A modal opened by another process (the Cloud Run Job updates what the
+Lambda or the service opened) starts from the hash passed along with
+the job; see ``ModalUpdater.adopt``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.logging import log_info
+except ImportError:
+    # テスト環境用の相対インポート
+    from .logging import log_info
+
+MAX_TRACKED_MODALS = 256
+
+
+def view_digest(view: Dict[str, Any]) -> str:
+    """Digest of what the modal shows. ``external_id`` names the modal
+    and is only sent with ``views.open``, so it is left out."""
+    content = {k: v for k, v in view.items() if k != "external_id"}
+    raw = json.dumps(content, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _view_hash(response: Any) -> Optional[str]:
+    view = response.get("view") if isinstance(response, dict) else None
+    value = view.get("hash") if isinstance(view, dict) else None
+    return value if isinstance(value, str) else None
+
+
+def _is_conflict(exc: BaseException) -> bool:
+    return getattr(exc, "error", "") == "hash_conflict"
+
+
+@dataclass
+class _ModalState:
+    digest: str = ""
+    hash: Optional[str] = None
+    conflicted: bool = False
+
+
+class ModalUpdater:
+    """Last content and Slack ``hash`` per modal, in this process.
+
+    Clients are passed per call, so one updater serves every token and
+    both the blocking and asyncio clients. Thread-safe.
+    """
+
+    def __init__(self, max_entries: int = MAX_TRACKED_MODALS) -> None:
+        self.max_entries = max_entries
+        self._modals: "OrderedDict[str, _ModalState]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Counters for logs and tests
+        self.sent = 0
+        self.skipped = 0
+        self.conflicts = 0
+
+    def _state(self, external_id: str) -> _ModalState:
+        state = self._modals.get(external_id)
+        if state is None:
+            state = _ModalState()
+            self._modals[external_id] = state
+            while len(self._modals) > self.max_entries:
+                self._modals.popitem(last=False)
+        self._modals.move_to_end(external_id)
+        return state
+
+    def opened(
+        self,
+        external_id: Optional[str],
+        view: Dict[str, Any],
+        response: Any,
+    ) -> None:
+        """Record a modal just opened with ``views.open``."""
+        if not external_id:
+            return
+        with self._lock:
+            state = self._state(external_id)
+            state.digest = view_digest(view)
+            state.hash = _view_hash(response)
+            state.conflicted = False
+
+    def adopt(self, external_id: str, view_hash: Optional[str]) -> None:
+        """Start from the ``hash`` of a modal opened by another process,
+        unless this process already tracks a newer one."""
+        if not external_id or not view_hash:
+            return
+        with self._lock:
+            state = self._state(external_id)
+            if state.hash is None:
+                state.hash = view_hash
+
+    def current_hash(self, external_id: str) -> Optional[str]:
+        """Slack's ``hash`` of the modal as last opened or updated here."""
+        with self._lock:
+            state = self._modals.get(external_id)
+            return state.hash if state is not None else None
+
+    def _plan(
+        self, external_id: str, view: Dict[str, Any]
+    ) -> Optional[Dict[str, Any]]:
+        """``views.update`` arguments, or None when the call is not
+        needed (identical content, or the modal was changed elsewhere)."""
+        digest = view_digest(view)
+        with self._lock:
+            state = self._state(external_id)
+            if state.conflicted or state.digest == digest:
+                self.skipped += 1
+                return None
+            return {
+                "view": view,
+                "external_id": external_id,
+                "hash": state.hash,
+            }
+
+    def _sent(
+        self, external_id: str, view: Dict[str, Any], response: Any
+    ) -> None:
+        with self._lock:
+            state = self._state(external_id)
+            state.digest = view_digest(view)
+            state.hash = _view_hash(response)
+            self.sent += 1
+
+    def _conflict(self, external_id: str) -> None:
+        with self._lock:
+            self._state(external_id).conflicted = True
+            self.conflicts += 1
+        log_info(
+            "modal changed elsewhere, updates stopped",
+            external_id=external_id,
+        )
+
+    def update(
+        self,
+        client: Any,
+        external_id: str,
+        view: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """Push ``view`` unless it would change nothing; ``False`` when a
+        newer version of the modal is kept instead. Other Slack errors
+        are raised."""
+        call = self._plan(external_id, view)
+        if call is None:
+            return not self._is_conflicted(external_id)
+        try:
+            response = client.views_update(timeout=timeout, **call)
+        except Exception as exc:
+            if not _is_conflict(exc):
+                raise
+            self._conflict(external_id)
+            return False
+        self._sent(external_id, view, response)
+        return True
+
+    async def aupdate(
+        self,
+        client: Any,
+        external_id: str,
+        view: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """``update`` with an ``AsyncSlackWebClient``."""
+        call = self._plan(external_id, view)
+        if call is None:
+            return not self._is_conflicted(external_id)
+        try:
+            response = await client.views_update(timeout=timeout, **call)
+        except Exception as exc:
+            if not _is_conflict(exc):
+                raise
+            self._conflict(external_id)
+            return False
+        self._sent(external_id, view, response)
+        return True
+
+    def _is_conflicted(self, external_id: str) -> bool:
+        with self._lock:
+            return self._state(external_id).conflicted
+
+
+@lru_cache(maxsize=1)
+def get_modal_updater() -> ModalUpdater:
+    """Process-wide updater, so warm invocations keep the hashes."""
+    return ModalUpdater()
@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.prompt_builder import estimate_tokens
+except ImportError:
+    # テスト環境用の相対インポート
+    from .prompt_builder import estimate_tokens
+
+ROUTE_FAST = "fast"
+ROUTE_STRONG = "strong"
+
+CATEGORY_GENERAL = "general"
+
+# Keyword lists are matched against the redacted body, case-insensitively
+CATEGORY_KEYWORDS: Tuple[Tuple[str, Tuple[str, ...]], ...] = (
+    (
+        "complaint",
+        ("苦情", "クレーム", "不満", "謝罪", "誠意", "complaint"),
+    ),
+    (
+        "legal",
+        ("弁護士", "訴訟", "法的", "契約違反", "個人情報", "lawyer", "legal"),
+    ),
+    (
+        "billing",
+        ("請求", "返金", "料金", "支払", "解約", "refund", "invoice", "cancel"),
+    ),
+    (
+        "incident",
+        ("障害", "不具合", "エラー", "動かない", "ログインできない", "error", "outage"),
+    ),
+)
+
+
+@dataclass(frozen=True)
+class Route:
+    name: str
+    model: str
+    # Upper bound for the whole generation, retries included (seconds)
+    timeout: float
+    # Ceiling for the reply length; the prompt builder may pick less
+    max_tokens: int
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    route: Route
+    category: str
+    reason: str
+    body_tokens: int
+
+    def context_fields(self) -> Dict[str, Any]:
+        """Attributes recorded on the context item."""
+        return {
+            "model_route": self.route.name,
+            "model": self.route.model,
+            "inquiry_category": self.category,
+        }
+
+
+DEFAULT_ROUTES: Dict[str, Route] = {
+    ROUTE_FAST: Route(ROUTE_FAST, "gpt-4o-mini", timeout=10.0, max_tokens=300),
+    ROUTE_STRONG: Route(ROUTE_STRONG, "gpt-4o", timeout=25.0, max_tokens=600),
+}
+
+
+@dataclass(frozen=True)
+class RoutingPolicy:
+    routes: Dict[str, Route] = field(
+        default_factory=lambda: dict(DEFAULT_ROUTES)
+    )
+    # Bodies estimated above this many tokens go to the strong route
+    long_tokens: int = 600
+    # Several distinct questions also count as complex
+    max_questions: int = 3
+    strong_categories: FrozenSet[str] = frozenset(
+        {"complaint", "legal", "incident"}
+    )
+
+    def choose(self, redacted_body: str) -> RouteDecision:
+        tokens = estimate_tokens(redacted_body)
+        category = classify_inquiry(redacted_body)
+        questions = redacted_body.count("?") + redacted_body.count("？")
+        if tokens > self.long_tokens:
+            name, reason = ROUTE_STRONG, "long"
+        elif category in self.strong_categories:
+            name, reason = ROUTE_STRONG, f"category:{category}"
+        elif questions >= self.max_questions:
+            name, reason = ROUTE_STRONG, "questions"
+        else:
+            name, reason = ROUTE_FAST, "short"
+        route = self.routes.get(name) or self.routes[ROUTE_FAST]
+        return RouteDecision(route, category, reason, tokens)
+
+
+def classify_inquiry(redacted_body: str) -> str:
+    text = redacted_body.lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(k in text for k in keywords):
+            return category
+    return CATEGORY_GENERAL
+
+
+def _load_routes(raw: str) -> Dict[str, Route]:
+    """Merge ``MODEL_ROUTES`` JSON over the defaults.
+
+    e.g. ``{"strong": {"model": "gpt-4.1", "timeout": 20}}``
+    """
+    routes = dict(DEFAULT_ROUTES)
+    for name, spec in (json.loads(raw) if raw else {}).items():
+        base = routes.get(name) or Route(name, "gpt-4o-mini", 10.0, 300)
+        routes[name] = replace(
+            base,
+            model=str(spec.get("model", base.model)),
+            timeout=float(spec.get("timeout", base.timeout)),
+            max_tokens=int(spec.get("max_tokens", base.max_tokens)),
+        )
+    return routes
+
+
+@lru_cache(maxsize=1)
+def get_routing_policy() -> RoutingPolicy:
+    """Policy from env: ``MODEL_ROUTES`` (JSON), ``ROUTE_LONG_TOKENS`` and
+    ``ROUTE_STRONG_CATEGORIES`` (comma-separated)."""
+    kwargs: Dict[str, Any] = {
+        "routes": _load_routes(os.getenv("MODEL_ROUTES", "")),
+    }
+    long_tokens = os.getenv("ROUTE_LONG_TOKENS", "")
+    if long_tokens:
+        kwargs["long_tokens"] = int(long_tokens)
+    categories = os.getenv("ROUTE_STRONG_CATEGORIES", "")
+    if categories:
+        kwargs["strong_categories"] = frozenset(
+            c.strip() for c in categories.split(",") if c.strip()
+        )
+    return RoutingPolicy(**kwargs)
+
+
+def choose_route(
+    redacted_body: str, policy: Optional[RoutingPolicy] = None
+) -> RouteDecision:
+    return (policy or get_routing_policy()).choose(redacted_body)
@@ -1,23 +1,71 @@
 from __future__ import annotations
 
 from functools import lru_cache
-from typing import Optional
+from typing import Any, Dict, Iterator, List, Optional
 
 import json
-import urllib.request
-import urllib.error
+import os
+import time
 
 try:
     # Lambda環境用の絶対インポート
     from common.config import load_config
-    from common.logging import log_error
+    from common.http_pool import KeepAlivePool, get_pool
+    from common.logging import log_info
+    from common.model_routing import Route
+    from common.prompt_builder import (
+        PromptPlan,
+        plan_reply_prompt,
+    )
+    from common.retry import (
+        LatencyTracker,
+        RetryPolicy,
+        call_with_retry,
+        hedged_call,
+        stream_with_retry,
+    )
     from common.secrets import resolve_openai_api_key
 except ImportError:
     # テスト環境用の相対インポート
     from .config import load_config
-    from .logging import log_error
+    from .http_pool import KeepAlivePool, get_pool
+    from .logging import log_info
+    from .model_routing import Route
+    from .prompt_builder import (
+        PromptPlan,
+        plan_reply_prompt,
+    )
+    from .retry import (
+        LatencyTracker,
+        RetryPolicy,
+        call_with_retry,
+        hedged_call,
+        stream_with_retry,
+    )
     from .secrets import resolve_openai_api_key
 
+OPENAI_BASE_URL = "https://api.openai.com"
+CHAT_COMPLETIONS_PATH = "/v1/chat/completions"
+# Used when no route is given
+DEFAULT_MODEL = "gpt-4o-mini"
+
+# Completion latencies of this process; hedging fires past their p95
+_latency = LatencyTracker()
+
+
+class OpenAIHTTPError(Exception):
+    def __init__(
+        self,
+        status: int,
+        body: bytes,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        super().__init__(f"openai http {status}")
+        self.status = status
+        self.body = body
+        # Lower-cased; carries Retry-After for 429/503
+        self.headers = headers or {}
+
 
 @lru_cache(maxsize=1)
 def _get_api_key() -> str:
@@ -25,61 +73,211 @@ def _get_api_key() -> str:
     return resolve_openai_api_key(cfg.openai_api_key_secret_arn)
 
 
-def generate_reply_draft(
-    redacted_body: str,
-    tone: Optional[str] = None,
-) -> str:
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def get_retry_policy() -> RetryPolicy:
+    """``OPENAI_MAX_ATTEMPTS`` (default 3) bounds tries per generation."""
+    return RetryPolicy(
+        max_attempts=max(1, int(_env_float("OPENAI_MAX_ATTEMPTS", 3)))
+    )
+
+
+def hedging_enabled() -> bool:
+    return os.getenv("OPENAI_HEDGE", "").lower() in ("1", "true", "yes")
+
+
+def get_base_url() -> str:
+    """API origin; ``OPENAI_BASE_URL`` points at a stub or proxy.
+
+    Give the origin only (e.g. ``http://127.0.0.1:8089``); request paths
+    already start with ``/v1``.
     """
-    Generate a Japanese reply draft from redacted text.
-    Do not include PII; input is already redacted.
+    return os.getenv("OPENAI_BASE_URL", "") or OPENAI_BASE_URL
+
+
+def get_openai_pool(base_url: Optional[str] = None) -> KeepAlivePool:
+    """Shared keep-alive pool to the OpenAI API.
+
+    ``OPENAI_CONNECT_TIMEOUT`` bounds DNS/TCP/TLS setup (default 2s);
+    ``OPENAI_READ_TIMEOUT`` is the default per-read timeout (default 30s).
     """
-    if not redacted_body:
-        return ""
-    lines = [
-        "あなたは日本語のCS担当者です。以下の問い合わせに対し、",
-        "丁寧で簡潔な返信文案を日本語で作成してください。",
-        "- 会社のブランドトーンに合う丁寧語",
-        "- 不確実な点は確認依頼として記載",
-        "- 箇条書き可",
-        "- 件名行は不要",
-        "",
-        "問い合わせ本文（機微情報はプレースホルダーに置換済み）：",
-        redacted_body,
-        "",
-    ]
-    if tone:
-        lines.append(f"希望するトーン: {tone}")
-        lines.append("")
-    prompt = "\n".join(lines)
+    return get_pool(
+        base_url or get_base_url(),
+        connect_timeout=_env_float("OPENAI_CONNECT_TIMEOUT", 2.0),
+        read_timeout=_env_float("OPENAI_READ_TIMEOUT", 30.0),
+    )
 
-    try:
-        api_key = _get_api_key()
-        headers = {
+
+def post_chat_completion(
+    payload: Dict[str, Any],
+    api_key: str,
+    timeout: Optional[float] = None,
+    base_url: Optional[str] = None,
+) -> Dict[str, Any]:
+    """POST a chat completion over the pooled connection; raise on non-2xx."""
+    resp = get_openai_pool(base_url).request(
+        "POST",
+        CHAT_COMPLETIONS_PATH,
+        body=json.dumps(payload).encode("utf-8"),
+        headers={
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json",
-        }
-        payload = {
-            "model": "gpt-4o-mini",
-            "messages": [
-                {"role": "user", "content": prompt},
-            ],
-            "max_tokens": 300,
-        }
-        req = urllib.request.Request(
-            url="https://api.openai.com/v1/chat/completions",
-            data=json.dumps(payload).encode("utf-8"),
-            headers=headers,
-            method="POST",
-        )
-        with urllib.request.urlopen(req, timeout=3) as resp:
-            raw = resp.read().decode("utf-8", errors="ignore")
-        data = json.loads(raw)
-        choices = data.get("choices") or []
-        if not choices:
-            return ""
-        message = choices[0].get("message", {})
-        content = (message or {}).get("content", "")
-        return str(content or "").strip()
-    except Exception as exc:  # pragma: no cover - external call
-        log_error("openai generation failed", error=str(exc))
+        },
+        timeout=timeout,
+    )
+    if resp.status >= 300:
+        raise OpenAIHTTPError(resp.status, resp.body, resp.headers)
+    return resp.json()  # type: ignore[no-any-return]
+
+
+def stream_chat_completion(
+    payload: Dict[str, Any],
+    api_key: str,
+    timeout: Optional[float] = None,
+    base_url: Optional[str] = None,
+) -> Iterator[str]:
+    """Yield content deltas from a streamed (server-sent events) completion.
+
+    ``timeout`` bounds each read, i.e. the gap between chunks, not the whole
+    completion.
+    """
+    body = dict(payload, stream=True)
+    resp = get_openai_pool(base_url).stream(
+        "POST",
+        CHAT_COMPLETIONS_PATH,
+        body=json.dumps(body).encode("utf-8"),
+        headers={
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json",
+            "Accept": "text/event-stream",
+        },
+        timeout=timeout,
+    )
+    with resp:
+        if resp.status >= 300:
+            raise OpenAIHTTPError(resp.status, resp.read(), resp.headers)
+        for line in resp.iter_lines():
+            deltas = parse_sse_line(line)
+            if deltas is None:
+                # Drain the terminating chunk so the connection is reused
+                resp.read()
+                return
+            yield from deltas
+
+
+def parse_sse_line(line: bytes) -> Optional[List[str]]:
+    """Content deltas carried by one server-sent event line.
+
+    Returns ``None`` for the ``[DONE]`` sentinel and an empty list for
+    comments, blank lines and unparsable events.
+    """
+    if not line.startswith(b"data:"):
+        return []
+    data = line[5:].strip()
+    if data == b"[DONE]":
+        return None
+    try:
+        chunk = json.loads(data)
+    except ValueError:
+        return []
+    deltas: List[str] = []
+    for choice in chunk.get("choices") or []:
+        delta = (choice.get("delta") or {}).get("content")
+        if delta:
+            deltas.append(str(delta))
+    return deltas
+
+
+def extract_message_content(data: Dict[str, Any]) -> str:
+    choices = data.get("choices") or []
+    if not choices:
         return ""
+    message = choices[0].get("message", {})
+    content = (message or {}).get("content", "")
+    return str(content or "").strip()
+
+
+def build_draft_payload(
+    plan: PromptPlan, route: Optional[Route] = None
+) -> Dict[str, Any]:
+    """Chat payload for a reply draft; logs the plan's token estimates."""
+    model = route.model if route is not None else DEFAULT_MODEL
+    log_info(
+        "reply prompt planned",
+        model=model,
+        route=route.name if route is not None else "",
+        **plan.log_fields(),
+    )
+    return {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": plan.prompt},
+        ],
+        "max_tokens": plan.max_tokens,
+    }
+
+
+def build_route_payload(
+    redacted_body: str, route: Route, tone: Optional[str] = None
+) -> Dict[str, Any]:
+    """Prompt sized to the route's token ceiling, sent to its model."""
+    plan = plan_reply_prompt(
+        redacted_body, tone, max_output_tokens=route.max_tokens
+    )
+    return build_draft_payload(plan, route)
+
+
+def complete_with_retry(
+    payload: Dict[str, Any],
+    api_key: str,
+    budget: float,
+    base_url: Optional[str] = None,
+    policy: Optional[RetryPolicy] = None,
+    hedge: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """``post_chat_completion`` with retries and optional hedging.
+
+    Everything, including backoff sleeps, finishes within ``budget``
+    seconds. With hedging on (default: ``OPENAI_HEDGE``), an attempt that
+    runs past the observed p95 latency gets a duplicate request and the
+    first success wins.
+    """
+    hedge = hedging_enabled() if hedge is None else hedge
+
+    def attempt(timeout: float) -> Dict[str, Any]:
+        # hedge_after=timeout never hedges but still records the latency
+        return hedged_call(
+            lambda t: post_chat_completion(
+                payload, api_key, timeout=t, base_url=base_url
+            ),
+            timeout,
+            _latency,
+            hedge_after=None if hedge else timeout,
+        )
+
+    return call_with_retry(
+        attempt, time.monotonic() + budget, policy or get_retry_policy()
+    )
+
+
+def stream_completion_with_retry(
+    payload: Dict[str, Any],
+    api_key: str,
+    budget: float,
+    base_url: Optional[str] = None,
+    policy: Optional[RetryPolicy] = None,
+) -> Iterator[str]:
+    """``stream_chat_completion`` whose opening is retried within
+    ``budget`` seconds; errors after the first delta propagate."""
+    return stream_with_retry(
+        lambda t: stream_chat_completion(
+            payload, api_key, timeout=t, base_url=base_url
+        ),
+        time.monotonic() + budget,
+        policy or get_retry_policy(),
+    )
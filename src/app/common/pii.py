@@ -112,3 +112,26 @@ def reidentify(text: str, pii_map: Dict[str, str]) -> str:
     for placeholder, original in pii_map.items():
         out = out.replace(placeholder, original)
     return out
+
+
+# Longest placeholder we expect to see split across streamed chunks
+_MAX_PLACEHOLDER_LEN = 32
+
+
+def reidentify_partial(text: str, pii_map: Dict[str, str]) -> str:
+    """Re-identify text that may end in the middle of a placeholder.
+
+    While streaming, a chunk can stop at e.g. ``"[EMAIL_"``; that tail is
+    held back until the closing bracket arrives so neither a half
+    placeholder nor a wrong substitution is ever shown.
+    """
+    if not pii_map:
+        return text
+    idx = text.rfind("[")
+    if (
+        idx != -1
+        and "]" not in text[idx:]
+        and len(text) - idx <= _MAX_PLACEHOLDER_LEN
+    ):
+        text = text[:idx]
+    return reidentify(text, pii_map)
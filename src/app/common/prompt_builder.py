@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+# Offline token estimate tuned for gpt-4o style BPE: CJK characters cost
+# about one token each, ASCII words about one token per four characters,
+# other symbols one token each. It errs slightly high, which is the safe
+# side for a budget.
+_CJK_RE = re.compile(
+    "[\u3000-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff00-\uffef]"
+)
+_WORD_RE = re.compile(r"[A-Za-z0-9]+")
+# PII placeholders from common.pii, e.g. "[EMAIL_1]"; never cut in half
+_PLACEHOLDER_RE = re.compile(r"\[[A-Z][A-Z_]*_\d+\]")
+_QUOTE_PREFIXES = (">", "＞")
+
+DEFAULT_INPUT_BUDGET = 2000
+DEFAULT_MIN_OUTPUT_TOKENS = 200
+DEFAULT_MAX_OUTPUT_TOKENS = 600
+# Lines kept at each end of a trimmed quoted block
+QUOTE_KEEP_LINES = 2
+
+
+@dataclass(frozen=True)
+class PromptPlan:
+    prompt: str
+    max_tokens: int
+    source_tokens: int
+    body_tokens: int
+    prompt_tokens: int
+    trimmed: bool
+
+    def log_fields(self) -> Dict[str, Any]:
+        return {
+            "source_tokens": self.source_tokens,
+            "body_tokens": self.body_tokens,
+            "prompt_tokens": self.prompt_tokens,
+            "max_tokens": self.max_tokens,
+            "trimmed": self.trimmed,
+        }
+
+
+def estimate_tokens(text: str) -> int:
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    rest = _CJK_RE.sub(" ", text)
+    words = _WORD_RE.findall(rest)
+    word_tokens = sum((len(w) + 3) // 4 for w in words)
+    symbols = len(_WORD_RE.sub("", rest).replace(" ", "").replace("\n", ""))
+    return cjk + word_tokens + symbols
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, "") or default)
+    except ValueError:
+        return default
+
+
+def _quoted_blocks(lines: List[str]) -> List[Tuple[int, int]]:
+    """(start, end) line ranges of consecutive ``>`` quoted lines."""
+    blocks = []
+    start = None
+    for i, line in enumerate(lines + [""]):
+        quoted = line.lstrip().startswith(_QUOTE_PREFIXES)
+        if quoted and start is None:
+            start = i
+        elif not quoted and start is not None:
+            blocks.append((start, i))
+            start = None
+    return blocks
+
+
+def _collapse(lines: List[str], collapsed: Dict[int, int]) -> str:
+    keep = QUOTE_KEEP_LINES
+    out: List[str] = []
+    i = 0
+    while i < len(lines):
+        end = collapsed.get(i)
+        if end is None:
+            out.append(lines[i])
+            i += 1
+            continue
+        omitted = end - i - keep * 2
+        out.extend(lines[i: i + keep])
+        out.append(f"> …（引用 {omitted} 行省略）…")
+        out.extend(lines[end - keep: end])
+        i = end
+    return "\n".join(out)
+
+
+def _trim_quotes(text: str, budget: int) -> str:
+    """Collapse the middle of quoted blocks, longest first, until in budget."""
+    lines = text.split("\n")
+    blocks = sorted(
+        _quoted_blocks(lines), key=lambda b: b[1] - b[0], reverse=True
+    )
+    collapsed: Dict[int, int] = {}
+    out = text
+    for start, end in blocks:
+        if estimate_tokens(out) <= budget:
+            break
+        if end - start <= QUOTE_KEEP_LINES * 2 + 1:
+            continue
+        collapsed[start] = end
+        out = _collapse(lines, collapsed)
+    return out
+
+
+def _snap_to_placeholders(text: str, head: int, tail: int) -> Tuple[int, int]:
+    """Move the cuts ``text[:head]`` and ``text[tail:]`` out of any
+    placeholder they fall inside, dropping it whole."""
+    for match in _PLACEHOLDER_RE.finditer(text):
+        if match.start() < head < match.end():
+            head = match.start()
+        if match.start() < tail < match.end():
+            tail = match.end()
+    return head, tail
+
+
+def trim_middle(text: str, budget: int) -> str:
+    """Keep the beginning and end of ``text`` within ``budget`` tokens,
+    without splitting a PII placeholder (``reidentify`` would not restore
+    half of one)."""
+    if estimate_tokens(text) <= budget:
+        return text
+    marker = "\n…（中略）…\n"
+    # Binary search the number of characters kept at each end
+    lo, hi = 0, len(text) // 2
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        candidate = text[:mid] + marker + text[-mid:]
+        if estimate_tokens(candidate) <= budget:
+            lo = mid
+        else:
+            hi = mid - 1
+    if lo == 0:
+        return marker.strip()
+    head, tail = _snap_to_placeholders(text, lo, len(text) - lo)
+    return text[:head] + marker + text[tail:]
+
+
+def fit_body(body: str, budget: int) -> str:
+    """Shrink ``body`` to ``budget`` tokens, quoted history first."""
+    if estimate_tokens(body) <= budget:
+        return body
+    body = _trim_quotes(body, budget)
+    return trim_middle(body, budget)
+
+
+def size_max_tokens(
+    body_tokens: int,
+    floor: Optional[int] = None,
+    ceiling: Optional[int] = None,
+) -> int:
+    """Reply length scales with the inquiry: ~half its size plus a greeting."""
+    floor = floor or _env_int("REPLY_MIN_TOKENS", DEFAULT_MIN_OUTPUT_TOKENS)
+    ceiling = ceiling or _env_int(
+        "REPLY_MAX_TOKENS", DEFAULT_MAX_OUTPUT_TOKENS
+    )
+    # The ceiling wins over the floor: a route's max_tokens is a hard cap
+    return min(ceiling, max(floor, 120 + body_tokens // 2))
+
+
+def build_reply_prompt(redacted_body: str, tone: Optional[str] = None) -> str:
+    lines = [
+        "あなたは日本語のCS担当者です。以下の問い合わせに対し、",
+        "丁寧で簡潔な返信文案を日本語で作成してください。",
+        "- 会社のブランドトーンに合う丁寧語",
+        "- 不確実な点は確認依頼として記載",
+        "- 箇条書き可",
+        "- 件名行は不要",
+        "",
+        "問い合わせ本文（機微情報はプレースホルダーに置換済み）：",
+        redacted_body,
+        "",
+    ]
+    if tone:
+        lines.append(f"希望するトーン: {tone}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def plan_reply_prompt(
+    redacted_body: str,
+    tone: Optional[str] = None,
+    input_budget: Optional[int] = None,
+    max_output_tokens: Optional[int] = None,
+) -> PromptPlan:
+    """Build the reply prompt within ``input_budget`` tokens.
+
+    The budget (``PROMPT_INPUT_TOKEN_BUDGET``, default 2000) covers the
+    whole prompt; the body gets what the instructions leave over.
+    """
+    budget = input_budget or _env_int(
+        "PROMPT_INPUT_TOKEN_BUDGET", DEFAULT_INPUT_BUDGET
+    )
+    overhead = estimate_tokens(build_reply_prompt("", tone))
+    body = fit_body(redacted_body, max(budget - overhead, 0))
+    body_tokens = estimate_tokens(body)
+    prompt = build_reply_prompt(body, tone)
+    return PromptPlan(
+        prompt=prompt,
+        max_tokens=size_max_tokens(body_tokens, ceiling=max_output_tokens),
+        source_tokens=estimate_tokens(redacted_body),
+        body_tokens=body_tokens,
+        prompt_tokens=estimate_tokens(prompt),
+        trimmed=body != redacted_body,
+    )
@@ -0,0 +1,261 @@
+from __future__ import annotations
+
+import asyncio
+import http.client
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import (
+    Awaitable,
+    Callable,
+    Deque,
+    Iterator,
+    Mapping,
+    Optional,
+    TypeVar,
+)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 3
+    base_delay: float = 0.25
+    max_delay: float = 4.0
+    # Do not start an attempt with less time than this left
+    min_attempt_seconds: float = 0.3
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = _status(exc)
+    if status is not None:
+        return status in RETRYABLE_STATUSES
+    return isinstance(exc, (OSError, http.client.HTTPException))
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Server-requested delay from ``retry-after-ms`` / ``Retry-After``."""
+    headers: Mapping[str, str] = getattr(exc, "headers", None) or {}
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return max(float(value) / 1000.0, 0.0)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(
+    attempt: int,
+    policy: RetryPolicy,
+    exc: Optional[BaseException] = None,
+    rng: Callable[[float, float], float] = random.uniform,
+) -> float:
+    """Full-jitter exponential backoff, never shorter than Retry-After."""
+    cap = min(policy.max_delay, policy.base_delay * (2 ** attempt))
+    delay = rng(0.0, cap)
+    hinted = retry_after_seconds(exc) if exc is not None else None
+    return max(delay, hinted) if hinted is not None else delay
+
+
+def call_with_retry(
+    fn: Callable[[float], T],
+    deadline: float,
+    policy: RetryPolicy = RetryPolicy(),
+    sleep: Optional[Callable[[float], None]] = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> T:
+    """Call ``fn(timeout)`` until it succeeds, retrying transient errors.
+
+    ``deadline`` is an absolute ``clock()`` time; each attempt gets the time
+    remaining as its timeout, and no retry starts (or sleeps) past it. The
+    last error is re-raised when the attempts or the time run out.
+    """
+    sleep = sleep or time.sleep
+    attempt = 0
+    while True:
+        remaining = deadline - clock()
+        if remaining <= 0:
+            raise TimeoutError("deadline exceeded before attempt")
+        try:
+            return fn(remaining)
+        except Exception as exc:
+            attempt += 1
+            if attempt >= policy.max_attempts or not is_retryable(exc):
+                raise
+            delay = backoff_delay(attempt - 1, policy, exc)
+            left = deadline - clock() - delay
+            if left < policy.min_attempt_seconds:
+                raise
+            sleep(delay)
+
+
+def stream_with_retry(
+    open_stream: Callable[[float], Iterator[T]],
+    deadline: float,
+    policy: RetryPolicy = RetryPolicy(),
+    sleep: Optional[Callable[[float], None]] = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> Iterator[T]:
+    """Retry a stream until its first item arrives; later errors propagate.
+
+    Once output has been yielded a retry would duplicate it, so only
+    connection, status and first-chunk failures are retried.
+    """
+    _empty = object()
+
+    def first(timeout: float):  # type: ignore[no-untyped-def]
+        it = open_stream(timeout)
+        return next(it, _empty), it
+
+    head, it = call_with_retry(first, deadline, policy, sleep, clock)
+    if head is _empty:
+        return
+    yield head
+    yield from it
+
+
+async def async_call_with_retry(
+    fn: Callable[[float], Awaitable[T]],
+    deadline: float,
+    policy: RetryPolicy = RetryPolicy(),
+    clock: Callable[[], float] = time.monotonic,
+) -> T:
+    """``call_with_retry`` for coroutines.
+
+    Each attempt is additionally cancelled once the time remaining runs
+    out, and backoff waits with ``asyncio.sleep`` so the event loop keeps
+    serving other drafts.
+    """
+    attempt = 0
+    while True:
+        remaining = deadline - clock()
+        if remaining <= 0:
+            raise TimeoutError("deadline exceeded before attempt")
+        try:
+            return await asyncio.wait_for(fn(remaining), remaining)
+        except Exception as exc:
+            attempt += 1
+            if attempt >= policy.max_attempts or not is_retryable(exc):
+                raise
+            delay = backoff_delay(attempt - 1, policy, exc)
+            left = deadline - clock() - delay
+            if left < policy.min_attempt_seconds:
+                raise
+            await asyncio.sleep(delay)
+
+
+class LatencyTracker:
+    """Sliding window of successful call latencies (seconds)."""
+
+    def __init__(self, window: int = 200, min_samples: int = 20) -> None:
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.min_samples = min_samples
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def p95(self) -> Optional[float]:
+        return self.percentile(0.95)
+
+
+def _spawn(fn: Callable[[float], T], timeout: float) -> "Future[T]":
+    """Run ``fn(timeout)`` on its own daemon thread.
+
+    A shared executor would queue concurrent callers' primaries behind each
+    other; the losing request finishes in the background and returns its
+    connection to the pool.
+    """
+    future: "Future[T]" = Future()
+
+    def run() -> None:
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(fn(timeout))
+        except BaseException as exc:
+            future.set_exception(exc)
+
+    threading.Thread(target=run, name="hedge", daemon=True).start()
+    return future
+
+
+def hedged_call(
+    fn: Callable[[float], T],
+    timeout: float,
+    tracker: LatencyTracker,
+    hedge_after: Optional[float] = None,
+    clock: Callable[[], float] = time.monotonic,
+) -> T:
+    """Call ``fn(timeout)``; if it is still running after ``hedge_after``
+    (default: the tracker's p95) send a second identical call and return
+    whichever succeeds first.
+
+    Without enough samples to know the p95 no hedge is sent.
+    """
+    started = clock()
+
+    def timed(budget: float) -> T:
+        call_started = clock()
+        result = fn(budget)
+        tracker.observe(clock() - call_started)
+        return result
+
+    hedge_after = tracker.p95() if hedge_after is None else hedge_after
+    if hedge_after is None or hedge_after >= timeout:
+        return timed(timeout)
+
+    pending = {_spawn(timed, timeout)}
+    done, _ = wait(pending, timeout=hedge_after)
+    if not done:
+        remaining = timeout - (clock() - started)
+        if remaining > 0:
+            pending.add(_spawn(timed, remaining))
+    error: Optional[BaseException] = None
+    while pending:
+        remaining = timeout - (clock() - started)
+        done, pending = wait(
+            pending, timeout=max(remaining, 0), return_when=FIRST_COMPLETED
+        )
+        if not done:
+            break
+        for future in done:
+            exc = future.exception()
+            if exc is None:
+                return future.result()  # type: ignore[no-any-return]
+            error = exc
+    if error is not None:
+        raise error
+    raise TimeoutError(f"hedged call exceeded {timeout:.2f}s")
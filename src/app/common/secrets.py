@@ -1,14 +1,49 @@
 from __future__ import annotations
 
 import json
-from functools import lru_cache
-from typing import Any, Dict, Optional
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
 
-import boto3
+# Rotated secrets are picked up within this many seconds
+SECRET_TTL_SECONDS = 300.0
 
 
-@lru_cache(maxsize=32)
-def get_secret_string(secret_arn: str) -> str:
+class CachedSecret:
+    """Value from ``load``, reused for ``ttl`` seconds.
+
+    Keeps secret stores off the request path: a warm process loads each
+    secret once per ``ttl`` instead of once per request. Failed loads are
+    not cached.
+    """
+
+    def __init__(
+        self,
+        load: Callable[[], str],
+        ttl: float = SECRET_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._load = load
+        self.ttl = ttl
+        self._clock = clock
+        self._value: Optional[Tuple[float, str]] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        with self._lock:
+            now = self._clock()
+            if self._value is None or self._value[0] <= now:
+                self._value = (now + self.ttl, self._load())
+            return self._value[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._value = None
+
+
+def fetch_secret_string(secret_arn: str) -> str:
+    import boto3
+
     client = boto3.client("secretsmanager")
     resp = client.get_secret_value(SecretId=secret_arn)
     if "SecretString" in resp:
@@ -17,9 +52,24 @@ def get_secret_string(secret_arn: str) -> str:
     raise ValueError("SecretString not found for ARN")
 
 
+_secrets: Dict[str, CachedSecret] = {}
+_secrets_lock = threading.Lock()
+
+
+def get_secret_string(secret_arn: str) -> str:
+    """Secret value, fetched at most once per ``SECRET_TTL_SECONDS``."""
+    with _secrets_lock:
+        secret = _secrets.get(secret_arn)
+        if secret is None:
+            secret = CachedSecret(lambda: fetch_secret_string(secret_arn))
+            _secrets[secret_arn] = secret
+    return secret.get()
+
+
 def clear_secrets_cache() -> None:
     """Clear the secrets cache to force fresh retrieval."""
-    get_secret_string.cache_clear()
+    with _secrets_lock:
+        _secrets.clear()
 
 
 def get_secret_json(secret_arn: str) -> Dict[str, Any]:
@@ -0,0 +1,93 @@
+"""
+Queued reply sends for modal submissions.
+
+With ``REPLY_SEND_QUEUE_URL`` set, ``view_submission`` persists the send
+intent (the edited text and a fresh ``send_id``) on the context, queues a
+message naming it and closes the modal; the reply_sender Lambda delivers
+the email and then the Slack confirmation. Submission latency then no
+longer includes SES or Slack. The ``send_id`` keeps SQS redelivery from sending
+twice and lets a later submission of the same context supersede an
+earlier one that has not gone out yet.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import uuid
+from typing import Any, Optional, Tuple
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.deadline import Deadline
+    from common.dynamodb_repo import update_context_fields
+    from common.logging import log_error, log_info
+except ImportError:
+    # テスト環境用の相対インポート
+    from .deadline import Deadline
+    from .dynamodb_repo import update_context_fields
+    from .logging import log_error, log_info
+
+# Context attributes of the send intent
+REPLY_TEXT_ATTR = "reply_text"
+SEND_ID_ATTR = "send_id"
+SENT_SEND_ID_ATTR = "sent_send_id"
+CONFIRMED_SEND_ID_ATTR = "confirmed_send_id"
+
+
+def send_queue_url() -> str:
+    return os.getenv("REPLY_SEND_QUEUE_URL", "")
+
+
+def queue_send(context_id: str, send_id: str, client: Any = None) -> None:
+    """Send the message to the reply queue; raises if SQS refuses it."""
+    if client is None:
+        import boto3
+
+        client = boto3.client("sqs")
+    client.send_message(
+        QueueUrl=send_queue_url(),
+        MessageBody=json.dumps(
+            {"send": {"context_id": context_id, "send_id": send_id}},
+            ensure_ascii=False,
+        ),
+    )
+
+
+def parse_send_message(raw: str) -> Tuple[str, str]:
+    """(context_id, send_id) of a queued send; ``ValueError`` if invalid."""
+    try:
+        send = json.loads(raw)["send"]
+        context_id, send_id = str(send["context_id"]), str(send["send_id"])
+    except (KeyError, TypeError) as exc:
+        raise ValueError(f"invalid send message: {exc}") from exc
+    if not context_id or not send_id:
+        raise ValueError("invalid send message: empty id")
+    return context_id, send_id
+
+
+def try_queue_send(
+    context_id: str, text: str, deadline: Optional[Deadline] = None
+) -> bool:
+    """Persist the intent and queue it; ``False`` means the caller should
+    send the reply itself (queue off, or the intent could not be stored
+    or queued)."""
+    if not send_queue_url():
+        return False
+    send_id = uuid.uuid4().hex
+    try:
+        update_context_fields(
+            context_id,
+            deadline=deadline,
+            **{REPLY_TEXT_ATTR: text, SEND_ID_ATTR: send_id},
+        )
+        queue_send(context_id, send_id)
+    except Exception as exc:
+        log_error(
+            "reply send queue failed, sending directly",
+            context_id=context_id,
+            error=str(exc),
+        )
+        return False
+    log_info("reply send queued", context_id=context_id, send_id=send_id)
+    return True
@@ -1,17 +1,29 @@
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 
 import boto3
 
+try:
+    # Lambda環境用の絶対インポート
+    from common.deadline import Deadline, boto_config, cap_timeout
+except ImportError:
+    # テスト環境用の相対インポート
+    from .deadline import Deadline, boto_config, cap_timeout
+
+# SES usually answers in well under a second; botocore's default is 60s
+DEFAULT_TIMEOUT_SECONDS = 5.0
+
 
 def send_email(
     sender: str,
     to_addresses: List[str],
     subject: str,
     body: str,
+    deadline: Optional[Deadline] = None,
 ) -> None:
-    client = boto3.client("ses")
+    timeout = cap_timeout(deadline, DEFAULT_TIMEOUT_SECONDS)
+    client = boto3.client("ses", config=boto_config(timeout))
     client.send_email(
         Source=sender,
         Destination={"ToAddresses": to_addresses},
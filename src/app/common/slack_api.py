@@ -0,0 +1,331 @@
+"""
+Slack Web API client over a shared keep-alive connection pool.
+
+slack_sdk's ``WebClient`` opens a new HTTPS connection for every call, so
+each ``views.open`` pays DNS, TCP and TLS setup inside Slack's 3 second
+window. This client sends the few methods the app uses as JSON over
+``http_pool`` connections that stay open across warm invocations, and is
+shared by the Lambda, the Cloud Run service and the Cloud Run worker.
+``AsyncSlackWebClient`` sends the same methods from an asyncio event loop.
+slack_sdk is not kept as a wrapper: its sync client calls urllib directly
+with no way to plug in a transport, and its async client needs aiohttp.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import weakref
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.http_pool import HTTPResponse, KeepAlivePool, get_pool
+    from common.generation.aio import AsyncKeepAlivePool
+except ImportError:
+    # テスト環境用の相対インポート
+    from .http_pool import HTTPResponse, KeepAlivePool, get_pool
+    from .generation.aio import AsyncKeepAlivePool
+
+SLACK_API_URL = "https://slack.com"
+DEFAULT_TIMEOUT_SECONDS = 10.0
+# Slack's edge drops idle keep-alive connections after about a minute;
+# reusing one it already closed costs a failed write plus a new handshake
+IDLE_SECONDS = 50.0
+
+
+class SlackAPIError(Exception):
+    def __init__(
+        self,
+        method: str,
+        error: str,
+        status: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        super().__init__(f"slack {method} failed: {error}")
+        self.method = method
+        self.error = error
+        self.status = status
+        # Lower-cased; carries Retry-After for 429
+        self.headers = headers or {}
+
+
+def get_api_url() -> str:
+    """API origin; ``SLACK_API_URL`` points at a stub or proxy."""
+    return os.getenv("SLACK_API_URL", "") or SLACK_API_URL
+
+
+def get_slack_pool(base_url: Optional[str] = None) -> KeepAlivePool:
+    """Keep-alive pool to Slack, shared by every token's client."""
+    return get_pool(
+        base_url or get_api_url(),
+        connect_timeout=2.0,
+        read_timeout=DEFAULT_TIMEOUT_SECONDS,
+        max_idle_age=IDLE_SECONDS,
+    )
+
+
+def _encode(
+    token: str, payload: Dict[str, Any]
+) -> Tuple[bytes, Dict[str, str]]:
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Content-Type": "application/json; charset=utf-8",
+    }
+    return body, headers
+
+
+def _result(method: str, resp: HTTPResponse) -> Dict[str, Any]:
+    """Decoded body of an ok response; ``SlackAPIError`` otherwise."""
+    if resp.status >= 400:
+        error = "ratelimited" if resp.status == 429 else "http_error"
+        raise SlackAPIError(method, error, resp.status, resp.headers)
+    try:
+        data = resp.json()
+    except ValueError:
+        raise SlackAPIError(method, "invalid_response", resp.status)
+    if not data.get("ok"):
+        raise SlackAPIError(
+            method, str(data.get("error") or "unknown_error"), resp.status
+        )
+    return data  # type: ignore[no-any-return]
+
+
+def _views_update_payload(
+    view: Dict[str, Any],
+    external_id: Optional[str],
+    view_id: Optional[str],
+    hash: Optional[str],
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = {"view": view}
+    if external_id:
+        payload["external_id"] = external_id
+    if view_id:
+        payload["view_id"] = view_id
+    if hash:
+        payload["hash"] = hash
+    return payload
+
+
+def _post_message_payload(
+    channel: str, text: str, blocks: Any, fields: Dict[str, Any]
+) -> Dict[str, Any]:
+    payload: Dict[str, Any] = dict(fields, channel=channel, text=text)
+    if blocks is not None:
+        payload["blocks"] = blocks
+    return payload
+
+
+class SlackWebClient:
+    """The Web API methods this app calls, named as in slack_sdk.
+
+    ``timeout`` bounds each socket read; every method also takes a
+    per-call ``timeout``.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        pool: Optional[KeepAlivePool] = None,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    ) -> None:
+        self.token = token
+        self.pool = pool or get_slack_pool()
+        self.timeout = timeout
+
+    def api_call(
+        self,
+        method: str,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """POST ``payload`` as JSON; raise ``SlackAPIError`` unless ok."""
+        body, headers = _encode(self.token, payload)
+        resp = self.pool.request(
+            "POST",
+            f"/api/{method}",
+            body=body,
+            headers=headers,
+            timeout=self.timeout if timeout is None else timeout,
+        )
+        return _result(method, resp)
+
+    def views_open(
+        self,
+        trigger_id: str,
+        view: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        return self.api_call(
+            "views.open", {"trigger_id": trigger_id, "view": view}, timeout
+        )
+
+    def views_update(
+        self,
+        view: Dict[str, Any],
+        external_id: Optional[str] = None,
+        view_id: Optional[str] = None,
+        hash: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        return self.api_call(
+            "views.update",
+            _views_update_payload(view, external_id, view_id, hash),
+            timeout,
+        )
+
+    def chat_postMessage(  # noqa: N802 - Slack method name
+        self,
+        channel: str,
+        text: str = "",
+        blocks: Any = None,
+        timeout: Optional[float] = None,
+        **fields: Any,
+    ) -> Dict[str, Any]:
+        return self.api_call(
+            "chat.postMessage",
+            _post_message_payload(channel, text, blocks, fields),
+            timeout,
+        )
+
+    def warm(self) -> None:
+        """Start connecting to Slack ahead of a latency-critical call."""
+        self.pool.prewarm()
+
+
+_async_pools: "weakref.WeakKeyDictionary[Any, AsyncKeepAlivePool]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_async_slack_pool() -> AsyncKeepAlivePool:
+    """Keep-alive pool to Slack for the running event loop.
+
+    asyncio connections cannot move between loops, so each loop gets its
+    own pool, dropped together with the loop.
+    """
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(loop)
+    if pool is None:
+        pool = AsyncKeepAlivePool(get_api_url(), connect_timeout=2.0)
+        _async_pools[loop] = pool
+    return pool
+
+
+class AsyncSlackWebClient:
+    """``SlackWebClient`` for coroutines.
+
+    Calls wait on the event loop rather than a thread, so Slack calls can
+    overlap with DynamoDB and OpenAI work and many interactions can be in
+    flight at once. Without ``pool`` the running loop's shared pool is
+    used, so a client may be created outside the loop it is used on.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        pool: Optional[AsyncKeepAlivePool] = None,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+    ) -> None:
+        self.token = token
+        self._pool = pool
+        self.timeout = timeout
+
+    @property
+    def pool(self) -> AsyncKeepAlivePool:
+        return self._pool or get_async_slack_pool()
+
+    async def api_call(
+        self,
+        method: str,
+        payload: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        body, headers = _encode(self.token, payload)
+        resp = await self.pool.request(
+            "POST",
+            f"/api/{method}",
+            body=body,
+            headers=headers,
+            timeout=self.timeout if timeout is None else timeout,
+        )
+        return _result(method, resp)
+
+    async def views_open(
+        self,
+        trigger_id: str,
+        view: Dict[str, Any],
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        return await self.api_call(
+            "views.open", {"trigger_id": trigger_id, "view": view}, timeout
+        )
+
+    async def views_update(
+        self,
+        view: Dict[str, Any],
+        external_id: Optional[str] = None,
+        view_id: Optional[str] = None,
+        hash: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        return await self.api_call(
+            "views.update",
+            _views_update_payload(view, external_id, view_id, hash),
+            timeout,
+        )
+
+    async def chat_postMessage(  # noqa: N802 - Slack method name
+        self,
+        channel: str,
+        text: str = "",
+        blocks: Any = None,
+        timeout: Optional[float] = None,
+        **fields: Any,
+    ) -> Dict[str, Any]:
+        return await self.api_call(
+            "chat.postMessage",
+            _post_message_payload(channel, text, blocks, fields),
+            timeout,
+        )
+
+
+@lru_cache(maxsize=4)
+def get_slack_web_client(token: str) -> SlackWebClient:
+    """Client per bot token, reused across warm invocations.
+
+    Keyed by the token itself, so a rotated token gets a new client on
+    the first call after rotation; the old one ages out of the cache.
+    All clients share one connection pool, so rotation keeps warm
+    connections.
+    """
+    return SlackWebClient(token)
+
+
+_async_clients: (
+    "weakref.WeakKeyDictionary[Any, Dict[str, AsyncSlackWebClient]]"
+) = weakref.WeakKeyDictionary()
+
+
+def get_async_slack_web_client(token: str) -> AsyncSlackWebClient:
+    """``get_slack_web_client`` for the running event loop.
+
+    Cached per loop and token over the loop's shared pool, so streamed
+    updates reuse one client and its connections. As with the sync
+    cache, a rotated token gets a new client and only the latest few
+    are kept.
+    """
+    loop = asyncio.get_running_loop()
+    clients = _async_clients.get(loop)
+    if clients is None:
+        clients = _async_clients[loop] = {}
+    client = clients.get(token)
+    if client is None:
+        client = AsyncSlackWebClient(token, pool=get_async_slack_pool())
+        clients[token] = client
+        while len(clients) > 4:
+            del clients[next(iter(clients))]
+    return client
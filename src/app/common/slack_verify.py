@@ -0,0 +1,158 @@
+"""
+Slack request verification, shared by the Lambda and the Cloud Run service.
+
+The HMAC is computed over the raw request bytes exactly as received, with
+no decode/re-encode, and compared in constant time. Requests outside the
+timestamp window are rejected before any hashing. Authentic requests are
+then checked against a bounded cache of recently accepted (timestamp,
+signature) pairs, so a captured request replayed within the window is
+rejected before it reaches any downstream work.
+
+The replay cache is per process: it catches replays that land on the same
+warm Lambda container or Cloud Run instance, while the timestamp window
+bounds the rest.
+"""
+
+from __future__ import annotations
+
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+from typing import Callable, Optional, Tuple, Union
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.secrets import SECRET_TTL_SECONDS, CachedSecret
+except ImportError:
+    # テスト環境用の相対インポート
+    from .secrets import SECRET_TTL_SECONDS, CachedSecret
+
+DEFAULT_TOLERANCE_SECONDS = 60 * 5
+REPLAY_CACHE_SIZE = 4096
+# "v0=" and a hex SHA-256
+SIGNATURE_LENGTH = 3 + 64
+
+# Reasons returned by ``check_signature``
+STALE = "stale"
+INVALID = "invalid"
+REPLAY = "replay"
+
+
+def compute_signature(secret: bytes, timestamp: bytes, body: bytes) -> bytes:
+    mac = hmac.new(secret, b"v0:" + timestamp + b":" + body, sha256)
+    return b"v0=" + mac.hexdigest().encode("ascii")
+
+
+class ReplayCache:
+    """Recently accepted (timestamp, signature) pairs, oldest first.
+
+    Pairs older than ``window`` can no longer pass the timestamp check,
+    so they are dropped; ``max_entries`` bounds memory under a burst.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = REPLAY_CACHE_SIZE,
+        window: float = DEFAULT_TOLERANCE_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.max_entries = max_entries
+        self.window = window
+        self._clock = clock
+        self._seen: "OrderedDict[Tuple[int, str], None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, timestamp: int, signature: str) -> bool:
+        """Record the pair; ``True`` when it was already recorded."""
+        key = (timestamp, signature)
+        oldest = self._clock() - self.window
+        with self._lock:
+            if key in self._seen:
+                return True
+            self._seen[key] = None
+            while self._seen and (
+                len(self._seen) > self.max_entries
+                or next(iter(self._seen))[0] < oldest
+            ):
+                self._seen.popitem(last=False)
+            return False
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+
+_replay_cache = ReplayCache()
+
+
+def get_replay_cache() -> ReplayCache:
+    """Process-wide replay cache."""
+    return _replay_cache
+
+
+def check_signature(
+    secret: Union[str, bytes],
+    timestamp: str,
+    signature: str,
+    body: bytes,
+    tolerance: float = DEFAULT_TOLERANCE_SECONDS,
+    replay_cache: Optional[ReplayCache] = None,
+    now: Optional[float] = None,
+) -> str:
+    """Why the request must be rejected, or ``""`` when it is authentic
+    (and, with ``replay_cache``, not seen before)."""
+    if not timestamp.isdigit():
+        return STALE
+    ts = int(timestamp)
+    if abs((time.time() if now is None else now) - ts) > tolerance:
+        return STALE
+    if len(signature) != SIGNATURE_LENGTH or not signature.isascii():
+        return INVALID
+    key = secret.encode("utf-8") if isinstance(secret, str) else secret
+    expected = compute_signature(key, timestamp.encode("ascii"), body)
+    if not hmac.compare_digest(expected, signature.encode("ascii")):
+        return INVALID
+    if replay_cache is not None and replay_cache.seen(ts, signature):
+        return REPLAY
+    return ""
+
+
+class SlackRequestVerifier:
+    """Verification for one signing secret, loaded through a TTL cache.
+
+    ``load_secret`` is called at most once per ``secret_ttl`` seconds, so
+    a warm instance verifies a request with one HMAC and no network call.
+    A failing ``load_secret`` raises out of ``check``; callers decide
+    whether that is a server error.
+    """
+
+    def __init__(
+        self,
+        load_secret: Callable[[], str],
+        tolerance: float = DEFAULT_TOLERANCE_SECONDS,
+        secret_ttl: float = SECRET_TTL_SECONDS,
+        replay_cache: Optional[ReplayCache] = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.secret = CachedSecret(load_secret, secret_ttl)
+        self.tolerance = tolerance
+        if replay_cache is None:
+            replay_cache = ReplayCache(window=tolerance, clock=clock)
+        self.replay_cache = replay_cache
+        self._clock = clock
+
+    def check(self, timestamp: str, signature: str, body: bytes) -> str:
+        """``check_signature`` with the cached secret."""
+        return check_signature(
+            self.secret.get(),
+            timestamp,
+            signature,
+            body,
+            self.tolerance,
+            self.replay_cache,
+            now=self._clock(),
+        )
+
+    def verify(self, timestamp: str, signature: str, body: bytes) -> bool:
+        return not self.check(timestamp, signature, body)
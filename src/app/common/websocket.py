@@ -0,0 +1,205 @@
+"""
+Minimal RFC 6455 websocket client for Slack Socket Mode.
+
+Only what Socket Mode needs: one text-message connection over ws:// or
+wss://, automatic pong replies and the closing handshake. It uses the
+standard library alone, so the Lambda package and the containers need no
+extra dependency. ``read_frame`` and ``write_frame`` are also used by the
+local Socket Mode stand-in (benchmarks/socket_mode_stub.py).
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import os
+import socket
+import ssl
+import struct
+import threading
+from typing import BinaryIO, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_CONTINUATION = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+# Slack's messages are small; anything larger is a broken peer
+MAX_MESSAGE_BYTES = 1 << 20
+
+
+class WebSocketError(OSError):
+    pass
+
+
+def accept_key(key: str) -> str:
+    """``Sec-WebSocket-Accept`` for a ``Sec-WebSocket-Key``."""
+    digest = hashlib.sha1((key + GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def _read_exact(rfile: BinaryIO, n: int) -> bytes:
+    data = rfile.read(n)
+    if data is None or len(data) < n:
+        raise WebSocketError("connection closed")
+    return data
+
+
+def read_frame(rfile: BinaryIO) -> Tuple[bool, int, bytes]:
+    """One frame as (fin, opcode, unmasked payload)."""
+    first, second = _read_exact(rfile, 2)
+    length = second & 0x7F
+    if length == 126:
+        (length,) = struct.unpack("!H", _read_exact(rfile, 2))
+    elif length == 127:
+        (length,) = struct.unpack("!Q", _read_exact(rfile, 8))
+    if length > MAX_MESSAGE_BYTES:
+        raise WebSocketError(f"frame too large: {length}")
+    mask = _read_exact(rfile, 4) if second & 0x80 else b""
+    payload = _read_exact(rfile, length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return bool(first & 0x80), first & 0x0F, payload
+
+
+def write_frame(
+    sock: socket.socket, opcode: int, payload: bytes, masked: bool
+) -> None:
+    """Send one final frame; clients must mask, servers must not."""
+    header = bytearray([0x80 | opcode])
+    mask_bit = 0x80 if masked else 0
+    length = len(payload)
+    if length < 126:
+        header.append(mask_bit | length)
+    elif length < 1 << 16:
+        header.append(mask_bit | 126)
+        header += struct.pack("!H", length)
+    else:
+        header.append(mask_bit | 127)
+        header += struct.pack("!Q", length)
+    if masked:
+        mask = os.urandom(4)
+        header += mask
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    sock.sendall(bytes(header) + payload)
+
+
+class WebSocket:
+    """A client connection; ``recv`` from one thread, ``send`` from any."""
+
+    def __init__(
+        self, sock: socket.socket, rfile: Optional[BinaryIO] = None
+    ) -> None:
+        self.sock = sock
+        # The handshake's reader, which may already hold the first frames
+        self._rfile = rfile or sock.makefile("rb")
+        self._send_lock = threading.Lock()
+        self.closed = False
+
+    def _send(self, opcode: int, payload: bytes) -> None:
+        with self._send_lock:
+            write_frame(self.sock, opcode, payload, masked=True)
+
+    def send(self, text: str) -> None:
+        self._send(OP_TEXT, text.encode("utf-8"))
+
+    def recv(self) -> Optional[str]:
+        """Next text message; None once the peer has closed.
+
+        Raises ``socket.timeout`` when nothing (not even a ping) arrived
+        within the connection's read timeout.
+        """
+        parts = []
+        while not self.closed:
+            fin, opcode, payload = read_frame(self._rfile)
+            if opcode == OP_PING:
+                self._send(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                self.close(payload[:2])
+                return None
+            parts.append(payload)
+            if sum(len(p) for p in parts) > MAX_MESSAGE_BYTES:
+                raise WebSocketError("message too large")
+            if fin:
+                return b"".join(parts).decode("utf-8")
+        return None
+
+    def close(self, status: bytes = struct.pack("!H", 1000)) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self._send(OP_CLOSE, status)
+        except OSError:
+            pass
+        try:
+            self._rfile.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+def _read_headers(rfile: BinaryIO) -> Tuple[str, Dict[str, str]]:
+    status_line = rfile.readline(8192).decode("latin-1").strip()
+    headers: Dict[str, str] = {}
+    while True:
+        line = rfile.readline(8192).decode("latin-1").strip()
+        if not line:
+            return status_line, headers
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+
+def connect(
+    url: str,
+    timeout: float = 10.0,
+    read_timeout: Optional[float] = None,
+) -> WebSocket:
+    """Open a connection and complete the opening handshake.
+
+    ``read_timeout`` (default ``timeout``) bounds each ``recv``.
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == "wss"
+    if parts.scheme not in ("ws", "wss") or not parts.hostname:
+        raise ValueError(f"not a websocket url: {url}")
+    port = parts.port or (443 if secure else 80)
+    sock = socket.create_connection((parts.hostname, port), timeout=timeout)
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if secure:
+            sock = ssl.create_default_context().wrap_socket(
+                sock, server_hostname=parts.hostname
+            )
+        key = base64.b64encode(os.urandom(16)).decode("ascii")
+        target = (parts.path or "/") + (
+            f"?{parts.query}" if parts.query else ""
+        )
+        request = (
+            f"GET {target} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        sock.sendall(request.encode("ascii"))
+        rfile = sock.makefile("rb")
+        status_line, headers = _read_headers(rfile)
+        if status_line.split(" ")[1:2] != ["101"]:
+            raise WebSocketError(f"handshake failed: {status_line}")
+        if headers.get("sec-websocket-accept") != accept_key(key):
+            raise WebSocketError("handshake failed: bad accept key")
+        sock.settimeout(timeout if read_timeout is None else read_timeout)
+    except BaseException:
+        sock.close()
+        raise
+    return WebSocket(sock, rfile)
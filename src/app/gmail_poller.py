@@ -6,11 +6,13 @@ import base64
 import json
 
 from common.config import load_config
+from common.deadline import Deadline
 from common.logging import log_error, log_info
 from common.secrets import resolve_gmail_oauth, clear_secrets_cache
 from common.dynamodb_repo import get_context_item, put_context_item
 from common.pii import redact_and_map
 from slack.client import SlackClient, build_new_email_notification
+from slack.digest import notification_entry, try_queue_notification
 
 
 def _get_gmail_service(creds_dict: Dict[str, str]):
@@ -41,6 +43,8 @@ def _get_gmail_service(creds_dict: Dict[str, str]):
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     cfg = load_config()
+    # Notifications queued behind Slack's rate limit drain until this
+    deadline = Deadline.from_lambda_context(context)
     try:
         clear_secrets_cache()
         secret_arn = cfg.gmail_oauth_secret_arn  # type: ignore[attr-defined]
@@ -122,6 +126,18 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                 preview = (
                     (redacted or body_raw or "").strip().replace("\r", "")
                 )
+                # ダイジェストモードではキュー経由でまとめて通知
+                if try_queue_notification(
+                    notification_entry(
+                        cfg.slack_channel_id,
+                        context_id,
+                        sender,
+                        subject,
+                        preview,
+                    )
+                ):
+                    count += 1
+                    continue
                 if len(preview) > 400:
                     preview = preview[:400] + "…"
                 blocks = build_new_email_notification(
@@ -144,6 +160,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
                         channel=cfg.slack_channel_id,
                         text=f"新しい問い合わせ: {subject}",
                         blocks=blocks,
+                        deadline=deadline,
                     )
                 count += 1
             except Exception as exc:
@@ -5,4 +5,4 @@ import router
 
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    return router.handle_event(event)  # type: ignore[no-any-return]
+    return router.handle_event(event, context)  # type: ignore[no-any-return]
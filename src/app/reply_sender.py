@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List
+
+import json
+
+from common.config import load_config
+from common.context_record import ContextRecord
+from common.deadline import Deadline
+from common.dynamodb_repo import get_context_item
+from common.logging import log_error, log_info
+from common.secrets import resolve_slack_credentials
+from common.send_queue import (
+    CONFIRMED_SEND_ID_ATTR,
+    REPLY_TEXT_ATTR,
+    SEND_ID_ATTR,
+    SENT_SEND_ID_ATTR,
+    parse_send_message,
+)
+from router import confirm_reply, send_reply
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Deliver replies queued by view_submission: the email by SES,
+    then the Slack confirmation.
+
+    A send is skipped when its ``send_id`` has already gone out or was
+    superseded by a later submission. Failed emails are reported as
+    batch item failures, so SQS redelivers only those (and eventually
+    moves them to the dead-letter queue). Whichever attempt sends the
+    email also confirms it; a redelivered send whose email went out
+    after its attempt gave up only posts the missing confirmation.
+    """
+    cfg = load_config()
+    deadline = Deadline.from_lambda_context(context)
+    bot_token = ""
+    try:
+        bot_token = resolve_slack_credentials(
+            cfg.slack_signing_secret_arn, cfg.slack_app_secret_arn
+        ).get("bot_token", "")
+    except Exception as exc:
+        # The email matters more than the confirmation
+        log_error("slack bot token not available", error=str(exc))
+
+    failures: List[Dict[str, str]] = []
+    report = {"sent": 0, "skipped": 0, "failed": 0}
+    for record in (event or {}).get("Records") or []:
+        message_id = record.get("messageId", "")
+        try:
+            context_id, send_id = parse_send_message(record.get("body", ""))
+        except ValueError as exc:
+            log_error(
+                "invalid reply send message",
+                message_id=message_id,
+                error=str(exc),
+            )
+            continue
+        try:
+            stored = ContextRecord.from_item(
+                get_context_item(context_id, deadline=deadline)
+            )
+        except Exception as exc:
+            log_error(
+                "failed to load context",
+                context_id=context_id,
+                error=str(exc),
+            )
+            failures.append({"itemIdentifier": message_id})
+            report["failed"] += 1
+            continue
+        if stored is None or stored.get(SEND_ID_ATTR) != send_id:
+            log_info(
+                "reply send skipped", context_id=context_id, send_id=send_id
+            )
+            report["skipped"] += 1
+            continue
+        if stored.get(SENT_SEND_ID_ATTR) == send_id:
+            if stored.get(CONFIRMED_SEND_ID_ATTR) != send_id:
+                confirm_reply(cfg, context_id, bot_token, deadline, send_id)
+            log_info(
+                "reply send skipped", context_id=context_id, send_id=send_id
+            )
+            report["skipped"] += 1
+            continue
+        if send_reply(
+            cfg,
+            context_id,
+            stored.recipient,
+            stored.subject,
+            str(stored.get(REPLY_TEXT_ATTR) or ""),
+            bot_token,
+            deadline,
+            send_id=send_id,
+        ):
+            report["sent"] += 1
+        else:
+            failures.append({"itemIdentifier": message_id})
+            report["failed"] += 1
+    log_info("reply sends processed", **report)
+    return {"batchItemFailures": failures}
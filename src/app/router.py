@@ -2,7 +2,10 @@ from __future__ import annotations
 
 import base64
 import json
-from typing import Any, Dict, cast
+import os
+import threading
+from concurrent import futures
+from typing import Any, Dict, Iterator, Optional, cast
 import time
 
 from urllib.parse import parse_qs
@@ -16,8 +19,32 @@ try:
     # Lambda環境用の絶対インポート
     from common.config import load_config
     from common.logging import log_error, log_info
-    from common.secrets import resolve_slack_credentials, clear_secrets_cache
-    from common.dynamodb_repo import get_context_item, put_context_item
+    from common.secrets import resolve_slack_credentials
+    from common.context_record import ContextRecord
+    from common.context_store import STATUS_SENT
+    from common.deadline import (
+        SLACK_ACK_BUDGET_SECONDS,
+        Deadline,
+        boto_config,
+    )
+    from common.dynamodb_repo import (
+        get_context_item,
+        put_context_item,
+        mark_context_status,
+        claim_interaction,
+        complete_interaction,
+        release_interaction,
+        update_context_fields,
+    )
+    from common.idempotency import (
+        InteractionRecords,
+        get_interaction_ledger,
+        interaction_key,
+        slack_retry,
+    )
+    from common.faq_index import FaqMatch, find_faq_template
+    from common.modal_updates import get_modal_updater
+    from common.model_routing import Route, choose_route
     from common.ses_email import send_email
     from slack.signature import verify_slack_signature  # type: ignore
     from slack.client import (
@@ -25,13 +52,44 @@ try:
         build_ai_reply_modal,
         build_new_email_notification,
     )
+    from slack.digest import notification_entry, try_queue_notification
     from common.pii import redact_and_map, reidentify
+    from common.draft_stream import stream_draft
+    from common.send_queue import (
+        CONFIRMED_SEND_ID_ATTR,
+        SENT_SEND_ID_ATTR,
+        try_queue_send,
+    )
 except ImportError:
     # テスト環境用の相対インポート
     from .common.config import load_config
     from .common.logging import log_error, log_info
-    from .common.secrets import resolve_slack_credentials, clear_secrets_cache
-    from .common.dynamodb_repo import get_context_item, put_context_item
+    from .common.secrets import resolve_slack_credentials
+    from .common.context_record import ContextRecord
+    from .common.context_store import STATUS_SENT
+    from .common.deadline import (
+        SLACK_ACK_BUDGET_SECONDS,
+        Deadline,
+        boto_config,
+    )
+    from .common.dynamodb_repo import (
+        get_context_item,
+        put_context_item,
+        mark_context_status,
+        claim_interaction,
+        complete_interaction,
+        release_interaction,
+        update_context_fields,
+    )
+    from .common.idempotency import (
+        InteractionRecords,
+        get_interaction_ledger,
+        interaction_key,
+        slack_retry,
+    )
+    from .common.faq_index import FaqMatch, find_faq_template
+    from .common.modal_updates import get_modal_updater
+    from .common.model_routing import Route, choose_route
     from .common.ses_email import send_email
     from .slack.signature import verify_slack_signature
     from .slack.client import (
@@ -39,11 +97,21 @@ except ImportError:
         build_ai_reply_modal,
         build_new_email_notification,
     )
+    from .slack.digest import notification_entry, try_queue_notification
     from .common.pii import redact_and_map, reidentify
+    from .common.draft_stream import stream_draft
+    from .common.send_queue import (
+        CONFIRMED_SEND_ID_ATTR,
+        SENT_SEND_ID_ATTR,
+        try_queue_send,
+    )
 
 # OpenAI クライアントは任意依存のため、個別にフォールバックを用意
 try:  # pragma: no cover - import-time guard
-    from common.openai_client import generate_reply_draft  # type: ignore
+    from common.generation import (  # type: ignore
+        generate_reply_draft,
+        stream_reply_draft,
+    )
 except Exception:  # pragma: no cover - optional dependency missing
     def generate_reply_draft(
         *args: Any, **kwargs: Any
@@ -53,6 +121,24 @@ except Exception:  # pragma: no cover - optional dependency missing
         )
         return ""
 
+    def stream_reply_draft(
+        *args: Any, **kwargs: Any
+    ) -> Iterator[str]:  # type: ignore[no-redef]
+        log_info(
+            "OpenAI client not available, skipping reply generation."
+        )
+        return iter(())
+
+# Replies are sent off the calling thread, so waiting on SES is bounded
+# by the deadline
+_send_executor = futures.ThreadPoolExecutor(
+    max_workers=4, thread_name_prefix="reply-send"
+)
+# Inline generation leaves this much of the Slack budget for views.open
+MODAL_OPEN_RESERVE_SECONDS = 0.7
+# Inline generation is not attempted with less than this left
+MIN_GENERATION_SECONDS = 0.5
+
 
 def _response(status: int, body: Dict[str, Any]) -> Dict[str, Any]:
     return {
@@ -62,11 +148,516 @@ def _response(status: int, body: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
-def handle_event(event: Dict[str, Any]) -> Dict[str, Any]:
+def _route_for(
+    context_id: str, redacted_body: str, deadline: Deadline
+) -> Route:
+    """Pick the generation route and record it on the context.
+
+    Recording is bookkeeping and is skipped when the budget is tight.
+    """
+    decision = choose_route(redacted_body)
+    log_info(
+        "model route chosen",
+        context_id=context_id,
+        route=decision.route.name,
+        reason=decision.reason,
+        body_tokens=decision.body_tokens,
+    )
+    if not deadline.allows():
+        return decision.route
+    try:
+        update_context_fields(
+            context_id, deadline=deadline, **decision.context_fields()
+        )
+    except Exception as exc:
+        log_error("failed to record model route", error=str(exc))
+    return decision.route
+
+
+def _faq_for(
+    context_id: str, redacted_body: str, deadline: Deadline
+) -> Optional[FaqMatch]:
+    """Approved template for a stock question, recorded on the context."""
+    try:
+        faq = find_faq_template(redacted_body)
+    except Exception as exc:
+        log_error("faq lookup failed", error=str(exc))
+        return None
+    if faq is None:
+        return None
+    log_info(
+        "faq template matched",
+        context_id=context_id,
+        template_id=faq.template_id,
+        score=round(faq.score, 3),
+    )
+    if not deadline.allows():
+        return faq
+    try:
+        update_context_fields(
+            context_id, deadline=deadline, faq_template_id=faq.template_id
+        )
+    except Exception as exc:
+        log_error("failed to record faq template", error=str(exc))
+    return faq
+
+
+def _stream_into_modal(
+    slack: SlackClient,
+    context_id: str,
+    external_id: str,
+    redacted_body: str,
+    pii_map: Dict[str, str],
+    deadline: Deadline,
+    route: Optional[Route] = None,
+) -> None:
+    """Fill the already-open modal progressively as the draft streams.
+
+    Stops at ``deadline`` so the interaction is still acked in time; the
+    operator keeps whatever text arrived by then.
+    """
+    def push(text: str) -> None:
+        slack.update_modal(
+            external_id,
+            build_ai_reply_modal(context_id=context_id, initial_text=text),
+            deadline=deadline,
+        )
+
+    try:
+        stream_draft(
+            stream_reply_draft(
+                redacted_body, timeout=deadline.remaining(), route=route
+            ),
+            pii_map,
+            push,
+            min_interval=0.5,
+            deadline=deadline.expires_at,
+            clock=deadline.clock,
+        )
+    except Exception as exc:
+        log_error("streaming draft update failed", error=str(exc))
+
+
+class _ContextTableInteractions(InteractionRecords):
+    """Interaction records in the context table, bounded by the
+    request's deadline."""
+
+    def __init__(self, deadline: Deadline) -> None:
+        self.deadline = deadline
+
+    def claim(
+        self, key: str, lease_until: int, expires_at: int, now: int
+    ) -> bool:
+        return claim_interaction(
+            key, lease_until, expires_at, now, deadline=self.deadline
+        )
+
+    def complete(self, key: str, expires_at: int) -> None:
+        complete_interaction(key, expires_at, deadline=self.deadline)
+
+    def release(self, key: str) -> None:
+        release_interaction(key, deadline=self.deadline)
+
+
+def _interaction_records(deadline: Deadline) -> Optional[InteractionRecords]:
+    """Shared records, so a retry served by another container is
+    recognised (SLACK_INTERACTION_RECORDS=1)."""
+    if os.getenv("SLACK_INTERACTION_RECORDS", "").lower() not in (
+        "1", "true", "yes"
+    ):
+        return None
+    return _ContextTableInteractions(deadline)
+
+
+def confirm_reply(
+    cfg: Any,
+    context_id: str,
+    bot_token: str,
+    deadline: Deadline,
+    send_id: str = "",
+) -> None:
+    """Tell the channel a reply went out. With ``send_id`` a sent post is
+    recorded, so the reply sender can tell whether a redelivered send
+    still needs it."""
+    if not (bot_token and cfg.slack_channel_id):
+        return
+    if not deadline.allows():
+        log_info(
+            "skipping slack confirmation, deadline near",
+            context_id=context_id,
+        )
+        return
+    try:
+        posted = SlackClient(bot_token).post_message(
+            channel=cfg.slack_channel_id,
+            text="返信が完了しました",
+            deadline=deadline,
+        )
+    except Exception as exc:
+        log_error(
+            "slack post confirmation failed",
+            error=str(exc) or type(exc).__name__,
+        )
+        return
+    # A deferred post may still be dropped; only a sent one is recorded
+    if not (posted and send_id):
+        return
+    try:
+        update_context_fields(
+            context_id,
+            deadline=deadline,
+            **{CONFIRMED_SEND_ID_ATTR: send_id},
+        )
+    except Exception as exc:
+        log_error("failed to record confirmation", error=str(exc))
+
+
+def send_reply(
+    cfg: Any,
+    context_id: str,
+    recipient: str,
+    subject: str,
+    text: str,
+    bot_token: str,
+    deadline: Deadline,
+    send_id: str = "",
+) -> bool:
+    """Send the reply by SES, then post the Slack confirmation, bounded
+    by ``deadline``; ``True`` once the email is sent.
+
+    The confirmation is only posted after the email went out. An email
+    still in flight at the deadline counts as not sent; if it goes out
+    later, the reply sender confirms it when the send is redelivered.
+    Runs inline for view_submission when no send queue is configured,
+    and in the reply_sender Lambda for queued sends.
+    """
+    sent = threading.Event()
+
+    def deliver() -> None:
+        send_email(
+            sender=cfg.sender_email_address,
+            to_addresses=[recipient],
+            subject=subject,
+            body=text,
+            deadline=deadline,
+        )
+        sent.set()
+        # Partial update: status and timestamp, not the whole email.
+        # Leaving "pending" also drops it from the pending index.
+        fields: Dict[str, Any] = {"sent_at": int(time.time())}
+        if send_id:
+            fields[SENT_SEND_ID_ATTR] = send_id
+        try:
+            mark_context_status(
+                context_id, STATUS_SENT, deadline=deadline, **fields
+            )
+        except Exception as exc:
+            log_error("failed to record sent status", error=str(exc))
+        confirm_reply(cfg, context_id, bot_token, deadline, send_id)
+
+    job = _send_executor.submit(deliver)
+    futures.wait([job], timeout=deadline.remaining())
+    if sent.is_set():
+        return True
+    try:
+        job.result(timeout=0)
+    except futures.TimeoutError:
+        log_error("ses send_email still in flight", context_id=context_id)
+    except Exception as exc:
+        log_error(
+            "ses send_email failed",
+            context_id=context_id,
+            error=str(exc) or type(exc).__name__,
+        )
+    return False
+
+
+def handle_interaction(
+    cfg: Any,
+    body_json: Dict[str, Any],
+    bot_token: str,
+    deadline: Deadline,
+    retry_num: int = 0,
+    retry_reason: str = "",
+) -> Dict[str, Any]:
+    """Handle a verified ``block_actions`` or ``view_submission`` payload.
+
+    Shared by the HTTP path below and the Socket Mode receiver;
+    ``deadline`` is what is left of Slack's acknowledgement window. A
+    second delivery of an interaction being or already handled (a Slack
+    retry, ``retry_num`` > 0, or not) is acknowledged without running
+    anything again; the claim only becomes final once the interaction
+    was handled, so a retry after a failed attempt runs it.
+    """
+    event_type = body_json.get("type")
+    key = interaction_key(body_json)
+    ledger = get_interaction_ledger()
+    records = _interaction_records(deadline)
+    if ledger.is_duplicate(key, records):
+        log_info(
+            "duplicate interaction acknowledged",
+            key=key,
+            retry_num=retry_num,
+            retry_reason=retry_reason,
+        )
+        if event_type == "view_submission":
+            return _response(200, {"response_action": "clear"})
+        return _response(200, {"ack": True})
+    if retry_num:
+        log_info(
+            "slack retry of unseen interaction",
+            key=key,
+            retry_num=retry_num,
+            retry_reason=retry_reason,
+        )
+    try:
+        response = _run_interaction(cfg, body_json, bot_token, deadline)
+    except Exception:
+        ledger.release(key, records)
+        raise
+    ledger.done(key, records)
+    return response
+
+
+def _run_interaction(
+    cfg: Any,
+    body_json: Dict[str, Any],
+    bot_token: str,
+    deadline: Deadline,
+) -> Dict[str, Any]:
+    # Distinguish block_actions vs view_submission
+    event_type = body_json.get("type")
+    if event_type == "block_actions":
+        log_info("received block_actions")
+        # Extract trigger_id and context_id from action value JSON
+        trigger_id = body_json.get("trigger_id", "")
+        actions = body_json.get("actions") or []
+        context_id = ""
+        if actions:
+            try:
+                val = actions[0].get("value") or "{}"
+                context_id = json.loads(val).get("context_id", "")
+            except Exception:
+                context_id = ""
+        # Prepare initial text. If async endpoint is configured, we won't
+        # block beyond a small budget.
+        slack: Optional[SlackClient] = None
+        if bot_token:
+            try:
+                slack = SlackClient(bot_token)
+                if trigger_id:
+                    # views.open must not wait on a TLS handshake;
+                    # connect while the context is being read
+                    slack.warm()
+            except Exception as exc:
+                log_error("failed to prepare slack client", error=str(exc))
+        initial_text = "ここにAIが生成した返信文案が表示されます。"
+        redacted_body = ""
+        pii_map: Dict[str, str] = {}
+        faq: Optional[FaqMatch] = None
+        # A draft written ahead of the click (batch run, earlier async
+        # job) is shown as is: no inline, streamed or async generation
+        stored_draft = ""
+        try:
+            record = ContextRecord.from_item(
+                get_context_item(context_id, deadline=deadline)
+                if context_id
+                else None
+            )
+            if record is not None:
+                redacted_body = record.body_redacted
+                pii_map = record.pii_map
+                stored_draft = record.draft_redacted
+            # A stock question gets its approved template at once; the
+            # model is skipped (or left to the async worker).
+            faq = _faq_for(context_id, redacted_body, deadline)
+            if faq is not None:
+                initial_text = reidentify(faq.answer, pii_map)
+            elif stored_draft:
+                log_info("stored draft used", context_id=context_id)
+                initial_text = reidentify(stored_draft, pii_map)
+            # Do quick inline generation only when async endpoint is not
+            # set and within what is left of the Slack budget once
+            # views.open is reserved. Streaming defers it until the modal
+            # is open.
+            budget = deadline.remaining() - MODAL_OPEN_RESERVE_SECONDS
+            if (
+                redacted_body
+                and faq is None
+                and not stored_draft
+                and not cfg.async_generation_endpoint
+                and not cfg.openai_streaming
+                and budget >= MIN_GENERATION_SECONDS
+            ):
+                try:
+                    draft = generate_reply_draft(
+                        redacted_body,
+                        budget=budget,
+                        route=_route_for(
+                            context_id, redacted_body, deadline
+                        ),
+                    )
+                except Exception as exc:
+                    log_error("openai generation failed", error=str(exc))
+                    draft = ""
+                if draft:
+                    try:
+                        initial_text = reidentify(draft, pii_map)
+                    except Exception:
+                        initial_text = draft
+        except Exception as exc:
+            log_error("prefill draft failed", error=str(exc))
+
+        # Open modal
+        if slack is not None and trigger_id:
+            try:
+                external_id = (
+                    f"ai-reply-{context_id}" if context_id else None
+                )
+                view = build_ai_reply_modal(
+                    context_id=context_id or "",
+                    initial_text=initial_text,
+                    external_id=external_id,
+                )
+                slack.open_modal(
+                    trigger_id=trigger_id, view=view, deadline=deadline
+                )
+                if (
+                    cfg.openai_streaming
+                    and redacted_body
+                    and faq is None
+                    and not stored_draft
+                    and external_id
+                    and not cfg.async_generation_endpoint
+                    and deadline.allows(MIN_GENERATION_SECONDS)
+                ):
+                    _stream_into_modal(
+                        slack,
+                        context_id,
+                        external_id,
+                        redacted_body,
+                        pii_map,
+                        deadline=deadline,
+                        route=_route_for(
+                            context_id, redacted_body, deadline
+                        ),
+                    )
+            except Exception as exc:
+                log_error("failed to open slack modal", error=str(exc))
+        # Trigger async generation if configured
+        try:
+            if (
+                cfg.async_generation_endpoint
+                and context_id
+                and not stored_draft
+                and (faq is None or cfg.faq_background_generation)
+            ):
+                payload = {
+                    "context_id": context_id,
+                    "external_id": f"ai-reply-{context_id}",
+                    "stage": cfg.stage,
+                }
+                # The job is another process: pass the hash views.open
+                # returned so its updates never overwrite a newer view
+                view_hash = get_modal_updater().current_hash(
+                    payload["external_id"]
+                )
+                if view_hash:
+                    payload["view_hash"] = view_hash
+                # Include content to avoid cross-cloud data fetch
+                try:
+                    payload["redacted_body"] = redacted_body
+                    payload["pii_map"] = pii_map
+                except Exception:
+                    pass
+                headers = {
+                    "Content-Type": "application/json",
+                }
+                if cfg.async_generation_auth_header:
+                    headers["Authorization"] = (
+                        cfg.async_generation_auth_header
+                    )
+                import urllib.request
+                req = urllib.request.Request(
+                    url=cfg.async_generation_endpoint,
+                    data=json.dumps(payload).encode("utf-8"),
+                    headers=headers,
+                    method="POST",
+                )
+                # Fire-and-forget; do not block. Small timeout.
+                try:
+                    urllib.request.urlopen(
+                        req, timeout=deadline.cap(1.0)
+                    )
+                except Exception:
+                    pass
+        except Exception as exc:
+            log_error("failed to trigger async generation", error=str(exc))
+
+        return _response(200, {"ack": True})
+    if event_type == "view_submission":
+        log_info("received view_submission")
+        # Extract context_id from private_metadata
+        private_metadata = body_json.get("view", {}).get(
+            "private_metadata", "{}"
+        )
+        try:
+            meta = json.loads(private_metadata)
+        except Exception:
+            meta = {}
+        context_id = meta.get("context_id", "")
+
+        # Extract edited text
+        values = body_json.get("view", {}).get("state", {}).get(
+            "values", {}
+        )
+        edited_text = (
+            values.get("editable_reply_block", {})
+            .get("editable_reply_input", {})
+            .get("value", "")
+        )
+
+        # Fetch context from DDB
+        record = ContextRecord.from_item(
+            get_context_item(context_id, deadline=deadline)
+            if context_id
+            else None
+        )
+        if record is None:
+            log_error(
+                "context not found or missing", context_id=context_id
+            )
+            return _response(200, {"response_action": "clear"})
+
+        # Persist the send intent and leave delivery to the reply sender,
+        # so the modal closes without waiting on SES or Slack
+        if not try_queue_send(context_id, edited_text, deadline):
+            send_reply(
+                cfg,
+                context_id,
+                record.recipient,
+                record.subject,
+                edited_text,
+                bot_token,
+                deadline,
+            )
+        return _response(200, {"response_action": "clear"})
+
+    log_error("unknown slack event type", event_type=str(event_type))
+    return _response(400, {"error": "unsupported"})
+
+
+def handle_event(
+    event: Dict[str, Any], context: Any = None
+) -> Dict[str, Any]:
     cfg = load_config()
+    # Every outbound call below is bounded by what is left of the
+    # invocation (or of Slack's acknowledgement window)
+    invocation = Deadline.from_lambda_context(context)
 
     # API Gateway v2 (HTTP API) path
     if "requestContext" in event and "http" in event["requestContext"]:
+        deadline = invocation.child(SLACK_ACK_BUDGET_SECONDS)
         is_base64 = event.get("isBase64Encoded", False)
         raw_body = event.get("body") or ""
         body_bytes = (
@@ -83,8 +674,8 @@ def handle_event(event: Dict[str, Any]) -> Dict[str, Any]:
         sig = headers.get("x-slack-signature", "")
 
         try:
-            # Clear secrets cache to ensure fresh token retrieval
-            clear_secrets_cache()
+            # Cached with a TTL, so verification makes no network call on
+            # a warm container; rotated secrets apply within the TTL
             creds = resolve_slack_credentials(
                 cfg.slack_signing_secret_arn, cfg.slack_app_secret_arn
             )
@@ -125,174 +716,15 @@ def handle_event(event: Dict[str, Any]) -> Dict[str, Any]:
                 "body": body_json["challenge"],
             }
 
-        # Distinguish block_actions vs view_submission
-        event_type = body_json.get("type")
-        if event_type == "block_actions":
-            log_info("received block_actions")
-            # Extract trigger_id and context_id from action value JSON
-            trigger_id = body_json.get("trigger_id", "")
-            actions = body_json.get("actions") or []
-            context_id = ""
-            if actions:
-                try:
-                    val = actions[0].get("value") or "{}"
-                    context_id = json.loads(val).get("context_id", "")
-                except Exception:
-                    context_id = ""
-            # Prepare initial text. If async endpoint is configured, we won't
-            # block beyond a small budget.
-            bot_token = creds.get("bot_token", "")
-            initial_text = "ここにAIが生成した返信文案が表示されます。"
-            started = time.time()
-            try:
-                item = get_context_item(context_id) if context_id else None
-                redacted_body = (item or {}).get("body_redacted") or ""
-                pii_map_raw = (item or {}).get("pii_map") or "{}"
-                pii_map: Dict[str, str] = {}
-                try:
-                    pii_map = json.loads(str(pii_map_raw))
-                except Exception:
-                    pii_map = {}
-                # Do quick inline generation only when async endpoint is not
-                # set and within a tight time budget.
-                if (
-                    redacted_body
-                    and not cfg.async_generation_endpoint
-                    and (time.time() - started) < 3.0
-                ):
-                    try:
-                        draft = generate_reply_draft(redacted_body)
-                    except Exception as exc:
-                        log_error("openai generation failed", error=str(exc))
-                        draft = ""
-                    if draft:
-                        try:
-                            initial_text = reidentify(draft, pii_map)
-                        except Exception:
-                            initial_text = draft
-            except Exception as exc:
-                log_error("prefill draft failed", error=str(exc))
-
-            # Open modal
-            if bot_token and trigger_id:
-                try:
-                    slack = SlackClient(bot_token)
-                    external_id = (
-                        f"ai-reply-{context_id}" if context_id else None
-                    )
-                    view = build_ai_reply_modal(
-                        context_id=context_id or "",
-                        initial_text=initial_text,
-                        external_id=external_id,
-                    )
-                    slack.open_modal(trigger_id=trigger_id, view=view)
-                except Exception as exc:
-                    log_error("failed to open slack modal", error=str(exc))
-            # Trigger async generation if configured
-            try:
-                if cfg.async_generation_endpoint and context_id:
-                    payload = {
-                        "context_id": context_id,
-                        "external_id": f"ai-reply-{context_id}",
-                        "stage": cfg.stage,
-                    }
-                    # Include content to avoid cross-cloud data fetch
-                    try:
-                        payload["redacted_body"] = redacted_body
-                        payload["pii_map"] = pii_map
-                    except Exception:
-                        pass
-                    headers = {
-                        "Content-Type": "application/json",
-                    }
-                    if cfg.async_generation_auth_header:
-                        headers["Authorization"] = (
-                            cfg.async_generation_auth_header
-                        )
-                    import urllib.request
-                    req = urllib.request.Request(
-                        url=cfg.async_generation_endpoint,
-                        data=json.dumps(payload).encode("utf-8"),
-                        headers=headers,
-                        method="POST",
-                    )
-                    # Fire-and-forget; do not block. Small timeout.
-                    try:
-                        urllib.request.urlopen(req, timeout=1)
-                    except Exception:
-                        pass
-            except Exception as exc:
-                log_error("failed to trigger async generation", error=str(exc))
-
-            return _response(200, {"ack": True})
-        if event_type == "view_submission":
-            log_info("received view_submission")
-            # Extract context_id from private_metadata
-            private_metadata = body_json.get("view", {}).get(
-                "private_metadata", "{}"
-            )
-            try:
-                meta = json.loads(private_metadata)
-            except Exception:
-                meta = {}
-            context_id = meta.get("context_id", "")
-
-            # Extract edited text
-            values = body_json.get("view", {}).get("state", {}).get(
-                "values", {}
-            )
-            edited_text = (
-                values.get("editable_reply_block", {})
-                .get("editable_reply_input", {})
-                .get("value", "")
-            )
-
-            # Fetch context from DDB
-            item = get_context_item(context_id) if context_id else None
-            if not item:
-                log_error(
-                    "context not found or missing", context_id=context_id
-                )
-                return _response(200, {"response_action": "clear"})
-
-            recipient = item.get("sender_email") or item.get("to") or ""
-            subject = item.get("subject") or ""
-
-            # Send email via SES
-            try:
-                send_email(
-                    sender=cfg.sender_email_address,
-                    to_addresses=[recipient],
-                    subject=subject,
-                    body=edited_text,
-                )
-            except Exception as exc:
-                log_error("ses send_email failed", error=str(exc))
-
-            # Post Slack confirmation
-            try:
-                # Clear secrets cache to ensure fresh token retrieval
-                clear_secrets_cache()
-                bot_token = (
-                    resolve_slack_credentials(
-                        cfg.slack_signing_secret_arn,
-                        cfg.slack_app_secret_arn,
-                    ).get("bot_token", "")
-                )
-                if bot_token and cfg.slack_channel_id:
-                    SlackClient(bot_token).post_message(
-                        channel=cfg.slack_channel_id,
-                        text="返信が完了しました",
-                    )
-            except Exception as exc:
-                log_error(
-                    "slack post confirmation failed", error=str(exc)
-                )
-
-            return _response(200, {"response_action": "clear"})
-
-        log_error("unknown slack event type", event_type=str(event_type))
-        return _response(400, {"error": "unsupported"})
+        retry_num, retry_reason = slack_retry(headers)
+        return handle_interaction(
+            cfg,
+            body_json,
+            creds.get("bot_token", ""),
+            deadline,
+            retry_num,
+            retry_reason,
+        )
 
     # S3 (SES inbound) event path: fetch raw email from S3,
     # parse, persist, then notify via Slack
@@ -305,7 +737,9 @@ def handle_event(event: Dict[str, Any]) -> Dict[str, Any]:
                 bucket = (s3_info.get("bucket") or {}).get("name", "")
                 key_enc = (s3_info.get("object") or {}).get("key", "")
                 key = unquote_plus(key_enc)
-                s3 = boto3.client("s3")
+                s3 = boto3.client(
+                    "s3", config=boto_config(invocation.cap(10.0))
+                )
                 obj = s3.get_object(Bucket=bucket, Key=key)
                 raw_bytes = obj["Body"].read()
                 parser = BytesParser(
@@ -350,21 +784,31 @@ def handle_event(event: Dict[str, Any]) -> Dict[str, Any]:
                 "body_redacted": redacted,
                 "pii_map": json.dumps(pii_map, ensure_ascii=False),
             }
-            put_context_item(item)
+            put_context_item(item, deadline=invocation)
             log_info("context saved", context_id=context_id)
 
             # Slack notify with new email details
             try:
-                # Clear secrets cache to ensure fresh token retrieval
-                clear_secrets_cache()
-                creds = resolve_slack_credentials(
-                    cfg.slack_signing_secret_arn,
-                    cfg.slack_app_secret_arn,
+                text_for_preview = (redacted or body_raw or "")
+                preview = text_for_preview.strip().replace("\r", "")
+                # Digest mode batches notifications into one message
+                queued = try_queue_notification(
+                    notification_entry(
+                        cfg.slack_channel_id,
+                        context_id,
+                        source,
+                        subject,
+                        preview,
+                    )
                 )
-                bot_token = creds.get("bot_token", "")
+                bot_token = ""
+                if not queued:
+                    creds = resolve_slack_credentials(
+                        cfg.slack_signing_secret_arn,
+                        cfg.slack_app_secret_arn,
+                    )
+                    bot_token = creds.get("bot_token", "")
                 if bot_token and cfg.slack_channel_id:
-                    text_for_preview = (redacted or body_raw or "")
-                    preview = text_for_preview.strip().replace("\r", "")
                     if len(preview) > 400:
                         preview = preview[:400] + "…"
                     blocks = build_new_email_notification(
@@ -377,6 +821,7 @@ def handle_event(event: Dict[str, Any]) -> Dict[str, Any]:
                         channel=cfg.slack_channel_id,
                         text=f"新しい問い合わせ: {subject}",
                         blocks=blocks,
+                        deadline=invocation,
                     )
             except Exception as exc:
                 log_error("slack notify failed", error=str(exc))
@@ -1,13 +1,26 @@
 from .signature import verify_slack_signature
 from .client import (
+    AsyncSlackClient,
     SlackClient,
     build_ai_reply_modal,
     build_new_email_notification,
 )
+from .dispatcher import SlackDispatcher, get_dispatcher
+from .digest import (
+    build_digest_notification,
+    notification_entry,
+    try_queue_notification,
+)
 
 __all__ = [
     "verify_slack_signature",
     "SlackClient",
+    "AsyncSlackClient",
     "build_ai_reply_modal",
     "build_new_email_notification",
+    "SlackDispatcher",
+    "get_dispatcher",
+    "build_digest_notification",
+    "notification_entry",
+    "try_queue_notification",
 ]
@@ -1,26 +1,212 @@
 from __future__ import annotations
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
+import asyncio
 import json
 
-from slack_sdk import WebClient
+try:
+    # Lambda環境用の絶対インポート
+    from common.deadline import (
+        MIN_CALL_SECONDS,
+        Deadline,
+        DeadlineExceeded,
+        cap_timeout,
+    )
+    from common.logging import log_error
+    from common.modal_updates import get_modal_updater
+    from common.retry import (
+        async_call_with_retry,
+        is_retryable,
+        retry_after_seconds,
+    )
+    from common.slack_api import (
+        DEFAULT_TIMEOUT_SECONDS,
+        AsyncSlackWebClient,
+        get_slack_web_client,
+    )
+except ImportError:
+    # テスト環境用の相対インポート
+    from ..common.deadline import (
+        MIN_CALL_SECONDS,
+        Deadline,
+        DeadlineExceeded,
+        cap_timeout,
+    )
+    from ..common.logging import log_error
+    from ..common.modal_updates import get_modal_updater
+    from ..common.retry import (
+        async_call_with_retry,
+        is_retryable,
+        retry_after_seconds,
+    )
+    from ..common.slack_api import (
+        DEFAULT_TIMEOUT_SECONDS,
+        AsyncSlackWebClient,
+        get_slack_web_client,
+    )
+from .dispatcher import RETRY_POLICY, OutboundCall, get_dispatcher
+
+# Longest an async post_message keeps retrying
+POST_BUDGET_SECONDS = 60.0
 
 
 class SlackClient:
     def __init__(self, bot_token: str) -> None:
-        self._client = WebClient(token=bot_token)
+        # Cached per token over a shared keep-alive pool, so warm
+        # invocations skip the TLS handshake to slack.com
+        self._client = get_slack_web_client(bot_token)
+        self._dispatcher = get_dispatcher(bot_token)
+
+    def warm(self) -> None:
+        """Connect ahead of ``open_modal`` while other lookups run."""
+        self._client.warm()
 
-    def open_modal(self, trigger_id: str, view: Dict[str, Any]) -> None:
+    def open_modal(
+        self,
+        trigger_id: str,
+        view: Dict[str, Any],
+        deadline: Optional[Deadline] = None,
+    ) -> None:
         # Slack requires views.open within 3 seconds of interaction
-        self._client.views_open(trigger_id=trigger_id, view=view)
+        response = self._client.views_open(
+            trigger_id=trigger_id,
+            view=view,
+            timeout=cap_timeout(deadline, DEFAULT_TIMEOUT_SECONDS),
+        )
+        get_modal_updater().opened(view.get("external_id"), view, response)
+
+    def update_modal(
+        self,
+        external_id: str,
+        view: Dict[str, Any],
+        deadline: Optional[Deadline] = None,
+    ) -> bool:
+        """Skipped when the modal already shows ``view``; ``False`` once
+        the modal was changed elsewhere (see ``ModalUpdater``)."""
+        return get_modal_updater().update(
+            self._client,
+            external_id,
+            view,
+            timeout=cap_timeout(deadline, DEFAULT_TIMEOUT_SECONDS),
+        )
 
     def post_message(
-        self, channel: str, text: str, blocks: Dict[str, Any] | None = None
+        self,
+        channel: str,
+        text: str,
+        blocks: Dict[str, Any] | None = None,
+        deadline: Optional[Deadline] = None,
+    ) -> bool:
+        """Queue the message behind Slack's rate limit and send what fits
+        before ``deadline``; the rest is deferred, not dropped. ``True``
+        only when this message was sent before returning."""
+        payload: Dict[str, Any] = {"channel": channel, "text": text}
+        if blocks is not None:
+            payload["blocks"] = blocks
+        call = OutboundCall("chat.postMessage", payload)
+        self._dispatcher.enqueue(call)
+        self._dispatcher.flush(deadline)
+        return call.sent
+
+
+class AsyncSlackClient:
+    """``SlackClient`` for coroutines, with the same methods.
+
+    Messages are paced by the same per-channel buckets as the token's
+    dispatcher, so sync and async senders in one process share Slack's
+    rate limit. A message that still cannot be sent by ``deadline`` goes
+    to the dispatcher's outbox when there is one.
+    """
+
+    def __init__(
+        self, bot_token: str, client: Optional[AsyncSlackWebClient] = None
+    ) -> None:
+        self._client = client or AsyncSlackWebClient(bot_token)
+        self._dispatcher = get_dispatcher(bot_token)
+
+    async def open_modal(
+        self,
+        trigger_id: str,
+        view: Dict[str, Any],
+        deadline: Optional[Deadline] = None,
     ) -> None:
-        kwargs: Dict[str, Any] = {"channel": channel, "text": text}
+        response = await self._client.views_open(
+            trigger_id=trigger_id,
+            view=view,
+            timeout=cap_timeout(deadline, DEFAULT_TIMEOUT_SECONDS),
+        )
+        get_modal_updater().opened(view.get("external_id"), view, response)
+
+    async def update_modal(
+        self,
+        external_id: str,
+        view: Dict[str, Any],
+        deadline: Optional[Deadline] = None,
+    ) -> bool:
+        return await get_modal_updater().aupdate(
+            self._client,
+            external_id,
+            view,
+            timeout=cap_timeout(deadline, DEFAULT_TIMEOUT_SECONDS),
+        )
+
+    async def post_message(
+        self,
+        channel: str,
+        text: str,
+        blocks: Dict[str, Any] | None = None,
+        deadline: Optional[Deadline] = None,
+    ) -> bool:
+        """Send once the channel's bucket allows, retrying 429s and
+        transient errors until ``deadline``; deferred, not dropped, when
+        time runs out. ``True`` only when the message was sent."""
+        payload: Dict[str, Any] = {"channel": channel, "text": text}
         if blocks is not None:
-            kwargs["blocks"] = blocks
-        self._client.chat_postMessage(**kwargs)
+            payload["blocks"] = blocks
+        call = OutboundCall("chat.postMessage", payload)
+        bucket = self._dispatcher.bucket(call)
+        deadline = (deadline or Deadline.never()).child(POST_BUDGET_SECONDS)
+
+        async def attempt(timeout: float) -> None:
+            call.attempts += 1
+            wait = bucket.wait_time()
+            while wait > 0:
+                if wait + MIN_CALL_SECONDS >= deadline.remaining():
+                    raise DeadlineExceeded("rate limited past deadline")
+                await asyncio.sleep(wait)
+                wait = bucket.wait_time()
+            bucket.take()
+            try:
+                await self._client.api_call(
+                    call.method,
+                    call.payload,
+                    timeout=min(timeout, DEFAULT_TIMEOUT_SECONDS),
+                )
+            except Exception as exc:
+                hinted = retry_after_seconds(exc)
+                if hinted is not None:
+                    bucket.pause(hinted)
+                raise
+
+        try:
+            await async_call_with_retry(
+                attempt, deadline.expires_at, RETRY_POLICY, deadline.clock
+            )
+        except Exception as exc:
+            outbox = self._dispatcher.outbox
+            if outbox is not None and is_retryable(exc):
+                await asyncio.to_thread(
+                    outbox.defer, call, bucket.wait_time()
+                )
+                return False
+            log_error(
+                "slack call dropped",
+                method=call.method,
+                attempts=call.attempts,
+                error=str(exc),
+            )
+            return False
+        return True
 
 
 def build_ai_reply_modal(
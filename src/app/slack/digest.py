@@ -0,0 +1,146 @@
+"""
+Digest mode for new-email notifications.
+
+With ``SLACK_DIGEST_QUEUE_URL`` set, each inbound email is queued on SQS
+instead of posted. The queue's Lambda trigger batches up to
+``SLACK_DIGEST_MAX_ITEMS`` entries, or whatever arrived within its
+batching window, and the ``slack_outbox`` Lambda posts each batch as one
+message. Every entry keeps its own "generate reply" button carrying its
+``context_id``, so the modal flow is unchanged.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.logging import log_error, log_info
+except ImportError:
+    # テスト環境用の相対インポート
+    from ..common.logging import log_error, log_info
+
+DEFAULT_MAX_ITEMS = 10
+# Slack allows 50 blocks per message: a header plus two per entry
+MAX_ITEMS = 24
+PREVIEW_CHARS = 150
+
+
+def digest_queue_url() -> str:
+    return os.getenv("SLACK_DIGEST_QUEUE_URL", "")
+
+
+def max_items() -> int:
+    try:
+        value = int(os.getenv("SLACK_DIGEST_MAX_ITEMS", "") or 0)
+    except ValueError:
+        value = 0
+    return min(value or DEFAULT_MAX_ITEMS, MAX_ITEMS)
+
+
+def notification_entry(
+    channel: str,
+    context_id: str,
+    sender: str,
+    subject: str,
+    preview_text: str,
+) -> Dict[str, str]:
+    preview = preview_text.strip()
+    if len(preview) > PREVIEW_CHARS:
+        preview = preview[:PREVIEW_CHARS] + "…"
+    return {
+        "channel": channel,
+        "context_id": context_id,
+        "sender": sender,
+        "subject": subject,
+        "preview": preview,
+    }
+
+
+def queue_notification(entry: Dict[str, str], client: Any = None) -> None:
+    """Send ``entry`` to the digest queue; raises if SQS refuses it."""
+    if client is None:
+        import boto3
+
+        client = boto3.client("sqs")
+    client.send_message(
+        QueueUrl=digest_queue_url(),
+        MessageBody=json.dumps({"digest": entry}, ensure_ascii=False),
+    )
+    log_info(
+        "notification queued for digest", context_id=entry["context_id"]
+    )
+
+
+def try_queue_notification(entry: Dict[str, str]) -> bool:
+    """Queue ``entry`` when digest mode is on; ``False`` means the caller
+    should post the notification itself (mode off or queue unreachable)."""
+    if not digest_queue_url() or not entry.get("channel"):
+        return False
+    try:
+        queue_notification(entry)
+        return True
+    except Exception as exc:
+        log_error("digest queue failed, posting directly", error=str(exc))
+        return False
+
+
+def build_digest_notification(entries: List[Dict[str, str]]) -> Any:
+    # One section (with its own button) and a divider per email
+    blocks: List[Dict[str, Any]] = [
+        {
+            "type": "header",
+            "text": {
+                "type": "plain_text",
+                "text": f"新しい問い合わせが{len(entries)}件届きました",
+            },
+        },
+    ]
+    for entry in entries:
+        blocks.append(
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": (
+                        f"*From:* {entry.get('sender', '')}\n"
+                        f"*Subject:* {entry.get('subject', '')}\n"
+                        f"{entry.get('preview') or '(本文なし)'}"
+                    ),
+                },
+                "accessory": {
+                    "type": "button",
+                    "text": {"type": "plain_text", "text": "返信文を生成する"},
+                    "action_id": "generate_reply_action",
+                    "value": json.dumps(
+                        {"context_id": entry.get("context_id", "")}
+                    ),
+                },
+            }
+        )
+        blocks.append({"type": "divider"})
+    return blocks[:-1]
+
+
+def digest_messages(
+    entries: List[Dict[str, str]], limit: Optional[int] = None
+) -> List[Tuple[str, str, Any]]:
+    """``(channel, text, blocks)`` per message, at most ``limit`` emails
+    each, in arrival order."""
+    limit = min(limit or max_items(), MAX_ITEMS)
+    by_channel: Dict[str, List[Dict[str, str]]] = {}
+    for entry in entries:
+        by_channel.setdefault(entry.get("channel", ""), []).append(entry)
+    messages = []
+    for channel, items in by_channel.items():
+        for start in range(0, len(items), limit):
+            chunk = items[start: start + limit]
+            text = f"新しい問い合わせ {len(chunk)}件: " + " / ".join(
+                entry.get("subject", "") for entry in chunk
+            )
+            messages.append(
+                (channel, text[:300], build_digest_notification(chunk))
+            )
+    return messages
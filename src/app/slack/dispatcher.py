@@ -0,0 +1,394 @@
+"""
+Rate-limited outbound dispatcher for Slack Web API calls.
+
+Calls are queued per bot token and sent as fast as Slack's per-method
+limits allow: each (method, channel) pair has a token bucket sized to the
+method's tier, and a 429 empties the bucket for the ``Retry-After`` the
+server asked for. ``flush`` drains the queue until the caller's deadline;
+whatever is left is handed to the durable outbox (an SQS queue drained by
+the ``slack_outbox`` Lambda) when one is configured, and otherwise stays
+queued in memory for the next flush in this process.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.deadline import MIN_CALL_SECONDS, Deadline
+    from common.logging import log_error, log_info
+    from common.retry import (
+        RetryPolicy,
+        backoff_delay,
+        is_retryable,
+        retry_after_seconds,
+    )
+    from common.slack_api import (
+        DEFAULT_TIMEOUT_SECONDS,
+        SlackWebClient,
+        get_slack_web_client,
+    )
+except ImportError:
+    # テスト環境用の相対インポート
+    from ..common.deadline import MIN_CALL_SECONDS, Deadline
+    from ..common.logging import log_error, log_info
+    from ..common.retry import (
+        RetryPolicy,
+        backoff_delay,
+        is_retryable,
+        retry_after_seconds,
+    )
+    from ..common.slack_api import (
+        DEFAULT_TIMEOUT_SECONDS,
+        SlackWebClient,
+        get_slack_web_client,
+    )
+
+# Slack's Web API tiers, in requests per second (per method and workspace)
+TIER_RATES = {1: 1 / 60, 2: 20 / 60, 3: 50 / 60, 4: 100 / 60}
+# (rate, burst) per method. chat.postMessage is outside the tiers: about
+# one message per second per channel, with short bursts tolerated.
+METHOD_LIMITS: Dict[str, Tuple[float, int]] = {
+    "chat.postMessage": (1.0, 3),
+    "chat.update": (TIER_RATES[3], 5),
+    "views.open": (TIER_RATES[4], 10),
+    "views.update": (TIER_RATES[4], 10),
+}
+DEFAULT_LIMIT = (TIER_RATES[2], 2)
+# Payload field that partitions a method's limit
+PARTITION_FIELDS = {"chat.postMessage": "channel", "chat.update": "channel"}
+
+DEFAULT_MAX_QUEUE = 100
+# SQS refuses longer delays
+MAX_DEFER_SECONDS = 900
+RETRY_POLICY = RetryPolicy(max_attempts=5, base_delay=1.0, max_delay=30.0)
+
+
+class TokenBucket:
+    """``rate`` tokens per second, holding at most ``burst``."""
+
+    def __init__(
+        self,
+        rate: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available (0 if one is now)."""
+        now = self.clock()
+        if now < self._paused_until:
+            return self._paused_until - now
+        if now > self._updated:
+            self._tokens = min(
+                float(self.burst),
+                self._tokens + (now - self._updated) * self.rate,
+            )
+            self._updated = now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.rate
+
+    def take(self) -> bool:
+        if self.wait_time() > 0:
+            return False
+        self._tokens -= 1
+        return True
+
+    def pause(self, seconds: float) -> None:
+        """Hand out nothing for ``seconds`` (a server-sent Retry-After)."""
+        until = self.clock() + seconds
+        if until > self._paused_until:
+            self._paused_until = until
+            self._tokens = 0.0
+            self._updated = until
+
+
+@dataclass
+class OutboundCall:
+    method: str
+    payload: Dict[str, Any]
+    attempts: int = 0
+    # clock() time before which the call must not be sent
+    not_before: float = field(default=0.0, compare=False)
+    # Set once Slack accepted the call in this process
+    sent: bool = field(default=False, compare=False)
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        partition = PARTITION_FIELDS.get(self.method)
+        if partition is None:
+            return self.method, ""
+        return self.method, str(self.payload.get(partition, ""))
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {
+                "method": self.method,
+                "payload": self.payload,
+                "attempts": self.attempts,
+            },
+            ensure_ascii=False,
+        )
+
+    @classmethod
+    def from_json(cls, raw: str) -> "OutboundCall":
+        data = json.loads(raw)
+        return cls(
+            method=str(data["method"]),
+            payload=dict(data["payload"]),
+            attempts=int(data.get("attempts") or 0),
+        )
+
+
+class Outbox:
+    """Durable place for calls that could not be sent in time."""
+
+    def defer(self, call: OutboundCall, delay: float) -> None:
+        raise NotImplementedError
+
+
+class SqsOutbox(Outbox):
+    def __init__(self, queue_url: str, client: Any = None) -> None:
+        self.queue_url = queue_url
+        self._client = client
+
+    def defer(self, call: OutboundCall, delay: float) -> None:
+        if self._client is None:
+            import boto3
+
+            self._client = boto3.client("sqs")
+        self._client.send_message(
+            QueueUrl=self.queue_url,
+            MessageBody=call.to_json(),
+            DelaySeconds=int(min(math.ceil(max(delay, 0)), MAX_DEFER_SECONDS)),
+        )
+
+
+def build_outbox() -> Optional[Outbox]:
+    """``SLACK_OUTBOX_QUEUE_URL`` enables the SQS outbox."""
+    queue_url = os.getenv("SLACK_OUTBOX_QUEUE_URL", "")
+    return SqsOutbox(queue_url) if queue_url else None
+
+
+class SlackDispatcher:
+    """Queue of outbound calls for one bot token, drained by ``flush``.
+
+    Meant to live for the whole process (see ``get_dispatcher``) so the
+    buckets remember recent traffic across warm invocations. Thread-safe:
+    the Socket Mode workers and the reply sender share it. The queue,
+    buckets and counters are guarded by one lock, which is released while
+    a call is sent or a bucket is waited on, so one thread's send does not
+    hold up the others.
+    """
+
+    def __init__(
+        self,
+        client: SlackWebClient,
+        outbox: Optional[Outbox] = None,
+        max_queue: int = DEFAULT_MAX_QUEUE,
+        policy: RetryPolicy = RETRY_POLICY,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Optional[Callable[[float], None]] = None,
+    ) -> None:
+        self.client = client
+        self.outbox = outbox
+        self.max_queue = max_queue
+        self.policy = policy
+        self.clock = clock
+        self._sleep = sleep
+        self._queue: Deque[OutboundCall] = deque()
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.RLock()
+        # Counters for logs
+        self.sent = 0
+        self.deferred = 0
+        self.dropped = 0
+
+    @property
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def bucket(self, call: OutboundCall) -> TokenBucket:
+        with self._lock:
+            bucket = self._buckets.get(call.key)
+            if bucket is None:
+                rate, burst = METHOD_LIMITS.get(call.method, DEFAULT_LIMIT)
+                bucket = TokenBucket(rate, burst, self.clock)
+                self._buckets[call.key] = bucket
+            return bucket
+
+    def submit(self, method: str, payload: Dict[str, Any]) -> None:
+        self.enqueue(OutboundCall(method, payload))
+
+    def enqueue(self, call: OutboundCall) -> None:
+        """Queue ``call``; a full queue first sheds its oldest call to the
+        outbox, or without one sends it (waiting for its bucket)."""
+        with self._lock:
+            if len(self._queue) < self.max_queue:
+                self._queue.append(call)
+                return
+            if self.outbox is not None:
+                oldest = self._queue.popleft()
+                self._queue.append(call)
+        if self.outbox is not None:
+            self._defer(self.outbox, oldest)
+            return
+        self._drain(None, limit=1)
+        with self._lock:
+            self._queue.append(call)
+
+    def _wait_for(self, call: OutboundCall) -> float:
+        with self._lock:
+            return max(
+                self.bucket(call).wait_time(), call.not_before - self.clock()
+            )
+
+    def _next(self) -> Tuple[Optional[OutboundCall], float]:
+        """The queued call that can go soonest, keeping per-key order.
+        Called with the lock held."""
+        best: Optional[OutboundCall] = None
+        best_wait = math.inf
+        seen = set()
+        for call in self._queue:
+            if call.key in seen:
+                continue
+            seen.add(call.key)
+            wait = self._wait_for(call)
+            if wait < best_wait:
+                best, best_wait = call, wait
+        return best, best_wait
+
+    def _send(self, call: OutboundCall, deadline: Optional[Deadline]) -> bool:
+        """Make ``call`` (outside the lock); ``True`` once it went out."""
+        timeout = (
+            DEFAULT_TIMEOUT_SECONDS
+            if deadline is None
+            else deadline.cap(DEFAULT_TIMEOUT_SECONDS)
+        )
+        try:
+            self.client.api_call(call.method, call.payload, timeout=timeout)
+        except Exception as exc:
+            call.attempts += 1
+            if (
+                not is_retryable(exc)
+                or call.attempts >= self.policy.max_attempts
+            ):
+                with self._lock:
+                    self.dropped += 1
+                log_error(
+                    "slack call dropped",
+                    method=call.method,
+                    attempts=call.attempts,
+                    error=str(exc),
+                )
+                return False
+            delay = backoff_delay(call.attempts - 1, self.policy, exc)
+            hinted = retry_after_seconds(exc)
+            with self._lock:
+                if hinted is not None:
+                    # Rate limited: nothing else for this key until then
+                    self.bucket(call).pause(hinted)
+                call.not_before = self.clock() + delay
+                self._queue.appendleft(call)
+            log_info(
+                "slack call retry scheduled",
+                method=call.method,
+                attempts=call.attempts,
+                delay=round(delay, 3),
+            )
+            return False
+        with self._lock:
+            self.sent += 1
+            call.sent = True
+        return True
+
+    def _drain(
+        self, deadline: Optional[Deadline], limit: float = math.inf
+    ) -> int:
+        sent = 0
+        handled = 0
+        while handled < limit:
+            with self._lock:
+                if not self._queue:
+                    break
+                call, wait = self._next()
+                if call is None:
+                    break
+                if deadline is not None and (
+                    wait + MIN_CALL_SECONDS >= deadline.remaining()
+                ):
+                    break
+                if wait <= 0:
+                    self._queue.remove(call)
+                    self.bucket(call).take()
+            if wait > 0:
+                (self._sleep or time.sleep)(wait)
+                continue
+            if self._send(call, deadline):
+                sent += 1
+            handled += 1
+        return sent
+
+    def _defer(self, outbox: Outbox, call: OutboundCall) -> None:
+        try:
+            outbox.defer(call, self._wait_for(call))
+        except Exception as exc:
+            with self._lock:
+                self.dropped += 1
+            log_error(
+                "slack call could not be deferred",
+                method=call.method,
+                error=str(exc),
+            )
+            return
+        with self._lock:
+            self.deferred += 1
+
+    def flush(self, deadline: Optional[Deadline] = None) -> int:
+        """Send queued calls until done or ``deadline``; return how many
+        were sent. Leftovers go to the outbox when there is one."""
+        sent = self._drain(deadline)
+        with self._lock:
+            leftovers = []
+            if self.outbox is not None:
+                leftovers = list(self._queue)
+                self._queue.clear()
+            pending = len(self._queue)
+        if leftovers and self.outbox is not None:
+            for call in leftovers:
+                self._defer(self.outbox, call)
+            log_info("slack calls deferred to outbox", total=self.deferred)
+        elif pending:
+            log_info("slack calls left queued", pending=pending)
+        return sent
+
+
+@lru_cache(maxsize=4)
+def get_dispatcher(token: str) -> SlackDispatcher:
+    """Dispatcher per bot token, sharing its pooled client."""
+    try:
+        max_queue = int(os.getenv("SLACK_OUTBOX_MAX_QUEUE", "") or 0)
+    except ValueError:
+        max_queue = 0
+    return SlackDispatcher(
+        get_slack_web_client(token),
+        outbox=build_outbox(),
+        max_queue=max_queue or DEFAULT_MAX_QUEUE,
+    )
@@ -1,6 +1,21 @@
-import hmac
-import time
-from hashlib import sha256
+from typing import Optional
+
+try:
+    # Lambda環境用の絶対インポート
+    from common.slack_verify import (
+        DEFAULT_TOLERANCE_SECONDS,
+        ReplayCache,
+        check_signature,
+        get_replay_cache,
+    )
+except ImportError:
+    # テスト環境用の相対インポート
+    from ..common.slack_verify import (
+        DEFAULT_TOLERANCE_SECONDS,
+        ReplayCache,
+        check_signature,
+        get_replay_cache,
+    )
 
 
 def verify_slack_signature(
@@ -8,20 +23,13 @@ def verify_slack_signature(
     timestamp: str,
     signature: str,
     body: bytes,
-    tolerance: int = 60 * 5,
+    tolerance: int = DEFAULT_TOLERANCE_SECONDS,
+    replay_cache: Optional[ReplayCache] = None,
 ) -> bool:
-    # Protect against replay
-    now = int(time.time())
-    try:
-        ts = int(timestamp)
-    except Exception:
-        return False
-    if abs(now - ts) > tolerance:
-        return False
-
-    basestring = f"v0:{timestamp}:{body.decode('utf-8')}".encode("utf-8")
-    computed = "v0=" + hmac.new(
-        signing_secret.encode("utf-8"), basestring, sha256
-    ).hexdigest()
-    # Constant-time compare
-    return hmac.compare_digest(computed, signature)
+    # Timestamp window, HMAC over the raw body, then replay protection
+    # across the warm container's requests
+    if replay_cache is None:
+        replay_cache = get_replay_cache()
+    return not check_signature(
+        signing_secret, timestamp, signature, body, tolerance, replay_cache
+    )
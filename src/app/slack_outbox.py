@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from typing import Any, Dict
+
+import json
+
+from common.config import load_config
+from common.deadline import Deadline
+from common.logging import log_error, log_info
+from common.secrets import resolve_slack_credentials
+from slack.digest import digest_messages
+from slack.dispatcher import OutboundCall, get_dispatcher
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """Drain Slack calls deferred to the SQS outbox, and post digests of
+    new-email notifications batched by the digest queue's trigger.
+
+    Calls that still cannot be sent before this invocation's deadline go
+    back to the queue with the delay Slack asked for, so the messages of
+    this batch are always consumed. Failing to reach the bot token raises
+    and leaves the batch to SQS redelivery (and its dead-letter queue).
+    """
+    cfg = load_config()
+    deadline = Deadline.from_lambda_context(context)
+    # Cached with a TTL across warm invocations; rotation applies within it
+    bot_token = resolve_slack_credentials(
+        cfg.slack_signing_secret_arn, cfg.slack_app_secret_arn
+    ).get("bot_token", "")
+    if not bot_token:
+        raise RuntimeError("slack bot token not available")
+
+    dispatcher = get_dispatcher(bot_token)
+    received = 0
+    digest_entries = []
+    for record in (event or {}).get("Records") or []:
+        try:
+            body = json.loads(record.get("body", ""))
+            if "digest" in body:
+                digest_entries.append(dict(body["digest"]))
+            else:
+                dispatcher.enqueue(OutboundCall.from_json(record["body"]))
+            received += 1
+        except (KeyError, TypeError, ValueError) as exc:
+            log_error(
+                "invalid slack outbox message",
+                message_id=record.get("messageId", ""),
+                error=str(exc),
+            )
+    digests = digest_messages(digest_entries)
+    for channel, text, blocks in digests:
+        dispatcher.submit(
+            "chat.postMessage",
+            {"channel": channel, "text": text, "blocks": blocks},
+        )
+    sent = dispatcher.flush(deadline)
+    report = {
+        "received": received,
+        "sent": sent,
+        "pending": dispatcher.pending,
+        "digests": len(digests),
+    }
+    log_info("slack outbox drained", **report)
+    return {"statusCode": 200, "body": json.dumps(report)}
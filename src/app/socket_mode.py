@@ -0,0 +1,308 @@
+"""
+Slack Socket Mode receiver: interactions over a websocket instead of the
+HTTP request URL.
+
+A long-lived process holds one Socket Mode connection, acknowledges each
+envelope as soon as it is read, and hands ``block_actions`` and
+``view_submission`` payloads to worker threads through a bounded queue.
+The workers run the same ``router.handle_interaction`` as the Lambda, so
+behaviour is identical; only the transport changes. There is no cold
+start and no signature check on this path: Slack authenticates the
+connection with the app-level token (``xapp-``) instead.
+
+The acknowledgement carries no payload, so a submitted modal is closed
+by Slack's default handling rather than by ``response_action``.
+
+Run it on a host that stays up (a container with min instances, a VM):
+
+    SLACK_APP_TOKEN=xapp-... python src/app/socket_mode.py
+
+benchmarks/socket_mode_stub.py stands in for Slack locally.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import queue
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    # Lambda環境用の絶対インポート
+    from common import websocket
+    from common.config import load_config
+    from common.deadline import SLACK_ACK_BUDGET_SECONDS, Deadline
+    from common.logging import log_error, log_info
+    from common.retry import RetryPolicy, backoff_delay
+    from common.secrets import get_secret_json, resolve_slack_credentials
+    from common.slack_api import SlackWebClient
+    from router import handle_interaction  # type: ignore
+except ImportError:
+    # テスト環境用の相対インポート
+    from .common import websocket
+    from .common.config import load_config
+    from .common.deadline import SLACK_ACK_BUDGET_SECONDS, Deadline
+    from .common.logging import log_error, log_info
+    from .common.retry import RetryPolicy, backoff_delay
+    from .common.secrets import get_secret_json, resolve_slack_credentials
+    from .common.slack_api import SlackWebClient
+    from .router import handle_interaction
+
+# Envelope types passed to the handler; others are acknowledged only
+DISPATCHED_TYPES = frozenset({"interactive"})
+DISPATCHED_PAYLOADS = frozenset({"block_actions", "view_submission"})
+DEFAULT_WORKERS = 4
+DEFAULT_QUEUE_SIZE = 64
+# Slack pings every few seconds; silence this long means a dead link
+READ_TIMEOUT_SECONDS = 30.0
+# Reconnects never give up; only the delays of the policy apply
+RECONNECT_POLICY = RetryPolicy(base_delay=1.0, max_delay=30.0)
+
+# (payload, deadline, retry_attempt, retry_reason)
+Handler = Callable[[Dict[str, Any], Deadline, int, str], Any]
+Connect = Callable[[str], "websocket.WebSocket"]
+
+
+def open_connection_url(app_token: str) -> str:
+    """A fresh websocket URL from ``apps.connections.open``."""
+    response = SlackWebClient(app_token).api_call(
+        "apps.connections.open", {}
+    )
+    return str(response["url"])
+
+
+def dispatch_interaction(
+    payload: Dict[str, Any],
+    deadline: Deadline,
+    retry_attempt: int = 0,
+    retry_reason: str = "",
+) -> Any:
+    """Run the Lambda's interaction handling for one payload. A
+    redelivered envelope (``retry_attempt`` > 0) is a Slack retry."""
+    cfg = load_config()
+    bot_token = resolve_slack_credentials(
+        cfg.slack_signing_secret_arn, cfg.slack_app_secret_arn
+    ).get("bot_token", "")
+    return handle_interaction(
+        cfg, payload, bot_token, deadline, retry_attempt, retry_reason
+    )
+
+
+def _envelope_retry(message: Dict[str, Any]) -> Tuple[int, str]:
+    """``(retry_attempt, retry_reason)`` of an envelope; Slack sends the
+    same envelope again when it was not acknowledged in time."""
+    try:
+        attempt = int(message.get("retry_attempt") or 0)
+    except (TypeError, ValueError):
+        attempt = 0
+    return attempt, str(message.get("retry_reason") or "")
+
+
+def _connect(url: str) -> "websocket.WebSocket":
+    return websocket.connect(url, read_timeout=READ_TIMEOUT_SECONDS)
+
+
+class SocketModeReceiver:
+    """Reads envelopes on one thread, handles them on ``workers``.
+
+    When ``queue_size`` payloads are already waiting, a new envelope is
+    left unacknowledged (and logged) rather than queued behind them.
+    """
+
+    def __init__(
+        self,
+        app_token: str,
+        handle: Handler = dispatch_interaction,
+        connect: Connect = _connect,
+        open_url: Callable[[str], str] = open_connection_url,
+        workers: int = DEFAULT_WORKERS,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        sleep: Optional[Callable[[float], Any]] = None,
+    ) -> None:
+        self.app_token = app_token
+        self.handle = handle
+        self.connect = connect
+        self.open_url = open_url
+        self.workers = workers
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue(
+            maxsize=queue_size
+        )
+        self._stop = threading.Event()
+        self._sleep = sleep or self._stop.wait
+        self._threads: List[threading.Thread] = []
+        self._socket: Optional[websocket.WebSocket] = None
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = dict.fromkeys(
+            (
+                "connections",
+                "received",
+                "acked",
+                "dropped",
+                "handled",
+                "failed",
+            ),
+            0,
+        )
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def start_workers(self) -> None:
+        for i in range(self.workers - len(self._threads)):
+            thread = threading.Thread(
+                target=self._work, name=f"socket-mode-{i}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            envelope_id, payload, deadline, retry = item
+            try:
+                self.handle(payload, deadline, *retry)
+                self._count("handled")
+            except Exception as exc:
+                self._count("failed")
+                log_error(
+                    "socket mode handler failed",
+                    envelope_id=envelope_id,
+                    payload_type=str(payload.get("type")),
+                    error=str(exc),
+                )
+
+    def on_message(self, ws: Any, text: str) -> bool:
+        """Handle one message; ``False`` when the connection should be
+        replaced."""
+        try:
+            message = json.loads(text)
+        except ValueError:
+            log_error("invalid socket mode message")
+            return True
+        kind = message.get("type")
+        if kind == "hello":
+            log_info("socket mode connected")
+            return True
+        if kind == "disconnect":
+            log_info(
+                "socket mode disconnect requested",
+                reason=str(message.get("reason", "")),
+            )
+            return False
+        envelope_id = message.get("envelope_id")
+        if not envelope_id:
+            return True
+        self._count("received")
+        payload = message.get("payload") or {}
+        if (
+            kind in DISPATCHED_TYPES
+            and payload.get("type") in DISPATCHED_PAYLOADS
+        ):
+            # trigger_id expires three seconds after Slack sent it
+            deadline = Deadline.after(SLACK_ACK_BUDGET_SECONDS)
+            retry = _envelope_retry(message)
+            try:
+                self._queue.put_nowait(
+                    (envelope_id, payload, deadline, retry)
+                )
+            except queue.Full:
+                self._count("dropped")
+                log_error(
+                    "socket mode queue full",
+                    envelope_id=envelope_id,
+                    payload_type=str(payload.get("type")),
+                )
+                return True
+        ws.send(json.dumps({"envelope_id": envelope_id}))
+        self._count("acked")
+        return True
+
+    def serve(self, ws: Any) -> None:
+        """Read ``ws`` until it closes or Slack asks for a new one."""
+        with self._lock:
+            self._socket = ws
+        try:
+            while not self._stop.is_set():
+                text = ws.recv()
+                if text is None or not self.on_message(ws, text):
+                    return
+        finally:
+            ws.close()
+            with self._lock:
+                self._socket = None
+
+    def run_forever(self) -> None:
+        """Connect, serve and reconnect until ``stop``."""
+        self.start_workers()
+        failures = 0
+        while not self._stop.is_set():
+            try:
+                ws = self.connect(self.open_url(self.app_token))
+            except Exception as exc:
+                delay = backoff_delay(failures, RECONNECT_POLICY, exc)
+                failures = min(failures + 1, 10)
+                log_error(
+                    "socket mode connect failed",
+                    error=str(exc),
+                    retry_in=round(delay, 2),
+                )
+                self._sleep(delay)
+                continue
+            failures = 0
+            self._count("connections")
+            try:
+                self.serve(ws)
+            except Exception as exc:
+                # Timeouts and resets: reconnect at once
+                log_error("socket mode connection lost", error=str(exc))
+
+    def stop(self) -> None:
+        """Stop reading, then let the workers finish what is queued."""
+        self._stop.set()
+        with self._lock:
+            ws = self._socket
+        if ws is not None:
+            ws.close()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+
+def resolve_app_token() -> str:
+    """``SLACK_APP_TOKEN``, else ``app_token`` in the Slack app secret."""
+    token = os.getenv("SLACK_APP_TOKEN", "")
+    if token:
+        return token
+    return str(
+        get_secret_json(load_config().slack_app_secret_arn).get(
+            "app_token", ""
+        )
+    )
+
+
+def main() -> None:
+    app_token = resolve_app_token()
+    if not app_token:
+        raise SystemExit("SLACK_APP_TOKEN is not set")
+    receiver = SocketModeReceiver(
+        app_token,
+        workers=int(os.getenv("SOCKET_MODE_WORKERS", str(DEFAULT_WORKERS))),
+    )
+    try:
+        receiver.run_forever()
+    except KeyboardInterrupt:
+        receiver.stop()
+
+
+if __name__ == "__main__":
+    main()
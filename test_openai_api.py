@@ -62,8 +62,10 @@ def test_openai_api(api_key: str) -> bool:
         }
         
         print("🔄 OpenAI APIをテスト中...")
+        # OPENAI_BASE_URL lets this run against benchmarks/openai_stub.py
+        base_url = os.getenv("OPENAI_BASE_URL") or "https://api.openai.com"
         response = requests.post(
-            "https://api.openai.com/v1/chat/completions",
+            f"{base_url.rstrip('/')}/v1/chat/completions",
             headers=headers,
             json=data,
             timeout=30
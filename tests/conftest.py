@@ -0,0 +1,17 @@
+"""
+Shared fixtures for the test suite
+"""
+import pytest
+
+from common import idempotency as lambda_idempotency
+from src.app.common import idempotency
+
+
+@pytest.fixture(autouse=True)
+def fresh_interaction_ledger():
+    """Each test starts with an empty process-wide interaction ledger, so
+    payloads reused across tests are not taken for duplicates."""
+    # Both import paths of the module are in use (see pytest.ini)
+    for module in (idempotency, lambda_idempotency):
+        module.get_interaction_ledger.cache_clear()
+    yield
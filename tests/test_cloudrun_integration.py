@@ -173,19 +173,17 @@ class TestCloudRunJobWorkerIntegration:
                 )
             )
 
-    @patch('urllib.request.urlopen')
-    def test_openai_integration(self, mock_urlopen):
+    @patch('common.openai_client.post_chat_completion')
+    def test_openai_integration(self, mock_post):
         """Test OpenAI API integration with real request structure"""
         # Mock successful OpenAI response
-        mock_response = MagicMock()
-        mock_response.read.return_value = json.dumps({
+        mock_post.return_value = {
             "choices": [{
                 "message": {
                     "content": "Thank you for your inquiry. I will help you with that."
                 }
             }]
-        }).encode('utf-8')
-        mock_urlopen.return_value.__enter__.return_value = mock_response
+        }
 
         config = JobWorkerConfig(
             openai_api_key="test-key",
@@ -197,14 +195,11 @@ class TestCloudRunJobWorkerIntegration:
         
         assert result == "Thank you for your inquiry. I will help you with that."
         
-        # Verify request was made to OpenAI API
-        mock_urlopen.assert_called_once()
-        request = mock_urlopen.call_args[0][0]
-        assert request.get_full_url() == "https://api.openai.com/v1/chat/completions"
-        assert request.get_method() == "POST"
+        # Verify request went through the pooled chat completions transport
+        mock_post.assert_called_once()
         
         # Verify request payload
-        payload = json.loads(request.data.decode('utf-8'))
+        payload = mock_post.call_args[0][0]
         assert payload['model'] == 'gpt-4o-mini'
         assert 'Test email content' in payload['messages'][0]['content']
 
@@ -243,11 +238,11 @@ class TestCloudRunJobWorkerIntegration:
             Key={'context_id': 'test-context-123'}
         )
 
-    @patch('slack_sdk.WebClient')
-    def test_slack_modal_update_integration(self, mock_webclient):
+    @patch('worker.get_slack_web_client')
+    def test_slack_modal_update_integration(self, mock_get_client):
         """Test Slack modal update integration with real Slack client"""
         mock_client = MagicMock()
-        mock_webclient.return_value = mock_client
+        mock_get_client.return_value = mock_client
 
         config = JobWorkerConfig(
             openai_api_key="test-key",
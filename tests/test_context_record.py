@@ -0,0 +1,80 @@
+"""
+Unit tests for the typed ContextRecord
+"""
+from unittest.mock import patch
+
+import pytest
+
+from src.app.common.context_record import ContextRecord
+
+
+class _Binary:
+    """Stand-in for boto3.dynamodb.types.Binary"""
+
+    def __init__(self, value: bytes) -> None:
+        self.value = value
+
+
+class TestContextRecord:
+    """Lazy decoding and typed accessors"""
+
+    def test_header_fields(self):
+        record = ContextRecord(
+            {
+                "context_id": "ctx",
+                "sender_email": "",
+                "to": "fallback@example.com",
+                "subject": "件名",
+                "status": "pending",
+            }
+        )
+
+        assert record.context_id == "ctx"
+        assert record.subject == "件名"
+        assert record.status == "pending"
+        assert record.recipient == "fallback@example.com"
+
+    def test_pii_map_is_decoded_once(self):
+        record = ContextRecord({"pii_map": '{"[EMAIL_1]": "a@example.com"}'})
+
+        with patch(
+            "src.app.common.context_record.json.loads",
+            wraps=__import__("json").loads,
+        ) as mock_loads:
+            first = record.pii_map
+            second = record.pii_map
+
+        assert first == {"[EMAIL_1]": "a@example.com"}
+        assert first is second
+        mock_loads.assert_called_once()
+
+    @pytest.mark.parametrize(
+        "raw",
+        [None, "", "not json", "[1, 2]"],
+    )
+    def test_pii_map_fallbacks(self, raw):
+        assert ContextRecord({"pii_map": raw}).pii_map == {}
+
+    def test_pii_map_already_decoded(self):
+        record = ContextRecord({"pii_map": {"[PHONE_1]": "090"}})
+        assert record.pii_map == {"[PHONE_1]": "090"}
+
+    def test_binary_bodies_are_decoded(self):
+        record = ContextRecord(
+            {
+                "body_raw": _Binary("本文".encode("utf-8")),
+                "body_redacted": b"[EMAIL_1]",
+            }
+        )
+
+        assert record.body_raw == "本文"
+        assert record.body_redacted == "[EMAIL_1]"
+
+    def test_from_item_handles_missing(self):
+        assert ContextRecord.from_item(None) is None
+        assert ContextRecord.from_item({}) is None
+
+    def test_uses_slots(self):
+        record = ContextRecord({"context_id": "ctx"})
+        assert not hasattr(record, "__dict__")
+        assert record.get("missing", "default") == "default"
@@ -0,0 +1,293 @@
+"""
+Unit tests for pluggable context store backends
+"""
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.app.common.context_store import (
+    ConditionFailedError,
+    DynamoDBContextStore,
+    InMemoryContextStore,
+    SQLiteContextStore,
+    build_context_store,
+    get_context_store,
+    reset_context_store,
+)
+from src.app.common.dynamodb_repo import stamp_lifecycle
+
+
+ITEM = {
+    "context_id": "ctx-1",
+    "sender_email": "customer@example.com",
+    "subject": "件名",
+    "body_redacted": "本文 [EMAIL_1]",
+    "pii_map": '{"[EMAIL_1]": "a@example.com"}',
+}
+
+
+class TestContextStores:
+    """Behaviour shared by every backend"""
+
+    @pytest.mark.parametrize("backend", ["memory", "sqlite"])
+    def test_put_and_get_round_trip(self, backend):
+        store = build_context_store(backend)
+        store.put(dict(ITEM))
+
+        assert store.get("ctx-1") == ITEM
+        assert store.get("missing") is None
+
+    @pytest.mark.parametrize("backend", ["memory", "sqlite"])
+    def test_put_replaces_whole_item(self, backend):
+        store = build_context_store(backend)
+        store.put(dict(ITEM))
+        store.put({"context_id": "ctx-1", "subject": "new"})
+
+        assert store.get("ctx-1") == {"context_id": "ctx-1", "subject": "new"}
+
+    @pytest.mark.parametrize("backend", ["memory", "sqlite"])
+    def test_put_requires_context_id(self, backend):
+        store = build_context_store(backend)
+        with pytest.raises(ValueError):
+            store.put({"subject": "no id"})
+
+    @pytest.mark.parametrize("backend", ["memory", "sqlite"])
+    def test_put_new_keeps_existing_item(self, backend):
+        store = build_context_store(backend)
+
+        assert store.put_new(dict(ITEM))
+        assert not store.put_new({"context_id": "ctx-1", "subject": "new"})
+        assert store.get("ctx-1") == ITEM
+
+    def test_dynamodb_put_new_is_conditional(self):
+        resource = MagicMock()
+        table = resource.Table.return_value
+        error = Exception("conditional check failed")
+        error.response = {
+            "Error": {"Code": "ConditionalCheckFailedException"}
+        }
+        table.put_item.side_effect = [None, error]
+        store = DynamoDBContextStore("test-table", resource=resource)
+
+        assert store.put_new(dict(ITEM))
+        assert not store.put_new(dict(ITEM))
+        assert table.put_item.call_args[1]["ConditionExpression"] == (
+            "attribute_not_exists(context_id)"
+        )
+
+    def test_memory_store_returns_copies(self):
+        store = InMemoryContextStore()
+        store.put(dict(ITEM))
+        got = store.get("ctx-1")
+        got["subject"] = "mutated"
+
+        assert store.get("ctx-1")["subject"] == "件名"
+
+    def test_sqlite_store_persists_to_file(self, tmp_path):
+        path = str(tmp_path / "contexts.db")
+        store = SQLiteContextStore(path)
+        store.put(dict(ITEM))
+        store.close()
+
+        assert SQLiteContextStore(path).get("ctx-1") == ITEM
+
+    def test_dynamodb_store_reuses_table(self):
+        resource = MagicMock()
+        table = resource.Table.return_value
+        table.get_item.return_value = {"Item": dict(ITEM)}
+        store = DynamoDBContextStore("test-table", resource=resource)
+
+        store.put(dict(ITEM))
+        assert store.get("ctx-1") == ITEM
+
+        resource.Table.assert_called_once_with("test-table")
+        table.put_item.assert_called_once_with(Item=ITEM)
+        table.get_item.assert_called_once_with(Key={"context_id": "ctx-1"})
+
+    def test_dynamodb_store_requires_table_name(self):
+        with pytest.raises(ValueError):
+            DynamoDBContextStore("")
+
+    def test_unknown_backend(self):
+        with pytest.raises(ValueError):
+            build_context_store("redis")
+
+
+class TestGetContextStore:
+    """Backend selection from the environment"""
+
+    def teardown_method(self):
+        reset_context_store()
+
+    def test_selects_backend_from_env(self):
+        reset_context_store()
+        with patch.dict(os.environ, {"CONTEXT_STORE_BACKEND": "memory"}):
+            store = get_context_store()
+            assert isinstance(store, InMemoryContextStore)
+            # Cached for warm invocations
+            assert get_context_store() is store
+
+    def test_defaults_to_dynamodb(self):
+        reset_context_store()
+        env = {"DDB_TABLE_NAME": "test-table"}
+        with patch.dict(os.environ, env):
+            os.environ.pop("CONTEXT_STORE_BACKEND", None)
+            store = get_context_store()
+            assert isinstance(store, DynamoDBContextStore)
+            assert store.table_name == "test-table"
+
+
+class TestUpdateFields:
+    """Partial updates with optional optimistic-concurrency conditions"""
+
+    @pytest.mark.parametrize("backend", ["memory", "sqlite"])
+    def test_sets_and_removes_fields(self, backend):
+        store = build_context_store(backend)
+        store.put(dict(ITEM))
+
+        store.update_fields("ctx-1", {"draft_redacted": "d", "subject": None})
+
+        item = store.get("ctx-1")
+        assert item["draft_redacted"] == "d"
+        assert "subject" not in item
+        assert item["body_redacted"] == ITEM["body_redacted"]
+
+    @pytest.mark.parametrize("backend", ["memory", "sqlite"])
+    def test_condition_mismatch_writes_nothing(self, backend):
+        store = build_context_store(backend)
+        store.put(dict(ITEM, sent_at=1))
+
+        with pytest.raises(ConditionFailedError):
+            store.update_fields("ctx-1", {"sent_at": 2}, {"sent_at": None})
+        with pytest.raises(ConditionFailedError):
+            store.update_fields("ctx-1", {"subject": "x"}, {"sent_at": 5})
+
+        assert store.get("ctx-1")["sent_at"] == 1
+        assert store.get("ctx-1")["subject"] == ITEM["subject"]
+
+    @pytest.mark.parametrize("backend", ["memory", "sqlite"])
+    def test_missing_item_fails(self, backend):
+        store = build_context_store(backend)
+        with pytest.raises(ConditionFailedError):
+            store.update_fields("missing", {"sent_at": 1})
+
+    def test_dynamodb_update_expression(self):
+        resource = MagicMock()
+        table = resource.Table.return_value
+        store = DynamoDBContextStore("test-table", resource=resource)
+
+        store.update_fields(
+            "ctx-1", {"draft_redacted": "d", "subject": None}, {"sent_at": None}
+        )
+
+        kwargs = table.update_item.call_args[1]
+        assert kwargs["Key"] == {"context_id": "ctx-1"}
+        assert kwargs["UpdateExpression"] == "SET #f0 = :f0 REMOVE #f1"
+        assert kwargs["ConditionExpression"] == (
+            "attribute_exists(context_id) AND attribute_not_exists(#c0)"
+        )
+        assert kwargs["ExpressionAttributeNames"] == {
+            "#f0": "draft_redacted",
+            "#f1": "subject",
+            "#c0": "sent_at",
+        }
+        assert kwargs["ExpressionAttributeValues"] == {":f0": "d"}
+
+    def test_dynamodb_condition_failure_is_translated(self):
+        resource = MagicMock()
+        error = Exception("conditional check failed")
+        error.response = {"Error": {"Code": "ConditionalCheckFailedException"}}
+        resource.Table.return_value.update_item.side_effect = error
+        store = DynamoDBContextStore("test-table", resource=resource)
+
+        with pytest.raises(ConditionFailedError):
+            store.update_fields("ctx-1", {"sent_at": 1}, {"sent_at": None})
+
+
+class TestLifecycle:
+    """TTL stamping and the sparse pending index"""
+
+    def test_stamp_lifecycle_defaults(self):
+        with patch.dict(os.environ, {"CONTEXT_TTL_DAYS": "2"}):
+            os.environ.pop("DDB_TTL_ATTRIBUTE", None)
+            item = stamp_lifecycle({"context_id": "c"}, now=1000)
+
+        assert item["received_at"] == 1000
+        assert item["status"] == "pending"
+        assert item["ttl_epoch"] == 1000 + 2 * 86400
+        assert item["pending_flag"] == "pending"
+
+    def test_stamp_lifecycle_keeps_existing_values(self):
+        with patch.dict(os.environ, {"DDB_TTL_ATTRIBUTE": "expires"}):
+            item = stamp_lifecycle(
+                {"context_id": "c", "received_at": 5, "status": "sent"},
+                now=1000,
+            )
+
+        assert item["received_at"] == 5
+        assert "expires" in item
+        assert "pending_flag" not in item
+
+    @pytest.mark.parametrize("backend", ["memory", "sqlite"])
+    def test_query_pending_oldest_first(self, backend):
+        store = build_context_store(backend)
+        for context_id, received_at in [("b", 20), ("a", 10), ("c", 30)]:
+            store.put(
+                stamp_lifecycle(
+                    {"context_id": context_id, "received_at": received_at}
+                )
+            )
+        store.update_fields("b", {"status": "sent", "pending_flag": None})
+
+        pending = store.query_pending(limit=10)
+        assert [item["context_id"] for item in pending] == ["a", "c"]
+
+        older = store.query_pending(limit=10, received_before=30)
+        assert [item["context_id"] for item in older] == ["a"]
+
+    @pytest.mark.parametrize("backend", ["memory", "sqlite"])
+    def test_query_pending_filters_before_limit(self, backend):
+        store = build_context_store(backend)
+        for i in range(3):
+            store.put(
+                stamp_lifecycle(
+                    {"context_id": f"d{i}", "received_at": i, "drafted_at": 1}
+                )
+            )
+        store.put(stamp_lifecycle({"context_id": "n", "received_at": 10}))
+
+        undrafted = store.query_pending(limit=1, absent=("drafted_at",))
+        drafted = store.query_pending(limit=5, present=("drafted_at",))
+
+        assert [item["context_id"] for item in undrafted] == ["n"]
+        assert len(drafted) == 3
+
+    def test_dynamodb_query_pages_past_filtered_items(self):
+        resource = MagicMock()
+        table = resource.Table.return_value
+        table.query.side_effect = [
+            {"Items": [], "LastEvaluatedKey": {"context_id": "d1"}},
+            {"Items": [{"context_id": "n1"}, {"context_id": "n2"}]},
+        ]
+        store = DynamoDBContextStore("test-table", resource=resource)
+
+        items = store.query_pending(limit=1, absent=("drafted_at",))
+
+        assert items == [{"context_id": "n1"}]
+        first, second = table.query.call_args_list
+        assert "FilterExpression" in first[1]
+        assert second[1]["ExclusiveStartKey"] == {"context_id": "d1"}
+
+    def test_dynamodb_query_uses_pending_index(self):
+        resource = MagicMock()
+        table = resource.Table.return_value
+        table.query.return_value = {"Items": [{"context_id": "a"}]}
+        store = DynamoDBContextStore("test-table", resource=resource)
+
+        assert store.query_pending(limit=5) == [{"context_id": "a"}]
+
+        kwargs = table.query.call_args[1]
+        assert kwargs["IndexName"] == "pending_by_age"
+        assert kwargs["ScanIndexForward"] is True
+        assert kwargs["Limit"] == 5
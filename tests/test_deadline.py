@@ -0,0 +1,231 @@
+"""
+Tests for deadline propagation from the Lambda entry point to outbound calls
+"""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.app.common import context_store
+from src.app.common.context_store import DynamoDBContextStore
+from src.app.common.deadline import (
+    Deadline,
+    DeadlineExceeded,
+    boto_config,
+    cap_timeout,
+    timeout_bucket,
+)
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class LambdaContext:
+    def __init__(self, remaining_ms):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining_ms
+
+
+class TestDeadline:
+    """Budget arithmetic"""
+
+    def test_from_lambda_context_keeps_safety_margin(self):
+        clock = FakeClock()
+
+        deadline = Deadline.from_lambda_context(
+            LambdaContext(5000), clock=clock
+        )
+
+        assert deadline.remaining() == pytest.approx(4.7)
+
+    def test_budget_tightens_lambda_time(self):
+        clock = FakeClock()
+
+        deadline = Deadline.from_lambda_context(
+            LambdaContext(60000), budget=2.5, clock=clock
+        )
+
+        assert deadline.remaining() == pytest.approx(2.5)
+
+    def test_without_context_only_budget_applies(self):
+        assert Deadline.from_lambda_context(None).remaining() == float("inf")
+        assert Deadline.from_lambda_context(None, budget=1).remaining() <= 1
+
+    def test_child_never_outlives_parent(self):
+        clock = FakeClock()
+        parent = Deadline.after(1.0, clock)
+
+        assert parent.child(5.0).remaining() == pytest.approx(1.0)
+        assert parent.child(0.2).remaining() == pytest.approx(0.2)
+
+    def test_cap_and_allows(self):
+        clock = FakeClock()
+        deadline = Deadline.after(2.0, clock)
+
+        assert deadline.cap(10.0) == pytest.approx(2.0)
+        assert deadline.cap(1.0) == 1.0
+        assert deadline.allows()
+
+        clock.now += 1.8
+        assert not deadline.allows()
+        assert not deadline.expired()
+
+        clock.now += 0.2
+        assert deadline.expired()
+        with pytest.raises(DeadlineExceeded):
+            deadline.cap(1.0)
+
+    def test_cap_timeout_without_deadline(self):
+        assert cap_timeout(None, 5.0) == 5.0
+
+    def test_timeout_bucket_never_exceeds_timeout(self):
+        assert timeout_bucket(2.4) == 2.0
+        assert timeout_bucket(60) == 10.0
+        assert timeout_bucket(0.12) == 0.1
+        assert timeout_bucket(0.05) == 0.05
+
+    def test_boto_config_limits_retries_for_short_budgets(self):
+        short = boto_config(1.5)
+        longer = boto_config(5.0)
+
+        assert short.read_timeout == 1.5
+        assert short.connect_timeout == 1.0
+        assert short.retries["total_max_attempts"] == 1
+        assert longer.retries["total_max_attempts"] == 2
+
+
+class TestBoundedStore:
+    """Repository calls use a client bounded by the deadline"""
+
+    def test_injected_resource_is_kept(self):
+        store = DynamoDBContextStore("table", resource=MagicMock())
+
+        assert store.bounded(1.0) is store
+
+    def test_resource_cached_per_bucket(self):
+        context_store._bounded_dynamodb_resource.cache_clear()
+        store = DynamoDBContextStore("table")
+        with patch("boto3.resource") as mock_resource:
+            first = store.bounded(2.4)
+            second = store.bounded(2.1)
+
+        assert first is not store
+        assert first._resource is second._resource
+        mock_resource.assert_called_once()
+        assert mock_resource.call_args[1]["config"].read_timeout == 2.0
+        context_store._bounded_dynamodb_resource.cache_clear()
+
+
+class TestRouterDeadline:
+    """handle_event skips optional work once the budget is nearly spent"""
+
+    def _event(self, payload):
+        return {
+            "requestContext": {"http": {"method": "POST"}},
+            "headers": {
+                "Content-Type": "application/x-www-form-urlencoded",
+                "X-Slack-Request-Timestamp": "1234567890",
+                "X-Slack-Signature": "v0=test-signature",
+            },
+            "body": "payload=" + json.dumps(payload),
+            "isBase64Encoded": False,
+        }
+
+    def _submission(self):
+        return self._event({
+            "type": "view_submission",
+            "view": {
+                "private_metadata": json.dumps({"context_id": "ctx"}),
+                "state": {"values": {"editable_reply_block": {
+                    "editable_reply_input": {"value": "返信"},
+                }}},
+            },
+        })
+
+    def _run(self, event, remaining_ms, context=None, **config):
+        from src.app import router
+
+        cfg = MagicMock()
+        cfg.sender_email_address = "support@example.com"
+        cfg.slack_channel_id = "C1"
+        cfg.async_generation_endpoint = ""
+        cfg.openai_streaming = False
+        for key, value in config.items():
+            setattr(cfg, key, value)
+        mocks = {}
+        with (
+            patch.object(router, "load_config", return_value=cfg),
+            patch.object(
+                router,
+                "resolve_slack_credentials",
+                return_value={"bot_token": "xoxb", "signing_secret": "s"},
+            ),
+            patch.object(router, "verify_slack_signature", return_value=True),
+            patch.object(
+                router, "get_context_item", return_value=context
+            ) as mocks["get"],
+            patch.object(router, "mark_context_status") as mocks["mark"],
+            patch.object(router, "update_context_fields") as mocks["update"],
+            patch.object(router, "send_email") as mocks["send"],
+            patch.object(router, "generate_reply_draft") as mocks["generate"],
+            patch.object(router, "SlackClient") as mocks["slack"],
+        ):
+            response = router.handle_event(
+                event, LambdaContext(remaining_ms)
+            )
+        return response, mocks
+
+    def test_calls_receive_the_invocation_deadline(self):
+        context = {
+            "context_id": "ctx",
+            "sender_email": "customer@example.com",
+            "subject": "件名",
+        }
+        response, mocks = self._run(self._submission(), 60000, context)
+
+        assert json.loads(response["body"]) == {"response_action": "clear"}
+        deadline = mocks["send"].call_args[1]["deadline"]
+        assert 2.0 < deadline.remaining() <= 2.5
+        assert mocks["get"].call_args[1]["deadline"] is deadline
+        assert mocks["mark"].call_args[1]["deadline"] is deadline
+        post = mocks["slack"].return_value.post_message
+        assert post.call_args[1]["deadline"] is deadline
+
+    def test_nearly_spent_budget_skips_confirmation(self):
+        context = {
+            "context_id": "ctx",
+            "sender_email": "customer@example.com",
+            "subject": "件名",
+        }
+        response, mocks = self._run(self._submission(), 700, context)
+
+        assert json.loads(response["body"]) == {"response_action": "clear"}
+        mocks["send"].assert_called_once()
+        mocks["slack"].return_value.post_message.assert_not_called()
+
+    def test_nearly_spent_budget_skips_inline_generation(self):
+        event = self._event({
+            "type": "block_actions",
+            "trigger_id": "trigger",
+            "actions": [{
+                "action_id": "generate_reply_action",
+                "value": json.dumps({"context_id": "ctx"}),
+            }],
+        })
+        context = {"context_id": "ctx", "body_redacted": "見積もりの依頼です"}
+
+        response, mocks = self._run(
+            event, 1200, context, faq_background_generation=False
+        )
+
+        assert response["statusCode"] == 200
+        mocks["generate"].assert_not_called()
+        mocks["update"].assert_not_called()
+        mocks["slack"].return_value.open_modal.assert_called_once()
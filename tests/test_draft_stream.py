@@ -0,0 +1,146 @@
+"""
+Unit tests for streamed drafts: SSE parsing, partial re-identification and
+throttled modal updates
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from src.app.common.draft_stream import stream_draft
+from src.app.common.http_pool import KeepAlivePool
+from src.app.common.openai_client import (
+    OpenAIHTTPError,
+    stream_chat_completion,
+)
+from src.app.common.pii import reidentify_partial
+
+
+class _SSEHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    status = 200
+
+    def do_POST(self):  # noqa: N802 - http.server API
+        length = int(self.headers.get("Content-Length", "0"))
+        received = json.loads(self.rfile.read(length))
+        if self.status != 200:
+            body = b'{"error": "rate limited"}'
+            self.send_response(self.status)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        assert received["stream"] is True
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        events = [
+            {"choices": [{"delta": {"role": "assistant"}}]},
+            {"choices": [{"delta": {"content": "お問い合わせ"}}]},
+            {"choices": [{"delta": {"content": "ありがとうございます"}}]},
+        ]
+        lines = [f"data: {json.dumps(e)}\n\n".encode() for e in events]
+        lines.append(b": keep-alive\n\n")
+        lines.append(b"data: [DONE]\n\n")
+        for line in lines:
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def sse_pool():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _SSEHandler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    pool = KeepAlivePool(f"http://127.0.0.1:{httpd.server_address[1]}")
+    with patch(
+        "src.app.common.openai_client.get_openai_pool", return_value=pool
+    ):
+        yield pool
+    pool.close()
+    httpd.shutdown()
+    httpd.server_close()
+    _SSEHandler.status = 200
+
+
+class TestStreamChatCompletion:
+    """Server-sent events parsing over the pooled connection"""
+
+    def test_yields_content_deltas_and_reuses_connection(self, sse_pool):
+        payload = {"model": "m", "messages": []}
+
+        first = list(stream_chat_completion(payload, "key"))
+        second = list(stream_chat_completion(payload, "key"))
+
+        assert first == ["お問い合わせ", "ありがとうございます"]
+        assert second == first
+        assert sse_pool.connections_opened == 1
+
+    def test_error_status_raises(self, sse_pool):
+        _SSEHandler.status = 429
+
+        with pytest.raises(OpenAIHTTPError) as excinfo:
+            list(stream_chat_completion({"messages": []}, "key"))
+
+        assert excinfo.value.status == 429
+
+
+class TestReidentifyPartial:
+    """Placeholders split across chunks are held back"""
+
+    def test_holds_back_unclosed_placeholder(self):
+        pii_map = {"[EMAIL_1]": "a@example.com"}
+
+        assert reidentify_partial("連絡先は[EMA", pii_map) == "連絡先は"
+        assert (
+            reidentify_partial("連絡先は[EMAIL_1]です", pii_map)
+            == "連絡先はa@example.comです"
+        )
+
+    def test_without_map_returns_text(self):
+        assert reidentify_partial("[注意", {}) == "[注意"
+
+
+class TestStreamDraft:
+    """Throttled pushes and final update"""
+
+    def test_throttles_and_pushes_final_text(self):
+        ticks = iter([0.0, 0.1, 0.2, 1.5, 1.6])
+        pushed = []
+
+        draft = stream_draft(
+            ["こんにちは", "[PERSON", "_1]様", "、", "よろしく"],
+            {"[PERSON_1]": "山田"},
+            pushed.append,
+            min_interval=1.0,
+            clock=lambda: next(ticks),
+        )
+
+        assert draft == "こんにちは[PERSON_1]様、よろしく"
+        assert pushed == [
+            "こんにちは",
+            "こんにちは山田様、",
+            "こんにちは山田様、よろしく",
+        ]
+
+    def test_stops_at_deadline(self):
+        ticks = iter([0.0, 1.0, 2.0])
+        pushed = []
+
+        draft = stream_draft(
+            iter(["a", "b", "c", "d"]),
+            {},
+            pushed.append,
+            min_interval=0.0,
+            deadline=1.0,
+            clock=lambda: next(ticks),
+        )
+
+        assert draft == "ab"
+        assert pushed == ["a", "ab"]
@@ -0,0 +1,209 @@
+"""
+Tests for the FAQ template index and template pre-fill in the router
+"""
+import json
+import os
+from unittest.mock import ANY, MagicMock, patch
+
+import pytest
+
+from src.app.common import faq_index
+from src.app.common.faq_index import (
+    FaqIndex,
+    FaqTemplate,
+    build_index,
+    char_ngrams,
+    find_faq_template,
+    get_faq_index,
+    load_templates,
+    normalize,
+)
+
+FAQ_DIR = os.path.join(
+    os.path.dirname(__file__), "..", "src", "app", "faq"
+)
+
+TEMPLATES = [
+    FaqTemplate(
+        "password-reset",
+        "パスワードの再設定",
+        "ログイン画面から再設定いただけます。",
+        ("パスワードを忘れました", "ログインできません"),
+    ),
+    FaqTemplate(
+        "invoice-request",
+        "請求書・領収書の発行",
+        "マイページからダウンロードいただけます。",
+        ("請求書を発行してください", "領収書がほしい"),
+    ),
+    FaqTemplate(
+        "shipping-status",
+        "配送状況の確認",
+        "追跡番号からご確認いただけます。",
+        ("商品がまだ届きません", "発送状況を教えてください"),
+    ),
+]
+
+
+@pytest.fixture
+def index():
+    return FaqIndex(build_index(TEMPLATES))
+
+
+@pytest.fixture(autouse=True)
+def clear_index_cache():
+    get_faq_index.cache_clear()
+    yield
+    get_faq_index.cache_clear()
+
+
+class TestNgrams:
+    """Normalisation and character n-grams"""
+
+    def test_normalize_drops_placeholders_and_folds_width(self):
+        assert normalize("[PERSON_1]様、ＰＡＳＳ！") == "様 pass"
+
+    def test_ngrams_stay_within_runs(self):
+        assert char_ngrams("領収書 ok") == [
+            "領収", "収書", "領収書", "ok",
+        ]
+
+
+class TestFaqIndex:
+    """Binary format and retrieval"""
+
+    def test_build_is_deterministic(self):
+        assert build_index(TEMPLATES) == build_index(list(TEMPLATES))
+
+    def test_search_ranks_matching_template_first(self, index):
+        matches = index.search("パスワードを忘れてしまいました")
+
+        assert matches[0].template_id == "password-reset"
+        assert matches[0].answer == "ログイン画面から再設定いただけます。"
+        assert 0 < matches[0].score <= 1
+
+    def test_unrelated_text_has_no_matches(self, index):
+        assert index.search("xyz") == []
+
+    def test_memory_mapped_file(self, tmp_path):
+        path = tmp_path / "faq.bin"
+        faq_index.write_index(TEMPLATES, str(path))
+
+        mapped = FaqIndex.open(str(path))
+
+        assert mapped.n_docs == 3
+        assert mapped.search("領収書がほしい")[0].template_id == (
+            "invoice-request"
+        )
+
+    def test_rejects_other_files(self):
+        with pytest.raises(ValueError):
+            FaqIndex(b"\x00" * 64)
+
+    def test_missing_index_disables_matching(self, tmp_path):
+        with patch.dict(
+            os.environ, {"FAQ_INDEX_PATH": str(tmp_path / "none.bin")}
+        ):
+            assert get_faq_index() is None
+            assert find_faq_template("パスワードを忘れました") is None
+
+    def test_committed_index_matches_templates(self):
+        """faq_index.bin must be rebuilt (make faq-index) after edits"""
+        templates = load_templates(os.path.join(FAQ_DIR, "templates.json"))
+        with open(os.path.join(FAQ_DIR, "faq_index.bin"), "rb") as f:
+            assert f.read() == build_index(templates)
+
+
+class TestFindFaqTemplate:
+    """Threshold, margin and length guard"""
+
+    def test_clear_match(self, index):
+        faq = find_faq_template("パスワードを忘れました", index=index)
+
+        assert faq is not None and faq.template_id == "password-reset"
+
+    def test_below_threshold(self, index):
+        assert find_faq_template(
+            "パスワードを忘れました", threshold=1.01, index=index
+        ) is None
+
+    def test_ambiguous_between_templates(self, index):
+        text = "ログインできません。領収書がほしい"
+
+        assert find_faq_template(text, margin=1.5, index=index) is None
+
+    def test_long_inquiries_go_to_the_model(self, index):
+        text = "パスワードを忘れました。" * 60
+
+        assert find_faq_template(text, index=index) is None
+
+    def test_shipped_templates(self):
+        faq = find_faq_template(
+            "お世話になっております。先週注文した商品がまだ届きません。"
+            "いつ届きますか？"
+        )
+        assert faq is not None and faq.template_id == "shipping-status"
+        assert find_faq_template(
+            "御社のサービスの導入を検討しています。見積もりをお願いできますか"
+        ) is None
+
+
+class TestRouterPrefill:
+    """block_actions pre-fills the modal from a matched template"""
+
+    def _event(self):
+        return {
+            "requestContext": {"http": {"method": "POST"}},
+            "headers": {
+                "Content-Type": "application/x-www-form-urlencoded",
+                "X-Slack-Request-Timestamp": "1234567890",
+                "X-Slack-Signature": "v0=test-signature",
+            },
+            "body": "payload=" + json.dumps({
+                "type": "block_actions",
+                "trigger_id": "test-trigger-id",
+                "actions": [{
+                    "action_id": "generate_reply_action",
+                    "value": json.dumps({"context_id": "faq-ctx"}),
+                }],
+            }),
+            "isBase64Encoded": False,
+        }
+
+    def test_template_skips_generation(self):
+        from src.app import router
+
+        config = MagicMock()
+        config.async_generation_endpoint = "https://worker.example.com/run"
+        config.openai_streaming = False
+        config.faq_background_generation = False
+        context = {
+            "context_id": "faq-ctx",
+            "body_redacted": "[PERSON_1]です。パスワードを忘れてしまいました",
+            "pii_map": '{"[PERSON_1]": "山田"}',
+        }
+
+        with (
+            patch.object(router, "load_config", return_value=config),
+            patch.object(
+                router,
+                "resolve_slack_credentials",
+                return_value={"bot_token": "xoxb", "signing_secret": "s"},
+            ),
+            patch.object(router, "verify_slack_signature", return_value=True),
+            patch.object(router, "get_context_item", return_value=context),
+            patch.object(router, "update_context_fields") as mock_update,
+            patch.object(router, "generate_reply_draft") as mock_generate,
+            patch.object(router, "SlackClient") as mock_slack_client,
+            patch("urllib.request.urlopen") as mock_urlopen,
+        ):
+            router.handle_event(self._event())
+
+        view = mock_slack_client.return_value.open_modal.call_args[1]["view"]
+        text = view["blocks"][1]["element"]["initial_value"]
+        assert "パスワードをお忘れの方" in text
+        mock_generate.assert_not_called()
+        mock_urlopen.assert_not_called()
+        mock_update.assert_called_once_with(
+            "faq-ctx", deadline=ANY, faq_template_id="password-reset"
+        )
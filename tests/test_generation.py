@@ -0,0 +1,218 @@
+"""
+Tests for the shared generation engine, its caches, metrics hooks and transports
+"""
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from benchmarks.openai_stub import StubConfig, start_stub
+from src.app.common.generation import (
+    AsyncTransport,
+    DraftCache,
+    GenerationEngine,
+    GenerationMetrics,
+    MemoryCache,
+    SyncTransport,
+    cache_key,
+)
+from src.app.common.model_routing import DEFAULT_ROUTES, ROUTE_FAST
+from src.app.common.openai_client import OpenAIHTTPError
+from src.app.common.retry import RetryPolicy
+
+FAST = DEFAULT_ROUTES[ROUTE_FAST]
+REPLY = {"choices": [{"message": {"content": " 下書き "}}]}
+
+
+class RecordingMetrics(GenerationMetrics):
+    def __init__(self):
+        self.events = []
+
+    def on_first_delta(self, route, elapsed):
+        self.events.append(("first_delta", route.name))
+
+    def on_success(self, route, mode, elapsed, chars, cached):
+        self.events.append(("success", mode, chars, cached))
+
+    def on_error(self, route, mode, elapsed, error):
+        self.events.append(("error", mode, str(error)))
+
+
+@pytest.fixture
+def stub_factory():
+    servers = []
+
+    def start(**kwargs):
+        httpd, stub, base_url = start_stub(StubConfig(seed=1, **kwargs))
+        servers.append(httpd)
+        return stub, base_url
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+class TestMemoryCache:
+    """LRU with time-to-live"""
+
+    def test_evicts_least_recently_used(self):
+        cache = MemoryCache(maxsize=2)
+        cache.set("a", "1")
+        cache.set("b", "2")
+        cache.get("a")
+        cache.set("c", "3")
+
+        assert cache.get("a") == "1"
+        assert cache.get("b") is None
+        assert len(cache) == 2
+
+    def test_expires_after_ttl(self):
+        now = [0.0]
+        cache = MemoryCache(ttl=10, clock=lambda: now[0])
+        cache.set("a", "1")
+        now[0] = 10.0
+
+        assert cache.get("a") is None
+
+    def test_key_depends_on_model_and_limits(self):
+        payload = {"model": "m", "messages": [], "max_tokens": 10}
+
+        assert cache_key(payload) == cache_key(dict(payload))
+        assert cache_key(payload) != cache_key(dict(payload, max_tokens=11))
+
+
+class TestGenerationEngine:
+    """Routing, caching, parsing and metrics"""
+
+    def test_generate_caps_budget_and_parses_reply(self):
+        transport = MagicMock()
+        transport.complete.return_value = REPLY
+        metrics = RecordingMetrics()
+
+        result = GenerationEngine(transport, metrics=metrics).generate(
+            "質問です", budget=30
+        )
+
+        assert result.ok and result.text == "下書き"
+        assert result.route.name == FAST.name
+        payload, budget = transport.complete.call_args[0]
+        assert payload["model"] == FAST.model
+        assert budget == FAST.timeout
+        assert metrics.events == [("success", "complete", 3, False)]
+
+    def test_cache_hit_skips_transport(self):
+        transport = MagicMock()
+        transport.complete.return_value = REPLY
+        engine = GenerationEngine(transport, cache=MemoryCache())
+
+        first = engine.generate("質問です")
+        second = engine.generate("質問です")
+
+        assert transport.complete.call_count == 1
+        assert (first.cached, second.cached) == (False, True)
+        assert second.text == first.text
+
+    def test_failure_returns_empty_draft(self):
+        transport = MagicMock()
+        transport.complete.side_effect = OpenAIHTTPError(500, b"{}")
+        metrics = RecordingMetrics()
+        cache = MemoryCache()
+
+        result = GenerationEngine(
+            transport, cache=cache, metrics=metrics
+        ).generate("質問です")
+
+        assert not result.ok
+        assert result.error == "openai http 500"
+        assert metrics.events == [("error", "complete", "openai http 500")]
+        assert len(cache) == 0
+
+    def test_stream_keeps_partial_text_and_caches_complete_drafts(self):
+        def broken(payload, budget):
+            yield "途中"
+            raise ConnectionError("reset")
+
+        transport = MagicMock()
+        transport.stream.side_effect = broken
+        metrics = RecordingMetrics()
+        cache = MemoryCache()
+        engine = GenerationEngine(transport, cache=cache, metrics=metrics)
+
+        assert list(engine.stream("質問です")) == ["途中"]
+        assert len(cache) == 0
+
+        transport.stream.side_effect = lambda payload, budget: iter(["全", "文"])
+        assert list(engine.stream("質問です")) == ["全", "文"]
+        assert list(engine.stream("質問です")) == ["全文"]
+        assert metrics.events == [
+            ("first_delta", "fast"),
+            ("error", "stream", "reset"),
+            ("first_delta", "fast"),
+            ("success", "stream", 2, False),
+            ("success", "stream", 2, True),
+        ]
+
+    def test_default_cache_stores_nothing(self):
+        cache = DraftCache()
+        cache.set("a", "1")
+
+        assert cache.get("a") is None
+
+
+class TestTransports:
+    """Sync and asyncio transports against the local stub"""
+
+    def test_sync_transport(self, stub_factory):
+        _, base_url = stub_factory()
+        engine = GenerationEngine(SyncTransport("key", base_url=base_url))
+
+        result = engine.generate("質問です", budget=2)
+
+        assert len(result.text) == 120
+
+    def test_async_complete_and_stream_reuse_connection(self, stub_factory):
+        stub, base_url = stub_factory()
+
+        async def run():
+            transport = AsyncTransport("key", base_url=base_url)
+            engine = GenerationEngine(async_transport=transport)
+            try:
+                results = await asyncio.gather(
+                    *(engine.agenerate(f"質問 {i}") for i in range(4))
+                )
+                deltas = [d async for d in engine.astream("別の質問")]
+                again = await engine.agenerate("質問 0")
+                return results, deltas, again, transport.pool
+            finally:
+                transport.close()
+
+        results, deltas, again, pool = asyncio.run(run())
+
+        assert all(len(r.text) == 120 for r in results)
+        assert len("".join(deltas)) == 120
+        assert again.text == results[0].text
+        # Four concurrent requests need four connections; later ones reuse
+        assert pool.connections_opened == 4
+        assert stub.stats.as_dict()["requests"] == 6
+
+    def test_async_retries_rate_limit(self, stub_factory):
+        stub, base_url = stub_factory(rate_limit_rate=1.0, retry_after=0.05)
+
+        async def run():
+            transport = AsyncTransport(
+                "key",
+                base_url=base_url,
+                policy=RetryPolicy(max_attempts=3, base_delay=0.01),
+            )
+            try:
+                return await GenerationEngine(
+                    async_transport=transport
+                ).agenerate("質問です", budget=2)
+            finally:
+                transport.close()
+
+        result = asyncio.run(run())
+
+        assert result.error == "openai http 429"
+        assert stub.stats.as_dict()["rate_limited"] == 3
@@ -0,0 +1,158 @@
+"""
+Unit tests for the keep-alive HTTP connection pool
+"""
+import asyncio
+import http.client
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from src.app.common.generation.aio import AsyncKeepAlivePool
+from src.app.common.http_pool import KeepAlivePool, can_resend
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    broken = []
+
+    def do_POST(self):  # noqa: N802 - http.server API
+        length = int(self.headers.get("Content-Length", "0"))
+        received = json.loads(self.rfile.read(length) or b"{}")
+        if received.get("broken"):
+            # Acted on the request, then sent a malformed response
+            type(self).broken.append(self.command)
+            self.wfile.write(b"garbage\r\n")
+            self.close_connection = True
+            return
+        body = json.dumps({"path": self.path, "received": received}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if received.get("close"):
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_PUT = do_POST  # noqa: N815 - http.server API
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestKeepAlivePool:
+    """Connection reuse and failure handling"""
+
+    def test_reuses_connection(self, server):
+        pool = KeepAlivePool(server + "/base")
+        for i in range(5):
+            resp = pool.request("POST", "/v1/x", body=json.dumps({"i": i}).encode())
+            assert resp.status == 200
+            assert resp.json() == {"path": "/base/v1/x", "received": {"i": i}}
+
+        assert pool.connections_opened == 1
+        pool.close()
+
+    def test_connection_close_is_honoured(self, server):
+        pool = KeepAlivePool(server)
+        pool.request("POST", "/", body=b'{"close": true}')
+        pool.request("POST", "/", body=b"{}")
+
+        assert pool.connections_opened == 2
+        pool.close()
+
+    def test_retries_once_on_stale_connection(self, server):
+        pool = KeepAlivePool(server)
+        pool.request("POST", "/", body=b"{}")
+        # Simulate the peer dropping the idle socket
+        pool._idle[0].sock.shutdown(socket.SHUT_RDWR)
+
+        resp = pool.request("POST", "/", body=b"{}")
+
+        assert resp.status == 200
+        assert pool.connections_opened == 2
+        pool.close()
+
+    @pytest.mark.parametrize("method,sends", [("POST", 1), ("PUT", 2)])
+    def test_failure_after_request_resent_only_if_idempotent(
+        self, server, method, sends
+    ):
+        _Handler.broken.clear()
+        pool = KeepAlivePool(server)
+        pool.request(method, "/", body=b"{}")
+
+        with pytest.raises(http.client.BadStatusLine):
+            pool.request(method, "/", body=b'{"broken": true}')
+
+        assert _Handler.broken == [method] * sends
+        pool.close()
+
+    @pytest.mark.parametrize(
+        "method,exc,written,expected",
+        [
+            ("POST", BrokenPipeError(), False, True),
+            ("POST", http.client.RemoteDisconnected(), True, True),
+            ("POST", ConnectionResetError(), True, False),
+            ("POST", http.client.BadStatusLine("x"), True, False),
+            ("GET", ConnectionResetError(), True, True),
+            ("GET", TimeoutError(), False, False),
+        ],
+    )
+    def test_can_resend(self, method, exc, written, expected):
+        assert can_resend(method, exc, written) is expected
+
+    def test_rejects_unsupported_url(self):
+        with pytest.raises(ValueError):
+            KeepAlivePool("ftp://example.com")
+
+    def test_connect_bounded_by_call_timeout(self):
+        timeouts = []
+
+        def hang(address, timeout, *args, **kwargs):
+            # A connect that never completes: fails only when it times out
+            timeouts.append(timeout)
+            time.sleep(timeout)
+            raise TimeoutError("timed out")
+
+        pool = KeepAlivePool("http://192.0.2.1", connect_timeout=2.0)
+        started = time.monotonic()
+        with patch("socket.create_connection", side_effect=hang):
+            with pytest.raises(TimeoutError):
+                pool.request("POST", "/", body=b"{}", timeout=0.2)
+
+        assert timeouts == [0.2]
+        assert time.monotonic() - started < 1.0
+
+
+class TestAsyncKeepAlivePool:
+    """Connection setup on the event loop"""
+
+    def test_connect_bounded_by_call_timeout(self):
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(3600)
+
+        async def run():
+            pool = AsyncKeepAlivePool("http://192.0.2.1", connect_timeout=2.0)
+            with pytest.raises(TimeoutError):
+                await pool.request("POST", "/", body=b"{}", timeout=0.2)
+
+        started = time.monotonic()
+        with patch("asyncio.open_connection", side_effect=hang):
+            asyncio.run(run())
+
+        assert time.monotonic() - started < 1.0
@@ -0,0 +1,279 @@
+"""
+Tests for Slack retry detection and idempotent interaction handling
+"""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.app.common import dynamodb_repo
+from src.app.common.context_store import InMemoryContextStore
+from src.app.common.idempotency import (
+    InteractionLedger,
+    InteractionRecords,
+    interaction_key,
+    slack_retry,
+)
+from src.app.router import handle_event
+
+BLOCK_ACTIONS = {
+    "type": "block_actions",
+    "trigger_id": "trigger-1",
+    "actions": [
+        {
+            "action_id": "generate_reply_action",
+            "value": json.dumps({"context_id": "ctx-1"}),
+        }
+    ],
+}
+
+
+class _StoreRecords(InteractionRecords):
+    """Shared records through the repository, on one store"""
+
+    def __init__(self, store):
+        self.store = store
+
+    def _patched(self, fn, *args):
+        with patch.object(dynamodb_repo, "_store", return_value=self.store):
+            return fn(*args)
+
+    def claim(self, key, lease_until, expires_at, now):
+        return self._patched(
+            dynamodb_repo.claim_interaction, key, lease_until, expires_at, now
+        )
+
+    def complete(self, key, expires_at):
+        self._patched(dynamodb_repo.complete_interaction, key, expires_at)
+
+    def release(self, key):
+        self._patched(dynamodb_repo.release_interaction, key)
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestInteractionKey:
+    """Keys identify one user interaction"""
+
+    def test_block_actions_key(self):
+        assert interaction_key(BLOCK_ACTIONS) == (
+            "block_actions:trigger-1:generate_reply_action"
+        )
+
+    def test_view_submission_key(self):
+        payload = {"type": "view_submission", "view": {"id": "V1"}}
+
+        assert interaction_key(payload) == "view_submission:V1"
+
+    def test_no_key_without_ids(self):
+        assert interaction_key({"type": "block_actions"}) == ""
+        assert interaction_key({"type": "event_callback"}) == ""
+
+    def test_retry_headers(self):
+        headers = {
+            "x-slack-retry-num": "2",
+            "x-slack-retry-reason": "http_timeout",
+        }
+
+        assert slack_retry(headers) == (2, "http_timeout")
+        assert slack_retry({}) == (0, "")
+        assert slack_retry({"x-slack-retry-num": "x"}) == (0, "")
+
+
+class TestInteractionLedger:
+    """A second delivery of a claimed interaction is a duplicate"""
+
+    def test_second_delivery_of_seen_interaction(self):
+        ledger = InteractionLedger()
+
+        assert not ledger.is_duplicate("k")
+        assert ledger.is_duplicate("k")
+
+    def test_no_key_never_duplicate(self):
+        ledger = InteractionLedger()
+
+        assert not ledger.is_duplicate("")
+        assert not ledger.is_duplicate("")
+
+    def test_entries_expire(self):
+        clock = _Clock()
+        ledger = InteractionLedger(ttl=60, clock=clock)
+        ledger.is_duplicate("k")
+
+        clock.now += 61
+
+        assert not ledger.is_duplicate("k")
+
+    def test_bounded(self):
+        ledger = InteractionLedger(max_entries=2)
+        for key in ("a", "b", "c"):
+            ledger.is_duplicate(key)
+
+        assert len(ledger) == 2
+        assert not ledger.is_duplicate("a")
+
+    def test_failed_attempt_released_for_retry(self):
+        ledger = InteractionLedger()
+        ledger.is_duplicate("k")
+
+        ledger.release("k")
+
+        assert not ledger.is_duplicate("k")
+
+    def test_lapsed_lease_taken_over(self):
+        clock = _Clock()
+        ledger = InteractionLedger(lease=30, clock=clock)
+        ledger.is_duplicate("k")
+        assert ledger.is_duplicate("k")
+
+        clock.now += 31
+
+        assert not ledger.is_duplicate("k")
+
+    def test_handled_interaction_outlives_lease(self):
+        clock = _Clock()
+        ledger = InteractionLedger(lease=30, clock=clock)
+        ledger.is_duplicate("k")
+        ledger.done("k")
+
+        clock.now += 31
+
+        assert ledger.is_duplicate("k")
+
+    def test_shared_records_catch_other_process(self):
+        store = InMemoryContextStore()
+        records = _StoreRecords(store)
+
+        first = InteractionLedger()
+        assert not first.is_duplicate("k", records)
+        assert InteractionLedger().is_duplicate("k", records)
+        first.done("k", records)
+        assert InteractionLedger().is_duplicate("k", records)
+
+    def test_lost_shared_claim_is_duplicate_and_not_held(self):
+        store = InMemoryContextStore()
+        records = _StoreRecords(store)
+        InteractionLedger().is_duplicate("k", records)
+        second = InteractionLedger()
+
+        # A first attempt too: the other process holds the interaction
+        assert second.is_duplicate("k", records)
+        assert len(second) == 0
+
+    def test_shared_claim_released_after_failure(self):
+        store = InMemoryContextStore()
+        records = _StoreRecords(store)
+        first = InteractionLedger()
+        first.is_duplicate("k", records)
+
+        first.release("k", records)
+
+        assert not InteractionLedger().is_duplicate("k", records)
+
+    def test_record_failure_treated_as_new_without_local_claim(self):
+        records = MagicMock()
+        records.claim.side_effect = RuntimeError("throttled")
+        ledger = InteractionLedger()
+
+        assert not ledger.is_duplicate("k", records)
+        assert len(ledger) == 0
+
+
+class TestRouterRetries:
+    """The Lambda acknowledges retries without running them again"""
+
+    def _event(self, retry_num=None):
+        headers = {
+            "Content-Type": "application/x-www-form-urlencoded",
+            "X-Slack-Request-Timestamp": "1234567890",
+            "X-Slack-Signature": "v0=test-signature",
+        }
+        if retry_num is not None:
+            headers["X-Slack-Retry-Num"] = str(retry_num)
+            headers["X-Slack-Retry-Reason"] = "http_timeout"
+        return {
+            "requestContext": {"http": {"method": "POST"}},
+            "headers": headers,
+            "body": "payload=" + json.dumps(BLOCK_ACTIONS),
+        }
+
+    def test_retry_skips_side_effects(self):
+        store = InMemoryContextStore()
+        with (
+            patch("src.app.router.load_config") as mock_config,
+            patch(
+                "src.app.router.resolve_slack_credentials",
+                return_value={"bot_token": "xoxb", "signing_secret": "s"},
+            ),
+            patch(
+                "src.app.router.verify_slack_signature", return_value=True
+            ),
+            patch("src.app.router.get_context_item", return_value=None),
+            patch(
+                "src.app.router.get_interaction_ledger",
+                side_effect=InteractionLedger,
+            ),
+            patch(
+                "src.app.router._interaction_records",
+                return_value=_StoreRecords(store),
+            ),
+            patch("src.app.router.SlackClient") as mock_slack,
+        ):
+            mock_config.return_value = MagicMock(
+                async_generation_endpoint="", openai_streaming=False
+            )
+            first = handle_event(self._event())
+            # A fresh ledger per call: the retry lands on another container
+            retry = handle_event(self._event(retry_num=1))
+
+        assert first["statusCode"] == retry["statusCode"] == 200
+        assert json.loads(retry["body"]) == {"ack": True}
+        mock_slack.return_value.open_modal.assert_called_once()
+
+    def test_retry_after_failed_attempt_runs(self):
+        store = InMemoryContextStore()
+        submission = {
+            "type": "view_submission",
+            "view": {
+                "id": "V1",
+                "private_metadata": json.dumps({"context_id": "ctx-1"}),
+            },
+        }
+        event = self._event()
+        event["body"] = "payload=" + json.dumps(submission)
+        retry = self._event(retry_num=1)
+        retry["body"] = event["body"]
+        with (
+            patch("src.app.router.load_config"),
+            patch(
+                "src.app.router.resolve_slack_credentials",
+                return_value={"bot_token": "xoxb", "signing_secret": "s"},
+            ),
+            patch(
+                "src.app.router.verify_slack_signature", return_value=True
+            ),
+            patch(
+                "src.app.router.get_context_item",
+                side_effect=[RuntimeError("timed out"), None],
+            ) as mock_get,
+            patch(
+                "src.app.router.get_interaction_ledger",
+                side_effect=InteractionLedger,
+            ),
+            patch(
+                "src.app.router._interaction_records",
+                return_value=_StoreRecords(store),
+            ),
+        ):
+            with pytest.raises(RuntimeError):
+                handle_event(event)
+            response = handle_event(retry)
+
+        assert json.loads(response["body"]) == {"response_action": "clear"}
+        assert mock_get.call_count == 2
@@ -3,7 +3,7 @@ Integration tests for the Slack AI Email Assistant
 """
 import json
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
 from src.app.router import handle_event
 
 
@@ -184,6 +184,7 @@ class TestIntegration:
                 to_addresses=["customer@example.com"],
                 subject="Re: Test Inquiry",
                 body="Thank you for your inquiry. We will get back to you soon.",
+                deadline=ANY,
             )
 
             # Verify confirmation message was sent
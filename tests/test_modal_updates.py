@@ -0,0 +1,125 @@
+"""
+Tests for deduplicated, hash-checked modal updates
+"""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+from src.app.common.modal_updates import ModalUpdater
+from src.app.common.slack_api import SlackAPIError
+
+
+def _view(text):
+    return {"type": "modal", "blocks": [{"type": "section", "text": text}]}
+
+
+def _client(*hashes):
+    client = MagicMock()
+    client.views_update.side_effect = [
+        {"ok": True, "view": {"hash": h}} for h in hashes
+    ]
+    return client
+
+
+class TestModalUpdater:
+    """Skip identical updates, never clobber a newer view"""
+
+    def test_identical_update_is_skipped(self):
+        updater = ModalUpdater()
+        client = _client("h1", "h2")
+
+        assert updater.update(client, "ext", _view("a"))
+        assert updater.update(client, "ext", _view("a"))
+        assert updater.update(client, "ext", _view("b"))
+
+        assert client.views_update.call_count == 2
+        assert updater.skipped == 1 and updater.sent == 2
+        first, second = client.views_update.call_args_list
+        assert first[1]["hash"] is None
+        assert second[1]["hash"] == "h1"
+
+    def test_hash_from_views_open_is_used(self):
+        updater = ModalUpdater()
+        client = _client("h2")
+        updater.opened(
+            "ext", _view("loading"), {"ok": True, "view": {"hash": "h1"}}
+        )
+
+        assert updater.update(client, "ext", _view("loading"))
+        assert updater.update(client, "ext", _view("draft"))
+
+        client.views_update.assert_called_once()
+        assert client.views_update.call_args[1]["hash"] == "h1"
+
+    def test_open_view_external_id_does_not_defeat_dedup(self):
+        updater = ModalUpdater()
+        client = _client("h2")
+        opened = dict(_view("loading"), external_id="ext")
+        updater.opened("ext", opened, {"ok": True, "view": {"hash": "h1"}})
+
+        assert updater.update(client, "ext", _view("loading"))
+
+        client.views_update.assert_not_called()
+
+    def test_adopted_hash_is_sent(self):
+        updater = ModalUpdater()
+        client = _client("h2")
+        updater.adopt("ext", "h1")
+
+        assert updater.update(client, "ext", _view("draft"))
+        updater.adopt("ext", "h0")
+
+        assert client.views_update.call_args[1]["hash"] == "h1"
+        assert updater.current_hash("ext") == "h2"
+
+    def test_conflict_stops_further_updates(self):
+        updater = ModalUpdater()
+        client = MagicMock()
+        client.views_update.side_effect = SlackAPIError(
+            "views.update", "hash_conflict"
+        )
+
+        assert not updater.update(client, "ext", _view("a"))
+        assert not updater.update(client, "ext", _view("b"))
+
+        client.views_update.assert_called_once()
+        assert updater.conflicts == 1
+
+    def test_other_errors_raise_and_allow_retry(self):
+        updater = ModalUpdater()
+        client = MagicMock()
+        client.views_update.side_effect = [
+            SlackAPIError("views.update", "internal_error", 500),
+            {"ok": True, "view": {"hash": "h1"}},
+        ]
+
+        try:
+            updater.update(client, "ext", _view("a"))
+        except SlackAPIError:
+            pass
+        # A failed update is not remembered, so the retry goes out
+        assert updater.update(client, "ext", _view("a"))
+        assert client.views_update.call_count == 2
+
+    def test_async_client(self):
+        updater = ModalUpdater()
+        client = MagicMock()
+        client.views_update = AsyncMock(
+            return_value={"ok": True, "view": {"hash": "h1"}}
+        )
+
+        async def run():
+            await updater.aupdate(client, "ext", _view("a"))
+            await updater.aupdate(client, "ext", _view("a"))
+
+        asyncio.run(run())
+
+        client.views_update.assert_awaited_once()
+
+    def test_oldest_modals_are_forgotten(self):
+        updater = ModalUpdater(max_entries=2)
+        client = _client("1", "2", "3", "4")
+
+        for external_id in ("a", "b", "c", "a"):
+            updater.update(client, external_id, _view("x"))
+
+        assert client.views_update.call_count == 4
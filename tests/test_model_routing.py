@@ -0,0 +1,139 @@
+"""
+Unit tests for length- and category-based model routing
+"""
+import json
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.app.common import model_routing
+from src.app.common.model_routing import (
+    ROUTE_FAST,
+    ROUTE_STRONG,
+    RoutingPolicy,
+    choose_route,
+    classify_inquiry,
+    get_routing_policy,
+)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_policy():
+    get_routing_policy.cache_clear()
+    yield
+    get_routing_policy.cache_clear()
+
+
+class TestRoutingPolicy:
+    """Route selection"""
+
+    def test_short_general_inquiry_is_fast(self):
+        decision = choose_route("営業時間を教えてください。")
+
+        assert decision.route.name == ROUTE_FAST
+        assert decision.category == "general"
+        assert decision.reason == "short"
+
+    def test_long_inquiry_is_strong(self):
+        decision = choose_route("商品についての質問です。" * 100)
+
+        assert decision.route.name == ROUTE_STRONG
+        assert decision.reason == "long"
+
+    @pytest.mark.parametrize(
+        "body, category",
+        [
+            ("対応に不満があり苦情を申し上げます", "complaint"),
+            ("弁護士に相談しています", "legal"),
+            ("ログインできない状態です", "incident"),
+        ],
+    )
+    def test_complex_categories_are_strong(self, body, category):
+        decision = choose_route(body)
+
+        assert decision.category == category
+        assert decision.route.name == ROUTE_STRONG
+
+    def test_billing_stays_fast_by_default(self):
+        assert classify_inquiry("返金は可能ですか") == "billing"
+        assert choose_route("返金は可能ですか").route.name == ROUTE_FAST
+
+    def test_many_questions_are_strong(self):
+        decision = choose_route("Aは？Bは？Cは？")
+
+        assert decision.route.name == ROUTE_STRONG
+        assert decision.reason == "questions"
+
+    def test_context_fields(self):
+        fields = choose_route("こんにちは").context_fields()
+
+        assert fields == {
+            "model_route": "fast",
+            "model": "gpt-4o-mini",
+            "inquiry_category": "general",
+        }
+
+
+class TestPolicyFromEnv:
+    """MODEL_ROUTES / ROUTE_* overrides"""
+
+    def test_env_overrides(self):
+        env = {
+            "MODEL_ROUTES": json.dumps(
+                {"strong": {"model": "gpt-4.1", "timeout": 12}}
+            ),
+            "ROUTE_LONG_TOKENS": "10",
+            "ROUTE_STRONG_CATEGORIES": "billing",
+        }
+        with patch.dict("os.environ", env):
+            policy = get_routing_policy()
+
+        strong = policy.routes[ROUTE_STRONG]
+        assert (strong.model, strong.timeout, strong.max_tokens) == (
+            "gpt-4.1", 12.0, 600
+        )
+        assert policy.long_tokens == 10
+        assert policy.choose("返金は可能ですか").route.model == "gpt-4.1"
+
+    def test_default_policy(self):
+        with patch.dict("os.environ", {"MODEL_ROUTES": ""}):
+            assert get_routing_policy() == RoutingPolicy()
+
+
+class TestGenerationUsesRoute:
+    """openai_client and router honour the route"""
+
+    def test_generate_reply_draft_uses_route_limits(self):
+        from src.app.common.generation import GenerationEngine
+
+        strong = model_routing.DEFAULT_ROUTES[ROUTE_STRONG]
+        transport = MagicMock()
+        transport.complete.return_value = {
+            "choices": [{"message": {"content": "ok"}}]
+        }
+        result = GenerationEngine(transport).generate(
+            "質問", budget=3, route=strong
+        )
+
+        assert result.text == "ok"
+        payload, budget = transport.complete.call_args[0]
+        assert payload["model"] == "gpt-4o"
+        assert payload["max_tokens"] <= strong.max_tokens
+        assert budget == 3
+
+    def test_router_records_route_on_context(self):
+        from src.app import router
+        from src.app.common.deadline import Deadline
+
+        deadline = Deadline.never()
+        with patch.object(router, "update_context_fields") as mock_update:
+            route = router._route_for("ctx-1", "苦情です", deadline)
+
+        assert route.name == ROUTE_STRONG
+        mock_update.assert_called_once_with(
+            "ctx-1",
+            deadline=deadline,
+            model_route="strong",
+            model="gpt-4o",
+            inquiry_category="complaint",
+        )
@@ -0,0 +1,100 @@
+"""
+Tests for the local OpenAI-compatible stub and the configurable base URL
+"""
+import random
+from unittest.mock import patch
+
+import pytest
+
+from benchmarks.openai_stub import StubConfig, parse_latency, start_stub
+from src.app.common.openai_client import (
+    OpenAIHTTPError,
+    extract_message_content,
+    get_base_url,
+    post_chat_completion,
+    stream_chat_completion,
+)
+
+PAYLOAD = {"model": "gpt-4o-mini", "messages": [], "max_tokens": 10}
+
+
+@pytest.fixture
+def stub_factory():
+    servers = []
+
+    def start(**kwargs):
+        httpd, stub, base_url = start_stub(StubConfig(seed=1, **kwargs))
+        servers.append(httpd)
+        return stub, base_url
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+class TestOpenAIStub:
+    """Protocol and fault injection"""
+
+    def test_completion_and_stream(self, stub_factory):
+        stub, base_url = stub_factory()
+
+        data = post_chat_completion(PAYLOAD, "key", base_url=base_url)
+        deltas = list(stream_chat_completion(PAYLOAD, "key", base_url=base_url))
+
+        text = extract_message_content(data)
+        assert len(text) == 10
+        assert "".join(deltas) == text
+        assert stub.stats.as_dict()["streamed"] == 1
+
+    def test_rate_limit_injection_sets_retry_after(self, stub_factory):
+        _, base_url = stub_factory(rate_limit_rate=1.0, retry_after=2.5)
+
+        with pytest.raises(OpenAIHTTPError) as excinfo:
+            post_chat_completion(PAYLOAD, "key", base_url=base_url)
+
+        assert excinfo.value.status == 429
+        assert excinfo.value.headers["retry-after"] == "3"
+        assert excinfo.value.headers["retry-after-ms"] == "2500"
+
+    def test_tokens_per_minute_limit(self, stub_factory):
+        # 60 tokens/minute: six 10-token replies fit, the seventh does not
+        _, base_url = stub_factory(tokens_per_minute=60)
+        for _ in range(6):
+            post_chat_completion(PAYLOAD, "key", base_url=base_url)
+
+        with pytest.raises(OpenAIHTTPError) as excinfo:
+            post_chat_completion(PAYLOAD, "key", base_url=base_url)
+
+        assert excinfo.value.status == 429
+
+    def test_error_injection(self, stub_factory):
+        _, base_url = stub_factory(error_rate=1.0)
+
+        with pytest.raises(OpenAIHTTPError) as excinfo:
+            post_chat_completion(PAYLOAD, "key", base_url=base_url)
+
+        assert excinfo.value.status == 500
+
+    @pytest.mark.parametrize(
+        "spec", ["fixed:0.1", "uniform:0,1", "exp:0.2", "lognormal:0.3,0.5"]
+    )
+    def test_latency_specs(self, spec):
+        sample = parse_latency(spec)(random.Random(0))
+        assert sample >= 0
+
+    def test_invalid_latency_spec(self):
+        with pytest.raises(ValueError):
+            parse_latency("gaussian:1")
+
+
+class TestBaseURL:
+    """OPENAI_BASE_URL selects the origin"""
+
+    def test_default_and_override(self):
+        with patch.dict("os.environ", {"OPENAI_BASE_URL": ""}):
+            assert get_base_url() == "https://api.openai.com"
+        with patch.dict(
+            "os.environ", {"OPENAI_BASE_URL": "http://127.0.0.1:8089"}
+        ):
+            assert get_base_url() == "http://127.0.0.1:8089"
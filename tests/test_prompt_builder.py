@@ -0,0 +1,94 @@
+"""
+Unit tests for the token-budgeted reply prompt builder
+"""
+import re
+from unittest.mock import patch
+
+from src.app.common.prompt_builder import (
+    estimate_tokens,
+    fit_body,
+    plan_reply_prompt,
+    size_max_tokens,
+    trim_middle,
+)
+
+
+class TestEstimateTokens:
+    """Offline estimates for Japanese and English"""
+
+    def test_japanese_is_about_one_token_per_character(self):
+        assert estimate_tokens("お問い合わせありがとうございます") == 16
+
+    def test_english_words(self):
+        # "Hello"(2) ","(1) "thanks"(2) "."(1)
+        assert estimate_tokens("Hello, thanks.") == 6
+
+    def test_empty(self):
+        assert estimate_tokens("") == 0
+
+
+class TestFitBody:
+    """Quoted history is trimmed before the inquiry itself"""
+
+    def test_short_body_is_untouched(self):
+        assert fit_body("短い本文", 100) == "短い本文"
+
+    def test_collapses_quoted_block_keeping_ends(self):
+        quoted = [f"> 過去のメール {i}" for i in range(100)]
+        body = "\n".join(["質問があります。"] + quoted + ["以上です。"])
+
+        fitted = fit_body(body, 200)
+
+        assert estimate_tokens(fitted) <= 200
+        assert fitted.startswith("質問があります。\n> 過去のメール 0")
+        assert fitted.endswith("> 過去のメール 99\n以上です。")
+        assert "引用 96 行省略" in fitted
+
+    def test_falls_back_to_middle_trim(self):
+        body = "始" + "あ" * 1000 + "終"
+
+        fitted = fit_body(body, 100)
+
+        assert estimate_tokens(fitted) <= 100
+        assert fitted.startswith("始") and fitted.endswith("終")
+        assert "中略" in fitted
+
+    def test_middle_trim_keeps_placeholders_whole(self):
+        body = "".join(f"連絡先は[EMAIL_{i}]です。" for i in range(40))
+
+        for budget in range(20, 200, 3):
+            fitted = trim_middle(body, budget)
+
+            assert estimate_tokens(fitted) <= budget
+            rest = re.sub(r"\[EMAIL_\d+\]", "", fitted)
+            assert "[" not in rest and "]" not in rest and "EMAIL" not in rest
+
+
+class TestPlanReplyPrompt:
+    """Prompt and max_tokens sizing"""
+
+    def test_max_tokens_scales_with_inquiry(self):
+        short = plan_reply_prompt("料金を教えてください。")
+        long = plan_reply_prompt("詳細な説明です。" * 150)
+
+        assert short.max_tokens == 200
+        assert 200 < long.max_tokens <= 600
+        assert not short.trimmed
+
+    def test_budget_from_env(self):
+        with patch.dict(
+            "os.environ", {"PROMPT_INPUT_TOKEN_BUDGET": "300"}
+        ):
+            plan = plan_reply_prompt("あ" * 2000)
+
+        assert plan.trimmed
+        assert plan.prompt_tokens <= 300
+        assert plan.source_tokens == 2000
+        assert plan.log_fields()["body_tokens"] == plan.body_tokens
+
+    def test_size_max_tokens_bounds(self):
+        assert size_max_tokens(0, floor=50, ceiling=100) == 100
+        assert size_max_tokens(10_000, ceiling=400) == 400
+
+    def test_ceiling_wins_over_floor(self):
+        assert size_max_tokens(0, floor=200, ceiling=150) == 150
@@ -0,0 +1,288 @@
+"""
+Tests for queued reply sends from modal submissions
+"""
+import json
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.app import reply_sender
+from src.app.common import send_queue
+from src.app.common.deadline import Deadline
+from src.app.common.send_queue import parse_send_message, try_queue_send
+from src.app.router import handle_event, send_reply
+
+QUEUE_URL = "https://sqs.example/reply-send"
+CONFIG = MagicMock(
+    sender_email_address="support@example.com", slack_channel_id="C1"
+)
+
+
+def _record(context_id="ctx-1", send_id="s1", receive_count="1"):
+    return {
+        "messageId": f"m-{send_id}",
+        "body": json.dumps(
+            {"send": {"context_id": context_id, "send_id": send_id}}
+        ),
+        "attributes": {"ApproximateReceiveCount": receive_count},
+    }
+
+
+class TestQueueSend:
+    """view_submission persists the intent and queues it"""
+
+    def test_off_without_queue_url(self, monkeypatch):
+        monkeypatch.delenv("REPLY_SEND_QUEUE_URL", raising=False)
+
+        assert not try_queue_send("ctx-1", "本文")
+
+    def test_persists_intent_then_queues(self, monkeypatch):
+        monkeypatch.setenv("REPLY_SEND_QUEUE_URL", QUEUE_URL)
+        with (
+            patch.object(send_queue, "update_context_fields") as mock_update,
+            patch("boto3.client") as mock_boto,
+        ):
+            assert try_queue_send("ctx-1", "本文")
+
+        fields = mock_update.call_args[1]
+        assert fields["reply_text"] == "本文"
+        kwargs = mock_boto.return_value.send_message.call_args[1]
+        assert kwargs["QueueUrl"] == QUEUE_URL
+        assert parse_send_message(kwargs["MessageBody"]) == (
+            "ctx-1", fields["send_id"]
+        )
+
+    def test_failure_falls_back(self, monkeypatch):
+        monkeypatch.setenv("REPLY_SEND_QUEUE_URL", QUEUE_URL)
+        with patch.object(
+            send_queue,
+            "update_context_fields",
+            side_effect=RuntimeError("throttled"),
+        ):
+            assert not try_queue_send("ctx-1", "本文")
+
+    @pytest.mark.parametrize(
+        "raw", ["{}", '{"send": {"context_id": "c"}}', "[]"]
+    )
+    def test_invalid_message(self, raw):
+        with pytest.raises(ValueError):
+            parse_send_message(raw)
+
+    def test_submission_does_not_wait_for_delivery(self):
+        view = {
+            "id": "V1",
+            "private_metadata": json.dumps({"context_id": "ctx-1"}),
+            "state": {
+                "values": {
+                    "editable_reply_block": {
+                        "editable_reply_input": {"value": "Edited"}
+                    }
+                }
+            },
+        }
+        event = {
+            "requestContext": {"http": {"method": "POST"}},
+            "headers": {
+                "Content-Type": "application/x-www-form-urlencoded",
+            },
+            "body": "payload="
+            + json.dumps({"type": "view_submission", "view": view}),
+        }
+        with (
+            patch("src.app.router.load_config", return_value=CONFIG),
+            patch(
+                "src.app.router.resolve_slack_credentials",
+                return_value={"bot_token": "xoxb", "signing_secret": "s"},
+            ),
+            patch(
+                "src.app.router.verify_slack_signature", return_value=True
+            ),
+            patch(
+                "src.app.router.get_context_item",
+                return_value={"sender_email": "c@example.com"},
+            ),
+            patch(
+                "src.app.router.try_queue_send", return_value=True
+            ) as mock_queue,
+            patch("src.app.router.send_email") as mock_send,
+            patch("src.app.router.SlackClient") as mock_slack,
+        ):
+            response = handle_event(event)
+
+        assert json.loads(response["body"]) == {"response_action": "clear"}
+        assert mock_queue.call_args[0][:2] == ("ctx-1", "Edited")
+        mock_send.assert_not_called()
+        mock_slack.assert_not_called()
+
+
+class TestSendReply:
+    """The Slack confirmation follows a sent email"""
+
+    def test_confirmation_follows_email(self):
+        calls = []
+        with (
+            patch(
+                "src.app.router.send_email",
+                side_effect=lambda **kwargs: calls.append("email"),
+            ),
+            patch("src.app.router.mark_context_status") as mock_mark,
+            patch("src.app.router.update_context_fields") as mock_update,
+            patch("src.app.router.SlackClient") as mock_slack,
+        ):
+            mock_slack.return_value.post_message.side_effect = (
+                lambda **kwargs: calls.append("confirmation") or True
+            )
+            sent = send_reply(
+                CONFIG, "ctx-1", "c@example.com", "件名", "本文", "xoxb",
+                Deadline.after(5.0), send_id="s1",
+            )
+
+        assert sent
+        assert calls == ["email", "confirmation"]
+        assert mock_mark.call_args[1]["sent_send_id"] == "s1"
+        assert mock_update.call_args[1]["confirmed_send_id"] == "s1"
+
+    def test_deferred_confirmation_not_recorded(self):
+        with (
+            patch("src.app.router.send_email"),
+            patch("src.app.router.mark_context_status"),
+            patch("src.app.router.update_context_fields") as mock_update,
+            patch("src.app.router.SlackClient") as mock_slack,
+        ):
+            # The dispatcher deferred the post to its outbox
+            mock_slack.return_value.post_message.return_value = False
+            sent = send_reply(
+                CONFIG, "ctx-1", "c@example.com", "件名", "本文", "xoxb",
+                Deadline.after(5.0), send_id="s1",
+            )
+
+        assert sent
+        mock_slack.return_value.post_message.assert_called_once()
+        mock_update.assert_not_called()
+
+    def test_email_in_flight_at_deadline_not_confirmed(self):
+        def slow(**kwargs):
+            time.sleep(0.3)
+
+        with (
+            patch("src.app.router.send_email", side_effect=slow),
+            patch("src.app.router.mark_context_status"),
+            patch("src.app.router.update_context_fields"),
+            patch("src.app.router.SlackClient") as mock_slack,
+        ):
+            sent = send_reply(
+                CONFIG, "ctx-1", "c@example.com", "件名", "本文", "xoxb",
+                Deadline.after(0.1), send_id="s1",
+            )
+            time.sleep(0.4)
+
+        assert not sent
+        mock_slack.return_value.post_message.assert_not_called()
+
+    def test_email_failure_reported(self):
+        with (
+            patch(
+                "src.app.router.send_email",
+                side_effect=RuntimeError("ses throttled"),
+            ),
+            patch("src.app.router.mark_context_status") as mock_mark,
+            patch("src.app.router.SlackClient") as mock_slack,
+        ):
+            assert not send_reply(
+                CONFIG, "ctx-1", "c@example.com", "件名", "本文", "",
+                Deadline.after(5.0),
+            )
+
+        mock_mark.assert_not_called()
+        mock_slack.assert_not_called()
+
+
+class TestReplySender:
+    """The queue consumer sends each intent once"""
+
+    def _run(self, records, item):
+        with (
+            patch.object(reply_sender, "load_config", return_value=CONFIG),
+            patch.object(
+                reply_sender,
+                "resolve_slack_credentials",
+                return_value={"bot_token": "xoxb"},
+            ),
+            patch.object(
+                reply_sender, "get_context_item", return_value=item
+            ),
+            patch.object(reply_sender, "send_reply") as mock_send,
+            patch.object(reply_sender, "confirm_reply") as mock_confirm,
+        ):
+            mock_send.return_value = True
+            response = reply_sender.handler({"Records": records}, None)
+        self.confirm = mock_confirm
+        return response, mock_send
+
+    def test_sends_persisted_text(self):
+        item = {
+            "sender_email": "c@example.com",
+            "subject": "件名",
+            "reply_text": "本文",
+            "send_id": "s1",
+        }
+
+        response, mock_send = self._run([_record()], item)
+
+        assert response == {"batchItemFailures": []}
+        args, kwargs = mock_send.call_args
+        assert args[1:6] == ("ctx-1", "c@example.com", "件名", "本文", "xoxb")
+        assert kwargs == {"send_id": "s1"}
+
+    @pytest.mark.parametrize(
+        "item",
+        [
+            None,
+            {"send_id": "s2"},
+            {
+                "send_id": "s1",
+                "sent_send_id": "s1",
+                "confirmed_send_id": "s1",
+            },
+        ],
+    )
+    def test_skips_missing_superseded_or_sent(self, item):
+        response, mock_send = self._run([_record()], item)
+
+        assert response == {"batchItemFailures": []}
+        mock_send.assert_not_called()
+        self.confirm.assert_not_called()
+
+    def test_late_email_confirmed_on_redelivery(self):
+        item = {"send_id": "s1", "sent_send_id": "s1"}
+
+        response, mock_send = self._run([_record(receive_count="2")], item)
+
+        assert response == {"batchItemFailures": []}
+        mock_send.assert_not_called()
+        args = self.confirm.call_args[0]
+        assert args[1:3] == ("ctx-1", "xoxb") and args[4] == "s1"
+
+    def test_failed_send_redelivered(self):
+        item = {"sender_email": "c@example.com", "send_id": "s1"}
+        with (
+            patch.object(reply_sender, "load_config", return_value=CONFIG),
+            patch.object(
+                reply_sender,
+                "resolve_slack_credentials",
+                return_value={"bot_token": "xoxb"},
+            ),
+            patch.object(
+                reply_sender, "get_context_item", return_value=item
+            ),
+            patch.object(
+                reply_sender, "send_reply", return_value=False
+            ) as mock_send,
+        ):
+            response = reply_sender.handler(
+                {"Records": [_record(receive_count="2")]}, None
+            )
+
+        assert response["batchItemFailures"] == [{"itemIdentifier": "m-s1"}]
+        assert mock_send.call_args[1] == {"send_id": "s1"}
@@ -0,0 +1,171 @@
+"""
+Unit tests for retry, backoff and hedged OpenAI calls
+"""
+import threading
+import time
+
+import pytest
+
+from src.app.common.openai_client import OpenAIHTTPError
+from src.app.common.retry import (
+    LatencyTracker,
+    RetryPolicy,
+    backoff_delay,
+    call_with_retry,
+    hedged_call,
+    is_retryable,
+    retry_after_seconds,
+    stream_with_retry,
+)
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestBackoff:
+    """Retry classification and delays"""
+
+    @pytest.mark.parametrize(
+        "exc, expected",
+        [
+            (OpenAIHTTPError(429, b""), True),
+            (OpenAIHTTPError(503, b""), True),
+            (OpenAIHTTPError(400, b""), False),
+            (ConnectionResetError(), True),
+            (ValueError("bad"), False),
+        ],
+    )
+    def test_is_retryable(self, exc, expected):
+        assert is_retryable(exc) is expected
+
+    def test_retry_after_headers(self):
+        assert retry_after_seconds(
+            OpenAIHTTPError(429, b"", {"retry-after-ms": "1500"})
+        ) == 1.5
+        assert retry_after_seconds(
+            OpenAIHTTPError(429, b"", {"retry-after": "3"})
+        ) == 3.0
+        assert retry_after_seconds(OpenAIHTTPError(429, b"")) is None
+
+    def test_delay_is_jittered_and_honours_retry_after(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=4.0)
+
+        assert backoff_delay(5, policy, rng=lambda lo, hi: hi) == 4.0
+        assert backoff_delay(0, policy, rng=lambda lo, hi: lo) == 0.0
+        exc = OpenAIHTTPError(429, b"", {"retry-after": "2"})
+        assert backoff_delay(0, policy, exc, rng=lambda lo, hi: lo) == 2.0
+
+
+class TestCallWithRetry:
+    """Deadline-bounded retries"""
+
+    def test_retries_until_success(self):
+        clock = _FakeClock()
+        calls = []
+
+        def fn(timeout):
+            calls.append(timeout)
+            if len(calls) < 3:
+                raise OpenAIHTTPError(500, b"")
+            return "ok"
+
+        result = call_with_retry(
+            fn, 10.0, RetryPolicy(max_attempts=3),
+            sleep=clock.sleep, clock=clock,
+        )
+
+        assert result == "ok"
+        assert len(calls) == 3
+        # Later attempts only get what is left of the deadline
+        assert calls[0] == 10.0 and calls[2] < 10.0
+
+    def test_gives_up_when_retry_after_exceeds_deadline(self):
+        clock = _FakeClock()
+        calls = []
+
+        def fn(timeout):
+            calls.append(timeout)
+            raise OpenAIHTTPError(429, b"", {"retry-after": "30"})
+
+        with pytest.raises(OpenAIHTTPError):
+            call_with_retry(fn, 5.0, sleep=clock.sleep, clock=clock)
+
+        assert len(calls) == 1
+        assert clock.now == 0.0
+
+    def test_non_retryable_raises_immediately(self):
+        calls = []
+
+        def fn(timeout):
+            calls.append(timeout)
+            raise OpenAIHTTPError(401, b"")
+
+        with pytest.raises(OpenAIHTTPError):
+            call_with_retry(fn, time.monotonic() + 5)
+
+        assert len(calls) == 1
+
+    def test_stream_retries_only_before_first_item(self):
+        clock = _FakeClock()
+        opened = []
+
+        def open_stream(timeout):
+            opened.append(timeout)
+            if len(opened) == 1:
+                raise ConnectionResetError()
+            yield "a"
+            raise ConnectionResetError()
+
+        it = stream_with_retry(open_stream, 5.0, sleep=clock.sleep, clock=clock)
+
+        assert next(it) == "a"
+        with pytest.raises(ConnectionResetError):
+            next(it)
+        assert len(opened) == 2
+
+
+class TestHedgedCall:
+    """Second request after the observed p95"""
+
+    def test_no_hedge_without_samples(self):
+        tracker = LatencyTracker(min_samples=5)
+        calls = []
+
+        assert hedged_call(lambda t: calls.append(t) or "ok", 1.0, tracker) == "ok"
+        assert len(calls) == 1
+        assert tracker.percentile(0.5) is None
+
+    def test_hedge_wins_when_first_is_slow(self):
+        tracker = LatencyTracker(min_samples=1)
+        release = threading.Event()
+        calls = []
+
+        def fn(timeout):
+            calls.append(timeout)
+            if len(calls) == 1:
+                release.wait(2)
+                return "slow"
+            return "fast"
+
+        try:
+            result = hedged_call(fn, 2.0, tracker, hedge_after=0.05)
+        finally:
+            release.set()
+
+        assert result == "fast"
+        assert len(calls) == 2
+
+    def test_p95(self):
+        tracker = LatencyTracker(min_samples=10)
+        for i in range(100):
+            tracker.observe(i / 100)
+
+        assert tracker.p95() == 0.95
@@ -2,7 +2,7 @@
 Unit tests for event router functionality
 """
 import json
-from unittest.mock import MagicMock, patch
+from unittest.mock import ANY, MagicMock, patch
 
 from src.app.router import handle_event
 
@@ -153,6 +153,7 @@ class TestEventRouter:
             patch("src.app.router.verify_slack_signature") as mock_verify,
             patch("src.app.router.get_context_item") as mock_get,
             patch("src.app.router.send_email") as mock_send,
+            patch("src.app.router.mark_context_status") as mock_update,
             patch("src.app.router.SlackClient") as mock_slack,
         ):
             mock_config.return_value = MagicMock(
@@ -186,7 +187,11 @@ class TestEventRouter:
                 to_addresses=["customer@example.com"],
                 subject="Re: Test Subject",
                 body="Edited",
+                deadline=ANY,
             )
+            mock_update.assert_called_once()
+            assert mock_update.call_args[0] == ("ctx-id", "sent")
+            assert set(mock_update.call_args[1]) == {"sent_at", "deadline"}
             mock_slack_instance.post_message.assert_called_once()
 
     def test_unknown_event_type(self) -> None:
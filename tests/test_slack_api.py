@@ -0,0 +1,326 @@
+"""
+Tests for the pooled Slack Web API client
+"""
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.app.common.deadline import Deadline
+from src.app.common.generation.aio import AsyncKeepAlivePool
+from src.app.common.http_pool import KeepAlivePool
+from src.app.common.slack_api import (
+    AsyncSlackWebClient,
+    SlackAPIError,
+    SlackWebClient,
+    get_async_slack_pool,
+    get_async_slack_web_client,
+    get_slack_web_client,
+)
+from src.app.slack import client as slack_client
+from src.app.slack.dispatcher import OutboundCall, Outbox, SlackDispatcher
+
+
+class _SlackHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    calls = []
+
+    def do_POST(self):  # noqa: N802 - http.server API
+        length = int(self.headers.get("Content-Length", "0"))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        self.calls.append(
+            (self.path, self.headers.get("Authorization"), payload)
+        )
+        status, body, headers = 200, {"ok": True}, {}
+        if payload.get("view", {}).get("title") == "missing":
+            body = {"ok": False, "error": "not_found"}
+        if payload.get("channel") == "busy":
+            status, body, headers = 429, {}, {"Retry-After": "7"}
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slack_server():
+    _SlackHandler.calls = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _SlackHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestSlackWebClient:
+    """JSON calls over one keep-alive connection"""
+
+    def test_tokens_share_warm_connection(self, slack_server):
+        pool = KeepAlivePool(slack_server)
+        old = SlackWebClient("xoxb-old", pool=pool)
+        new = SlackWebClient("xoxb-new", pool=pool)
+
+        old.views_open(trigger_id="t", view={"type": "modal"})
+        new.views_update(view={"type": "modal"}, external_id="ai-reply-1")
+        new.chat_postMessage(channel="C1", text="届きました")
+
+        assert pool.connections_opened == 1
+        assert _SlackHandler.calls == [
+            ("/api/views.open", "Bearer xoxb-old",
+             {"trigger_id": "t", "view": {"type": "modal"}}),
+            ("/api/views.update", "Bearer xoxb-new",
+             {"view": {"type": "modal"}, "external_id": "ai-reply-1"}),
+            ("/api/chat.postMessage", "Bearer xoxb-new",
+             {"channel": "C1", "text": "届きました"}),
+        ]
+        pool.close()
+
+    def test_api_errors_raise(self, slack_server):
+        client = SlackWebClient("xoxb", pool=KeepAlivePool(slack_server))
+
+        with pytest.raises(SlackAPIError) as exc:
+            client.views_update(view={"title": "missing"}, external_id="x")
+        assert exc.value.error == "not_found"
+
+        with pytest.raises(SlackAPIError) as exc:
+            client.chat_postMessage(channel="busy", text="x")
+        assert exc.value.status == 429
+        assert exc.value.headers["retry-after"] == "7"
+        client.pool.close()
+
+    def test_prewarm_opens_connection_ahead_of_call(self, slack_server):
+        pool = KeepAlivePool(slack_server)
+
+        pool.prewarm().join()
+        assert pool.prewarm() is None
+        SlackWebClient("xoxb", pool=pool).views_open("t", {"type": "modal"})
+
+        assert pool.connections_opened == 1
+        pool.close()
+
+    def test_connections_idle_too_long_are_replaced(self, slack_server):
+        pool = KeepAlivePool(slack_server, max_idle_age=0.05)
+        client = SlackWebClient("xoxb", pool=pool)
+        client.views_open("t", {"type": "modal"})
+        idle = pool._idle[0]
+
+        time.sleep(0.1)
+        client.views_open("t", {"type": "modal"})
+
+        assert pool.connections_opened == 2
+        assert idle.sock is None
+        pool.close()
+
+
+class TestAsyncSlackWebClient:
+    """The same calls from an event loop"""
+
+    def test_concurrent_calls_on_one_loop(self, slack_server):
+        async def run():
+            pool = AsyncKeepAlivePool(slack_server)
+            client = AsyncSlackWebClient("xoxb", pool=pool)
+            await asyncio.gather(
+                client.views_update(view={"type": "modal"}, external_id="a"),
+                client.chat_postMessage(channel="C1", text="x"),
+            )
+            with pytest.raises(SlackAPIError) as exc:
+                await client.chat_postMessage(channel="busy", text="x")
+            pool.close()
+            return exc.value
+
+        error = asyncio.run(run())
+
+        assert sorted(path for path, _, _ in _SlackHandler.calls) == [
+            "/api/chat.postMessage",
+            "/api/chat.postMessage",
+            "/api/views.update",
+        ]
+        assert error.status == 429
+        assert error.headers["retry-after"] == "7"
+
+    def test_pool_per_event_loop(self):
+        async def pools():
+            return get_async_slack_pool(), get_async_slack_pool()
+
+        first, again = asyncio.run(pools())
+        other, _ = asyncio.run(pools())
+
+        assert first is again
+        assert other is not first
+
+    def test_client_per_token_and_event_loop(self):
+        async def clients():
+            return (
+                get_async_slack_web_client("xoxb-1"),
+                get_async_slack_web_client("xoxb-1"),
+                get_async_slack_web_client("xoxb-2"),
+            )
+
+        first, again, rotated = asyncio.run(clients())
+        other, _, _ = asyncio.run(clients())
+
+        assert first is again
+        assert rotated is not first and rotated.token == "xoxb-2"
+        assert rotated.pool is first.pool
+        assert other is not first
+
+
+class _RecordingOutbox(Outbox):
+    def __init__(self):
+        self.deferred = []
+
+    def defer(self, call, delay):
+        self.deferred.append((call, delay))
+
+
+class TestAsyncSlackClient:
+    """Same surface as SlackClient, sharing the dispatcher's buckets"""
+
+    def _client(self, web, outbox=None):
+        slack_client.get_modal_updater.cache_clear()
+        dispatcher = SlackDispatcher(MagicMock(), outbox=outbox)
+        with patch.object(
+            slack_client, "get_dispatcher", return_value=dispatcher
+        ):
+            return slack_client.AsyncSlackClient("xoxb", client=web)
+
+    def test_modal_calls(self):
+        web = MagicMock()
+        web.views_open = AsyncMock()
+        web.views_update = AsyncMock()
+        client = self._client(web)
+
+        async def run():
+            await client.open_modal("t", {"type": "modal"}, Deadline.after(2))
+            await client.update_modal("ext", {"type": "modal"})
+
+        asyncio.run(run())
+
+        assert web.views_open.call_args[1]["timeout"] <= 2
+        web.views_update.assert_awaited_once_with(
+            external_id="ext", view={"type": "modal"}, hash=None, timeout=10.0
+        )
+
+    def test_rate_limited_message_is_retried(self):
+        web = MagicMock()
+        web.api_call = AsyncMock(
+            side_effect=[
+                SlackAPIError(
+                    "chat.postMessage", "ratelimited", 429,
+                    {"retry-after": "0.05"},
+                ),
+                {"ok": True},
+            ]
+        )
+        client = self._client(web)
+
+        assert asyncio.run(client.post_message("C1", "done"))
+
+        assert web.api_call.await_count == 2
+        (method, payload), _ = web.api_call.call_args
+        assert method == "chat.postMessage"
+        assert payload == {"channel": "C1", "text": "done"}
+
+    def test_message_deferred_when_deadline_runs_out(self):
+        web = MagicMock()
+        web.api_call = AsyncMock(
+            side_effect=SlackAPIError(
+                "chat.postMessage", "ratelimited", 429,
+                {"retry-after": "30"},
+            )
+        )
+        outbox = _RecordingOutbox()
+        client = self._client(web, outbox)
+
+        assert not asyncio.run(
+            client.post_message("C1", "done", deadline=Deadline.after(0.5))
+        )
+
+        (call, delay), = outbox.deferred
+        assert call.payload == {"channel": "C1", "text": "done"}
+        assert delay == pytest.approx(30, abs=1)
+
+
+class TestClientCache:
+    """One client per token, rebuilt when the token changes"""
+
+    def test_cached_per_token(self):
+        get_slack_web_client.cache_clear()
+        try:
+            first = get_slack_web_client("xoxb-1")
+
+            assert get_slack_web_client("xoxb-1") is first
+            rotated = get_slack_web_client("xoxb-2")
+            assert rotated is not first
+            assert rotated.token == "xoxb-2"
+            assert rotated.pool is first.pool
+        finally:
+            get_slack_web_client.cache_clear()
+
+    def test_slack_client_caps_timeout_by_deadline(self):
+        web = MagicMock()
+        dispatcher = MagicMock()
+        deadline = Deadline.after(1.5)
+        with (
+            patch.object(
+                slack_client, "get_slack_web_client", return_value=web
+            ),
+            patch.object(
+                slack_client, "get_dispatcher", return_value=dispatcher
+            ),
+        ):
+            client = slack_client.SlackClient("xoxb")
+            client.open_modal("t", {"type": "modal"}, deadline)
+            client.post_message("C1", "done", deadline=deadline)
+
+        assert web.views_open.call_args[1]["timeout"] <= 1.5
+        # Messages go through the rate-limited dispatcher
+        (call,), _ = dispatcher.enqueue.call_args
+        assert call == OutboundCall(
+            "chat.postMessage", {"channel": "C1", "text": "done"}
+        )
+        dispatcher.flush.assert_called_once_with(deadline)
+
+    def test_post_message_reports_whether_sent(self):
+        web = MagicMock()
+        web.api_call.side_effect = [
+            {"ok": True},
+            SlackAPIError(
+                "chat.postMessage", "ratelimited", 429,
+                {"retry-after": "30"},
+            ),
+        ]
+        outbox = _RecordingOutbox()
+        dispatcher = SlackDispatcher(web, outbox=outbox)
+        with (
+            patch.object(
+                slack_client, "get_slack_web_client", return_value=web
+            ),
+            patch.object(
+                slack_client, "get_dispatcher", return_value=dispatcher
+            ),
+        ):
+            client = slack_client.SlackClient("xoxb")
+            sent = client.post_message(
+                "C1", "one", deadline=Deadline.after(1)
+            )
+            deferred = client.post_message(
+                "C1", "two", deadline=Deadline.after(1)
+            )
+
+        assert sent and not deferred
+        (call, _), = outbox.deferred
+        assert call.payload["text"] == "two"
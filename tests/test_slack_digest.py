@@ -0,0 +1,162 @@
+"""
+Tests for digest-mode new-email notifications
+"""
+import json
+from unittest.mock import MagicMock, patch
+
+from src.app.slack import digest
+from src.app.slack.digest import (
+    build_digest_notification,
+    digest_messages,
+    notification_entry,
+    try_queue_notification,
+)
+
+QUEUE_URL = "https://sqs.example/slack-digest"
+
+
+def _entry(i, channel="C1"):
+    return notification_entry(
+        channel, f"ctx-{i}", f"user{i}@example.com", f"件名{i}", "本文" * 200
+    )
+
+
+class TestDigestMessages:
+    """One message per batch, one button per email"""
+
+    def test_each_email_keeps_its_own_button(self):
+        blocks = build_digest_notification([_entry(1), _entry(2)])
+
+        assert blocks[0]["type"] == "header"
+        assert "2件" in blocks[0]["text"]["text"]
+        sections = [b for b in blocks if b["type"] == "section"]
+        assert [
+            json.loads(s["accessory"]["value"]) for s in sections
+        ] == [{"context_id": "ctx-1"}, {"context_id": "ctx-2"}]
+        assert {s["accessory"]["action_id"] for s in sections} == {
+            "generate_reply_action"
+        }
+        assert [b["type"] for b in blocks].count("divider") == 1
+
+    def test_preview_is_shortened(self):
+        assert _entry(1)["preview"].endswith("…")
+        assert len(_entry(1)["preview"]) == digest.PREVIEW_CHARS + 1
+
+    def test_chunked_by_limit_and_channel(self):
+        entries = [_entry(i) for i in range(5)] + [_entry(9, "C2")]
+
+        messages = digest_messages(entries, limit=2)
+
+        assert [(channel, len(blocks)) for channel, _, blocks in messages] == [
+            ("C1", 4), ("C1", 4), ("C1", 2), ("C2", 2),
+        ]
+        assert messages[0][1].startswith("新しい問い合わせ 2件")
+
+    def test_limit_capped_by_block_budget(self, monkeypatch):
+        monkeypatch.setenv("SLACK_DIGEST_MAX_ITEMS", "100")
+        entries = [_entry(i) for i in range(30)]
+
+        (_, _, blocks), _ = digest_messages(entries)
+
+        assert len(blocks) <= 50
+
+
+class TestQueueNotification:
+    """Queueing is opt-in and falls back to a direct post"""
+
+    def test_off_without_queue_url(self, monkeypatch):
+        monkeypatch.delenv("SLACK_DIGEST_QUEUE_URL", raising=False)
+
+        assert not try_queue_notification(_entry(1))
+
+    def test_queues_entry(self, monkeypatch):
+        monkeypatch.setenv("SLACK_DIGEST_QUEUE_URL", QUEUE_URL)
+        with patch("boto3.client") as mock_boto:
+            assert try_queue_notification(_entry(1))
+
+        kwargs = mock_boto.return_value.send_message.call_args[1]
+        assert kwargs["QueueUrl"] == QUEUE_URL
+        assert json.loads(kwargs["MessageBody"]) == {"digest": _entry(1)}
+
+    def test_queue_failure_falls_back(self, monkeypatch):
+        monkeypatch.setenv("SLACK_DIGEST_QUEUE_URL", QUEUE_URL)
+        with patch("boto3.client") as mock_boto:
+            mock_boto.return_value.send_message.side_effect = RuntimeError
+            assert not try_queue_notification(_entry(1))
+
+    def test_router_queues_instead_of_posting(self):
+        eml = (
+            "From: test@example.com\r\n"
+            "Subject: Test Subject\r\n"
+            "Message-ID: <test-message-id>\r\n\r\n"
+            "Test email body"
+        ).encode("utf-8")
+        body = MagicMock()
+        body.read.return_value = eml
+        s3_event = {
+            "Records": [
+                {
+                    "s3": {
+                        "bucket": {"name": "inbound"},
+                        "object": {"key": "inbound/abc.eml"},
+                    }
+                }
+            ]
+        }
+        with (
+            patch("src.app.router.load_config") as mock_config,
+            patch("src.app.router.boto3.client") as mock_boto,
+            patch("src.app.router.put_context_item"),
+            patch(
+                "src.app.router.try_queue_notification", return_value=True
+            ) as mock_queue,
+            patch("src.app.router.resolve_slack_credentials") as mock_creds,
+            patch("src.app.router.SlackClient") as mock_slack,
+        ):
+            from src.app.router import handle_event
+
+            mock_config.return_value = MagicMock(slack_channel_id="C1")
+            mock_boto.return_value.get_object.return_value = {"Body": body}
+            response = handle_event(s3_event)
+
+        assert response["statusCode"] == 200
+        (entry,), _ = mock_queue.call_args
+        assert entry["context_id"] == "<test-message-id>"
+        assert entry["channel"] == "C1"
+        mock_creds.assert_not_called()
+        mock_slack.assert_not_called()
+
+
+class TestDigestDrain:
+    """The outbox Lambda posts one message for a batch of records"""
+
+    def test_batch_posts_one_digest(self):
+        from src.app import slack_outbox
+
+        dispatcher = MagicMock()
+        dispatcher.flush.return_value = 1
+        dispatcher.pending = 0
+        records = [
+            {"body": json.dumps({"digest": _entry(i)})} for i in range(3)
+        ]
+        with (
+            patch.object(slack_outbox, "load_config"),
+            patch.object(
+                slack_outbox,
+                "resolve_slack_credentials",
+                return_value={"bot_token": "xoxb"},
+            ),
+            patch.object(
+                slack_outbox, "get_dispatcher", return_value=dispatcher
+            ),
+        ):
+            response = slack_outbox.handler({"Records": records}, None)
+
+        assert json.loads(response["body"])["digests"] == 1
+        dispatcher.enqueue.assert_not_called()
+        (method, payload), _ = dispatcher.submit.call_args
+        assert method == "chat.postMessage"
+        assert payload["channel"] == "C1"
+        assert len(
+            [b for b in payload["blocks"] if b["type"] == "section"]
+        ) == 3
@@ -0,0 +1,248 @@
+"""
+Tests for the rate-limited Slack dispatcher and the outbox drain Lambda
+"""
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.app.common.deadline import Deadline
+from src.app.common.slack_api import SlackAPIError
+from src.app.slack.dispatcher import (
+    OutboundCall,
+    Outbox,
+    SlackDispatcher,
+    TokenBucket,
+    get_dispatcher,
+)
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class FakeSlack:
+    def __init__(self, clock, failures=None):
+        self.clock = clock
+        self.calls = []
+        # channel -> exceptions raised by successive calls
+        self.failures = failures or {}
+
+    def api_call(self, method, payload, timeout=None):
+        pending = self.failures.get(payload.get("channel"))
+        if pending:
+            raise pending.pop(0)
+        self.calls.append((self.clock(), method, payload["channel"]))
+        return {"ok": True}
+
+
+class RecordingOutbox(Outbox):
+    def __init__(self):
+        self.deferred = []
+
+    def defer(self, call, delay):
+        self.deferred.append((call, delay))
+
+
+def rate_limited(retry_after):
+    return SlackAPIError(
+        "chat.postMessage",
+        "ratelimited",
+        429,
+        {"retry-after": str(retry_after)},
+    )
+
+
+@pytest.fixture
+def fake_time():
+    return FakeTime()
+
+
+def dispatcher_for(fake_time, slack, outbox=None, max_queue=100):
+    return SlackDispatcher(
+        slack,
+        outbox=outbox,
+        max_queue=max_queue,
+        clock=fake_time.clock,
+        sleep=fake_time.sleep,
+    )
+
+
+class TestTokenBucket:
+    """Refill, burst and Retry-After pauses"""
+
+    def test_burst_then_rate(self, fake_time):
+        bucket = TokenBucket(1.0, 3, fake_time.clock)
+
+        assert [bucket.take() for _ in range(4)] == [True] * 3 + [False]
+        assert bucket.wait_time() == pytest.approx(1.0)
+        fake_time.now += 1.0
+        assert bucket.take()
+
+    def test_pause_blocks_until_retry_after(self, fake_time):
+        bucket = TokenBucket(1.0, 3, fake_time.clock)
+        bucket.pause(30)
+
+        assert bucket.wait_time() == pytest.approx(30)
+        fake_time.now += 30
+        assert bucket.wait_time() == pytest.approx(1.0)
+
+
+class TestSlackDispatcher:
+    """Queueing, pacing, retries and deferral"""
+
+    def test_burst_drains_at_channel_rate(self, fake_time):
+        slack = FakeSlack(fake_time.clock)
+        dispatcher = dispatcher_for(fake_time, slack)
+        for i in range(5):
+            dispatcher.submit("chat.postMessage", {"channel": "C1", "i": i})
+        dispatcher.submit("chat.postMessage", {"channel": "C2"})
+
+        assert dispatcher.flush() == 6
+
+        times = [t for t, _, channel in slack.calls if channel == "C1"]
+        assert times == pytest.approx([0, 0, 0, 1, 2])
+        # The other channel has its own bucket and is not held back
+        assert [c for _, _, c in slack.calls].index("C2") == 3
+
+    def test_rate_limited_call_waits_for_retry_after(self, fake_time):
+        slack = FakeSlack(fake_time.clock, {"C1": [rate_limited(7)]})
+        dispatcher = dispatcher_for(fake_time, slack)
+        dispatcher.submit("chat.postMessage", {"channel": "C1"})
+
+        assert dispatcher.flush() == 1
+        assert slack.calls[0][0] >= 7
+
+    def test_leftovers_are_deferred_at_deadline(self, fake_time):
+        slack = FakeSlack(fake_time.clock, {"C1": [rate_limited(20)]})
+        outbox = RecordingOutbox()
+        dispatcher = dispatcher_for(fake_time, slack, outbox)
+        dispatcher.submit("chat.postMessage", {"channel": "C1"})
+        dispatcher.submit("chat.postMessage", {"channel": "C2"})
+
+        sent = dispatcher.flush(Deadline.after(2.0, fake_time.clock))
+
+        assert sent == 1
+        assert dispatcher.pending == 0
+        (call, delay), = outbox.deferred
+        assert call.payload == {"channel": "C1"} and call.attempts == 1
+        assert delay == pytest.approx(20)
+
+    def test_without_outbox_leftovers_stay_queued(self, fake_time):
+        slack = FakeSlack(fake_time.clock)
+        dispatcher = dispatcher_for(fake_time, slack)
+        for _ in range(4):
+            dispatcher.submit("chat.postMessage", {"channel": "C1"})
+
+        dispatcher.flush(Deadline.after(0.5, fake_time.clock))
+        assert dispatcher.pending == 1
+
+        dispatcher.flush()
+        assert dispatcher.pending == 0 and len(slack.calls) == 4
+
+    def test_permanent_errors_are_dropped(self, fake_time):
+        error = SlackAPIError("chat.postMessage", "channel_not_found")
+        slack = FakeSlack(fake_time.clock, {"C1": [error]})
+        dispatcher = dispatcher_for(fake_time, slack)
+        dispatcher.submit("chat.postMessage", {"channel": "C1"})
+
+        assert dispatcher.flush() == 0
+        assert dispatcher.dropped == 1 and dispatcher.pending == 0
+
+    def test_full_queue_sheds_oldest_to_outbox(self, fake_time):
+        outbox = RecordingOutbox()
+        dispatcher = dispatcher_for(
+            fake_time, FakeSlack(fake_time.clock), outbox, max_queue=2
+        )
+        for i in range(3):
+            dispatcher.submit("chat.postMessage", {"channel": "C1", "i": i})
+
+        assert [c.payload["i"] for c, _ in outbox.deferred] == [0]
+        assert dispatcher.pending == 2
+
+    def test_concurrent_submit_and_flush(self):
+        class SlowSlack:
+            def __init__(self):
+                self.channels = []
+
+            def api_call(self, method, payload, timeout=None):
+                time.sleep(0.001)
+                self.channels.append(payload["channel"])
+                return {"ok": True}
+
+        slack = SlowSlack()
+        dispatcher = SlackDispatcher(slack, max_queue=1000)
+
+        def worker(n):
+            for i in range(25):
+                dispatcher.submit("chat.postMessage", {"channel": f"{n}-{i}"})
+                dispatcher.flush(Deadline.after(5.0))
+
+        threads = [
+            threading.Thread(target=worker, args=(n,)) for n in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(slack.channels) == len(set(slack.channels)) == 200
+        assert dispatcher.sent == 200 and dispatcher.pending == 0
+
+    def test_outbound_call_round_trips(self):
+        call = OutboundCall("chat.postMessage", {"channel": "C1"}, 2)
+
+        assert OutboundCall.from_json(call.to_json()) == call
+
+
+class TestSlackOutboxHandler:
+    """SQS-triggered drain of deferred calls"""
+
+    def test_drains_records(self):
+        from src.app import slack_outbox
+
+        dispatcher = MagicMock()
+        dispatcher.flush.return_value = 1
+        dispatcher.pending = 0
+        records = [
+            {"body": OutboundCall("chat.postMessage", {"channel": "C1"})
+             .to_json()},
+            {"messageId": "bad", "body": "{}"},
+        ]
+        with (
+            patch.object(slack_outbox, "load_config"),
+            patch.object(
+                slack_outbox,
+                "resolve_slack_credentials",
+                return_value={"bot_token": "xoxb"},
+            ),
+            patch.object(
+                slack_outbox, "get_dispatcher", return_value=dispatcher
+            ),
+        ):
+            response = slack_outbox.handler({"Records": records}, None)
+
+        assert json.loads(response["body"]) == {
+            "received": 1, "sent": 1, "pending": 0, "digests": 0,
+        }
+        (call,), _ = dispatcher.enqueue.call_args
+        assert call.payload == {"channel": "C1"}
+
+    def test_dispatcher_cached_per_token(self):
+        get_dispatcher.cache_clear()
+        try:
+            assert get_dispatcher("xoxb-1") is get_dispatcher("xoxb-1")
+            assert get_dispatcher("xoxb-2") is not get_dispatcher("xoxb-1")
+        finally:
+            get_dispatcher.cache_clear()
@@ -0,0 +1,177 @@
+"""
+Tests for the shared Slack request verification
+"""
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.app.common import secrets
+from src.app.common.slack_verify import (
+    INVALID,
+    REPLAY,
+    STALE,
+    ReplayCache,
+    SlackRequestVerifier,
+    check_signature,
+    compute_signature,
+)
+from src.app.slack.signature import verify_slack_signature
+
+SECRET = "8f742231b10e8888abcd99yyyzzz85a5"
+NOW = 1_700_000_000
+
+
+def _sign(body, timestamp=str(NOW), secret=SECRET):
+    return compute_signature(
+        secret.encode(), timestamp.encode(), body
+    ).decode()
+
+
+class TestCheckSignature:
+    """HMAC over the raw bytes within the timestamp window"""
+
+    def test_valid(self):
+        body = b"payload=%7B%22type%22%3A%22block_actions%22%7D"
+
+        assert check_signature(
+            SECRET, str(NOW), _sign(body), body, now=NOW
+        ) == ""
+
+    def test_body_is_not_decoded(self):
+        # Not valid UTF-8; the previous implementation raised on this
+        body = b"\xff\xfe raw"
+
+        assert check_signature(
+            SECRET, str(NOW), _sign(body), body, now=NOW
+        ) == ""
+
+    def test_rejections(self):
+        body = b"{}"
+        signature = _sign(body)
+
+        assert check_signature(
+            SECRET, str(NOW - 301), _sign(body, str(NOW - 301)), body,
+            now=NOW,
+        ) == STALE
+        assert check_signature(
+            SECRET, "abc", signature, body, now=NOW
+        ) == STALE
+        assert check_signature(
+            SECRET, str(NOW), signature, b"{ }", now=NOW
+        ) == INVALID
+        assert check_signature(
+            "other", str(NOW), signature, body, now=NOW
+        ) == INVALID
+        assert check_signature(
+            SECRET, str(NOW), "v0=short", body, now=NOW
+        ) == INVALID
+
+    def test_replay_rejected_after_first_use(self):
+        cache = ReplayCache(clock=lambda: NOW)
+        body = b"{}"
+        args = (SECRET, str(NOW), _sign(body), body)
+
+        assert check_signature(*args, replay_cache=cache, now=NOW) == ""
+        assert check_signature(*args, replay_cache=cache, now=NOW) == REPLAY
+
+    def test_forged_requests_do_not_fill_replay_cache(self):
+        cache = ReplayCache(clock=lambda: NOW)
+
+        check_signature(
+            SECRET, str(NOW), "v0=" + "0" * 64, b"{}", replay_cache=cache,
+            now=NOW,
+        )
+
+        assert len(cache) == 0
+
+    def test_lambda_wrapper(self):
+        body = b"token=x&team_id=T1"
+        cache = ReplayCache(clock=lambda: NOW)
+        with patch("time.time", return_value=NOW):
+            ts = str(NOW)
+            assert verify_slack_signature(
+                SECRET, ts, _sign(body), body, replay_cache=cache
+            )
+            assert not verify_slack_signature(
+                SECRET, ts, _sign(body), body, replay_cache=cache
+            )
+
+
+class TestReplayCache:
+    """Bounded by size and by the timestamp window"""
+
+    def test_bounded_by_size(self):
+        cache = ReplayCache(max_entries=3, clock=lambda: NOW)
+        for i in range(5):
+            cache.seen(NOW, f"sig-{i}")
+
+        assert len(cache) == 3
+        assert not cache.seen(NOW, "sig-0")
+
+    def test_expired_pairs_dropped(self):
+        now = [NOW]
+        cache = ReplayCache(window=300, clock=lambda: now[0])
+        cache.seen(NOW, "old")
+
+        now[0] += 301
+        cache.seen(now[0], "new")
+
+        assert len(cache) == 1
+
+
+class TestSlackRequestVerifier:
+    """The signing secret is loaded once per TTL"""
+
+    def test_secret_loaded_once(self):
+        load = MagicMock(return_value=SECRET)
+        verifier = SlackRequestVerifier(load, clock=lambda: NOW)
+
+        for i in range(3):
+            body = f"n={i}".encode()
+            assert verifier.verify(str(NOW), _sign(body), body)
+
+        load.assert_called_once()
+
+    def test_replay_and_load_failure(self):
+        verifier = SlackRequestVerifier(lambda: SECRET, clock=lambda: NOW)
+        body = b"{}"
+
+        assert verifier.check(str(NOW), _sign(body), body) == ""
+        assert verifier.check(str(NOW), _sign(body), body) == REPLAY
+
+        failing = SlackRequestVerifier(
+            MagicMock(side_effect=RuntimeError("unavailable"))
+        )
+        with pytest.raises(RuntimeError):
+            failing.check(str(NOW), _sign(body), body)
+
+
+class TestSecretCache:
+    """Secrets Manager is read once per TTL, not per request"""
+
+    def test_secret_string_cached(self):
+        secrets.clear_secrets_cache()
+        try:
+            with patch.object(
+                secrets, "fetch_secret_string", return_value="s"
+            ) as fetch:
+                assert secrets.get_secret_string("arn:1") == "s"
+                assert secrets.get_secret_string("arn:1") == "s"
+                fetch.assert_called_once_with("arn:1")
+
+                secrets.clear_secrets_cache()
+                secrets.get_secret_string("arn:1")
+                assert fetch.call_count == 2
+        finally:
+            secrets.clear_secrets_cache()
+
+    def test_cached_secret_expires(self):
+        now = [0.0]
+        load = MagicMock(side_effect=["old", "new"])
+        secret = secrets.CachedSecret(load, ttl=300, clock=lambda: now[0])
+
+        assert secret.get() == "old"
+        now[0] = 299
+        assert secret.get() == "old"
+        now[0] = 300
+        assert secret.get() == "new"
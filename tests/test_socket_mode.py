@@ -0,0 +1,222 @@
+"""
+Tests for the Socket Mode receiver and its websocket client, against the
+local Socket Mode stand-in
+"""
+import io
+import json
+import socket
+import sys
+import threading
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from benchmarks.socket_mode_stub import start_stub
+from src.app import socket_mode
+from src.app.common.idempotency import InteractionLedger
+from src.app.common.websocket import OP_TEXT, read_frame, write_frame
+from src.app.socket_mode import SocketModeReceiver
+
+BLOCK_ACTIONS = {
+    "type": "block_actions",
+    "trigger_id": "trigger-1",
+    "actions": [{"value": json.dumps({"context_id": "ctx-1"})}],
+}
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    httpd, stub, api_url = start_stub()
+    monkeypatch.setenv("SLACK_API_URL", api_url)
+    yield stub
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class _Recorder:
+    def __init__(self):
+        self.payloads = []
+        self.retries = []
+        self.done = threading.Semaphore(0)
+
+    def __call__(self, payload, deadline, retry_attempt, retry_reason):
+        self.payloads.append((payload, deadline))
+        self.retries.append((retry_attempt, retry_reason))
+        self.done.release()
+
+
+@pytest.fixture
+def receiver(stub):
+    handle = _Recorder()
+    receiver = SocketModeReceiver("xapp-test", handle=handle, workers=2)
+    thread = threading.Thread(target=receiver.run_forever, daemon=True)
+    thread.start()
+    yield receiver, handle
+    receiver.stop()
+    thread.join(5)
+
+
+class TestWebSocketFrames:
+    """Framing used by the client and the stand-in"""
+
+    @pytest.mark.parametrize("size", [5, 300, 70000])
+    def test_masked_round_trip(self, size):
+        left, right = socket.socketpair()
+        payload = ("あ" * size).encode("utf-8")[:size]
+        try:
+            sender = threading.Thread(
+                target=write_frame, args=(left, OP_TEXT, payload, True)
+            )
+            sender.start()
+            fin, opcode, data = read_frame(right.makefile("rb"))
+            sender.join()
+        finally:
+            left.close()
+            right.close()
+
+        assert (fin, opcode, data) == (True, OP_TEXT, payload)
+
+    def test_truncated_frame_raises(self):
+        with pytest.raises(OSError):
+            read_frame(io.BytesIO(b"\x81\x05ab"))
+
+
+class TestReceiver:
+    """Acknowledge at once, handle on the workers"""
+
+    def test_envelope_acked_and_dispatched(self, stub, receiver):
+        receiver, handle = receiver
+
+        envelope_id = stub.deliver(BLOCK_ACTIONS)
+
+        assert stub.wait_ack(envelope_id)
+        assert handle.done.acquire(timeout=5)
+        payload, deadline = handle.payloads[0]
+        assert payload == BLOCK_ACTIONS
+        assert 0 < deadline.remaining() <= 2.5
+        assert handle.retries == [(0, "")]
+        assert receiver.stats()["received"] == 1
+
+    def test_redelivered_envelope_passed_as_retry(self, stub, receiver):
+        receiver, handle = receiver
+        envelope_id = stub.deliver(BLOCK_ACTIONS)
+        assert stub.wait_ack(envelope_id)
+
+        stub.deliver(
+            BLOCK_ACTIONS,
+            retry_attempt=1,
+            retry_reason="timeout",
+            envelope_id=envelope_id,
+        )
+
+        assert handle.done.acquire(timeout=5)
+        assert handle.done.acquire(timeout=5)
+        assert sorted(handle.retries) == [(0, ""), (1, "timeout")]
+
+    def test_reconnects_when_asked(self, stub, receiver):
+        receiver, handle = receiver
+        assert stub.wait_ack(stub.deliver(BLOCK_ACTIONS))
+
+        stub.disconnect()
+        envelope_id = stub.deliver(BLOCK_ACTIONS)
+
+        assert stub.wait_ack(envelope_id)
+        assert stub.stats.as_dict()["connections"] == 2
+        assert receiver.stats()["connections"] == 2
+
+    def test_other_envelopes_only_acked(self):
+        handle = MagicMock()
+        receiver = SocketModeReceiver("xapp-test", handle=handle)
+        ws = MagicMock()
+        message = {
+            "envelope_id": "e1",
+            "type": "events_api",
+            "payload": {"type": "event_callback"},
+        }
+
+        assert receiver.on_message(ws, json.dumps(message))
+
+        ws.send.assert_called_once_with(json.dumps({"envelope_id": "e1"}))
+        assert receiver._queue.empty()
+
+    def test_full_queue_leaves_envelope_unacked(self):
+        receiver = SocketModeReceiver("xapp-test", queue_size=1)
+        ws = MagicMock()
+
+        for envelope_id in ("e1", "e2"):
+            receiver.on_message(
+                ws,
+                json.dumps({
+                    "envelope_id": envelope_id,
+                    "type": "interactive",
+                    "payload": BLOCK_ACTIONS,
+                }),
+            )
+
+        ws.send.assert_called_once_with(json.dumps({"envelope_id": "e1"}))
+        assert receiver.stats()["dropped"] == 1
+
+    def test_connect_failure_backs_off(self):
+        delays = []
+        receiver = SocketModeReceiver(
+            "xapp-test",
+            open_url=MagicMock(side_effect=OSError("unreachable")),
+            workers=0,
+            sleep=lambda delay: (delays.append(delay), receiver.stop()),
+        )
+
+        receiver.run_forever()
+
+        assert len(delays) == 1
+        assert receiver.stats()["connections"] == 0
+
+
+class TestDispatchInteraction:
+    """Payloads go through the Lambda's interaction handling"""
+
+    def test_uses_router_handler(self):
+        deadline = MagicMock()
+        with (
+            patch.object(socket_mode, "load_config") as mock_config,
+            patch.object(
+                socket_mode,
+                "resolve_slack_credentials",
+                return_value={"bot_token": "xoxb"},
+            ),
+            patch.object(socket_mode, "handle_interaction") as mock_handle,
+        ):
+            socket_mode.dispatch_interaction(BLOCK_ACTIONS, deadline)
+
+        mock_handle.assert_called_once_with(
+            mock_config.return_value, BLOCK_ACTIONS, "xoxb", deadline, 0, ""
+        )
+
+    def test_redelivered_envelope_not_run_again(self):
+        # The router module socket_mode actually imported
+        router = sys.modules[socket_mode.handle_interaction.__module__]
+        deadline = socket_mode.Deadline.after(2.5)
+        with (
+            patch.object(socket_mode, "load_config"),
+            patch.object(
+                socket_mode,
+                "resolve_slack_credentials",
+                return_value={"bot_token": "xoxb"},
+            ),
+            patch.object(
+                router,
+                "get_interaction_ledger",
+                return_value=InteractionLedger(),
+            ),
+            patch.object(router, "_interaction_records", return_value=None),
+            patch.object(
+                router,
+                "_run_interaction",
+                return_value={"statusCode": 200},
+            ) as mock_run,
+        ):
+            socket_mode.dispatch_interaction(BLOCK_ACTIONS, deadline)
+            socket_mode.dispatch_interaction(
+                BLOCK_ACTIONS, deadline, 1, "timeout"
+            )
+
+        mock_run.assert_called_once()